@@ -1,81 +1,38 @@
 #! python3
 
-import datetime
 import os
+import re
 import shutil
-from distutils.dir_util import copy_tree
-import pyperclip
+import sys
+import time
 from typing import List, Dict, Optional
 
-PROGRAM_LIST = 0
-SESSION_DICT = 1
-EVERYTHING_LIST = 2
-
-CURRENT_PROGRAM = -1
+from fitnesslog import read, parse_date, return_current_program, write_adjusted_program, \
+    current_program_model, Exercise, Section, Program, log_feedback, append_to_log, \
+    format_session, ingest_sessions, select_entries, remove_entries, decode_record, move_logger, sessions_between, \
+    sessions_in_last_days, sessions_on_weekday, is_database, import_text_log, export_text_log, \
+    recover_log, LogPager, format_page, load_progression, find_loggers, parse_many, format_report, KEEP_DAYS, \
+    rotate_segments, segment_summary, profiling_options, enable_profiling, profile_action, SESSION, PROGRAM, \
+    SEARCH_LIMIT, search_records, regex_records, EXPORT_FORMATS, export_log, LogWatcher, \
+    diff_programs, format_changes, load_program_history, PERIODS, MONTH, CHART_METRICS, CHART_WIDTH, load_rollups, \
+    update_rollups, format_chart, load_rep_store, BACKUP_KEEP, create_backup, list_backups, restore_backup, \
+    sync_loggers, conflicts_path, removed_path
 
 USER = 0
 PLACE_TO_LOG = 1
+BACKEND = 2
 
+TEXT_BACKEND = 'text'
+SQLITE_BACKEND = 'sqlite'
+LOG_FILE_NAMES = {TEXT_BACKEND: 'my_fitness_logs.txt', SQLITE_BACKEND: 'my_fitness_logs.db'}
 
-def read(filename: str) -> str:
-    """
-    reads the file specified and returns it as a str
-    """
-    try:
-        file_handle = open(filename)
-        lines = file_handle.read()
-        file_handle.close()
-        return lines
-    except FileNotFoundError:
-        print("File couldn't be found.")
-
-
-def parse_logger(filename: str) -> (List[str],
-                                    Dict[str, List[str]],
-                                    List[str]):
-    """
-    reads the logger specified and parses it into appropriate dictionaries for later use
-    """
-    program_list = []
-    program_filters = ['First Pair']
-    session_dict = {}
-    days_of_week = ['Monday', 'Wednesday', 'Friday', 'Saturday', 'Thursday', 'Tuesday', 'Sunday']
-    everything_list = []
-
-    file_handle = open(filename)
-    whole_file = file_handle.read()
-    file_handle.close()
-    file_list = whole_file.split("---")
+READ_PAGE_SIZE = 10
 
-    for element in file_list:
-        # add to program_list
-        for key in program_filters:
-            if key in element[:33]:
-                program_list.append(element)
+MENU_ACTIONS = {'1': 'read the logger', '2': 'log a session', '3': 'read the current program',
+                '4': 'adjust the current program', '5': 'remove entries', '6': 'read user specifications',
+                '7': 'adjust user specifications', '8': 'find sessions by date'}
 
-        # add to session_dict
-        for day in days_of_week:
-            if day in element[:9]:
-                initial_split_element = element.split('\n')
-                split_element = list(filter(None, initial_split_element))  # filters out empty strings in the list
-                header = split_element[0]
-                session_dict[header] = split_element[1:]
-
-        # add to everything_list
-        if element != '':
-            everything_list.append(element)
-
-    return program_list, session_dict, everything_list
-
-
-def parse_date(wanted_date: str) -> datetime.date:
-    """
-    helper function for create_header() that takes a user inputted date in the form of dd/mm/yyyy and turns it into a
-    date instance
-    """
-    date_elements = wanted_date.split("/")
-    formatted_date = datetime.date(int(date_elements[2]), int(date_elements[1]), int(date_elements[0]))
-    return formatted_date
+python_dir = None  # set by main(), where src/ (user_spec.txt and the starter files) lives
 
 
 def return_user_spec() -> tuple[str, str]:
@@ -98,6 +55,29 @@ def return_user_spec() -> tuple[str, str]:
     return u_name, u_log_dir
 
 
+def return_backend() -> str:
+    """
+    returns where the logs are stored ('text' or 'sqlite'), as set on the third line of "user_spec".txt
+    """
+    file_handle = open(os.path.join(python_dir, "src", "user_spec.txt"))
+    whole_file = file_handle.read()
+    file_handle.close()
+    try:
+        u_backend = whole_file.split("\n")[BACKEND].strip().lower()
+    except IndexError:
+        return TEXT_BACKEND
+    if u_backend not in LOG_FILE_NAMES:
+        return TEXT_BACKEND
+    return u_backend
+
+
+def return_logger() -> str:
+    """
+    returns the path of the user's logger, depending on their logging directory and backend
+    """
+    return os.path.join(return_user_spec()[PLACE_TO_LOG], LOG_FILE_NAMES[return_backend()])
+
+
 def read_user_spec() -> None:
     """
     Parses and reads user specifications to the user.
@@ -105,6 +85,7 @@ def read_user_spec() -> None:
     u_name, u_log_dir = return_user_spec()
     print("\nName:", u_name)
     print("\nLogging Directory:", u_log_dir)
+    print("\nStorage:", return_backend())
 
 
 def adjust_user_spec() -> None:
@@ -113,11 +94,14 @@ def adjust_user_spec() -> None:
 
     1) User's name
     2) User's working directory (where the logs are being stored)
+    3) User's storage backend (a .txt file or an SQLite database)
     """
     old_name, old_log_dir = return_user_spec()
+    old_backend = return_backend()
     o_valid = False
     while not o_valid:
-        starting_prompt = input("\nWhat do you want to Adjust?\n\n1- Name\n2- Directory to store logs\n\n")
+        starting_prompt = input("\nWhat do you want to Adjust?\n\n1- Name\n2- Directory to store logs\n"
+                                "3- Storage (text or sqlite)\n\n")
 
         if starting_prompt.lower() == "1":
             name_prompt = "\nPlease enter your name:\n\n"
@@ -137,25 +121,53 @@ def adjust_user_spec() -> None:
                 if u_log_dir.lower() == "same":
                     u_log_dir = os.getcwd()
                 valid = os.path.isdir(u_log_dir)
+            old_file_location = os.path.join(old_log_dir, LOG_FILE_NAMES[old_backend])
+            print("\nMoving \"my_fitness_logs\" from {} to {}".format(old_log_dir, u_log_dir))
+            try:
+                # the index, journal, segments, restore points and every other file beside the logger go with it
+                moved = move_logger(old_file_location, u_log_dir)
+            except (FileExistsError, OSError) as error:
+                print("\nCouldn't move your logs: {}".format(error))
+                return
             write_user_spec(old_name, u_log_dir)
             print("\nSuccessfully changed logging directory to {}".format(u_log_dir))
-            old_file_location = os.path.join(old_log_dir, 'my_fitness_logs.txt')
-            print("\nMoving \"my_fitness_logs\" from {} to {}".format(old_log_dir, u_log_dir))
-            shutil.move(old_file_location, u_log_dir)
-            print("\nMoved file successfully!")
+            print("\nMoved {} successfully!".format(', '.join(os.path.basename(path) for path in moved)))
+            o_valid = True
+
+        elif starting_prompt.lower() == "3":
+            if old_backend == TEXT_BACKEND:
+                new_backend = SQLITE_BACKEND
+            else:
+                new_backend = TEXT_BACKEND
+            old_file_location = os.path.join(old_log_dir, LOG_FILE_NAMES[old_backend])
+            new_file_location = os.path.join(old_log_dir, LOG_FILE_NAMES[new_backend])
+            prompt = "\nYour logs are stored in {}. Copy them over to {}, replacing it if it exists, and use it from now " \
+                     "on?\n\n1- Yes\n2- No\n\n".format(old_file_location, new_file_location)
+            if input(prompt) == "1":
+                if new_backend == SQLITE_BACKEND:
+                    import_text_log(old_file_location, new_file_location)
+                else:
+                    export_text_log(old_file_location, new_file_location)
+                write_user_spec(old_name, old_log_dir, new_backend)
+                print("\nNow storing logs in {}.".format(new_file_location))
             o_valid = True
         else:
             print("\nInvalid number.")
 
 
-def write_user_spec(w_name: str,w_log_dir: str) -> None:
+def write_user_spec(w_name: str, w_log_dir: str, w_backend: Optional[str] = None) -> None:
     """
-    helper function for adjust_user_spec that writes to "user_spec".txt in src
+    helper function for adjust_user_spec that writes to "user_spec".txt in src, keeping the current backend unless
+    told otherwise
     """
+    if w_backend is None:
+        w_backend = return_backend()
     file_handle = open(os.path.join(python_dir, "src", "user_spec.txt"), "w")
     file_handle.write(w_name)
     file_handle.write("\n")
     file_handle.write(w_log_dir)
+    file_handle.write("\n")
+    file_handle.write(w_backend)
     file_handle.close()
 
 
@@ -165,9 +177,12 @@ def create_log_file() -> None:
     """
     u_log_dir = return_user_spec()[PLACE_TO_LOG]
     starter_file = read(os.path.join(python_dir, "src", "starter_file.txt"))
-    file_handle = open(os.path.join(u_log_dir, "my_fitness_logs.txt"), "w")
+    file_handle = open(os.path.join(u_log_dir, LOG_FILE_NAMES[TEXT_BACKEND]), "w")
     file_handle.write(starter_file)
     file_handle.close()
+    if return_backend() == SQLITE_BACKEND:
+        import_text_log(os.path.join(u_log_dir, LOG_FILE_NAMES[TEXT_BACKEND]),
+                        os.path.join(u_log_dir, LOG_FILE_NAMES[SQLITE_BACKEND]))
 
 
 def create_header() -> str:
@@ -215,83 +230,6 @@ def create_comment() -> (Optional[str],
     return comment, comment_decision
 
 
-def return_current_program(filename: str) -> str:
-    """
-    returns the current program being followed
-    """
-    program_list = parse_logger(filename)[PROGRAM_LIST]
-    try:
-        current_program = program_list[CURRENT_PROGRAM]
-        return current_program
-    except IndexError:
-        print("Couldn't detect a program.")
-        return
-
-
-def write_adjusted_program(filename: str, new_program: str) -> None:
-    """
-    a helper function for adjust_program() that writes the adjusted program to file
-    """
-    file_handle = open(filename, 'a')
-    file_handle.write('\n')
-    file_handle.write(new_program)
-    file_handle.write('---')
-    file_handle.close()
-
-
-def parse_current_program(filename: str) -> Dict[str, list[str]]:
-    """
-    helper function for adjust_program() that parses the current program for easy adjusting
-    """
-    current_program = return_current_program(filename)
-    current_program_dict = {}
-    header_list = create_program_header(filename)
-    current_program_list = current_program.split('\n\n')
-    index = 0
-    for index in range(len(current_program_list)):
-        element = current_program_list[index]
-        element = element.strip('\n')
-        element = element.strip(':')
-        if element in header_list:
-            appropriate_link = current_program_list[index + 1]
-            appropriate_link_list1 = appropriate_link.split('\n')
-            appropriate_link_list2 = list(filter(None, appropriate_link_list1))
-            current_program_dict[element] = appropriate_link_list2
-
-    return current_program_dict
-
-
-def parse_adjusted_program(new_program_dict: Dict[str, list[str]]) -> str:
-    """
-    helper function for adjust_program() that turns a dictionary into a str for file writing
-    """
-    new_program_list = []
-
-    for key in new_program_dict:
-        new_program_list.append(key)
-        new_program_list.append('')
-
-        sets = new_program_dict[key]
-        for element in sets:
-            new_program_list.append(element)
-        new_program_list.append('')
-
-    new_program_str = '\n'.join(new_program_list)
-
-    return new_program_str
-
-
-def log_feedback(filename: str) -> str:
-    """
-    helper function for log() and adjust_program() that gives feedback on log made
-    """
-    everything_list = parse_logger(filename)[EVERYTHING_LIST]
-    last_3_list = everything_list[-3:]
-    last_3_str = "---".join(last_3_list)
-    last_3_str += '---'
-    return last_3_str
-
-
 def adjust_program(filename: str) -> None:
     """
     adjusts the current program being followed
@@ -302,39 +240,45 @@ def adjust_program(filename: str) -> None:
 
     print("\nCurrent program is:\n", current_program)
 
-    current_program_dict = parse_current_program(filename)
-    new_program_dict = {}
+    program = current_program_model(filename)
+    new_sections = []
 
-    for key in current_program_dict:
-        prompt = "\nWhat do you want to do with the {}?\n\n1- Keep\n2- Adjust\n3- Delete\n\n".format(key.lower())
+    for section in program.sections:
+        prompt = "\nWhat do you want to do with the {}?\n\n1- Keep\n2- Adjust\n3- Delete\n\n".format(
+            section.header.lower())
         response = input(prompt)
-        set_list = current_program_dict[key]
         if response == '1':
-            new_program_dict[key] = set_list
+            new_sections.append(section)
         if response == '2':
-            index = 0
-            for index in range(len(set_list)):
-                element = set_list[index]
-                print(element)
+            exercises = []
+            for exercise in section.exercises:
+                print(exercise.text)
                 prompt = "Adjust?\n\n1- Yes\n2- No\n\n"
                 response = input(prompt)
                 if response == '1':
                     prompt = "Enter new subset:\n\n"
                     response = input(prompt)
-                    set_list[index] = response
+                    exercise = Exercise(response)
+                exercises.append(exercise)
             prompt = "Add new subset?\n\n1- Yes\n2- No\n\n"
             response = input(prompt)
             if response == '1':
                 prompt = "Enter new subset:\n\n"
                 response = input(prompt)
-                set_list.append(response)
-            new_program_dict[key] = set_list
+                exercises.append(Exercise(response))
+            new_sections.append(Section(section.header, exercises))
         if response == '3':
             continue
 
-    # turn the dictionary into a readable string
-    new_program_str = parse_adjusted_program(new_program_dict)
-    prompt = 'The new program is going to be:\n\n{}\nProceed?\n\n1- Yes\n2- No\n\n'.format(new_program_str)
+    # turn the sections into a readable string
+    new_program = Program(new_sections)
+    new_program_str = new_program.to_text()
+    changes = diff_programs(program, new_program)
+    if not changes:
+        print("\nThe program is unchanged, nothing was written.")
+        return
+    prompt = 'The new program is going to be:\n\n{}\nChanges:\n\n{}\n\nProceed?\n\n1- Yes\n2- No\n\n'.format(
+        new_program_str, format_changes(changes))
     response = input(prompt)
     if response == '1':
         write_adjusted_program(filename, new_program_str)
@@ -342,51 +286,54 @@ def adjust_program(filename: str) -> None:
         print(log_feedback(filename))
 
 
-def create_program_header(filename: str) -> List[str]:
+def recover_logger(filename: str) -> None:
     """
-    a helper function for create_body() that returns the section headers for the current program being followed
+    finishes whatever was being written to the logger if FitnessLogManager was stopped halfway through
     """
-    current_program = return_current_program(filename)
-    possible_header_list = current_program.split('\n\n')
-    temp_header_list = []
-    for possible_header in possible_header_list:
-        if 'pair' in possible_header.lower() or 'triplet' in possible_header.lower():
-            temp_header_list.append(possible_header)
+    if is_database(filename) or not os.path.exists(filename):
+        return
+    recovered = recover_log(filename)
+    if recovered:
+        print("\nFinished writing {} entr{} that were cut off when FitnessLogManager last stopped.".format(
+            recovered, 'y' if recovered == 1 else 'ies'))
 
-    # strip newlines and ':' from temp_header_list
-    header_list = []
-    for header in temp_header_list:
-        header = header.strip('\n')
-        header = header.strip(':')
-        header_list.append(header)
 
-    return header_list
+def copy_to_clipboard(text: str) -> bool:
+    """
+    copies text to the clipboard, returning False if there is no clipboard to copy to (pyperclip is only imported
+    here, as it is an optional dependency that is slow to import)
+    """
+    try:
+        import pyperclip
+        pyperclip.copy(text)
+    except Exception:  # pyperclip is missing or can't find a copy/paste mechanism
+        return False
+    return True
 
 
-def max_reps_clipboard(header: str) -> None:
+def max_reps_clipboard(section: Section) -> None:
     """
-    helper function for create_body() that copies the max reps possible to clipboard as appropriate to the given header
+    helper function for create_body() that copies the max reps possible to clipboard as appropriate to the given section
     """
-    if 'pair' in header.lower():
-        pyperclip.copy('8 8 8, 8 8 8')
-
-    elif 'triplet' in header.lower():
-        pyperclip.copy('12 12 12, 30 30 30, 12 12 12')
+    if section.max_reps is not None:
+        copy_to_clipboard(section.max_reps)
 
 
 def create_body(filename: str) -> Dict[str, str]:
     """
     helper function for log() that creates a body for the log based on user input
     """
-    header_list = create_program_header(filename)
+    program = current_program_model(filename)
     body = {}
+    if program is None:
+        return body
 
     print("\nMax reps copied to clipboard as appropriate.")
-    for header in header_list:
-        max_reps_clipboard(header)
-        prompt = "\nPlease enter your reps for the {}\n\n".format(header.lower())
+    for section in program.sections:
+        max_reps_clipboard(section)
+        prompt = "\nPlease enter your reps for the {}\n\n".format(section.header.lower())
         response = input(prompt)
-        body[header] = response
+        body[section.header] = response
 
     return body
 
@@ -429,33 +376,14 @@ def log(filename: str) -> None:
     prompt = '\nThe following is going to be logged:\n\n{}\n\nProceed?\n\n1- Yes\n2- No\n\n'.format(to_be_logged_str)
     response = input(prompt)
     if response == '1':
-        file_handle = open(filename, 'a')
-        file_handle.write('\n')
-        file_handle.write(header)
-        if comment_decision:
-            file_handle.write('\n')
-            file_handle.write(comment)
-        for key in body:
-            reps = body[key]
-            file_handle.write('\n')
-            file_handle.write(reps)
-        file_handle.write('\n')
-        file_handle.write('---')
-        file_handle.close()
+        if not comment_decision:
+            comment = None
+        append_to_log(filename, format_session(header, comment, list(body.values())))
+        update_rollups(filename)
         print("\nLog successful.")
         print(log_feedback(filename))
 
 
-def backup(filename: str):
-    """
-    creates a backup to 'backup.txt' before altering to the main file
-    """
-    file = read(filename)
-    file_handle = open('backup.txt', 'w')
-    file_handle.write(file)
-    file_handle.close()
-
-
 def delete_entries(filename: str) -> None:
     """
     deletes entries in the file based on user input
@@ -464,22 +392,129 @@ def delete_entries(filename: str) -> None:
     prompt = "\nHow many entries would you like to delete?\n\n"
     entries_to_delete = int(input(prompt))
 
-    everything_list = parse_logger(filename)[EVERYTHING_LIST]
-    delete_list = everything_list[-entries_to_delete:]
+    delete_records = select_entries(filename, entries_to_delete)
+    if not delete_records:
+        print("\nNothing to delete.")
+        return
+    delete_list = [decode_record(raw) for start, end, raw in delete_records]
     delete_str = '---'.join(delete_list)
 
     prompt = "{}\nDelete these entries?\n\n1- Yes\n2- No\n\n".format(delete_str)
     response = input(prompt)
 
     if response == '1':
-        backup(filename)
-        everything_list = everything_list[:-entries_to_delete]
-        everything_str = '---'.join(everything_list)
-        file_handle = open(filename, 'w')
-        file_handle.write(everything_str)
-        file_handle.write('---')
-        file_handle.close()
+        remove_entries(filename, delete_records)
+        update_rollups(filename)
         print("\nEntries deleted successfully.")
+        if is_database(filename):
+            print("The removed entries were saved to {}.".format(removed_path(filename)))
+        else:
+            print("To undo, run: python FitnessLogManager.py backup --restore {}".format(
+                list_backups(filename)[-1].number))
+
+
+def find_sessions(filename: str) -> None:
+    """
+    finds sessions by date based on user input:
+    1- Between two dates
+    2- In the last few days
+    3- On a given weekday
+    """
+    prompt = "\nHow do you want to find sessions?\n\n1- Between two dates\n2- In the last few days\n" \
+             "3- On a given weekday\n\n"
+    response = input(prompt)
+    try:
+        if response == '1':
+            first = parse_date(input("\nFrom which day? (DD/MM/YYYY)\n\n"))
+            last = parse_date(input("\nUntil which day? (DD/MM/YYYY)\n\n"))
+            sessions = sessions_between(filename, first, last)
+        elif response == '2':
+            days = int(input("\nHow many days back?\n\n"))
+            sessions = sessions_in_last_days(filename, days)
+        elif response == '3':
+            weekday = input("\nWhich weekday? (e.g. Monday)\n\n")
+            sessions = sessions_on_weekday(filename, weekday.strip())
+        else:
+            print("\nInvalid number.")
+            return
+    except (ValueError, IndexError):
+        print("\nInvalid values entered, dates must be an appropriate DD/MM/YYYY.")
+        return
+
+    if not sessions:
+        print("\nNo sessions found.")
+        return
+    print('---'.join(session.text for session in sessions) + '---')
+    print("\n{} session(s) found.".format(len(sessions)))
+
+
+def show_progress(filename: str) -> None:
+    """
+    prints how every exercise of the current program has been going, across every program it was part of
+    """
+    engine = load_progression(filename)
+    names = engine.current_exercises()
+    if not names:
+        return
+    print("Progress so far:\n")
+    width = max(len(name) for name in names)
+    for name, progress in engine.report(names).items():
+        if not progress['sessions']:
+            print("{}  not done yet".format(name.ljust(width)))
+            continue
+        print("{}  best set {:>3}, {:>6} reps over {:>4} sessions, {:+.1f} reps per session lately".format(
+            name.ljust(width), progress['best_set'], progress['total_reps'], progress['sessions'],
+            progress['trend']))
+
+
+def read_logger(filename: str) -> None:
+    """
+    shows the logger a page at a time, newest first, letting the user move between pages or jump to a date or record
+    """
+    if not os.path.exists(filename):
+        print("File couldn't be found.")
+        return
+    pager = LogPager(filename, READ_PAGE_SIZE)
+    page = 1
+
+    while True:
+        page = min(max(page, 1), pager.pages())
+        numbers = pager.page_numbers(page)
+        print(format_page(pager.page(page)))
+        if numbers:
+            showing = "records {} to {} of {}".format(numbers[0], numbers[-1], len(pager))
+        else:
+            showing = "no records"
+        order = "oldest" if pager.newest_first else "newest"
+        prompt = "\nPage {} of {}, {}.\n\n1- Next page\n2- Previous page\n3- Jump to a date\n" \
+                 "4- Jump to a record number\n5- Show {} first\n6- Change page size\n" \
+                 "Anything else- Back to the menu\n\n".format(page, pager.pages(), showing, order)
+        response = input(prompt)
+        try:
+            if response == '1':
+                page += 1
+            elif response == '2':
+                page -= 1
+            elif response == '3':
+                record = pager.record_of_date(parse_date(input("\nWhich day? (DD/MM/YYYY)\n\n")))
+                if record is None:
+                    print("\nNo sessions on or after that day.")
+                else:
+                    page = pager.page_of_record(record)
+            elif response == '4':
+                page = pager.page_of_record(int(input("\nWhich record number?\n\n")))
+            elif response == '5':
+                first_shown = numbers[0] if numbers else 1
+                pager.newest_first = not pager.newest_first
+                page = pager.page_of_record(first_shown)
+            elif response == '6':
+                first_shown = numbers[0] if numbers else 1
+                pager.page_size = max(1, int(input("\nHow many records per page?\n\n")))
+                page = pager.page_of_record(first_shown)
+            else:
+                return
+        except (ValueError, IndexError):
+            print("\nInvalid values entered.")
 
 
 # def backup_to_z():
@@ -491,8 +526,8 @@ def delete_entries(filename: str) -> None:
 #     print('\nStarting backup..')
 #     z_python_dir = r'Z:\_Mostafa\PycharmProjects\FitnessLogManager'
 #     z_log_dir = r'Z:\_Mostafa\Reddit bodyweight routine'
-#     copy_tree(python_dir, z_python_dir)
-#     copy_tree(log_dir, z_log_dir)
+#     shutil.copytree(python_dir, z_python_dir, dirs_exist_ok=True)
+#     shutil.copytree(log_dir, z_log_dir, dirs_exist_ok=True)
 #     print('\nBacked up to (Z:) successfully.')
 
 
@@ -560,7 +595,7 @@ def new_user_sequence():
     print("\nExample of what a directory looks like: D:\\Folders\\Training")
     print("\nIf you simply want to store that .txt file in the same directory as FitnessLogManager, just write "
           "\"same\" (without quotations)")
-    pyperclip.copy(python_dir)
+    copy_to_clipboard(python_dir)
     u_log_dir = input("\nCurrent directory has been copied to clipboard for convenience. Please enter a valid "
                       "directory to store your logs:\n\n")
     if u_log_dir.lower() == "same":
@@ -586,79 +621,458 @@ def new_user_sequence():
     print("\n\n\n\n\n\n\n\n\n\n\n\n\n\n\n\n\n\n\n\n\n\n\n\n\n\n\n\n\n\n")
 
 
-python_dir = os.getcwd()
+def run_command(arguments: List[str]) -> None:
+    """
+    runs FitnessLogManager without the menu, e.g. 'python FitnessLogManager.py ingest sessions.csv'
+    """
+    import argparse  # only needed for commands, so the menu doesn't pay for importing it
+
+    parser = argparse.ArgumentParser(prog='FitnessLogManager.py')
+    commands = parser.add_subparsers(dest='command', required=True)
+    ingest_parser = commands.add_parser('ingest', help="log every session in a .csv or .jsonl file")
+    ingest_parser.add_argument('path', help="the .csv or .jsonl file to read sessions from")
+    ingest_parser.add_argument('--logger', help="the logger to write to (defaults to the one in user_spec.txt)")
+    serve_parser = commands.add_parser('serve', help="serve the loggers of many users over HTTP/JSON")
+    serve_parser.add_argument('root', help="the folder holding one folder per user")
+    serve_parser.add_argument('--host', default='127.0.0.1')
+    serve_parser.add_argument('--port', type=int, default=8080)
+    serve_parser.add_argument('--max-states', type=int, default=64,
+                              help="how many users' parsed loggers to keep in memory at once")
+    serve_parser.add_argument('--workers', type=int, default=8, help="threads for reads (and as many for writes)")
+    report_parser = commands.add_parser('report', help="summarise many loggers (and .gz archives) at once")
+    report_parser.add_argument('paths', nargs='+', help="loggers, or folders to look for my_fitness_logs*.txt in")
+    report_parser.add_argument('--workers', type=int, default=None,
+                               help="processes to parse with (defaults to the number of cores)")
+    report_parser.add_argument('--json', action='store_true', help="print the report as JSON")
+    rotate_parser = commands.add_parser('rotate', help="move older sessions into compressed per-year segments")
+    rotate_parser.add_argument('--keep-days', type=int, default=KEEP_DAYS,
+                               help="how many days of sessions stay in the logger itself")
+    rotate_parser.add_argument('--compression', choices=['gzip', 'zstd'], default='gzip',
+                               help="zstd needs the zstandard package")
+    rotate_parser.add_argument('--logger', help="the logger to rotate (defaults to the one in user_spec.txt)")
+    search_parser = commands.add_parser('search', help="find entries by the words in their comments or programs")
+    search_parser.add_argument('query', help="words that all have to be in the comment (or program), or a phrase in "
+                                             "double quotes, or a regular expression with --regex")
+    search_parser.add_argument('--regex', action='store_true', help="treat the query as a regular expression")
+    search_parser.add_argument('--ignore-case', action='store_true', help="ignore case in the regular expression")
+    search_parser.add_argument('--kind', choices=[SESSION, PROGRAM], help="only show sessions or programs")
+    search_parser.add_argument('--limit', type=int, default=SEARCH_LIMIT, help="how many of the latest matches to show")
+    search_parser.add_argument('--logger', help="the logger to search (defaults to the one in user_spec.txt)")
+    export_parser = commands.add_parser('export', help="export every session and program as .csv, .jsonl or binary")
+    export_parser.add_argument('path', help="the file to write to")
+    export_parser.add_argument('--format', choices=list(EXPORT_FORMATS),
+                               help="defaults to the extension of path ({})".format(
+                                   ', '.join(EXPORT_FORMATS.values())))
+    export_parser.add_argument('--logger', help="the logger to export (defaults to the one in user_spec.txt)")
+    programs_parser = commands.add_parser('programs', help="list the revisions of the program, or compare two of them")
+    programs_parser.add_argument('--show', type=int, metavar='N', help="print revision N (-1 for the current one)")
+    programs_parser.add_argument('--diff', type=int, nargs=2, metavar=('A', 'B'),
+                                 help="print what changed from revision A to revision B")
+    programs_parser.add_argument('--logger', help="the logger to read (defaults to the one in user_spec.txt)")
+    chart_parser = commands.add_parser('chart', help="chart reps, sessions or best sets per week or month")
+    chart_parser.add_argument('--period', choices=list(PERIODS), default=MONTH)
+    chart_parser.add_argument('--metric', choices=list(CHART_METRICS), default='reps')
+    chart_parser.add_argument('--section', help="only count the reps of sections with this in their header, "
+                                                "e.g. 'Core Triplet'")
+    chart_parser.add_argument('--last', type=int, metavar='N', help="only chart the last N weeks or months")
+    chart_parser.add_argument('--width', type=int, default=CHART_WIDTH, help="how wide the longest bar is")
+    chart_parser.add_argument('--logger', help="the logger to chart (defaults to the one in user_spec.txt)")
+    backup_parser = commands.add_parser('backup', help="make a restore point of the logger, list them or restore one")
+    backup_parser.add_argument('--list', action='store_true', help="list the restore points")
+    backup_parser.add_argument('--restore', type=int, metavar='N',
+                               help="put the logger back as it was at restore point N")
+    backup_parser.add_argument('--keep', type=int, metavar='N',
+                               help="how many restore points to keep from now on (starts at {})".format(BACKUP_KEEP))
+    backup_parser.add_argument('--logger', help="the logger to back up (defaults to the one in user_spec.txt)")
+    volume_parser = commands.add_parser('volume', help="reps per week, best sets and how your last session compares to "
+                                                       "your max reps (needs NumPy)")
+    volume_parser.add_argument('--weeks', type=int, default=8, help="how many of the last weeks to show")
+    volume_parser.add_argument('--window', type=int, default=7, help="how many sessions the average reps are over")
+    volume_parser.add_argument('--logger', help="the logger to read (defaults to the one in user_spec.txt)")
+    sync_parser = commands.add_parser('sync', help="sync the logger with a copy of it in another folder")
+    sync_parser.add_argument('other', help="the other folder (a USB stick, a mounted share), or the other logger")
+    sync_parser.add_argument('--logger', help="the logger to sync (defaults to the one in user_spec.txt), its sessions "
+                                              "win when both loggers have a different one on the same date")
+    options = parser.parse_args(arguments)
+
+    if options.command == 'report':
+        report_logs(options)
+        return
+    if options.command == 'serve':
+        serve_logs(options)
+        return
 
-if is_new_user():
-    new_user_sequence()
+    filename = options.logger
+    if filename is None:
+        if is_new_user():
+            print("No user specifications found, run FitnessLogManager without arguments first or pass --logger.")
+            sys.exit(1)
+        filename = return_logger()
+    if not os.path.exists(filename):
+        print("File couldn't be found.")
+        sys.exit(1)
+    recover_logger(filename)
+
+    if options.command == 'ingest':
+        if ingest_sessions(filename, options.path) is None:
+            sys.exit(1)
+        update_rollups(filename)
+    elif options.command == 'rotate':
+        rotate_logger(filename, options.keep_days, options.compression)
+    elif options.command == 'search':
+        search_logger(filename, options)
+    elif options.command == 'export':
+        export_logger(filename, options.path, options.format)
+    elif options.command == 'programs':
+        show_revisions(filename, options)
+    elif options.command == 'chart':
+        show_chart(filename, options)
+    elif options.command == 'backup':
+        backup_logger(filename, options)
+    elif options.command == 'volume':
+        show_volume(filename, options)
+    elif options.command == 'sync':
+        sync_logger(filename, options.other)
+
+
+def rotate_logger(filename: str, keep_days: int, compression: str) -> None:
+    """
+    helper function for run_command() that moves the sessions older than keep_days into segments
+    """
+    if is_database(filename):
+        print("SQLite loggers don't need rotating, only .txt loggers can be split into segments.")
+        sys.exit(1)
+    try:
+        moved = rotate_segments(filename, keep_days, compression=compression)
+    except ImportError as error:
+        print(error)
+        sys.exit(1)
+    summary = segment_summary(filename)
+    print("Moved {} entries into segments, {} entries in {} segments and {} left in the logger.".format(
+        moved, summary['archived'], len(summary['segments']), summary['hot']))
 
-name, log_dir = return_user_spec()
 
-os.chdir(log_dir)
+def search_logger(filename: str, options) -> None:
+    """
+    helper function for run_command() that prints the latest entries matching a search, and how many there are
+    """
+    if is_database(filename):
+        print("Searching only works on .txt loggers, switch back to text to search.")
+        sys.exit(1)
+    limit = max(options.limit, 0)
+    started = time.perf_counter()
+    if options.regex:
+        try:
+            result = regex_records(filename, options.query, options.ignore_case, options.kind, limit)
+        except re.error as error:
+            print("Invalid regular expression:", error)
+            sys.exit(1)
+    else:
+        result = search_records(filename, options.query, options.kind, limit)
+    elapsed = time.perf_counter() - started
+    for record in result.records:
+        print('\n{}\n---'.format(record.text.strip('\n')))
+    print("\n{} entr{} found in {:.3f}s{}.".format(
+        result.total, 'y' if result.total == 1 else 'ies', elapsed,
+        ", showing the latest {}".format(len(result.records)) if len(result.records) < result.total else ''))
 
-# interface:
 
-logger = os.path.join(log_dir, 'my_fitness_logs.txt')
+def export_logger(filename: str, path: str, export_format: Optional[str]) -> None:
+    """
+    helper function for run_command() that exports the logger and says how long it took
+    """
+    started = time.perf_counter()
+    try:
+        rows = export_log(filename, path, export_format)
+    except ValueError as error:
+        print(error)
+        sys.exit(1)
+    print("Exported {} rows to {} in {:.1f}s.".format(rows, path, time.perf_counter() - started))
 
-welcome = ' Welcome, {}. What would you like to do today? '.format(name)
-welcome = welcome.center(211, '*')
-print(welcome)
-option_1 = ' (1) Read the logger '
-option_1 = option_1.center(211, '*')
-option_2 = ' (2) Log a session '
-option_2 = option_2.center(211, '*')
-option_3 = ' (3) Read the current program '
-option_3 = option_3.center(211, '*')
-option_4 = ' (4) Adjust the current program '
-option_4 = option_4.center(211, '*')
-option_5 = ' (5) Remove entries '
-option_5 = option_5.center(211, '*')
-option_6 = ' (6) Read user specifications '
-option_6 = option_6.center(211, '*')
-option_7 = ' (7) Adjust user specifications '
-option_7 = option_7.center(211, '*')
-# option_8 = ' (8) Backup to (Z:) '
-# option_8 = option_8.center(211, '*')
-exit_prompt = ' (Type \'exit\' to exit the program) '
-exit_prompt = exit_prompt.center(211, '*')
 
-answer = ""
+def show_revisions(filename: str, options) -> None:
+    """
+    helper function for run_command() that lists every revision of the program with what it changed, or prints one
+    revision or the changes between two
+    """
+    history = load_program_history(filename)
+    try:
+        if options.show is not None:
+            print(history.revision(options.show).to_text())
+        elif options.diff is not None:
+            print(format_changes(history.diff(*options.diff)))
+        else:
+            for number in range(1, len(history) + 1):
+                changes = history.delta(number)
+                print("Revision {}: {} sections, {}".format(
+                    number, len(history.revisions[number - 1]),
+                    ', '.join('{} {}'.format(change.change, change.header.split(':')[0]) for change in changes)
+                    if changes else 'unchanged'))
+            print("{} revisions, {} different sections.".format(len(history), len(history.sections)))
+    except IndexError as error:
+        print(error)
+        sys.exit(1)
+
+
+def show_chart(filename: str, options) -> None:
+    """
+    helper function for run_command() that charts the rollups of the logger, without reading any of its sessions
+    unless the rollups have to catch up with it
+    """
+    rollups = load_rollups(filename).rollups(options.period)
+    title = "Best set" if options.metric == 'best' else options.metric.capitalize()
+    if options.section is not None and options.metric == 'reps':
+        title += " of {}".format(options.section)
+    print("{} per {}:\n".format(title, options.period))
+    print(format_chart(rollups, options.period, options.metric, options.section, options.last, max(options.width, 1)))
 
-while 'exit' != answer.lower():
-    print('\n{}\n'
-          '{}\n'
-          '{}\n'
-          '{}\n'
-          '{}\n'
-          '{}\n'
-          '{}\n'
-          '{}\n'.format(option_1, option_2, option_3, option_4, option_5, option_6, option_7, exit_prompt))
 
-    answer = input()
+def show_volume(filename: str, options) -> None:
+    """
+    helper function for run_command() that prints the reps of the last few weeks, the average reps per session lately,
+    the best set of every exercise (named as in the current program) and how the last session compares to the max
+    reps of the current program, all from the rep store
+    """
+    try:
+        store = load_rep_store(filename)
+    except ImportError as error:
+        print(error)
+        sys.exit(1)
+    dates, averages = store.rolling_average(max(options.window, 1))
+    if not len(dates):
+        print("No sessions done yet.")
+        return
 
-    if answer == '1':
-        print('\n', read(logger), sep='')
+    weeks, totals = store.weekly_volume()
+    print("Reps per week:\n")
+    for week, total in list(zip(weeks, totals))[-max(options.weeks, 1):]:
+        print("  week of {}  {:>6}".format(week, total))
+    print("\nAverage reps over the last {} sessions: {:.0f}".format(min(max(options.window, 1), len(dates)),
+                                                                   averages[-1]))
+
+    program = current_program_model(filename)
+    names = []
+    for section, exercise, best in zip(*store.best_sets()):
+        if section < len(program.sections) and exercise < len(program.sections[section].exercises):
+            names.append((program.sections[section].exercises[exercise].name, best))
+        else:
+            names.append(("section {}, exercise {}".format(section + 1, exercise + 1), best))
+    width = max(len(name) for name, best in names)
+    print("\nBest sets:\n")
+    for name, best in names:
+        print("  {}  {:>4}".format(name.ljust(width), best))
 
-    elif answer == '2':
-        log(logger)
+    columns = store.columns()
+    last = (columns['start'] == columns['start'].max()) & ~columns['skipped']
+    percent = store.percent_of_max(program.headers())[last]
+    percent = percent[percent == percent]  # drops the sets without a max (NaN)
+    if len(percent):
+        print("\nYour last session was at {:.0f}% of your max reps on average.".format(percent.mean()))
 
-    elif answer == '3':
-        print(return_current_program(logger))
 
-    elif answer == '4':
-        adjust_program(logger)
+def backup_logger(filename: str, options) -> None:
+    """
+    helper function for run_command() that makes a restore point of the logger, lists them or restores one
+    """
+    if is_database(filename):
+        print("Restore points are only made of .txt loggers, SQLite loggers can be copied as they are.")
+        sys.exit(1)
+    started = time.perf_counter()
+    if options.restore is not None:
+        try:
+            point = restore_backup(filename, options.restore)
+        except ValueError as error:
+            print(error)
+            sys.exit(1)
+        print("Restored the logger as it was at restore point {} ({}, {}) in {:.2f}s, the logger as it was before "
+              "is restore point {}.".format(point.number, point.created, point.reason, time.perf_counter() - started,
+                                            list_backups(filename)[-1].number))
+    elif options.list:
+        points = list_backups(filename)
+        for point in points:
+            print("{:>4}  {}  {:>12,} bytes  {:>5} chunks  {:>12,} bytes written  {}".format(
+                point.number, point.created, point.size, point.chunks, point.written, point.reason))
+        if not points:
+            print("No restore points yet.")
+    else:
+        point = create_backup(filename, 'backup', options.keep)
+        print("Restore point {}: {:,} bytes in {} chunks, {:,} bytes written in {:.2f}s.".format(
+            point.number, point.size, point.chunks, point.written, time.perf_counter() - started))
+
 
-    elif answer == '5':
-        delete_entries(logger)
+def sync_logger(filename: str, other: str) -> None:
+    """
+    helper function for run_command() that syncs the logger with the logger of the same name in another folder
+    (creating it if it isn't there yet), and prints what was copied each way
+    """
+    if os.path.isdir(other):
+        other = os.path.join(other, os.path.basename(filename))
+    if not os.path.isdir(os.path.dirname(os.path.abspath(other))):
+        print("The folder {} couldn't be found.".format(os.path.dirname(os.path.abspath(other))))
+        sys.exit(1)
+    started = time.perf_counter()
+    try:
+        report = sync_loggers(filename, other)
+    except ValueError as error:
+        print(error)
+        sys.exit(1)
+    print("Synced {} with {} in {:.2f}s: {} record(s) copied there, {} copied here, {} deleted, {:,} bytes "
+          "copied.".format(filename, other, time.perf_counter() - started, report.sent, report.received,
+                           report.deleted, report.copied))
+    if report.conflicts:
+        print("\nBoth loggers had a different session on the same date, the one from {} was kept in both and the "
+              "other one saved to {}:".format(filename, conflicts_path(other)))
+        for header in report.conflicts:
+            print("  " + header)
+
+
+def report_logs(options) -> None:
+    """
+    helper function for run_command() that prints a report over many loggers, parsed in parallel
+    """
+    filenames = find_loggers(options.paths)
+    missing = [filename for filename in filenames if not os.path.exists(filename)]
+    if missing:
+        print("File couldn't be found:", missing[0])
+        sys.exit(1)
+    report = parse_many(filenames, options.workers)
+    if options.json:
+        import json
+        print(json.dumps({'files': [summary._asdict() for summary in report.files], 'exercises': report.exercises},
+                         indent=2))
+    else:
+        print(format_report(report))
 
-    elif answer == '6':
-        os.chdir(python_dir)
-        read_user_spec()
-        os.chdir(log_dir)
 
-    elif answer == '7':
-        os.chdir(python_dir)
-        adjust_user_spec()
-        os.chdir(log_dir)
+def serve_logs(options) -> None:
+    """
+    helper function for run_command() that runs the multi-user service until it is interrupted
+    """
+    import asyncio
+    from fitnesslog.service import serve  # asyncio is only needed for the service
+
+    if not os.path.isdir(options.root):
+        print("Come on man, that's an invalid path.")
+        sys.exit(1)
+    starter_file = os.path.join(python_dir, 'src', 'starter_file.txt')
+    try:
+        asyncio.run(serve(options.root, starter_file, options.host, options.port, options.max_states,
+                          options.workers))
+    except KeyboardInterrupt:
+        print("\nService stopped.")
+
+
+def main() -> None:
+    """
+    starts FitnessLogManager: runs a command if one was given, otherwise shows the menu
+    """
+    global python_dir
+    python_dir = os.getcwd()
+
+    arguments, profile_options = profiling_options(sys.argv[1:])
+    if profile_options is not None:
+        enable_profiling(**profile_options)
+
+    if arguments:
+        with profile_action(arguments[0]):
+            run_command(arguments)
+        return
 
-    # elif answer == '8':
-    #     backup_to_z()
+    if is_new_user():
+        new_user_sequence()
+
+    name, log_dir = return_user_spec()
+
+    os.chdir(log_dir)
+
+    # interface:
+
+    logger = return_logger()
+    recover_logger(logger)
+    # keeps what is cached about the logger current when it is edited by hand or synced while the menu is open
+    watcher = LogWatcher(logger).start()
+
+    welcome = ' Welcome, {}. What would you like to do today? '.format(name)
+    welcome = welcome.center(211, '*')
+    print(welcome)
+    option_1 = ' (1) Read the logger '
+    option_1 = option_1.center(211, '*')
+    option_2 = ' (2) Log a session '
+    option_2 = option_2.center(211, '*')
+    option_3 = ' (3) Read the current program '
+    option_3 = option_3.center(211, '*')
+    option_4 = ' (4) Adjust the current program '
+    option_4 = option_4.center(211, '*')
+    option_5 = ' (5) Remove entries '
+    option_5 = option_5.center(211, '*')
+    option_6 = ' (6) Read user specifications '
+    option_6 = option_6.center(211, '*')
+    option_7 = ' (7) Adjust user specifications '
+    option_7 = option_7.center(211, '*')
+    option_8 = ' (8) Find sessions by date '
+    option_8 = option_8.center(211, '*')
+    # option_9 = ' (9) Backup to (Z:) '
+    # option_9 = option_9.center(211, '*')
+    exit_prompt = ' (Type \'exit\' to exit the program) '
+    exit_prompt = exit_prompt.center(211, '*')
+
+    answer = ""
+
+    while 'exit' != answer.lower():
+        print('\n{}\n'
+              '{}\n'
+              '{}\n'
+              '{}\n'
+              '{}\n'
+              '{}\n'
+              '{}\n'
+              '{}\n'
+              '{}\n'.format(option_1, option_2, option_3, option_4, option_5, option_6, option_7, option_8, exit_prompt))
+
+        answer = input()
+
+        with profile_action(MENU_ACTIONS.get(answer)), watcher:
+            if answer == '1':
+                read_logger(logger)
+
+            elif answer == '2':
+                log(logger)
+
+            elif answer == '3':
+                print(return_current_program(logger))
+                show_progress(logger)
+
+            elif answer == '4':
+                adjust_program(logger)
+
+            elif answer == '5':
+                delete_entries(logger)
+
+            elif answer == '6':
+                os.chdir(python_dir)
+                read_user_spec()
+                os.chdir(log_dir)
+
+            elif answer == '7':
+                os.chdir(python_dir)
+                adjust_user_spec()
+                name, log_dir = return_user_spec()
+                logger = return_logger()
+                os.chdir(log_dir)
+                recover_logger(logger)
+
+            elif answer == '8':
+                find_sessions(logger)
+
+            # elif answer == '9':
+            #     backup_to_z()
+
+        if watcher.filename != os.path.abspath(logger):
+            watcher.stop()
+            watcher = LogWatcher(logger).start()
+
+    watcher.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,115 @@
+"""
+measures restore points on synthetic logs (see generate_log.py): how long a backup takes and how many bytes it
+writes, the first one and after an append, a removal and an edit in the middle of the logger, how long restoring the
+oldest one takes, and how much disk the restore points use against keeping a full copy of the logger for each.
+
+    python benchmarks/backups.py [--sizes 10000,100000,1000000] [--appends 10]
+"""
+
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+from fitnesslog import parse_cache, format_session, append_to_log, select_entries, remove_entries, create_backup, \
+    list_backups, restore_backup, backups_dir  # noqa: E402
+from generate_log import generate_log  # noqa: E402
+
+DEFAULT_SIZES = [10000, 100000, 1000000]
+DATA_DIR = os.path.join(tempfile.gettempdir(), 'fitnesslog-benchmarks')
+SESSION = format_session('Monday 01/01/2120', None, ['8 8 8, 8 8 8'] * 3 + ['12 12 12, 30 30 30, 12 12 12'])
+
+
+def data_file(sessions: int) -> str:
+    """
+    returns the synthetic log for the given size, generating it the first time (the same ones run_benchmarks.py uses)
+    """
+    os.makedirs(DATA_DIR, exist_ok=True)
+    filename = os.path.join(DATA_DIR, 'log_{}.txt'.format(sessions))
+    if not os.path.exists(filename):
+        generate_log(filename, sessions=sessions, programs=max(1, sessions // 2000))
+    return filename
+
+
+def disk_usage(path: str) -> int:
+    return sum(os.path.getsize(os.path.join(directory, name)) for directory, directories, names in os.walk(path)
+               for name in names)
+
+
+def edit_middle(filename: str) -> None:
+    """
+    changes one digit halfway through the logger, the way a typo fixed by hand would
+    """
+    file_handle = open(filename, 'r+b')
+    file_handle.seek(os.path.getsize(filename) // 2)
+    data = file_handle.read(4096)
+    position = next(position for position, byte in enumerate(data) if chr(byte).isdigit())
+    file_handle.seek(os.path.getsize(filename) // 2 + position)
+    file_handle.write(b'9' if data[position:position + 1] != b'9' else b'8')
+    file_handle.close()
+
+
+def timed(function, *arguments):
+    started = time.perf_counter()
+    result = function(*arguments)
+    return result, time.perf_counter() - started
+
+
+def run_size(sessions: int, appends: int, work_dir: str) -> None:
+    filename = os.path.join(work_dir, 'my_fitness_logs.txt')
+    shutil.copyfile(data_file(sessions), filename)
+    parse_cache.clear()
+    size = os.path.getsize(filename)
+    copy, copy_time = timed(shutil.copyfile, filename, os.path.join(work_dir, 'copy.txt'))
+    os.remove(copy)
+    print("\n{:,} sessions, {:,} bytes (a full copy takes {:.3f}s)".format(sessions, size, copy_time))
+
+    steps = [('first backup', lambda: None)]
+    steps.append(('after {} appends'.format(appends), lambda: [append_to_log(filename, SESSION)
+                                                                for append in range(appends)]))
+    steps.append(('removing 5 entries', None))
+    steps.append(('after an edit in the middle', lambda: edit_middle(filename)))
+    for name, change in steps:
+        last = list_backups(filename)[-1].number if list_backups(filename) else None
+        if change is None:
+            # remove_entries() makes the restore point itself, or keeps the last one if nothing changed since
+            ignored, elapsed = timed(remove_entries, filename, select_entries(filename, 5))
+            point = list_backups(filename)[-1]
+        else:
+            change()
+            point, elapsed = timed(create_backup, filename)
+        written = 0 if point.number == last else point.written
+        print("  {:<30} {:>8.3f}s  {:>12,} bytes written  {:>5} chunks".format(name, elapsed, written, point.chunks))
+
+    points = list_backups(filename)
+    restored, elapsed = timed(restore_backup, filename, points[0].number)
+    print("  {:<30} {:>8.3f}s".format('restoring the oldest', elapsed))
+    used = disk_usage(backups_dir(filename))
+    full = sum(point.size for point in list_backups(filename))
+    print("  {} restore points use {:,} bytes on disk, {:.1%} of the {:,} bytes of a full copy for each".format(
+        len(list_backups(filename)), used, used / full, full))
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="measures restore points on synthetic logs")
+    parser.add_argument('--sizes', default=','.join(str(size) for size in DEFAULT_SIZES),
+                        help="comma separated numbers of sessions")
+    parser.add_argument('--appends', type=int, default=10, help="sessions appended between two backups")
+    options = parser.parse_args()
+
+    for sessions in [int(size) for size in options.sizes.split(',')]:
+        work_dir = tempfile.mkdtemp(prefix='fitnesslog-backups-')
+        try:
+            run_size(sessions, options.appends, work_dir)
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
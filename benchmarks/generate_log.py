@@ -0,0 +1,135 @@
+"""
+writes synthetic my_fitness_logs.txt files in the same format FitnessLogManager writes them, for the benchmarks: the
+starter program, then sessions a day or few apart with the occasional comment or skipped session, and every so often
+an adjusted program (the way adjust_program() appends one).
+
+    python benchmarks/generate_log.py my_fitness_logs.txt --sessions 100000 --programs 5
+"""
+
+import argparse
+import datetime
+import os
+import random
+import sys
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+from fitnesslog import program_sections, parse_adjusted_program, max_reps, parse_rep_line  # noqa: E402
+
+STARTER_FILE = os.path.join(REPO_DIR, 'src', 'starter_file.txt')
+COMMENT_WORDS = ['felt', 'strong', 'tired', 'slept', 'badly', 'great', 'pump', 'elbow', 'sore', 'knee', 'wrist',
+                 'form', 'slow', 'tempo', 'rest', 'longer', 'gym', 'crowded', 'home', 'workout', 'deload', 'week']
+EXERCISES = ['Pull-ups', 'Chin-Ups', 'Squats', 'Pistol Squat', 'Parallel Bar Dips', 'Romanian Deadlift',
+             'Incline Rows', 'Incline Pushups', 'Pushups', 'Rows', 'Nordic Curls', 'Ring Dips']
+WRITE_BUFFER = 1024 * 1024
+
+
+def read_starter_program() -> str:
+    file_handle = open(STARTER_FILE)
+    starter_program = file_handle.read()
+    file_handle.close()
+    return starter_program
+
+
+def adjust(sections: dict, revision: int, rng: random.Random) -> dict:
+    """
+    returns a new revision of a program: a rep range moved up and, now and then, an exercise swapped for another
+    """
+    new_sections = {}
+    for header, subsets in sections.items():
+        new_subsets = []
+        for subset in subsets:
+            number, _, rest = subset.partition('- ')
+            name, _, reps = rest.partition(', ')
+            if header.lower().find('pair') != -1 and rng.random() < 0.25:
+                name = rng.choice(EXERCISES)
+            if reps.endswith('reps') and rng.random() < 0.5:
+                low, _, high = reps.split()[0].partition('-')
+                if low.isdigit() and high.isdigit():
+                    reps = '{}-{} reps'.format(int(low) + revision % 3, int(high) + revision % 3)
+            new_subsets.append('{}- {}, {}'.format(number, name, reps))
+        new_sections[header] = new_subsets
+    return new_sections
+
+
+def session_text(date: datetime.date, headers: list, rng: random.Random, comment_words: int, comment_rate: float,
+                 skipped_rate: float) -> str:
+    """
+    returns one session the way log() appends it
+    """
+    lines = ['', '{} {}'.format(date.strftime('%A'), date.strftime('%d/%m/%Y'))]
+    if rng.random() < skipped_rate:
+        lines.append('(SKIPPED)')
+    else:
+        if comment_words and rng.random() < comment_rate:
+            lines.append(' '.join(rng.choice(COMMENT_WORDS) for word in range(comment_words)))
+        for header in headers:
+            groups = []
+            for target in parse_rep_line(max_reps(header) or '8 8 8'):
+                groups.append(' '.join(str(rng.randint(max(1, reps * 6 // 10), reps)) for reps in target))
+            lines.append(', '.join(groups))
+    lines.append('---')
+    return '\n'.join(lines)
+
+
+def generate_log(filename: str, sessions: int = 1000, programs: int = 1, comment_words: int = 6,
+                 comment_rate: float = 0.2, skipped_rate: float = 0.05, seed: int = 0,
+                 start: datetime.date = datetime.date(2010, 1, 4)) -> dict:
+    """
+    writes a log with the given number of sessions and program revisions (the starter program included) to filename
+    and returns a summary of what was written. The same arguments always give the same file.
+    """
+    rng = random.Random(seed)
+    starter_program = read_starter_program()
+    sections = program_sections(starter_program.rsplit('---', 1)[0])
+    headers = list(sections)
+    programs = max(1, programs)
+    sessions_per_program = sessions // programs + 1
+
+    date = start
+    revision = 1
+    buffered = [starter_program]
+    buffered_size = len(starter_program)
+    file_handle = open(filename, 'w')
+    for session in range(sessions):
+        if session and session % sessions_per_program == 0 and revision < programs:
+            sections = adjust(sections, revision, rng)
+            headers = list(sections)
+            text = '\n' + parse_adjusted_program(sections) + '---'
+            revision += 1
+        else:
+            text = session_text(date, headers, rng, comment_words, comment_rate, skipped_rate)
+            date += datetime.timedelta(days=rng.choice((1, 1, 2, 2, 3)))
+        buffered.append(text)
+        buffered_size += len(text)
+        if buffered_size >= WRITE_BUFFER:
+            file_handle.write(''.join(buffered))
+            buffered = []
+            buffered_size = 0
+    file_handle.write(''.join(buffered))
+    file_handle.close()
+    return {'sessions': sessions - (revision - 1), 'programs': revision, 'records': sessions + 1,
+            'bytes': os.path.getsize(filename), 'last_date': date.isoformat()}
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="writes a synthetic my_fitness_logs.txt")
+    parser.add_argument('filename')
+    parser.add_argument('--sessions', type=int, default=1000, help="records to write after the starter program")
+    parser.add_argument('--programs', type=int, default=1, help="program revisions, the starter program included")
+    parser.add_argument('--comment-words', type=int, default=6, help="words per comment")
+    parser.add_argument('--comment-rate', type=float, default=0.2, help="share of sessions with a comment")
+    parser.add_argument('--skipped-rate', type=float, default=0.05, help="share of skipped sessions")
+    parser.add_argument('--seed', type=int, default=0)
+    options = parser.parse_args()
+
+    summary = generate_log(options.filename, options.sessions, options.programs, options.comment_words,
+                           options.comment_rate, options.skipped_rate, options.seed)
+    print("Wrote {records} records ({sessions} sessions, {programs} programs, {bytes} bytes) to".format(**summary),
+          options.filename)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
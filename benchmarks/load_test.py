@@ -0,0 +1,175 @@
+"""
+load tests the multi-user service (python FitnessLogManager.py serve) and reports requests per second and latency
+percentiles. Unless --port is given, a service is started on a temporary folder of synthetic users and stopped again
+afterwards. Every client keeps one connection open and sends a mix of reads and writes for a random user.
+
+    python benchmarks/load_test.py [--users 50] [--clients 32] [--seconds 10] [--sessions 1000]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+from fitnesslog import max_reps  # noqa: E402
+from generate_log import generate_log  # noqa: E402
+
+# (share of requests, method, path, body)
+REQUEST_MIX = [
+    (0.40, 'GET', '/users/{}/program', None),
+    (0.30, 'GET', '/users/{}/entries?last=3', None),
+    (0.25, 'POST', '/users/{}/sessions', 'session'),
+    (0.05, 'DELETE', '/users/{}/entries?last=1', None),
+]
+STARTUP_TIMEOUT = 30
+
+
+def free_port() -> int:
+    sock = socket.socket()
+    sock.bind(('127.0.0.1', 0))
+    port = sock.getsockname()[1]
+    sock.close()
+    return port
+
+
+def start_service(root: str, port: int, max_states: int) -> subprocess.Popen:
+    process = subprocess.Popen([sys.executable, 'FitnessLogManager.py', 'serve', root, '--port', str(port),
+                                '--max-states', str(max_states)], cwd=REPO_DIR, stdout=subprocess.DEVNULL)
+    deadline = time.monotonic() + STARTUP_TIMEOUT
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=1).close()
+            return process
+        except OSError:
+            if process.poll() is not None:
+                raise RuntimeError("the service exited with code {}".format(process.returncode))
+            time.sleep(0.05)
+    process.kill()
+    raise RuntimeError("the service didn't start within {} seconds".format(STARTUP_TIMEOUT))
+
+
+def make_users(root: str, users: int, sessions: int) -> list:
+    names = ['user{:04d}'.format(number) for number in range(users)]
+    template = os.path.join(root, 'template.txt')
+    generate_log(template, sessions=sessions, programs=max(1, sessions // 2000))
+    for name in names:
+        os.makedirs(os.path.join(root, name))
+        shutil.copyfile(template, os.path.join(root, name, 'my_fitness_logs.txt'))
+    os.remove(template)
+    return names
+
+
+async def request(reader, writer, method: str, path: str, body=None) -> (int, dict):
+    raw_body = json.dumps(body).encode('utf-8') if body is not None else b''
+    writer.write('{} {} HTTP/1.1\r\nHost: localhost\r\nContent-Length: {}\r\n\r\n'.format(
+        method, path, len(raw_body)).encode('latin-1') + raw_body)
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b''):
+            break
+        key, _, value = line.decode('latin-1').partition(':')
+        if key.lower() == 'content-length':
+            length = int(value)
+    return status, json.loads(await reader.readexactly(length))
+
+
+async def client(port: int, names: list, reps: list, deadline: float, rng: random.Random, latencies: list,
+                 failures: list) -> None:
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    weights = [share for share, method, path, body in REQUEST_MIX]
+    day = rng.randint(0, 3000)
+    try:
+        while time.monotonic() < deadline:
+            share, method, path, body = rng.choices(REQUEST_MIX, weights)[0]
+            if body == 'session':
+                day += 1
+                body = {'date': '{:02d}/{:02d}/{}'.format(day % 28 + 1, day // 28 % 12 + 1, 2100 + day // 336),
+                        'reps': reps}
+            started = time.perf_counter()
+            status, response = await request(reader, writer, method, path.format(rng.choice(names)), body)
+            latencies.append(time.perf_counter() - started)
+            if status >= 400:
+                failures.append('{} {} -> {} {}'.format(method, path, status, response.get('error')))
+    finally:
+        writer.close()
+
+
+async def load(port: int, names: list, clients: int, seconds: float, seed: int) -> (list, list, float):
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    status, program = await request(reader, writer, 'GET', '/users/{}/program'.format(names[0]))
+    writer.close()
+    if status != 200:
+        raise RuntimeError("couldn't read the program: {}".format(program))
+
+    latencies = []
+    failures = []
+    started = time.monotonic()
+    reps = [max_reps(header) for header in program['sections']]
+    await asyncio.gather(*(client(port, names, reps, started + seconds,
+                                  random.Random(seed + number), latencies, failures) for number in range(clients)))
+    return latencies, failures, time.monotonic() - started
+
+
+def percentile(sorted_values: list, fraction: float) -> float:
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * fraction))]
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="load tests the multi-user service")
+    parser.add_argument('--users', type=int, default=50)
+    parser.add_argument('--clients', type=int, default=32, help="concurrent connections")
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--sessions', type=int, default=1000, help="records in every user's logger")
+    parser.add_argument('--max-states', type=int, default=64)
+    parser.add_argument('--port', type=int, default=None,
+                        help="test a service that is already running (its users must be named user0000, ...)")
+    parser.add_argument('--seed', type=int, default=0)
+    options = parser.parse_args()
+
+    root = None
+    process = None
+    if options.port is None:
+        root = tempfile.mkdtemp(prefix='fitnesslog-load-')
+        names = make_users(root, options.users, options.sessions)
+        port = free_port()
+        process = start_service(root, port, options.max_states)
+    else:
+        names = ['user{:04d}'.format(number) for number in range(options.users)]
+        port = options.port
+    try:
+        latencies, failures, elapsed = asyncio.run(load(port, names, options.clients, options.seconds, options.seed))
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+        if root is not None:
+            shutil.rmtree(root, ignore_errors=True)
+
+    latencies.sort()
+    print("{} requests in {:.1f}s from {} clients over {} users: {:.0f} requests/s".format(
+        len(latencies), elapsed, options.clients, len(names), len(latencies) / elapsed))
+    print("latency p50 {:.1f} ms, p90 {:.1f} ms, p99 {:.1f} ms, max {:.1f} ms (mean {:.1f} ms)".format(
+        percentile(latencies, 0.5) * 1000, percentile(latencies, 0.9) * 1000, percentile(latencies, 0.99) * 1000,
+        latencies[-1] * 1000, statistics.mean(latencies) * 1000))
+    if failures:
+        print("{} requests failed, e.g. {}".format(len(failures), failures[0]))
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
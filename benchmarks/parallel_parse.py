@@ -0,0 +1,88 @@
+"""
+measures how parse_many() scales with worker processes on a corpus of synthetic loggers (one per member, plus one big
+logger that gets split at '---' boundaries), and checks every run gives the same report as a single process.
+
+    python benchmarks/parallel_parse.py [--members 200] [--sessions 2000] [--big-sessions 200000] [--workers 1,2,4]
+"""
+
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+from fitnesslog import find_loggers, parse_many  # noqa: E402
+from generate_log import generate_log  # noqa: E402
+
+SPLIT_SIZE = 2 * 1024 * 1024
+
+
+def make_corpus(root: str, members: int, sessions: int, big_sessions: int) -> None:
+    template = os.path.join(root, 'template.txt')
+    generate_log(template, sessions=sessions, programs=3)
+    for member in range(members):
+        os.makedirs(os.path.join(root, 'member{:04d}'.format(member)))
+        shutil.copyfile(template, os.path.join(root, 'member{:04d}'.format(member), 'my_fitness_logs.txt'))
+    os.remove(template)
+    if big_sessions:
+        os.makedirs(os.path.join(root, 'big'))
+        generate_log(os.path.join(root, 'big', 'my_fitness_logs.txt'), sessions=big_sessions,
+                     programs=max(1, big_sessions // 2000))
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="measures parallel parsing of many loggers")
+    parser.add_argument('--members', type=int, default=200)
+    parser.add_argument('--sessions', type=int, default=2000, help="records in every member's logger")
+    parser.add_argument('--big-sessions', type=int, default=200000, help="records in the one big logger")
+    parser.add_argument('--workers', default=None, help="comma separated worker counts (defaults to 1, 2, 4, ... "
+                                                        "up to the number of cores)")
+    parser.add_argument('--repeat', type=int, default=3)
+    options = parser.parse_args()
+
+    cores = os.cpu_count() or 1
+    if options.workers:
+        worker_counts = [int(workers) for workers in options.workers.split(',')]
+    else:
+        worker_counts = [1]
+        while worker_counts[-1] * 2 <= cores:
+            worker_counts.append(worker_counts[-1] * 2)
+        if worker_counts[-1] != cores:
+            worker_counts.append(cores)
+
+    root = tempfile.mkdtemp(prefix='fitnesslog-corpus-')
+    try:
+        make_corpus(root, options.members, options.sessions, options.big_sessions)
+        filenames = find_loggers([root])
+        size = sum(os.path.getsize(filename) for filename in filenames)
+        print("{} loggers, {:.1f} MB, {} cores".format(len(filenames), size / 1024 / 1024, cores))
+
+        baseline = None
+        expected = None
+        for workers in worker_counts:
+            best = None
+            for run in range(options.repeat):
+                started = time.perf_counter()
+                report = parse_many(filenames, workers, SPLIT_SIZE)
+                elapsed = time.perf_counter() - started
+                best = elapsed if best is None else min(best, elapsed)
+            if expected is None:
+                expected = report
+            elif report != expected:
+                print("workers={} gave a different report".format(workers))
+                return 1
+            if baseline is None:
+                baseline = best
+            print("{:>3} workers  {:7.2f}s  {:7.1f} MB/s  speedup {:4.2f}x ({:.0%} of linear)".format(
+                workers, best, size / 1024 / 1024 / best, baseline / best, baseline / best / workers))
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
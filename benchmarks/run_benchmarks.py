@@ -0,0 +1,273 @@
+"""
+times the functions that scale with the size of the log, and every menu action run headless, against synthetic logs
+of 1k/10k/100k/1M records (see generate_log.py), and writes the results as JSON so two versions can be compared.
+
+Every timing is the best of --repeat runs. 'cold' runs start with an empty parse cache, the way the first action after
+starting FitnessLogManager does; 'warm' runs follow straight after one. Peak memory comes from a separate traced run.
+
+    python benchmarks/run_benchmarks.py [--sizes 1000,10000] [--label before]
+    python benchmarks/run_benchmarks.py --label after --compare benchmarks/results/before.json
+"""
+
+import argparse
+import builtins
+import contextlib
+import datetime
+import io
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+import FitnessLogManager  # noqa: E402
+from fitnesslog import parse_cache, parse_logger, log_feedback, select_entries, remove_entries, \
+    return_current_program, parse_current_program, index_path, backups_dir, list_backups, \
+    restore_backup  # noqa: E402
+from generate_log import generate_log  # noqa: E402
+
+DEFAULT_SIZES = [1000, 10000, 100000, 1000000]
+DEFAULT_REPEAT = 3
+DEFAULT_THRESHOLD = 0.25
+RESULTS_DIR = os.path.join(REPO_DIR, 'benchmarks', 'results')
+DATA_DIR = os.path.join(tempfile.gettempdir(), 'fitnesslog-benchmarks')
+
+
+class ScriptedInput:
+    """
+    stands in for input() during menu actions, answering each prompt with the next scripted answer
+    """
+
+    def __init__(self, answers):
+        self.answers = list(answers)
+
+    def __call__(self, prompt=''):
+        if not self.answers:
+            raise RuntimeError("ran out of scripted answers at prompt {!r}".format(prompt))
+        return self.answers.pop(0)
+
+
+def menu_action(function, answers):
+    """
+    returns a callable that runs a menu action with scripted answers and its output thrown away
+    """
+    def run(filename):
+        original_input = builtins.input
+        builtins.input = ScriptedInput(answers)
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                function(filename)
+        finally:
+            builtins.input = original_input
+    return run
+
+
+def delete_last_entry(filename):
+    remove_entries(filename, select_entries(filename, 1))
+
+
+def undo_removal(filename):
+    """
+    puts back the entries remove_entries() took out, from the restore point it made first
+    """
+    restore_backup(filename, list_backups(filename)[-1].number)
+
+
+def drop_section_answers(filename):
+    """
+    answers adjust_program() by keeping every section but the last, deleting that one and confirming, so a new
+    program really is written (an unchanged program never reaches the logger)
+    """
+    return ['1'] * (len(parse_current_program(filename)) - 1) + ['3', '1']
+
+
+def log_answers(filename):
+    """
+    answers log() with a session the day after the last one, with a comment
+    """
+    sections = parse_current_program(filename)
+    return ['18/10/2099', '1', 'benchmark session'] + ['8 8 8, 8 8 8'] * len(sections) + ['1']
+
+
+# name -> (function, restore) where restore puts the log back the way it was after an action that changes it
+FUNCTIONS = {
+    'parse_logger': (parse_logger, None),
+    'log_feedback': (log_feedback, None),
+    'select_entries': (lambda filename: select_entries(filename, 5), None),
+    'return_current_program': (return_current_program, None),
+    'parse_current_program': (parse_current_program, None),
+}
+MENU_ACTIONS = {
+    'read_the_logger': (lambda filename: menu_action(FitnessLogManager.read_logger, ['0'])(filename), None),
+    'log_a_session': (lambda filename: menu_action(FitnessLogManager.log, log_answers(filename))(filename),
+                      delete_last_entry),
+    'read_the_current_program': (lambda filename: menu_action(
+        lambda name: print(return_current_program(name)), [])(filename), None),
+    'adjust_the_current_program': (lambda filename: menu_action(
+        FitnessLogManager.adjust_program, drop_section_answers(filename))(filename), delete_last_entry),
+    'remove_entries': (lambda filename: menu_action(FitnessLogManager.delete_entries, ['1', '1'])(filename),
+                       undo_removal),
+    'find_sessions': (lambda filename: menu_action(FitnessLogManager.find_sessions, ['2', '30'])(filename), None),
+}
+
+
+def data_file(sessions: int) -> str:
+    """
+    returns the synthetic log for the given size, generating it the first time
+    """
+    os.makedirs(DATA_DIR, exist_ok=True)
+    filename = os.path.join(DATA_DIR, 'log_{}.txt'.format(sessions))
+    if not os.path.exists(filename):
+        generate_log(filename, sessions=sessions, programs=max(1, sessions // 2000))
+    return filename
+
+
+def fresh_copy(source: str, work_dir: str) -> str:
+    filename = os.path.join(work_dir, 'my_fitness_logs.txt')
+    shutil.copyfile(source, filename)
+    if os.path.exists(index_path(filename)):
+        os.remove(index_path(filename))
+    # restore points of the previous size would make the first removal's restore point cheaper than a user's
+    shutil.rmtree(backups_dir(filename), ignore_errors=True)
+    return filename
+
+
+def time_once(function, filename, cold: bool) -> float:
+    if cold:
+        parse_cache.clear()
+    start = time.perf_counter()
+    function(filename)
+    return time.perf_counter() - start
+
+
+def measure(function, restore, filename, repeat: int) -> dict:
+    """
+    returns the best cold and warm times and the peak traced memory of a function, restoring the log after each run
+    when the function changes it
+    """
+    # build the sidecar index once so cold runs measure a restart rather than a first ever run
+    parse_cache.clear()
+    parse_logger(filename)
+
+    timings = {'cold': [], 'warm': []}
+    for run in range(repeat):
+        for kind in ('cold', 'warm'):
+            if kind == 'warm':
+                parse_logger(filename)
+            timings[kind].append(time_once(function, filename, kind == 'cold'))
+            if restore is not None:
+                restore(filename)
+
+    parse_cache.clear()
+    tracemalloc.start()
+    function(filename)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    if restore is not None:
+        restore(filename)
+
+    return {'cold_s': min(timings['cold']), 'warm_s': min(timings['warm']), 'peak_bytes': peak}
+
+
+def run_size(sessions: int, repeat: int, work_dir: str) -> dict:
+    source = data_file(sessions)
+    filename = fresh_copy(source, work_dir)
+    size_results = {'records': sessions + 1, 'bytes': os.path.getsize(source), 'functions': {}, 'menu': {}}
+    try:
+        for group, benchmarks in (('functions', FUNCTIONS), ('menu', MENU_ACTIONS)):
+            for name, (function, restore) in benchmarks.items():
+                size_results[group][name] = measure(function, restore, filename, repeat)
+                print("{:>8} {:<28} cold {cold_s:9.4f}s  warm {warm_s:9.4f}s  peak {peak_bytes:>12,}B".format(
+                    sessions, name, **size_results[group][name]))
+    finally:
+        parse_cache.clear()
+    return size_results
+
+
+def git_revision() -> str:
+    try:
+        completed = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_DIR, capture_output=True,
+                                   text=True, timeout=10)
+    except OSError:
+        return ''
+    return completed.stdout.strip()
+
+
+def compare(old: dict, new: dict, threshold: float) -> list:
+    """
+    returns a line for every timing or peak in new that is more than threshold worse than in old
+    """
+    regressions = []
+    for size, size_results in new['results'].items():
+        old_size = old['results'].get(size)
+        if old_size is None:
+            continue
+        for group in ('functions', 'menu'):
+            for name, measurements in size_results[group].items():
+                old_measurements = old_size[group].get(name)
+                if old_measurements is None:
+                    continue
+                for key, value in measurements.items():
+                    old_value = old_measurements.get(key)
+                    # ignore sub-millisecond timings, they are mostly noise
+                    if not old_value or (key.endswith('_s') and max(old_value, value) < 0.001):
+                        continue
+                    if value > old_value * (1 + threshold):
+                        regressions.append("{} records, {}: {} {:.4g} -> {:.4g} ({:+.0%})".format(
+                            size, name, key, old_value, value, value / old_value - 1))
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="benchmarks FitnessLogManager against synthetic logs")
+    parser.add_argument('--sizes', default=','.join(str(size) for size in DEFAULT_SIZES),
+                        help="comma separated numbers of records")
+    parser.add_argument('--repeat', type=int, default=DEFAULT_REPEAT)
+    parser.add_argument('--label', default=None, help="name of the results file in benchmarks/results")
+    parser.add_argument('--compare', default=None, help="earlier results to check for regressions against")
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help="relative slowdown counted as a regression")
+    options = parser.parse_args()
+
+    sizes = [int(size) for size in options.sizes.split(',')]
+    results = {'python': platform.python_version(), 'platform': platform.platform(), 'revision': git_revision(),
+               'timestamp': datetime.datetime.now().isoformat(timespec='seconds'), 'repeat': options.repeat,
+               'results': {}}
+    work_dir = tempfile.mkdtemp(prefix='fitnesslog-benchmark-')
+    try:
+        for sessions in sizes:
+            results['results'][str(sessions)] = run_size(sessions, options.repeat, work_dir)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    label = options.label or results['revision'] or 'results'
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    results_file = os.path.join(RESULTS_DIR, '{}.json'.format(label))
+    file_handle = open(results_file, 'w')
+    json.dump(results, file_handle, indent=2)
+    file_handle.close()
+    print("\nResults written to", results_file)
+
+    if options.compare:
+        file_handle = open(options.compare)
+        old = json.load(file_handle)
+        file_handle.close()
+        regressions = compare(old, results, options.threshold)
+        if regressions:
+            print("\nRegressions against {}:".format(options.compare))
+            for regression in regressions:
+                print(regression)
+            return 1
+        print("\nNo regressions against", options.compare)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,83 @@
+"""
+checks that importing fitnesslog and FitnessLogManager stays fast and free of side effects. Each module is imported
+in a fresh interpreter with 'python -X importtime', and the script fails if the median cold import takes longer than
+the budget, prints anything, or pulls in one of the slow optional dependencies.
+
+    python benchmarks/startup.py [--budget-ms 150] [--runs 5]
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+MODULES = ['fitnesslog', 'FitnessLogManager']
+LAZY_MODULES = ['numpy', 'pyperclip', 'distutils', 'argparse', 'asyncio', 'multiprocessing', 'gzip', 'inspect',
+                'cProfile', 'ctypes', 'selectors', 'hashlib', 'tempfile']
+DEFAULT_BUDGET_MS = 150
+DEFAULT_RUNS = 5
+
+
+def import_once(module: str) -> (float,
+                                 set,
+                                 str):
+    """
+    imports module in a new interpreter and returns its cumulative import time in ms, every module that got imported
+    and whatever was printed
+    """
+    completed = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import {}'.format(module)],
+                               cwd=REPO_DIR, stdin=subprocess.DEVNULL, capture_output=True, text=True, timeout=60)
+    if completed.returncode != 0:
+        raise RuntimeError("importing {} failed:\n{}".format(module, completed.stderr))
+
+    cumulative = None
+    imported = set()
+    for line in completed.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        self_time, cumulative_time, name = line[len('import time:'):].split('|')
+        name = name.strip()
+        imported.add(name.split('.')[0])
+        if name == module:
+            cumulative = int(cumulative_time) / 1000
+    return cumulative, imported, completed.stdout
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="fails if the cold import of FitnessLogManager is over budget")
+    parser.add_argument('--budget-ms', type=float, default=DEFAULT_BUDGET_MS)
+    parser.add_argument('--runs', type=int, default=DEFAULT_RUNS)
+    options = parser.parse_args()
+
+    failed = False
+    for module in MODULES:
+        import_once(module)  # writes the .pyc files, so the timed runs all start from the same place
+        timings = []
+        for run in range(options.runs):
+            cumulative, imported, printed = import_once(module)
+            timings.append(cumulative)
+            if printed:
+                print("FAIL {}: printed {!r} when imported".format(module, printed[:80]))
+                failed = True
+                break
+            eager = sorted(imported.intersection(LAZY_MODULES))
+            if eager:
+                print("FAIL {}: imported {} at import time".format(module, ', '.join(eager)))
+                failed = True
+                break
+
+        median = statistics.median(timings)
+        status = 'ok' if median <= options.budget_ms else 'FAIL'
+        if median > options.budget_ms:
+            failed = True
+        print("{:4} {:20} median {:6.1f} ms  min {:6.1f} ms  budget {:.0f} ms".format(
+            status, module, median, min(timings), options.budget_ms))
+
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,76 @@
+"""
+measures syncing two copies of a synthetic log (see generate_log.py) in two folders: the first sync, which copies
+everything, then a sync after both sides appended sessions, after one side removed entries and after an edit in the
+middle of one side, with how many records and bytes each one copied against copying the whole logger over.
+
+    python benchmarks/sync.py [--sizes 10000,100000,1000000] [--appends 10]
+"""
+
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+from fitnesslog import parse_cache, format_session, append_to_log, select_entries, remove_entries, \
+    sync_loggers  # noqa: E402
+from backups import data_file, edit_middle, timed  # noqa: E402
+
+DEFAULT_SIZES = [10000, 100000, 1000000]
+
+
+def session(day: int) -> str:
+    return format_session('Monday {:02d}/01/2120'.format(day % 28 + 1), None, ['8 8 8, 8 8 8'] * 3)
+
+
+def run_size(sessions: int, appends: int, work_dir: str) -> None:
+    first = os.path.join(work_dir, 'here', 'my_fitness_logs.txt')
+    second = os.path.join(work_dir, 'there', 'my_fitness_logs.txt')
+    os.makedirs(os.path.dirname(first))
+    os.makedirs(os.path.dirname(second))
+    shutil.copyfile(data_file(sessions), first)
+    parse_cache.clear()
+    size = os.path.getsize(first)
+    ignored, copy_time = timed(shutil.copyfile, first, second)
+    os.remove(second)
+    print("\n{:,} sessions, {:,} bytes (a full copy takes {:.3f}s)".format(sessions, size, copy_time))
+
+    def append_both():
+        for day in range(appends):
+            append_to_log(first if day % 2 else second, session(day))
+
+    steps = [('first sync', lambda: None),
+             ('after {} appends, both sides'.format(appends), append_both),
+             ('after removing 5 entries', lambda: remove_entries(second, select_entries(second, 5))),
+             ('after an edit in the middle', lambda: edit_middle(first)),
+             ('nothing changed', lambda: None)]
+    for name, change in steps:
+        change()
+        # the sync runs as it would from a fresh process, with nothing parsed yet
+        parse_cache.clear()
+        report, elapsed = timed(sync_loggers, first, second)
+        print("  {:<30} {:>8.3f}s  {:>7,} records copied  {:>12,} bytes copied  {:>3} deleted".format(
+            name, elapsed, report.sent + report.received, report.copied, report.deleted))
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="measures syncing two copies of synthetic logs")
+    parser.add_argument('--sizes', default=','.join(str(size) for size in DEFAULT_SIZES),
+                        help="comma separated numbers of sessions")
+    parser.add_argument('--appends', type=int, default=10, help="sessions appended between two syncs, half per side")
+    options = parser.parse_args()
+
+    for sessions in [int(size) for size in options.sizes.split(',')]:
+        work_dir = tempfile.mkdtemp(prefix='fitnesslog-sync-')
+        try:
+            run_size(sessions, options.appends, work_dir)
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
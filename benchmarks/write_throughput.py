@@ -0,0 +1,104 @@
+"""
+measures sustained append rates: one session at a time through append_to_log() (what the menu does), and from many
+threads at once through a GroupCommitWriter, on synthetic loggers of a few sizes. Every append is crash-safe in both
+cases, the difference is how many appends share an fsync. The rates should barely depend on the size of the logger,
+as an append only writes the new index entries.
+
+    python benchmarks/write_throughput.py [--seconds 5] [--threads 1,4,16] [--sessions 1000,100000]
+"""
+
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+from fitnesslog import parse_cache, load_index, append_to_log, format_session, GroupCommitWriter  # noqa: E402
+from generate_log import generate_log  # noqa: E402
+
+SESSION = format_session('Monday 01/01/2120', None, ['8 8 8, 8 8 8'] * 3 + ['12 12 12, 30 30 30, 12 12 12'])
+
+
+def fresh_logger(template: str, work_dir: str) -> str:
+    filename = os.path.join(work_dir, 'my_fitness_logs.txt')
+    for path in os.listdir(work_dir):
+        os.remove(os.path.join(work_dir, path))
+    shutil.copyfile(template, filename)
+    parse_cache.clear()
+    # a logger that is in use already has its index, building it isn't part of appending
+    load_index(filename)
+    parse_cache.clear()
+    return filename
+
+
+def sequential(filename: str, seconds: float) -> (int, int):
+    """
+    appends one session after the other through append_to_log() for the given time, returns (appends, batches)
+    """
+    appends = 0
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        append_to_log(filename, SESSION)
+        appends += 1
+    return appends, appends
+
+
+def grouped(filename: str, seconds: float, threads: int) -> (int, int):
+    """
+    appends sessions from several threads through one GroupCommitWriter for the given time, returns (appends, batches)
+    """
+    writer = GroupCommitWriter(filename)
+    deadline = time.perf_counter() + seconds
+
+    def work():
+        while time.perf_counter() < deadline:
+            writer.write(SESSION)
+
+    workers = [threading.Thread(target=work) for thread in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    writer.close()
+    return writer.committed, writer.batches
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="measures crash-safe append throughput")
+    parser.add_argument('--seconds', type=float, default=5)
+    parser.add_argument('--threads', default='1,4,16', help="comma separated numbers of writing threads")
+    parser.add_argument('--sessions', default='1000,100000',
+                        help="comma separated numbers of records in the logger before appending")
+    options = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix='fitnesslog-writes-')
+    template = os.path.join(tempfile.gettempdir(), 'fitnesslog-writes-template.txt')
+    runs = [('append_to_log', lambda filename: sequential(filename, options.seconds))]
+    for threads in [int(threads) for threads in options.threads.split(',')]:
+        runs.append(('group commit, {} thread{}'.format(threads, '' if threads == 1 else 's'),
+                     lambda filename, threads=threads: grouped(filename, options.seconds, threads)))
+    try:
+        for sessions in [int(sessions) for sessions in options.sessions.split(',')]:
+            generate_log(template, sessions=sessions, programs=max(1, sessions // 2000))
+            print("\n{:,} records".format(sessions + 1))
+            for name, run in runs:
+                filename = fresh_logger(template, work_dir)
+                started = time.perf_counter()
+                appends, batches = run(filename)
+                elapsed = time.perf_counter() - started
+                print("{:<26} {:>8.0f} appends/s  {:>7} appends in {:>6} batches ({:.1f} per batch)".format(
+                    name, appends / elapsed, appends, batches, appends / max(batches, 1)))
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+        if os.path.exists(template):
+            os.remove(template)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
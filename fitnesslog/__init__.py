@@ -0,0 +1,39 @@
+"""
+the parsing and writing side of FitnessLogManager, importable without starting the menu
+"""
+
+from .records import LOG_ENCODING, SEPARATOR, PROGRAM, SESSION, UNDATED, OTHER, DAYS_OF_WEEK, ProgramRecord, \
+    SessionRecord, UndatedRecord, OtherRecord, Record, read, parse_date, decode_record, encode_record, scan_records, \
+    make_record, iter_records, file_signature, tail_records, read_spans, parse_rep_line
+from .cache import ParseCache, parse_cache
+from .sidecars import SIDECAR_SUFFIXES, sidecar_paths, move_logger
+from .index import index_path, build_index, load_index, extend_index, truncate_index, catch_up_index, read_record
+from .programs import MAX_REPS, Exercise, Section, Program, parse_program, section_kind, program_headers, \
+    program_sections, parse_adjusted_program, max_reps, exercise_name
+from .profiling import profiling_options, enable_profiling, profile_action, format_summary
+from .journal import journal_path, recover_log, checkpoint_log, GroupCommitWriter
+from .segments import KEEP_DAYS, segments_dir, read_manifest, load_manifest, iter_history, rotate_segments, \
+    segment_summary
+from .search import SEARCH_LIMIT, SearchResult, SearchIndex, text_tokens, load_search_index, search_records, \
+    regex_records
+from .revisions import SectionChange, ProgramHistory, section_digest, diff_programs, format_changes, \
+    load_program_history
+from .pager import PAGE_SIZE, LogPager, format_page
+from .progression import ProgramRevision, LinkedSession, ExerciseProgress, ProgressionEngine, load_progression
+from .batch import ChunkResult, FileSummary, BatchReport, parse_chunk, split_points, find_loggers, parse_many, \
+    format_report
+from .analytics import RepStore, load_rep_store
+from .database import is_database, import_text_log, export_text_log, read_database, database_records, \
+    logger_history
+from .export import EXPORT_FORMATS, ExportedLog, export_csv, export_jsonl, export_binary, export_log, \
+    load_export
+from .watch import LogWatcher, refresh_logger
+from .backups import BACKUP_KEEP, RestorePoint, backups_dir, create_backup, list_backups, restore_backup
+from .rollups import WEEK, MONTH, PERIODS, CHART_METRICS, CHART_WIDTH, Rollup, RollupTables, period_key, load_rollups, \
+    update_rollups, format_chart
+from .dates import DateIndex, load_date_index, sessions_between, sessions_in_last_days, sessions_on_weekday
+from .logger import PROGRAM_LIST, SESSION_DICT, EVERYTHING_LIST, CURRENT_PROGRAM, parse_logger, last_entries, \
+    return_current_program, append_to_log, write_adjusted_program, current_program_model, parse_current_program, \
+    create_program_header, log_feedback, format_session, ingest_sessions, removed_path, select_entries, \
+    remove_entries, truncate_log, rewrite_log
+from .sync import SyncReport, sync_path, digests_path, conflicts_path, update_sync_state, sync_loggers
@@ -0,0 +1,209 @@
+"""
+the columnar rep store and the progress queries on it
+"""
+
+import array
+import datetime
+from typing import List, Dict
+
+from .records import SESSION, parse_rep_line
+from .cache import parse_cache
+from .programs import max_reps
+from .database import logger_history
+
+numpy = None  # imported by import_numpy() the first time a RepStore is made, since it is slow to import
+
+
+class RepStore:
+    """
+    the reps of every session in the logger, parsed once into columns with one row per set:
+
+    date      the day of the session, as a proleptic Gregorian ordinal (datetime.date.toordinal())
+    section   which line of the session the set is on, i.e. which section of the program
+    exercise  which comma separated group of the line the set is in, i.e. which exercise of the section
+    set       the position of the set within its exercise
+    reps      the reps done (0 for skipped sessions)
+    skipped   True for the single row standing in for a skipped session
+    start     where the session starts in the logger, so deleted entries can be dropped
+
+    The columns are appended to as sessions are logged and handed out as NumPy arrays for the queries.
+    """
+
+    COLUMNS = (('date', 'l'), ('section', 'h'), ('exercise', 'h'), ('set', 'h'), ('reps', 'l'), ('skipped', 'b'),
+               ('start', 'q'))
+
+    def __init__(self):
+        import_numpy()
+        self.buffers = {name: array.array(typecode) for name, typecode in self.COLUMNS}
+        self.arrays = None
+
+    @classmethod
+    def from_records(cls, records) -> 'RepStore':
+        store = cls()
+        store.extend(records)
+        return store
+
+    def extend(self, records) -> None:
+        """
+        adds the sets of every session in records
+        """
+        buffers = self.buffers
+        for record in records:
+            if record.kind != SESSION:
+                continue
+            date = record.date.toordinal()
+            if record.skipped:
+                rows = [(-1, -1, -1, 0, 1)]
+            else:
+                rows = []
+                for section, line in enumerate(record.reps):
+                    for exercise, group in enumerate(line.split(',')):
+                        for set_index, token in enumerate(group.split()):
+                            if token.isdigit():
+                                rows.append((section, exercise, set_index, int(token), 0))
+            for section, exercise, set_index, reps, skipped in rows:
+                buffers['date'].append(date)
+                buffers['section'].append(section)
+                buffers['exercise'].append(exercise)
+                buffers['set'].append(set_index)
+                buffers['reps'].append(reps)
+                buffers['skipped'].append(skipped)
+                buffers['start'].append(record.start)
+        self.arrays = None
+
+    def truncate(self, removed: list) -> None:
+        """
+        drops the sets of the given sessions, which were deleted from the end of the logger
+        """
+        offset = removed[0].start
+        starts = self.buffers['start']
+        keep = len(starts)
+        while keep and starts[keep - 1] >= offset:
+            keep -= 1
+        for buffer in self.buffers.values():
+            del buffer[keep:]
+        self.arrays = None
+
+    def __len__(self) -> int:
+        return len(self.buffers['date'])
+
+    def columns(self) -> Dict[str, 'numpy.ndarray']:
+        """
+        returns the columns as NumPy arrays, converting them only once after every change
+        """
+        if self.arrays is None:
+            self.arrays = {name: numpy.array(buffer, dtype=numpy.dtype(buffer.typecode))
+                           for name, buffer in self.buffers.items()}
+            self.arrays['skipped'] = self.arrays['skipped'].astype(bool)
+        return self.arrays
+
+    def done(self) -> Dict[str, 'numpy.ndarray']:
+        """
+        returns the columns without the rows standing in for skipped sessions
+        """
+        columns = self.columns()
+        keep = ~columns['skipped']
+        return {name: column[keep] for name, column in columns.items()}
+
+    def weekly_volume(self) -> ('numpy.ndarray',
+                                'numpy.ndarray'):
+        """
+        returns the monday of every week with sessions in it (as datetime64[D]) and the total reps done that week
+        """
+        columns = self.done()
+        week_starts = columns['date'] - (columns['date'] - 1) % 7
+        weeks, positions = numpy.unique(week_starts, return_inverse=True)
+        totals = numpy.bincount(positions, weights=columns['reps']).astype(numpy.int64)
+        return ordinals_to_datetime64(weeks), totals
+
+    def best_sets(self) -> ('numpy.ndarray',
+                            'numpy.ndarray',
+                            'numpy.ndarray'):
+        """
+        returns every (section, exercise) pair that was ever done and the most reps done in a single set of it
+        """
+        columns = self.done()
+        keys = columns['section'].astype(numpy.int64) << 16 | columns['exercise'].astype(numpy.int64)
+        pairs, positions = numpy.unique(keys, return_inverse=True)
+        best = numpy.zeros(len(pairs), dtype=numpy.int64)
+        numpy.maximum.at(best, positions, columns['reps'])
+        return (pairs >> 16).astype(numpy.int16), (pairs & 0xFFFF).astype(numpy.int16), best
+
+    def session_volume(self) -> ('numpy.ndarray',
+                                 'numpy.ndarray'):
+        """
+        returns the date of every session done (as datetime64[D], oldest first) and the total reps done that day
+        """
+        columns = self.done()
+        dates, positions = numpy.unique(columns['date'], return_inverse=True)
+        totals = numpy.bincount(positions, weights=columns['reps']).astype(numpy.int64)
+        return ordinals_to_datetime64(dates), totals
+
+    def rolling_average(self, window: int = 7) -> ('numpy.ndarray',
+                                                   'numpy.ndarray'):
+        """
+        returns the date of every session done and the average volume of the last window sessions up to it (fewer
+        for the first few sessions)
+        """
+        dates, totals = self.session_volume()
+        sums = numpy.cumsum(totals, dtype=numpy.float64)
+        sums[window:] = sums[window:] - sums[:-window]
+        counts = numpy.minimum(numpy.arange(1, len(totals) + 1), window)
+        return dates, sums / counts
+
+    def percent_of_max(self, header_list: List[str]) -> 'numpy.ndarray':
+        """
+        returns, for every row, the reps done as a percentage of the max reps for that set (the ones
+        max_reps_clipboard() copies), given the section headers of the program. Rows without a max are NaN.
+        """
+        columns = self.columns()
+        targets = [parse_rep_line(max_reps(header) or '') for header in header_list]
+        exercises = max([len(target) for target in targets] + [1])
+        sets = max([len(group) for target in targets for group in target] + [1])
+        table = numpy.zeros((len(targets) + 1, exercises + 1, sets + 1))
+        for section, target in enumerate(targets):
+            for exercise, group in enumerate(target):
+                table[section, exercise, :len(group)] = group
+
+        section = numpy.where((columns['section'] < 0) | (columns['section'] >= len(targets)), len(targets),
+                              columns['section'])
+        exercise = numpy.clip(columns['exercise'], 0, exercises)
+        set_index = numpy.clip(columns['set'], 0, sets)
+        maximum = table[section, exercise, set_index]
+        with numpy.errstate(divide='ignore', invalid='ignore'):
+            percent = numpy.where(maximum > 0, columns['reps'] * 100.0 / maximum, numpy.nan)
+        return percent
+
+
+def import_numpy() -> None:
+    """
+    helper function for RepStore that imports NumPy the first time it is needed
+    """
+    global numpy
+    if numpy is None:
+        try:
+            import numpy
+        except ImportError:
+            raise ImportError("RepStore needs NumPy, install it with 'pip install numpy'.")
+
+
+def ordinals_to_datetime64(ordinals: 'numpy.ndarray') -> 'numpy.ndarray':
+    """
+    helper function for RepStore that turns date ordinals into datetime64[D]
+    """
+    return (ordinals - datetime.date(1970, 1, 1).toordinal()).astype('datetime64[D]')
+
+
+def load_rep_store(filename: str) -> RepStore:
+    """
+    returns the rep store of the logger, parsing the logger only if it isn't already cached
+    """
+    return parse_cache.get(filename, 'rep_store', build_rep_store)
+
+
+def build_rep_store(filename: str) -> RepStore:
+    """
+    helper function for load_rep_store() that parses every session of a .txt (segments included) or SQLite logger
+    into a rep store
+    """
+    return RepStore.from_records(logger_history(filename))
@@ -0,0 +1,271 @@
+"""
+restore points of the logger, kept beside it as deduplicated chunks
+
+create_backup() splits the logger into chunks at record boundaries picked by the records themselves: a chunk ends
+with the first record whose checksum ends in zero bits (CHUNK_MASK) once it is at least MIN_CHUNK_SIZE long, and
+never takes a record that would make it longer than MAX_CHUNK_SIZE. An edit or an append only changes the chunks it
+falls in, the chunks around it start and end where they did. Every chunk is stored compressed under the hash of its
+bytes in 'my_fitness_logs.txt.backups/chunks', once however many restore points use it, so a backup only writes the
+chunks that changed since the last one. A restore point is the list of its chunks, in points.json.
+
+If the logger was only appended to since the last restore point (its checksum over what the last point had still
+matches) the chunks of the last point are kept as they are, except its last one, and only the rest of the logger is
+split. Only the newest keep restore points are kept, together with the chunks they use.
+"""
+
+import datetime
+import json
+import mmap
+import os
+import zlib
+from typing import List, Optional, Tuple, NamedTuple
+
+from .records import SEPARATOR
+from .index import prefix_check
+from .journal import recover_log
+from .sidecars import BACKUPS_SUFFIX
+
+CHUNKS_DIR = 'chunks'
+POINTS_NAME = 'points.json'
+BACKUPS_VERSION = 1
+BACKUP_KEEP = 10
+
+MIN_CHUNK_SIZE = 16 * 1024
+MAX_CHUNK_SIZE = 256 * 1024
+CHUNK_MASK = 0x3f  # a chunk ends after one in 64 records, past MIN_CHUNK_SIZE
+DIGEST_SIZE = 16
+COMPRESSION_LEVEL = 3  # most of what 6 saves, in a third of the time
+
+
+class RestorePoint(NamedTuple):
+    """
+    a backup of the logger: its number, when and why it was made, the size of the logger, how many chunks it is made
+    of and how many bytes (compressed) had to be written for it
+    """
+    number: int
+    created: str
+    reason: str
+    size: int
+    chunks: int
+    written: int
+
+
+def backups_dir(filename: str) -> str:
+    """
+    returns where the restore points of the logger are kept (right beside it)
+    """
+    return filename + BACKUPS_SUFFIX
+
+
+def chunk_path(filename: str, digest: str) -> str:
+    return os.path.join(backups_dir(filename), CHUNKS_DIR, digest[:2], digest)
+
+
+def chunk_spans(view, start: int, end: int) -> List[Tuple[int, int]]:
+    """
+    returns the (start, end) of every chunk of view (bytes or an mmap of the logger) from start to end. Where the
+    chunks end depends only on the records since start, so splitting from any earlier chunk boundary gives the same
+    chunks.
+    """
+    spans = []
+    chunk_start = start
+    position = start
+    while position < end:
+        separator = view.find(SEPARATOR, position, end)
+        record_end = end if separator == -1 else separator + len(SEPARATOR)
+        if record_end - chunk_start > MAX_CHUNK_SIZE and position > chunk_start:
+            spans.append((chunk_start, position))
+            chunk_start = position
+        if record_end - chunk_start >= MIN_CHUNK_SIZE and not zlib.crc32(view[position:record_end]) & CHUNK_MASK:
+            spans.append((chunk_start, record_end))
+            chunk_start = record_end
+        position = record_end
+    if chunk_start < end:
+        spans.append((chunk_start, end))
+    return spans
+
+
+def chunk_digest(data: bytes) -> str:
+    import hashlib  # only needed for backups, and slow to import
+
+    return hashlib.blake2b(data, digest_size=DIGEST_SIZE).hexdigest()
+
+
+def write_durably(path: str, data: bytes) -> None:
+    """
+    writes data to path in one go, through a temporary file that is fsynced before it replaces path
+    """
+    temp_path = path + '.tmp'
+    file_handle = open(temp_path, 'wb')
+    file_handle.write(data)
+    file_handle.flush()
+    os.fsync(file_handle.fileno())
+    file_handle.close()
+    os.replace(temp_path, path)
+
+
+def store_chunk(filename: str, data: bytes) -> Tuple[str, int]:
+    """
+    helper function for create_backup() that stores a chunk unless it is already stored. Returns its digest and how
+    many bytes had to be written for it.
+    """
+    digest = chunk_digest(data)
+    path = chunk_path(filename, digest)
+    if os.path.exists(path):
+        return digest, 0
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    compressed = zlib.compress(data, COMPRESSION_LEVEL)
+    write_durably(path, compressed)
+    return digest, len(compressed)
+
+
+def read_chunk(filename: str, digest: str, length: int) -> bytes:
+    """
+    returns a stored chunk, checking it against its digest
+    """
+    try:
+        file_handle = open(chunk_path(filename, digest), 'rb')
+        try:
+            data = zlib.decompress(file_handle.read())
+        finally:
+            file_handle.close()
+    except (OSError, zlib.error):
+        raise ValueError("The backup chunk {} is missing or damaged.".format(digest))
+    if len(data) != length or chunk_digest(data) != digest:
+        raise ValueError("The backup chunk {} is damaged.".format(digest))
+    return data
+
+
+def read_points(filename: str) -> dict:
+    """
+    returns the restore points of the logger as stored in points.json, or an empty list of them if there is none
+    """
+    try:
+        file_handle = open(os.path.join(backups_dir(filename), POINTS_NAME))
+        try:
+            points = json.load(file_handle)
+        finally:
+            file_handle.close()
+    except (OSError, ValueError):
+        points = None
+    if not isinstance(points, dict) or points.get('version') != BACKUPS_VERSION:
+        return {'version': BACKUPS_VERSION, 'keep': BACKUP_KEEP, 'next': 1, 'points': []}
+    return points
+
+
+def write_points(filename: str, points: dict) -> None:
+    os.makedirs(backups_dir(filename), exist_ok=True)
+    write_durably(os.path.join(backups_dir(filename), POINTS_NAME),
+                  json.dumps(points, separators=(',', ':')).encode())
+
+
+def restore_point(point: dict) -> RestorePoint:
+    return RestorePoint(point['number'], point['created'], point['reason'], point['size'], len(point['chunks']),
+                        point['written'])
+
+
+def list_backups(filename: str) -> List[RestorePoint]:
+    """
+    returns the restore points of the logger, oldest first
+    """
+    return [restore_point(point) for point in read_points(filename)['points']]
+
+
+def split_logger(filename: str, previous: Optional[dict]) -> Optional[Tuple[int, int, List[list], int]]:
+    """
+    helper function for create_backup() that stores the chunks of the logger that aren't stored yet, only splitting
+    what was appended since the previous restore point if that is all that changed. Returns the size of the logger,
+    its checksum, its chunks as [digest, length] and how many bytes were written, or None if nothing changed since
+    the previous restore point.
+    """
+    size = os.path.getsize(filename)
+    chunks = []
+    offset = 0
+    written = 0
+    file_handle = open(filename, 'rb')
+    try:
+        view = mmap.mmap(file_handle.fileno(), 0, access=mmap.ACCESS_READ) if size else b''
+        try:
+            check = None
+            if previous is not None and previous['size'] <= size:
+                check = prefix_check(view, previous['size'])
+            if check is not None and check == previous['check']:
+                if previous['size'] == size:
+                    return None
+                # only appended to: every chunk before the last one of the previous point is still the same
+                chunks = previous['chunks'][:-1]
+                offset = sum(length for digest, length in chunks)
+                check = zlib.crc32(memoryview(view)[previous['size']:size], check)
+            else:
+                check = prefix_check(view, size)
+            for start, end in chunk_spans(view, offset, size):
+                digest, chunk_written = store_chunk(filename, view[start:end])
+                chunks.append([digest, end - start])
+                written += chunk_written
+        finally:
+            if size:
+                view.close()
+    finally:
+        file_handle.close()
+    return size, check, chunks, written
+
+
+def create_backup(filename: str, reason: str = 'backup', keep: Optional[int] = None) -> RestorePoint:
+    """
+    makes a restore point of the logger as it is now, writing only the chunks no other restore point has, and drops
+    the oldest restore points past keep (which is remembered for the next backups, BACKUP_KEEP until it is given).
+    If the logger didn't change since the last restore point, that one is returned instead of making a new one.
+    """
+    points = read_points(filename)
+    if keep is not None:
+        points['keep'] = max(keep, 1)
+    point = points['points'][-1] if points['points'] else None
+    split = split_logger(filename, point)
+    if split is not None:
+        size, check, chunks, written = split
+        point = {'number': points['next'], 'created': datetime.datetime.now().isoformat(timespec='seconds'),
+                 'reason': reason, 'size': size, 'check': check, 'chunks': chunks, 'written': written}
+        points['next'] += 1
+        points['points'].append(point)
+    elif keep is None:
+        return restore_point(point)
+
+    dropped = points['points'][:max(len(points['points']) - points['keep'], 0)]
+    points['points'] = points['points'][len(dropped):]
+    write_points(filename, points)
+    # the chunks only dropped restore points used go once points.json doesn't point at them any more
+    used = {digest for kept in points['points'] for digest, length in kept['chunks']}
+    for digest in {digest for old in dropped for digest, length in old['chunks']} - used:
+        try:
+            os.remove(chunk_path(filename, digest))
+        except OSError:
+            pass
+    return restore_point(point)
+
+
+def restore_backup(filename: str, number: int) -> RestorePoint:
+    """
+    puts the logger back the way it was at a restore point, after making a restore point of it as it is now (so the
+    restore can be undone the same way). Raises ValueError if there is no such restore point or it is damaged.
+    """
+    points = read_points(filename)
+    point = next((point for point in points['points'] if point['number'] == number), None)
+    if point is None:
+        raise ValueError("There is no restore point {}, there are {}.".format(
+            number, ', '.join(str(point['number']) for point in points['points']) or 'none'))
+    recover_log(filename)
+    temp_path = filename + '.restoring'
+    file_handle = open(temp_path, 'wb')
+    try:
+        for digest, length in point['chunks']:
+            file_handle.write(read_chunk(filename, digest, length))
+        file_handle.flush()
+        os.fsync(file_handle.fileno())
+    except ValueError:
+        file_handle.close()
+        os.remove(temp_path)
+        raise
+    file_handle.close()
+    create_backup(filename, 'before restoring {}'.format(number))
+    os.replace(temp_path, filename)
+    return restore_point(point)
@@ -0,0 +1,285 @@
+"""
+parsing many loggers (and archives) at once across processes, for reports over a whole gym
+
+Every logger is parsed in its own task, and loggers bigger than split_size are split at '---' boundaries into several
+tasks. A task returns a small ChunkResult (counts, dates and per-exercise totals rather than the records), which is
+cheap to send back from the worker, and the chunks of each logger are merged in order into one BatchReport. A
+rotated logger is parsed with its whole history: every segment is a task of its own, ahead of the hot file.
+"""
+
+import datetime
+import os
+from typing import List, Dict, Optional, Tuple, NamedTuple
+
+from .records import SEPARATOR, PROGRAM, SESSION, make_record
+from .programs import parse_program
+from .index import RECORD_END, load_index
+from .segments import COMPRESSIONS, segments_dir, load_manifest, carried_records, open_segment
+
+SPLIT_SIZE = 8 * 1024 * 1024
+LOG_PREFIX = 'my_fitness_logs'
+ARCHIVE_SUFFIX = '.gz'
+ARCHIVE_SUFFIXES = (ARCHIVE_SUFFIX, COMPRESSIONS['zstd'])  # archived loggers and segments
+
+
+class ChunkResult(NamedTuple):
+    """
+    what parsing one part of a logger found. segments holds (exercises, totals) for the sessions under each program
+    in the chunk, the first one with exercises None for the sessions that came before any program in the chunk (they
+    belong to whatever program the previous chunk ended on). totals maps (section, exercise) to [reps, sets, best set,
+    sessions].
+    """
+    filename: str
+    start: int
+    records: int
+    programs: int
+    sessions: int
+    skipped: int
+    first_date: Optional[int]
+    last_date: Optional[int]
+    segments: List[Tuple[Optional[List[List[str]]], Dict[Tuple[int, int], List[int]]]]
+
+
+class FileSummary(NamedTuple):
+    filename: str
+    records: int
+    programs: int
+    sessions: int
+    skipped: int
+    first_date: Optional[int]
+    last_date: Optional[int]
+    reps: int
+
+
+class BatchReport(NamedTuple):
+    """
+    one FileSummary per logger, and reps, sets, best set and sessions per exercise over all of them
+    """
+    files: List[FileSummary]
+    exercises: Dict[str, List[int]]
+
+
+def read_part(filename: str, start: int, end: Optional[int]) -> bytes:
+    """
+    helper function for parse_chunk() that returns the bytes of a logger from start to end (to the end of the file if
+    end is None), decompressing archives and segments
+    """
+    if filename.endswith(ARCHIVE_SUFFIXES):
+        file_handle = open_segment(filename, 'rb')
+    else:
+        file_handle = open(filename, 'rb')
+    try:
+        file_handle.seek(start)
+        if end is None:
+            return file_handle.read()
+        return file_handle.read(end - start)
+    finally:
+        file_handle.close()
+
+
+def parse_chunk(filename: str, start: int = 0, end: Optional[int] = None) -> ChunkResult:
+    """
+    parses the records of a logger from start to end, which have to be right after a '---' (or the start or end of
+    the file)
+    """
+    data = read_part(filename, start, end)
+    counts = {PROGRAM: 0, SESSION: 0, 'skipped': 0, 'records': 0}
+    first_date = last_date = None
+    segments = [(None, {})]
+    position = start
+    for raw in data.split(SEPARATOR):
+        record_start = position
+        position += len(raw) + len(SEPARATOR)
+        if not raw:
+            continue
+        record = make_record(record_start, record_start + len(raw), raw)
+        counts['records'] += 1
+        if record.kind == PROGRAM:
+            counts[PROGRAM] += 1
+            segments.append(([[exercise.name for exercise in section.exercises]
+                              for section in parse_program(record.text).sections], {}))
+        elif record.kind == SESSION:
+            counts[SESSION] += 1
+            date = record.date.toordinal()
+            first_date = date if first_date is None else min(first_date, date)
+            last_date = date if last_date is None else max(last_date, date)
+            if record.skipped:
+                counts['skipped'] += 1
+                continue
+            totals = segments[-1][1]
+            for section, line in enumerate(record.reps):
+                for exercise, group in enumerate(line.split(',')):
+                    tokens = group.split()
+                    # the same as parse_rep_line(), minus the per token check when the whole group is digits
+                    if ''.join(tokens).isdigit():
+                        reps = list(map(int, tokens))
+                    else:
+                        reps = [int(token) for token in tokens if token.isdigit()]
+                    if not reps:
+                        continue
+                    total = totals.get((section, exercise))
+                    if total is None:
+                        total = totals[section, exercise] = [0, 0, 0, 0]
+                    total[0] += sum(reps)
+                    total[1] += len(reps)
+                    best = max(reps)
+                    if best > total[2]:
+                        total[2] = best
+                    total[3] += 1
+    if not segments[0][1]:
+        segments.pop(0)
+    return ChunkResult(filename, start, counts['records'], counts[PROGRAM], counts[SESSION], counts['skipped'],
+                       first_date, last_date, segments)
+
+
+def split_points(filename: str, split_size: int = SPLIT_SIZE, start: int = 0) -> List[Tuple[int, Optional[int]]]:
+    """
+    returns (start, end) parts of about split_size bytes that together cover the logger from start (which has to be
+    right after a '---'), each ending right after a '---'. Archives are never split, since a compressed file can't be
+    read from the middle.
+    """
+    if filename.endswith(ARCHIVE_SUFFIXES):
+        return [(0, None)]
+    size = os.path.getsize(filename)
+    parts = []
+    file_handle = open(filename, 'rb')
+    try:
+        while size - start > split_size:
+            file_handle.seek(start + split_size)
+            data = file_handle.read(64 * 1024)
+            found = data.find(SEPARATOR)
+            while found == -1 and data:
+                more = file_handle.read(64 * 1024)
+                if not more:
+                    break
+                data = data[-(len(SEPARATOR) - 1):] + more
+                found = data.find(SEPARATOR)
+            if found == -1:
+                break
+            end = file_handle.tell() - len(data) + found + len(SEPARATOR)
+            parts.append((start, end))
+            start = end
+    finally:
+        file_handle.close()
+    parts.append((start, None))
+    return parts
+
+
+def logger_parts(filename: str, split_size: int = SPLIT_SIZE) -> List[Tuple[str, int, Optional[int]]]:
+    """
+    returns the (file, start, end) tasks that together cover the whole history of a logger, in order: every segment
+    of a rotated logger, then the hot file without the program copy the rotation carried over
+    """
+    if filename.endswith(ARCHIVE_SUFFIXES):
+        return [(filename, 0, None)]
+    manifest = load_manifest(filename)
+    parts = []
+    start = 0
+    if manifest is not None:
+        parts = [(os.path.join(segments_dir(filename), segment['file']), 0, None) for segment in manifest['segments']]
+        if carried_records(filename, manifest):
+            start = load_index(filename)['records'][0][RECORD_END] + len(SEPARATOR)
+    return parts + [(filename, part_start, end) for part_start, end in split_points(filename, split_size, start)]
+
+
+def merge_chunks(filename: str, chunks: List[ChunkResult], exercises: Dict[str, List[int]]) -> FileSummary:
+    """
+    merges the chunks of one logger (in history order) into its summary, adding its exercise totals to exercises
+    """
+    current = []
+    summary = [0, 0, 0, 0, None, None, 0]
+    for chunk in chunks:
+        summary[0] += chunk.records
+        summary[1] += chunk.programs
+        summary[2] += chunk.sessions
+        summary[3] += chunk.skipped
+        if chunk.first_date is not None:
+            summary[4] = chunk.first_date if summary[4] is None else min(summary[4], chunk.first_date)
+            summary[5] = chunk.last_date if summary[5] is None else max(summary[5], chunk.last_date)
+        for program, totals in chunk.segments:
+            if program is not None:
+                current = program
+            for (section, exercise), (reps, sets, best, sessions) in totals.items():
+                if section < len(current) and exercise < len(current[section]):
+                    name = current[section][exercise]
+                else:
+                    name = '(no exercise in the program)'
+                total = exercises.setdefault(name, [0, 0, 0, 0])
+                summary[6] += reps
+                total[0] += reps
+                total[1] += sets
+                total[2] = max(total[2], best)
+                total[3] += sessions
+    return FileSummary(filename, *summary)
+
+
+def find_loggers(paths: List[str]) -> List[str]:
+    """
+    returns the given loggers, plus every my_fitness_logs*.txt(.gz) file under the given folders
+    """
+    filenames = []
+    for path in paths:
+        if not os.path.isdir(path):
+            filenames.append(path)
+            continue
+        for folder, folders, files in os.walk(path):
+            folders.sort()
+            for name in sorted(files):
+                if name.startswith(LOG_PREFIX) and name.endswith(('.txt', '.txt' + ARCHIVE_SUFFIX)):
+                    filenames.append(os.path.join(folder, name))
+    return filenames
+
+
+def parse_many(filenames: List[str], workers: Optional[int] = None, split_size: int = SPLIT_SIZE) -> BatchReport:
+    """
+    parses every logger in filenames across workers processes (as many as there are cores by default, and in this
+    process if workers is 1) and returns the merged report
+    """
+    tasks = []
+    owners = []  # the logger every task belongs to, since segments are read as files of their own
+    for filename in filenames:
+        parts = logger_parts(filename, split_size)
+        tasks.extend(parts)
+        owners.extend([filename] * len(parts))
+    if workers == 1 or len(tasks) <= 1:
+        results = [parse_chunk(*task) for task in tasks]
+    else:
+        # only imported here, since multiprocessing is slow to import and most runs never get this far
+        from concurrent.futures import ProcessPoolExecutor
+        executor = ProcessPoolExecutor(max_workers=workers)
+        try:
+            # several tasks per message keeps the overhead down when there are lots of small loggers
+            chunksize = max(1, len(tasks) // ((workers or os.cpu_count() or 1) * 4))
+            results = list(executor.map(parse_chunk, *zip(*tasks), chunksize=chunksize))
+        finally:
+            executor.shutdown()
+
+    by_file = {}
+    for owner, result in zip(owners, results):
+        # results come back in task order, which is history order within every logger
+        by_file.setdefault(owner, []).append(result)
+    exercises = {}
+    files = [merge_chunks(filename, by_file[filename], exercises) for filename in filenames if filename in by_file]
+    return BatchReport(files, exercises)
+
+
+def format_report(report: BatchReport) -> str:
+    """
+    returns the report as text: a line per logger, the totals, and every exercise by total reps
+    """
+    def day(ordinal: Optional[int]) -> str:
+        return '-' if ordinal is None else datetime.date.fromordinal(ordinal).strftime('%d/%m/%Y')
+
+    lines = []
+    for summary in report.files:
+        lines.append("{}: {} sessions ({} skipped) and {} programs from {} to {}, {} reps".format(
+            summary.filename, summary.sessions, summary.skipped, summary.programs, day(summary.first_date),
+            day(summary.last_date), summary.reps))
+    lines.append("\n{} loggers, {} sessions, {} reps\n".format(
+        len(report.files), sum(summary.sessions for summary in report.files),
+        sum(summary.reps for summary in report.files)))
+    width = max([len(name) for name in report.exercises] + [0])
+    for name, (reps, sets, best, sessions) in sorted(report.exercises.items(), key=lambda item: -item[1][0]):
+        lines.append("{}  {:>9} reps in {:>8} sets over {:>7} sessions, best set {}".format(
+            name.ljust(width), reps, sets, sessions, best))
+    return '\n'.join(lines)
@@ -0,0 +1,276 @@
+"""
+the in-memory cache of parsed loggers
+"""
+
+import gc
+import os
+import threading
+from collections import Counter, OrderedDict
+from typing import List, Dict, Optional
+
+from .records import SEPARATOR, PROGRAM, SESSION, UNDATED, decode_record, record_kind, iter_records, \
+    file_signature
+
+PARSE_CACHE_SIZE = 16
+
+
+def build_parsed_state(filename: str) -> (List[str],
+                                          Dict[str, List[str]],
+                                          List[str],
+                                          Counter):
+    """
+    helper function for parse_logger() that goes through the whole logger, also counting how many times every
+    session header shows up so the cache knows if deleting one uncovers an older session with the same header. SQLite
+    loggers are read entry by entry from the database.
+    """
+    from .database import is_database, database_records  # database.py imports this module (through segments.py)
+
+    parsed_state = ([], {}, [], Counter())
+    if is_database(filename):
+        for record in database_records(filename):
+            add_to_parsed_state(parsed_state, record)
+        return parsed_state
+
+    # everything read ends up in the lists anyway, so the whole file is read in one go, and only what the lists need
+    # is taken from each record: the same as add_to_parsed_state() does with the records iter_records() would make
+    program_list, session_dict, everything_list, header_counts = parsed_state
+    file_handle = open(filename, 'rb')
+    try:
+        texts = decode_record(file_handle.read()).split(SEPARATOR.decode())
+    finally:
+        file_handle.close()
+    counts = {}  # counted in a plain dict, which is a lot quicker to add to than a Counter
+    # the lists made here can't hold cycles, so the garbage collector going over them again and again as they grow
+    # would only slow this down
+    collecting = gc.isenabled()
+    gc.disable()
+    try:
+        for text in texts:
+            if not text:
+                continue
+            kind = record_kind(text)
+            if kind == PROGRAM:
+                program_list.append(text)
+            elif kind == SESSION:
+                lines = text.strip('\n').split('\n')
+                if '' in lines:
+                    lines = list(filter(None, lines))
+                header = lines[0]
+                session_dict[header] = lines[1:]
+                counts[header] = counts.get(header, 0) + 1
+            everything_list.append(text)
+    finally:
+        if collecting:
+            gc.enable()
+    header_counts.update(counts)
+    return parsed_state
+
+
+def add_to_parsed_state(parsed_state: tuple, record) -> None:
+    """
+    helper function for build_parsed_state() and the parse cache that adds one record to the parsed lists
+    """
+    program_list, session_dict, everything_list, header_counts = parsed_state
+    if record.kind == PROGRAM:
+        program_list.append(record.text)
+    elif record.kind in (SESSION, UNDATED):
+        session_dict[record.header] = record.lines
+        header_counts[record.header] += 1
+    everything_list.append(record.text)
+
+
+class ParseCache:
+    """
+    keeps the parsed state of recently used loggers in memory (their index, parse_logger()'s lists and whatever else
+    is derived from them), so unchanged files aren't re-read over and over. Entries are keyed on the logger's path,
+    inode, size and modification time, and the least recently used logger is dropped once there are more than
+    max_entries of them. The cache can be shared between threads, as long as only one of them writes to a given
+    logger at a time.
+    """
+
+    def __init__(self, max_entries: int = PARSE_CACHE_SIZE):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.entries = OrderedDict()  # path -> (signature, state)
+        self.lock = threading.RLock()
+
+    def state(self, filename: str) -> dict:
+        """
+        returns the cached state for the logger as it is on disk right now, starting a new one if it changed
+        """
+        path = os.path.abspath(filename)
+        signature = file_signature(filename)
+        with self.lock:
+            entry = self.entries.get(path)
+            if entry is None or entry[0] != signature:
+                entry = (signature, {})
+                self.entries[path] = entry
+            self.entries.move_to_end(path)
+            self.evict()
+            return entry[1]
+
+    def get(self, filename: str, key: str, build):
+        """
+        returns state[key] for the logger, calling build(filename) on a miss (outside the lock, so building one
+        logger's state doesn't hold up the others)
+        """
+        state = self.state(filename)
+        with self.lock:
+            if key in state:
+                self.hits += 1
+                return state[key]
+            self.misses += 1
+        value = build(filename)
+        state[key] = value
+        return value
+
+    def peek(self, filename: str, key: str, signature: List[int]):
+        """
+        returns state[key] if it is cached for the logger as it was when it had the given signature, otherwise None
+        """
+        with self.lock:
+            entry = self.entries.get(os.path.abspath(filename))
+        if entry is None or entry[0] != signature:
+            return None
+        return entry[1].get(key)
+
+    def resize(self, max_entries: int) -> None:
+        """
+        changes how many loggers are kept in memory at once
+        """
+        with self.lock:
+            self.max_entries = max_entries
+            self.evict()
+
+    def evict(self) -> None:
+        """
+        drops the least recently used loggers until there are at most max_entries of them
+        """
+        with self.lock:
+            while len(self.entries) > max(self.max_entries, 0):
+                self.entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self.lock:
+            self.entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def cached(self, filename: str) -> Optional[tuple]:
+        """
+        returns the (signature, state) cached for the logger, whatever version of the file it was for, or None
+        """
+        with self.lock:
+            return self.entries.get(os.path.abspath(filename))
+
+    def updated(self, filename: str, old_signature: List[int],
+                signature: Optional[List[int]] = None) -> Optional[dict]:
+        """
+        helper function for appended(), truncated() and rewritten() that moves the logger's state over to its new
+        signature (the one it has now, unless given) after it was written to. Returns None if nothing was cached for
+        the old version of the file.
+        """
+        path = os.path.abspath(filename)
+        with self.lock:
+            entry = self.entries.get(path)
+            if entry is None or entry[0] != old_signature:
+                return None
+            state = entry[1]
+        # only the index, the parsed lists and anything with extend() and truncate() (like the rep store) know how to
+        # update themselves, anything else gets rebuilt
+        for key in list(state):
+            if key not in ('index', 'parsed') and not is_updatable(state[key]):
+                del state[key]
+        with self.lock:
+            self.entries[path] = (file_signature(filename) if signature is None else signature, state)
+        return state
+
+    def appended(self, filename: str, old_signature: List[int], tail: int) -> None:
+        """
+        updates the cached state after FitnessLogManager appended to the logger. tail is where the last (possibly
+        unfinished) record of the file started before the append.
+        """
+        state = self.updated(filename, old_signature)
+        if state is None:
+            return
+        updatable = [key for key in state if is_updatable(state[key])]
+        if tail != old_signature[1]:
+            # the append extended an unfinished record that is already in the parsed lists
+            for key in updatable + ['parsed']:
+                state.pop(key, None)
+            return
+        if 'parsed' in state or updatable:
+            records = list(iter_records(filename, tail))
+            if 'parsed' in state:
+                for record in records:
+                    add_to_parsed_state(state['parsed'], record)
+            for key in updatable:
+                state[key].extend(records)
+
+    def truncated(self, filename: str, old_signature: List[int], removed: list) -> None:
+        """
+        updates the cached state after FitnessLogManager deleted the given records from the end of the logger
+        """
+        state = self.updated(filename, old_signature)
+        if state is None:
+            return
+        if removed:
+            drop_records(state, removed)
+
+    def rewritten(self, filename: str, old_signature: List[int], signature: List[int], removed: list,
+                  offset: int) -> None:
+        """
+        updates the cached state after the logger was changed by something other than FitnessLogManager (edited by
+        hand, synced from another machine): removed are the records from the first one that changed to the end of
+        the old file, and everything from offset onwards is new. Only the new records are parsed.
+        """
+        state = self.updated(filename, old_signature, signature)
+        if state is None:
+            return
+        if removed:
+            drop_records(state, removed)
+        updatable = [key for key in state if is_updatable(state[key])]
+        if 'parsed' in state or updatable:
+            records = list(iter_records(filename, offset))
+            if 'parsed' in state:
+                for record in records:
+                    add_to_parsed_state(state['parsed'], record)
+            for key in updatable:
+                state[key].extend(records)
+
+
+parse_cache = ParseCache()
+
+
+def drop_records(state: dict, removed: list) -> None:
+    """
+    helper function for truncated() and rewritten() that takes the given records, the last ones of the logger, out of
+    the cached state
+    """
+    for value in state.values():
+        if is_updatable(value):
+            value.truncate(removed)
+    if 'parsed' not in state:
+        return
+    program_list, session_dict, everything_list, header_counts = state['parsed']
+    for record in reversed(removed):
+        everything_list.pop()
+        if record.kind == PROGRAM:
+            program_list.pop()
+        elif record.kind in (SESSION, UNDATED):
+            header_counts[record.header] -= 1
+            if header_counts[record.header] > 0:
+                # an older session with the same header should show up again, which needs a reparse
+                del state['parsed']
+                return
+            del header_counts[record.header]
+            del session_dict[record.header]
+
+
+def is_updatable(value) -> bool:
+    """
+    helper function for ParseCache that tells if a cached value can be kept up to date through extend(records) and
+    truncate(removed_records) instead of being rebuilt after FitnessLogManager writes to the logger
+    """
+    return hasattr(value, 'extend') and hasattr(value, 'truncate') and not isinstance(value, list)
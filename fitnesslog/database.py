@@ -0,0 +1,348 @@
+"""
+the SQLite storage backend
+"""
+
+import datetime
+import os
+import sqlite3
+from typing import List, Optional, Iterator, Tuple
+
+from .records import SEPARATOR, PROGRAM, SESSION, OTHER, Record, SessionRecord, decode_record, encode_record, \
+    make_record, parse_rep_line
+from .programs import program_sections
+from .segments import iter_history, history_raw_records
+
+DATABASE_SUFFIX = '.db'
+IMPORT_BATCH_SIZE = 1000
+
+DATABASE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    position INTEGER PRIMARY KEY,
+    kind TEXT NOT NULL,
+    raw BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS entries_kind ON entries (kind, position);
+CREATE TABLE IF NOT EXISTS programs (
+    position INTEGER PRIMARY KEY
+);
+CREATE TABLE IF NOT EXISTS program_sections (
+    position INTEGER NOT NULL,
+    section INTEGER NOT NULL,
+    header TEXT NOT NULL,
+    subsets TEXT NOT NULL,
+    PRIMARY KEY (position, section)
+);
+CREATE TABLE IF NOT EXISTS sessions (
+    position INTEGER PRIMARY KEY,
+    date TEXT NOT NULL,
+    header TEXT NOT NULL,
+    comment TEXT,
+    skipped INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS sessions_date ON sessions (date, position);
+CREATE TABLE IF NOT EXISTS sets (
+    position INTEGER NOT NULL,
+    section INTEGER NOT NULL,
+    exercise INTEGER NOT NULL,
+    set_index INTEGER NOT NULL,
+    reps INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS sets_position ON sets (position);
+"""
+
+
+def is_database(filename: str) -> bool:
+    """
+    returns True if the logger is stored in SQLite rather than in a .txt file
+    """
+    return filename.endswith(DATABASE_SUFFIX)
+
+
+def connect_database(database: str) -> sqlite3.Connection:
+    """
+    opens the SQLite logger, creating its tables if they don't exist yet. A new database holds an empty logger, which
+    is a single empty entry.
+    """
+    connection = sqlite3.connect(database)
+    connection.executescript(DATABASE_SCHEMA)
+    if connection.execute('SELECT 1 FROM entries LIMIT 1').fetchone() is None:
+        with connection:
+            insert_entries(connection, [(0, b'')])
+    return connection
+
+
+def insert_entries(connection: sqlite3.Connection, entries: List[Tuple[int, bytes]]) -> None:
+    """
+    helper function for the SQLite backend that stores entries (the text between two '---') along with the programs,
+    sections, sessions and sets parsed from them
+    """
+    entry_rows = []
+    program_rows = []
+    section_rows = []
+    session_rows = []
+    set_rows = []
+    for position, raw in entries:
+        if not raw:
+            entry_rows.append((position, OTHER, raw))
+            continue
+        record = make_record(0, 0, raw)
+        entry_rows.append((position, record.kind, raw))
+        if record.kind == PROGRAM:
+            program_rows.append((position,))
+            sections = program_sections(record.text)
+            for section, header in enumerate(sections):
+                section_rows.append((position, section, header, '\n'.join(sections[header])))
+        elif record.kind == SESSION:
+            session_rows.append((position, record.date.isoformat(), record.header, record.comment,
+                                 int(record.skipped)))
+            for section, line in enumerate(record.reps):
+                for exercise, sets in enumerate(parse_rep_line(line)):
+                    for set_index, reps in enumerate(sets):
+                        set_rows.append((position, section, exercise, set_index, reps))
+
+    connection.executemany('INSERT OR REPLACE INTO entries VALUES (?, ?, ?)', entry_rows)
+    connection.executemany('INSERT OR REPLACE INTO programs VALUES (?)', program_rows)
+    connection.executemany('INSERT OR REPLACE INTO program_sections VALUES (?, ?, ?, ?)', section_rows)
+    connection.executemany('INSERT OR REPLACE INTO sessions VALUES (?, ?, ?, ?, ?)', session_rows)
+    connection.executemany('INSERT INTO sets VALUES (?, ?, ?, ?, ?)', set_rows)
+
+
+def delete_entries_from(connection: sqlite3.Connection, position: int) -> None:
+    """
+    helper function for the SQLite backend that deletes every entry from position onwards, along with what was parsed
+    from them
+    """
+    for table in ('entries', 'programs', 'program_sections', 'sessions', 'sets'):
+        connection.execute('DELETE FROM {} WHERE position >= ?'.format(table), (position,))
+
+
+def last_database_entry(connection: sqlite3.Connection) -> (int,
+                                                            bytes):
+    """
+    helper function for the SQLite backend that returns the position and raw bytes of the last entry, which is
+    whatever follows the last '---' in the text version
+    """
+    return connection.execute('SELECT position, raw FROM entries ORDER BY position DESC LIMIT 1').fetchone()
+
+
+def database_append(database: str, text: str) -> None:
+    """
+    appends text to the SQLite logger exactly as if it was appended to the .txt file: whatever comes before the first
+    '---' in text finishes the last entry, and every '---' starts a new one
+    """
+    pieces = encode_record(text).split(SEPARATOR)
+    connection = connect_database(database)
+    try:
+        with connection:
+            position, raw = last_database_entry(connection)
+            delete_entries_from(connection, position)
+            entries = [(position, raw + pieces[0])]
+            for piece in pieces[1:]:
+                position += 1
+                entries.append((position, piece))
+            insert_entries(connection, entries)
+    finally:
+        connection.close()
+
+
+def database_current_program(database: str) -> Optional[str]:
+    """
+    returns the last program in the SQLite logger
+    """
+    connection = connect_database(database)
+    try:
+        row = connection.execute('SELECT raw FROM entries WHERE kind = ? ORDER BY position DESC LIMIT 1',
+                                 (PROGRAM,)).fetchone()
+    finally:
+        connection.close()
+    if row is None:
+        return None
+    return decode_record(row[0])
+
+
+def database_programs(database: str) -> List[Record]:
+    """
+    returns every program in the SQLite logger as a record, oldest first, with its position as both its start and end
+    """
+    connection = connect_database(database)
+    try:
+        rows = connection.execute('SELECT position, raw FROM entries WHERE kind = ? ORDER BY position',
+                                  (PROGRAM,)).fetchall()
+    finally:
+        connection.close()
+    return [make_record(position, position, raw) for position, raw in rows]
+
+
+def database_tail_records(database: str, entries: int) -> List[Tuple[int, int, bytes]]:
+    """
+    returns the last few (non-empty) entries in the SQLite logger oldest first, shaped like tail_records() with the
+    entry position standing in for the offsets
+    """
+    if entries <= 0:
+        return []
+    connection = connect_database(database)
+    try:
+        rows = connection.execute('SELECT position, raw FROM entries WHERE length(raw) > 0 '
+                                  'ORDER BY position DESC LIMIT ?', (entries,)).fetchall()
+    finally:
+        connection.close()
+    rows.reverse()
+    return [(position, position, raw) for position, raw in rows]
+
+
+def database_truncate(database: str, position: int) -> bytes:
+    """
+    deletes the entry at position and everything after it, the same as truncating the .txt file right after the '---'
+    in front of that entry. Returns the bytes that were removed from the text version.
+    """
+    connection = connect_database(database)
+    try:
+        with connection:
+            removed = [raw for raw, in connection.execute('SELECT raw FROM entries WHERE position >= ? '
+                                                          'ORDER BY position', (position,))]
+            delete_entries_from(connection, position)
+            insert_entries(connection, [(position, b'')])
+    finally:
+        connection.close()
+    return SEPARATOR.join(removed)
+
+
+def read_database(database: str) -> str:
+    """
+    returns the SQLite logger as the text the .txt version would hold
+    """
+    connection = connect_database(database)
+    try:
+        raw = SEPARATOR.join(raw for raw, in connection.execute('SELECT raw FROM entries ORDER BY position'))
+    finally:
+        connection.close()
+    return decode_record(raw)
+
+
+def database_records(database: str) -> Iterator[Record]:
+    """
+    streams every (non-empty) entry of the SQLite logger as a record, oldest first, with its position as both its
+    start and end
+    """
+    connection = connect_database(database)
+    try:
+        for position, raw in connection.execute('SELECT position, raw FROM entries WHERE length(raw) > 0 '
+                                                'ORDER BY position'):
+            yield make_record(position, position, raw)
+    finally:
+        connection.close()
+
+
+def logger_history(filename: str) -> Iterator[Record]:
+    """
+    streams every record of the logger's whole history, oldest first, segments included, whichever backend it is stored
+    in. Everything that goes through the whole history (progression, the rep store, exports) reads it from here.
+    """
+    if is_database(filename):
+        return database_records(filename)
+    return iter_history(filename)
+
+
+def database_entry_positions(database: str) -> List[int]:
+    """
+    returns the position of every (non-empty) entry in the SQLite logger, oldest first
+    """
+    connection = connect_database(database)
+    try:
+        return [position for position, in connection.execute('SELECT position FROM entries WHERE length(raw) > 0 '
+                                                              'ORDER BY position')]
+    finally:
+        connection.close()
+
+
+def database_read_entries(database: str, first: int, last: int) -> List[Tuple[int, bytes]]:
+    """
+    returns (position, raw bytes) for every (non-empty) entry from position first to last (both included)
+    """
+    connection = connect_database(database)
+    try:
+        return connection.execute('SELECT position, raw FROM entries WHERE position BETWEEN ? AND ? '
+                                  'AND length(raw) > 0 ORDER BY position', (first, last)).fetchall()
+    finally:
+        connection.close()
+
+
+def database_first_session_from(database: str, date: datetime.date) -> Optional[int]:
+    """
+    returns the position of the earliest session done on or after date, or None if there is none
+    """
+    connection = connect_database(database)
+    try:
+        row = connection.execute('SELECT position FROM sessions WHERE date >= ? ORDER BY date, position LIMIT 1',
+                                 (date.isoformat(),)).fetchone()
+    finally:
+        connection.close()
+    return None if row is None else row[0]
+
+
+def database_sessions_between(database: str, first: datetime.date, last: datetime.date,
+                              weekday: Optional[int] = None) -> List[SessionRecord]:
+    """
+    sessions_between() for the SQLite logger, using the index on the session dates
+    """
+    query = 'SELECT entries.position, entries.raw FROM sessions JOIN entries USING (position) ' \
+            'WHERE sessions.date BETWEEN ? AND ?'
+    parameters = [first.isoformat(), last.isoformat()]
+    if weekday is not None:
+        # SQLite counts weekdays from sunday
+        query += " AND strftime('%w', sessions.date) = ?"
+        parameters.append(str((weekday + 1) % 7))
+    query += ' ORDER BY sessions.date, sessions.position'
+    connection = connect_database(database)
+    try:
+        rows = connection.execute(query, parameters).fetchall()
+    finally:
+        connection.close()
+    return [make_record(position, position, raw) for position, raw in rows]
+
+
+def import_text_log(filename: str, database: str) -> None:
+    """
+    streams a .txt logger (with its segments, if it was rotated) into a new SQLite logger (replacing whatever the
+    database held), a batch of entries at a time. The import goes into a new file beside the database, which only
+    replaces it once everything is in, so a failed import leaves the database as it was.
+    """
+    temp_path = database + '.tmp'
+    if os.path.exists(temp_path):
+        os.remove(temp_path)
+    try:
+        connection = sqlite3.connect(temp_path)
+        try:
+            connection.executescript(DATABASE_SCHEMA)
+            with connection:
+                batch = []
+                for position, raw in enumerate(history_raw_records(filename)):
+                    batch.append((position, raw))
+                    if len(batch) >= IMPORT_BATCH_SIZE:
+                        insert_entries(connection, batch)
+                        batch = []
+                insert_entries(connection, batch)
+        finally:
+            connection.close()
+        os.replace(temp_path, database)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+
+def export_text_log(database: str, filename: str) -> None:
+    """
+    streams the SQLite logger back into a .txt logger, byte for byte what import_text_log() read
+    """
+    connection = connect_database(database)
+    file_handle = open(filename, 'wb')
+    try:
+        first = True
+        for raw, in connection.execute('SELECT raw FROM entries ORDER BY position'):
+            if not first:
+                file_handle.write(SEPARATOR)
+            file_handle.write(raw)
+            first = False
+    finally:
+        file_handle.close()
+        connection.close()
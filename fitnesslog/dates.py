@@ -0,0 +1,136 @@
+"""
+the date index and date queries over sessions
+"""
+
+import bisect
+import datetime
+from typing import List, Optional, Tuple, Union
+
+from .records import SESSION, DAYS_OF_WEEK, SessionRecord, read_spans
+from .cache import parse_cache
+from .index import RECORD_START, RECORD_END, RECORD_KIND, RECORD_DATE, load_index
+from .database import is_database, database_sessions_between
+from .segments import load_manifest, archived_sessions_between
+
+
+class DateIndex:
+    """
+    the sessions of the logger sorted by date, as date ordinals with the (start, end) offsets of each session beside
+    them, both overall and per weekday. Several sessions on the same date are all kept, in the order they were
+    logged, and a date query is two bisects plus reading the sessions it returns.
+    """
+
+    def __init__(self):
+        self.ordinals = []
+        self.spans = []
+        self.weekdays = [([], []) for day in DAYS_OF_WEEK]  # (ordinals, spans) for monday to sunday
+
+    @classmethod
+    def from_index(cls, index: dict) -> 'DateIndex':
+        date_index = cls()
+        sessions = [(record[RECORD_DATE], record[RECORD_START], record[RECORD_END])
+                    for record in index['records'] if record[RECORD_KIND] == SESSION]
+        sessions.sort()
+        for ordinal, start, end in sessions:
+            date_index.ordinals.append(ordinal)
+            date_index.spans.append((start, end))
+            weekday_ordinals, weekday_spans = date_index.weekdays[(ordinal - 1) % 7]
+            weekday_ordinals.append(ordinal)
+            weekday_spans.append((start, end))
+        return date_index
+
+    def add(self, ordinal: int, start: int, end: int) -> None:
+        """
+        adds one session, after any other session on the same date
+        """
+        for ordinals, spans in (self.ordinals, self.spans), self.weekdays[(ordinal - 1) % 7]:
+            position = bisect.bisect_right(ordinals, ordinal)
+            ordinals.insert(position, ordinal)
+            spans.insert(position, (start, end))
+
+    def discard(self, ordinal: int, start: int) -> None:
+        """
+        removes the session on the given date starting at the given offset
+        """
+        for ordinals, spans in (self.ordinals, self.spans), self.weekdays[(ordinal - 1) % 7]:
+            position = bisect.bisect_left(ordinals, ordinal)
+            while position < len(ordinals) and ordinals[position] == ordinal:
+                if spans[position][0] == start:
+                    del ordinals[position]
+                    del spans[position]
+                    break
+                position += 1
+
+    def extend(self, records) -> None:
+        for record in records:
+            if record.kind == SESSION:
+                self.add(record.date.toordinal(), record.start, record.end)
+
+    def truncate(self, removed: list) -> None:
+        """
+        drops the given records, the last ones of the logger, going through the sessions once however many there are
+        """
+        offset = removed[0].start
+        for ordinals, spans in [(self.ordinals, self.spans)] + self.weekdays:
+            keep = [position for position, span in enumerate(spans) if span[0] < offset]
+            if len(keep) < len(spans):
+                ordinals[:] = [ordinals[position] for position in keep]
+                spans[:] = [spans[position] for position in keep]
+
+    def __len__(self) -> int:
+        return len(self.ordinals)
+
+    def between(self, first: datetime.date, last: datetime.date,
+                weekday: Optional[int] = None) -> List[Tuple[int, int]]:
+        """
+        returns the (start, end) offsets of every session from first to last (both included), oldest first,
+        optionally only the ones done on the given weekday (0 for monday)
+        """
+        if weekday is None:
+            ordinals, spans = self.ordinals, self.spans
+        else:
+            ordinals, spans = self.weekdays[weekday]
+        low = bisect.bisect_left(ordinals, first.toordinal())
+        high = bisect.bisect_right(ordinals, last.toordinal())
+        return spans[low:high]
+
+
+def load_date_index(filename: str) -> DateIndex:
+    """
+    returns the date index of the logger, building it from the logger's index only if it isn't already cached
+    """
+    return parse_cache.get(filename, 'date_index', lambda name: DateIndex.from_index(load_index(name)))
+
+
+def sessions_between(filename: str, first: datetime.date, last: datetime.date,
+                     weekday: Optional[int] = None) -> List[SessionRecord]:
+    """
+    returns every session done from first to last (both included), oldest first, optionally only the ones done on
+    the given weekday (0 for monday)
+    """
+    if is_database(filename):
+        return database_sessions_between(filename, first, last, weekday)
+    sessions = read_spans(filename, load_date_index(filename).between(first, last, weekday))
+    if load_manifest(filename) is not None:
+        # only the segments whose dates overlap are opened
+        sessions = archived_sessions_between(filename, first, last, weekday) + sessions
+    return sessions
+
+
+def sessions_in_last_days(filename: str, days: int, today: Optional[datetime.date] = None) -> List[SessionRecord]:
+    """
+    returns every session done in the last few days, today included
+    """
+    if today is None:
+        today = datetime.date.today()
+    return sessions_between(filename, today - datetime.timedelta(days=days - 1), today)
+
+
+def sessions_on_weekday(filename: str, weekday: Union[int, str], first: datetime.date = datetime.date.min,
+                        last: datetime.date = datetime.date.max) -> List[SessionRecord]:
+    """
+    returns every session done on the given weekday ('Monday' or 0 to 'Sunday' or 6), optionally between two dates
+    """
+    if isinstance(weekday, str):
+        weekday = DAYS_OF_WEEK.index(weekday.capitalize())
+    return sessions_between(filename, first, last, weekday)
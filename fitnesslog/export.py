@@ -0,0 +1,347 @@
+"""
+exporting the logger for spreadsheets and dashboards: CSV, JSON Lines and a columnar binary file
+
+Every export streams the logger's whole history (segments and SQLite loggers included) one record at a time, so
+memory stays the same however long the logger is. Sessions become flat rows, one per set (or a single row for a
+skipped session), named after the section and exercise of the program that was being followed. In JSON Lines the
+programs are written too, as nested objects, and every row says which of them it belongs to.
+
+The binary format holds the same data as columns of fixed size numbers that load_export() maps straight back into
+arrays, with nothing to parse. Each column is spooled to a temporary file while the logger is read and they are
+copied one after the other into the export at the end:
+
+    MAGIC | column | column | ... | comments | trailer (JSON) | trailer offset (8 bytes, little endian) | MAGIC
+
+The trailer says where every column starts, its type and the byte order it was written in, and holds the programs.
+"""
+
+import array
+import csv
+import json
+import os
+import shutil
+import struct
+import sys
+from typing import List, Dict, Optional, Iterator, Tuple, NamedTuple
+
+from .records import PROGRAM, SESSION, DAYS_OF_WEEK, Record, SessionRecord
+from .programs import Program, parse_program
+from .database import logger_history
+
+EXPORT_FORMATS = {'csv': '.csv', 'jsonl': '.jsonl', 'binary': '.flx'}
+EXPORT_COLUMNS = ['date', 'weekday', 'program', 'section', 'exercise', 'set', 'reps', 'comment', 'skipped']
+EXPORT_VERSION = 1
+MAGIC = b'FLOGEXP\x01'
+TRAILER_OFFSET = struct.Struct('<Q')
+SPOOL_ROWS = 64 * 1024
+ALIGNMENT = 8
+
+# the columns of the binary format: one row per session, and one row per set done (the same as RepStore, with
+# session pointing at the row of the session the set is in)
+SESSION_COLUMNS = (('date', 'i'), ('program', 'i'), ('skipped', 'b'), ('comment_end', 'q'))
+SET_COLUMNS = (('session', 'i'), ('section', 'h'), ('exercise', 'h'), ('set', 'h'), ('reps', 'i'))
+
+
+class SetRow(NamedTuple):
+    """
+    one set of a session: which line of the session it is on (section) and which comma separated group of the line
+    (exercise), its position in the group, the reps done and the names the program it was logged under gives them
+    """
+    section: int
+    exercise: int
+    set: int
+    reps: int
+    header: str
+    name: str
+
+
+class ExportedLog(NamedTuple):
+    """
+    a binary export loaded back: sessions and sets map every column name to an array (a read only NumPy memmap if
+    NumPy is installed, an array.array otherwise), programs are the programs as export_jsonl() writes them and
+    comments are the comments of every session one after the other, as utf-8 bytes in an array of the same kind
+    """
+    sessions: Dict[str, object]
+    sets: Dict[str, object]
+    programs: List[dict]
+    comments: object
+
+    def comment(self, session: int) -> str:
+        """
+        returns the comment of the session on the given row ('' if it had none)
+        """
+        ends = self.sessions['comment_end']
+        start = int(ends[session - 1]) if session else 0
+        return bytes(self.comments[start:int(ends[session])]).decode('utf-8')
+
+
+def export_entries(filename: str) -> Iterator[Tuple[Record, int, Optional[Program]]]:
+    """
+    yields every program and session in the logger's history along with the number of the program being followed
+    (1 for the first program in the logger, 0 for sessions logged before any) and that program parsed
+    """
+    number = 0
+    program = None
+    for record in logger_history(filename):
+        if record.kind == PROGRAM:
+            number += 1
+            program = parse_program(record.text)
+        elif record.kind != SESSION:
+            continue
+        yield record, number, program
+
+
+def set_rows(session: SessionRecord, program: Optional[Program]) -> List[SetRow]:
+    """
+    splits the reps of a session into its sets, the same way RepStore does (nothing for a skipped session)
+    """
+    rows = []
+    if session.skipped:
+        return rows
+    sections = program.sections if program is not None else []
+    for section, line in enumerate(session.reps):
+        exercises = sections[section].exercises if section < len(sections) else []
+        header = sections[section].header if section < len(sections) else ''
+        for exercise, group in enumerate(line.split(',')):
+            name = exercises[exercise].name if exercise < len(exercises) else ''
+            for set_index, token in enumerate(group.split()):
+                if token.isdigit():
+                    rows.append(SetRow(section, exercise, set_index, int(token), header, name))
+    return rows
+
+
+def program_object(program: Program, number: int) -> dict:
+    """
+    returns a program as the nested object export_jsonl() writes
+    """
+    return {'type': PROGRAM, 'program': number,
+            'sections': [{'header': section.header, 'kind': section.kind,
+                          'exercises': [{'text': exercise.text, 'name': exercise.name,
+                                         'rep_range': None if exercise.rep_range is None else list(exercise.rep_range)}
+                                        for exercise in section.exercises]}
+                         for section in program.sections]}
+
+
+def flat_rows(session: SessionRecord, number: int, program: Optional[Program]) -> Iterator[list]:
+    """
+    helper function for export_csv() and export_jsonl() that yields the EXPORT_COLUMNS of every set of a session
+    (sets counted from 1), or a single row without a section, set or reps for a session with no sets
+    """
+    common = [session.date.isoformat(), DAYS_OF_WEEK[session.date.weekday()], number]
+    comment = session.comment or ''
+    skipped = 1 if session.skipped else 0
+    rows = set_rows(session, program)
+    if not rows:
+        yield common + ['', '', None, None, comment, skipped]
+    for row in rows:
+        yield common + [row.header, row.name, row.set + 1, row.reps, comment, skipped]
+
+
+def set_object(row: list) -> dict:
+    exported = {'type': 'set'}
+    exported.update(zip(EXPORT_COLUMNS, row))
+    exported['skipped'] = bool(exported['skipped'])
+    return exported
+
+
+def export_csv(filename: str, path: str) -> int:
+    """
+    writes every set of every session in the logger to a .csv file with a header row, and returns how many rows
+    were written
+    """
+    rows = 0
+    file_handle = open(path, 'w', newline='', encoding='utf-8')
+    try:
+        writer = csv.writer(file_handle)
+        writer.writerow(EXPORT_COLUMNS)
+        for record, number, program in export_entries(filename):
+            if record.kind == SESSION:
+                for row in flat_rows(record, number, program):
+                    writer.writerow(row)
+                    rows += 1
+    finally:
+        file_handle.close()
+    return rows
+
+
+def export_jsonl(filename: str, path: str) -> int:
+    """
+    writes every program (as a nested object) and every set of every session (as a flat one) in the logger to a
+    .jsonl file, one per line, and returns how many lines were written
+    """
+    lines = 0
+    encode = json.JSONEncoder(ensure_ascii=False).encode
+    file_handle = open(path, 'w', encoding='utf-8')
+    try:
+        for record, number, program in export_entries(filename):
+            if record.kind == PROGRAM:
+                objects = [program_object(program, number)]
+            else:
+                objects = (set_object(row) for row in flat_rows(record, number, program))
+            for exported in objects:
+                file_handle.write(encode(exported) + '\n')
+                lines += 1
+    finally:
+        file_handle.close()
+    return lines
+
+
+class ColumnSpool:
+    """
+    one column of the binary format while it is being written: values are gathered in an array and moved to a
+    temporary file every SPOOL_ROWS values
+    """
+
+    def __init__(self, typecode: str, directory: str):
+        import tempfile
+
+        self.typecode = typecode
+        self.buffer = array.array(typecode)
+        self.file = tempfile.TemporaryFile(dir=directory)
+        self.rows = 0
+
+    def append(self, value: int) -> None:
+        self.buffer.append(value)
+        if len(self.buffer) >= SPOOL_ROWS:
+            self.flush()
+
+    def flush(self) -> None:
+        self.rows += len(self.buffer)
+        self.buffer.tofile(self.file)
+        del self.buffer[:]
+
+    def copy_to(self, file_handle) -> List[object]:
+        """
+        writes the column to file_handle (8 byte aligned) and returns its type, where it starts and how many values
+        it has, for the trailer
+        """
+        self.flush()
+        file_handle.write(b'\0' * (-file_handle.tell() % ALIGNMENT))
+        offset = file_handle.tell()
+        self.file.seek(0)
+        shutil.copyfileobj(self.file, file_handle)
+        self.file.close()
+        return [self.typecode, self.buffer.itemsize, offset, self.rows]
+
+
+def export_binary(filename: str, path: str) -> int:
+    """
+    writes every session and set in the logger as columns of a binary file (see the top of this module), and
+    returns how many sets were written
+    """
+    import tempfile  # only needed for binary exports, and slow to import
+
+    directory = os.path.dirname(os.path.abspath(path))
+    sessions = {name: ColumnSpool(typecode, directory) for name, typecode in SESSION_COLUMNS}
+    sets = {name: ColumnSpool(typecode, directory) for name, typecode in SET_COLUMNS}
+    comments = tempfile.TemporaryFile(dir=directory)
+    programs = []
+    comment_end = 0
+    session = 0
+    try:
+        for record, number, program in export_entries(filename):
+            if record.kind == PROGRAM:
+                programs.append(program_object(program, number))
+                continue
+            comment = (record.comment or '').encode('utf-8')
+            comments.write(comment)
+            comment_end += len(comment)
+            sessions['date'].append(record.date.toordinal())
+            sessions['program'].append(number)
+            sessions['skipped'].append(1 if record.skipped else 0)
+            sessions['comment_end'].append(comment_end)
+            for row in set_rows(record, program):
+                sets['session'].append(session)
+                sets['section'].append(row.section)
+                sets['exercise'].append(row.exercise)
+                sets['set'].append(row.set)
+                sets['reps'].append(row.reps)
+            session += 1
+
+        temp_path = path + '.tmp'
+        file_handle = open(temp_path, 'wb')
+        try:
+            file_handle.write(MAGIC)
+            trailer = {'version': EXPORT_VERSION, 'byteorder': sys.byteorder, 'programs': programs,
+                       'sessions': {name: spool.copy_to(file_handle) for name, spool in sessions.items()},
+                       'sets': {name: spool.copy_to(file_handle) for name, spool in sets.items()},
+                       'comments': [file_handle.tell(), comment_end]}
+            comments.seek(0)
+            shutil.copyfileobj(comments, file_handle)
+            trailer_offset = file_handle.tell()
+            file_handle.write(json.dumps(trailer, separators=(',', ':')).encode())
+            file_handle.write(TRAILER_OFFSET.pack(trailer_offset) + MAGIC)
+        finally:
+            file_handle.close()
+        os.replace(temp_path, path)
+    finally:
+        comments.close()
+        for spool in list(sessions.values()) + list(sets.values()):
+            spool.file.close()
+    return sets['reps'].rows
+
+
+def export_log(filename: str, path: str, export_format: Optional[str] = None) -> int:
+    """
+    exports the logger to path as 'csv', 'jsonl' or 'binary' (by default, whichever the extension of path is), and
+    returns how many rows were written
+    """
+    if export_format is None:
+        extensions = {extension: name for name, extension in EXPORT_FORMATS.items()}
+        export_format = extensions.get(os.path.splitext(path)[1].lower())
+        if export_format is None:
+            raise ValueError("Can't tell the format of {} from its extension, it has to be one of {}.".format(
+                path, ', '.join(EXPORT_FORMATS)))
+    exporters = {'csv': export_csv, 'jsonl': export_jsonl, 'binary': export_binary}
+    if export_format not in exporters:
+        raise ValueError("The format must be one of {}.".format(', '.join(EXPORT_FORMATS)))
+    return exporters[export_format](filename, path)
+
+
+def load_export(path: str) -> ExportedLog:
+    """
+    maps a binary export back into its columns without parsing anything, with NumPy memmaps if NumPy is installed
+    (so only the parts that are used are ever read) or array.arrays read straight from the file otherwise
+    """
+    file_handle = open(path, 'rb')
+    try:
+        file_handle.seek(0, os.SEEK_END)
+        size = file_handle.tell()
+        footer = TRAILER_OFFSET.size + len(MAGIC)
+        file_handle.seek(0)
+        if size < len(MAGIC) + footer or file_handle.read(len(MAGIC)) != MAGIC:
+            raise ValueError("{} isn't a binary export.".format(path))
+        file_handle.seek(size - footer)
+        trailer_offset, = TRAILER_OFFSET.unpack(file_handle.read(TRAILER_OFFSET.size))
+        file_handle.seek(trailer_offset)
+        trailer = json.loads(file_handle.read(size - footer - trailer_offset))
+        if trailer.get('version') != EXPORT_VERSION:
+            raise ValueError("{} was exported by another version of FitnessLogManager.".format(path))
+
+        try:
+            import numpy  # optional, and slow to import
+        except ImportError:
+            numpy = None
+        swap = trailer['byteorder'] != sys.byteorder
+
+        def column(typecode: str, itemsize: int, offset: int, rows: int):
+            if numpy is not None:
+                dtype = numpy.dtype(typecode)
+                if dtype.itemsize != itemsize:
+                    dtype = numpy.dtype('i{}'.format(itemsize))
+                if swap:
+                    dtype = dtype.newbyteorder()
+                return numpy.memmap(path, dtype=dtype, mode='r', offset=offset, shape=(rows,)) if rows else \
+                    numpy.zeros(0, dtype)
+            values = array.array(typecode)
+            file_handle.seek(offset)
+            values.frombytes(file_handle.read(rows * itemsize))
+            if swap:
+                values.byteswap()
+            return values
+
+        return ExportedLog({name: column(*spec) for name, spec in trailer['sessions'].items()},
+                           {name: column(*spec) for name, spec in trailer['sets'].items()},
+                           trailer['programs'], column('B', 1, *trailer['comments']))
+    finally:
+        file_handle.close()
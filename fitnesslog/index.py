@@ -0,0 +1,345 @@
+"""
+the byte-offset index kept beside the logger
+
+The index is a binary file: a fixed-size header (how many entries it has, where the last record of the logger starts,
+the checksum of everything before that and the signature of the logger it is for) followed by one fixed-width entry
+per record, in the order of the logger. Appending to the logger only appends the new entries and rewrites the header,
+and loading the index is a single read, with entries only unpacked when they are looked at (from either end).
+"""
+
+import mmap
+import os
+import struct
+import zlib
+from typing import List, Optional, Tuple
+
+from .records import SEPARATOR, PROGRAM, SESSION, UNDATED, OTHER, decode_record, scan_records, make_record, file_signature
+from .cache import parse_cache
+from .sidecars import INDEX_SUFFIX
+
+INDEX_MAGIC = b'FLIX'
+INDEX_VERSION = 4
+
+# magic, version, entries, tail, checksum before the tail (-1 if unknown), checksum of the entries, inode, size, mtime
+HEADER = struct.Struct('<4sHqqqIqqq')
+ENTRY = struct.Struct('<qqBiI')  # start, end, kind, date (0 for records that aren't sessions), checksum
+KINDS = [PROGRAM, SESSION, OTHER, UNDATED]
+KIND_CODES = {kind: code for code, kind in enumerate(KINDS)}
+
+RECORD_START = 0
+RECORD_END = 1
+RECORD_KIND = 2
+RECORD_DATE = 3
+RECORD_CHECK = 4
+
+
+def unpack_entry(fields: tuple) -> tuple:
+    start, end, kind, date, check = fields
+    return start, end, KINDS[kind], date or None, check
+
+
+class IndexRecords:
+    """
+    the entries of the index, oldest record first, kept packed the way they are stored and unpacked into
+    (start, end, kind, date, checksum) tuples only when they are looked at. stored is how many of the first entries
+    are already in the index file as they are here, and check is the checksum of all of them packed.
+    """
+
+    def __init__(self, data: bytes = b'', stored: int = 0):
+        self.data = bytearray(data)
+        self.stored = stored
+        self.check = zlib.crc32(self.data)
+
+    def __len__(self) -> int:
+        return len(self.data) // ENTRY.size
+
+    def __getitem__(self, position):
+        if isinstance(position, slice):
+            start, stop, step = position.indices(len(self))
+            if step != 1:
+                return [self[item] for item in range(start, stop, step)]
+            return IndexRecords(self.data[start * ENTRY.size:max(start, stop) * ENTRY.size])
+        if position < 0:
+            position += len(self)
+        if not 0 <= position < len(self):
+            raise IndexError("index entry out of range")
+        return unpack_entry(ENTRY.unpack_from(self.data, position * ENTRY.size))
+
+    def __iter__(self):
+        return (unpack_entry(fields) for fields in ENTRY.iter_unpack(self.data))
+
+    def __reversed__(self):
+        return (self[position] for position in range(len(self) - 1, -1, -1))
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, IndexRecords):
+            return self.data == other.data
+        return list(self) == list(other)
+
+    def __delitem__(self, position: slice) -> None:
+        """
+        drops every entry from position.start to the end, the only way entries are ever taken out
+        """
+        start, stop, step = position.indices(len(self))
+        if stop != len(self) or step != 1:
+            raise ValueError("only the last entries of the index can be deleted")
+        if start == stop:
+            return
+        del self.data[start * ENTRY.size:]
+        self.stored = min(self.stored, start)
+        self.check = zlib.crc32(self.data)
+
+    def __repr__(self) -> str:
+        return 'IndexRecords({!r})'.format(list(self))
+
+    def append(self, record) -> None:
+        start, end, kind, date, check = record
+        packed = ENTRY.pack(start, end, KIND_CODES[kind], date or 0, check)
+        self.data += packed
+        self.check = zlib.crc32(packed, self.check)
+
+    def first_from(self, offset: int) -> int:
+        """
+        returns the position of the first entry of a record starting at offset or later (len(self) if there is none)
+        """
+        low, high = 0, len(self)
+        while low < high:
+            middle = (low + high) // 2
+            if ENTRY.unpack_from(self.data, middle * ENTRY.size)[RECORD_START] < offset:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def cut(self, offset: int) -> None:
+        """
+        drops the entries of every record that starts at offset or later
+        """
+        del self[self.first_from(offset):]
+
+
+def index_path(filename: str) -> str:
+    """
+    returns where the index of the logger is stored (right beside it)
+    """
+    return filename + INDEX_SUFFIX
+
+
+def index_records(filename: str, index: dict, offset: int) -> None:
+    """
+    helper function for build_index() and extend_index() that indexes every record from offset onwards, keeping
+    index['check'] (the checksum of everything before the tail) going if it is known
+    """
+    check = index['check']
+    for start, end, raw in scan_records(filename, offset):
+        index['tail'] = start
+        index['check'] = check
+        if check is not None:
+            check = zlib.crc32(SEPARATOR, zlib.crc32(raw, check))
+        if not raw:
+            continue
+        record = make_record(start, end, raw)
+        date = None
+        if record.kind == SESSION:
+            date = record.date.toordinal()
+        index['records'].append((start, end, record.kind, date, zlib.crc32(raw)))
+
+
+def build_index(filename: str) -> dict:
+    """
+    scans the whole logger and builds the index of its records (offsets, kinds, dates and checksums)
+    """
+    signature = file_signature(filename)
+    index = {'signature': signature, 'tail': 0, 'check': 0, 'records': IndexRecords()}
+    index_records(filename, index, 0)
+    return index
+
+
+def pack_header(index: dict, count: int) -> bytes:
+    check = -1 if index['check'] is None else index['check']
+    return HEADER.pack(INDEX_MAGIC, INDEX_VERSION, count, index['tail'], check, index['records'].check,
+                       *index['signature'])
+
+
+def write_index(filename: str, index: dict) -> None:
+    """
+    brings the index stored beside the logger up to date, writing only the entries that aren't stored yet and then
+    the header. Until the header is written it still describes the index as it was: the entries it counts are
+    untouched (if entries were dropped it stops counting them first) and the checksum of the entries tells if they
+    didn't all make it to disk.
+    """
+    records = index['records']
+    path = index_path(filename)
+    try:
+        file_handle = open(path, 'r+b')
+    except FileNotFoundError:
+        file_handle = open(path, 'w+b')
+    try:
+        header = file_handle.read(HEADER.size)
+        stored_count = 0
+        if len(header) == HEADER.size and header[:len(INDEX_MAGIC)] == INDEX_MAGIC:
+            stored_count = HEADER.unpack(header)[2]
+        stored = min(records.stored, stored_count)
+        if stored < stored_count:
+            file_handle.seek(0)
+            file_handle.write(HEADER.pack(INDEX_MAGIC, INDEX_VERSION, 0, 0, -1, 0, 0, 0, 0))
+        file_handle.seek(HEADER.size + stored * ENTRY.size)
+        file_handle.write(records.data[stored * ENTRY.size:])
+        if stored < stored_count:
+            file_handle.truncate()
+        file_handle.seek(0)
+        file_handle.write(pack_header(index, len(records)))
+    finally:
+        file_handle.close()
+    records.stored = len(records)
+
+
+def read_index(filename: str) -> Optional[dict]:
+    """
+    helper function for load_index() and truncate_index() that reads the index as it was stored, without checking
+    that it still matches the logger
+    """
+    try:
+        file_handle = open(index_path(filename), 'rb')
+        try:
+            header = file_handle.read(HEADER.size)
+            if len(header) != HEADER.size or header[:len(INDEX_MAGIC)] != INDEX_MAGIC:
+                return None
+            magic, version, count, tail, check, entries_check, inode, size, mtime = HEADER.unpack(header)
+            if version != INDEX_VERSION:
+                return None
+            data = file_handle.read(count * ENTRY.size)
+        finally:
+            file_handle.close()
+    except OSError:
+        return None
+    records = IndexRecords(data, count)
+    if len(data) != count * ENTRY.size or records.check != entries_check:
+        return None
+    return {'signature': [inode, size, mtime], 'tail': tail, 'check': None if check < 0 else check,
+            'records': records}
+
+
+def load_index(filename: str) -> dict:
+    """
+    returns the index of the logger, rebuilding it only if the logger was changed outside of FitnessLogManager
+    """
+    return parse_cache.get(filename, 'index', load_stored_index)
+
+
+def load_stored_index(filename: str) -> dict:
+    """
+    helper function for load_index() that reads the index stored beside the logger, catching it up if the logger was
+    changed since (or building it if there is none)
+    """
+    index = read_index(filename)
+    if index is None:
+        index = build_index(filename)
+        write_index(filename, index)
+    elif index.get('signature') != file_signature(filename):
+        catch_up_index(filename, index)
+    return index
+
+
+def prefix_check(view, size: int) -> int:
+    """
+    returns the checksum of the first size bytes of an mmap of the logger
+    """
+    return zlib.crc32(memoryview(view)[:size])
+
+
+def first_changed_record(filename: str, index: dict) -> Tuple[int, int, int]:
+    """
+    helper function for catch_up_index() that compares the logger with an index of an older version of it, and
+    returns the position in the index of the first record that isn't in the logger any more as it was indexed (or
+    the number of indexed records if they all still are), the offset to reindex from and the checksum of everything
+    before that offset. If everything before the tail is untouched, which one checksum over it tells, the logger was
+    only appended to. Otherwise the records are compared one by one against their own checksums.
+    """
+    records = index['records']
+    tail = index['tail']
+    size = os.path.getsize(filename)
+    if size == 0:
+        return 0, 0, 0
+    file_handle = open(filename, 'rb')
+    try:
+        view = mmap.mmap(file_handle.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            if tail <= size and index['check'] is not None and prefix_check(view, tail) == index['check']:
+                position = len(records)
+                while position and records[position - 1][RECORD_START] >= tail:
+                    position -= 1
+                return position, tail, index['check']
+
+            previous = 0
+            for position, record in enumerate(records):
+                start, end = record[RECORD_START], record[RECORD_END]
+                gap = view[previous:start]
+                # every record before the tail is followed by a '---', and anything between records is more of them
+                if start >= tail or gap.replace(SEPARATOR, b'') or view[end:end + len(SEPARATOR)] != SEPARATOR or \
+                        zlib.crc32(view[start:end]) != record[RECORD_CHECK]:
+                    return position, previous, prefix_check(view, previous)
+                previous = end + len(SEPARATOR)
+            return len(records), previous, prefix_check(view, previous)
+        finally:
+            view.close()
+    finally:
+        file_handle.close()
+
+
+def catch_up_index(filename: str, index: dict) -> Tuple[List[list], int]:
+    """
+    brings an index of an older version of the logger up to date (and writes it), reindexing only from the first
+    record that was changed, e.g. by hand or by syncing the logger from another machine. Returns the entries that
+    were dropped from the index (the records that were changed or deleted) and the offset reindexing started from.
+    """
+    signature = file_signature(filename)
+    position, offset, check = first_changed_record(filename, index)
+    removed = index['records'][position:]
+    del index['records'][position:]
+    index['signature'] = signature
+    index['check'] = check
+    index_records(filename, index, offset)
+    write_index(filename, index)
+    return removed, offset
+
+
+def extend_index(filename: str, index: dict) -> None:
+    """
+    updates an index loaded right before appending to the logger with whatever was appended, only reading the new
+    bytes (and the unfinished record at the end of the file, if there was one)
+    """
+    tail = index['tail']
+    index['records'].cut(tail)
+    index['signature'] = file_signature(filename)
+    index_records(filename, index, tail)
+    write_index(filename, index)
+
+
+def truncate_index(filename: str, old_signature: List[int], offset: int) -> None:
+    """
+    drops every record from offset onwards after the logger was truncated there. If the stored index didn't match
+    the logger before the truncation it is left alone, and gets rebuilt the next time it is needed.
+    """
+    index = parse_cache.peek(filename, 'index', old_signature)
+    if index is None:
+        index = read_index(filename)
+    if index is None or index.get('signature') != old_signature:
+        return
+    index['records'].cut(offset)
+    index['tail'] = offset
+    # the checksum of what is left can't be worked out without reading it, the next catch up does that if needed
+    index['check'] = None
+    index['signature'] = file_signature(filename)
+    write_index(filename, index)
+
+
+def read_record(filename: str, record: list) -> str:
+    """
+    seeks to an indexed record and returns it
+    """
+    file_handle = open(filename, 'rb')
+    file_handle.seek(record[RECORD_START])
+    raw = file_handle.read(record[RECORD_END] - record[RECORD_START])
+    file_handle.close()
+    return decode_record(raw)
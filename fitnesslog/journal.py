@@ -0,0 +1,237 @@
+"""
+crash-safe appends to the logger through a write-ahead journal
+
+Every batch of records is first written to 'my_fitness_logs.txt.journal' beside the logger, together with the offset
+it belongs at and a checksum, and the journal is fsynced once for the whole batch. Only then is the batch appended to
+the logger. If FitnessLogManager stops halfway through that append, recover_log() finishes it from the journal the
+next time the logger is used, so the logger never ends in half a record. Once the logger itself has been fsynced (a
+checkpoint) the journal is emptied.
+"""
+
+import os
+import struct
+import threading
+import zlib
+from typing import List, Tuple
+
+from .records import encode_record
+from .cache import parse_cache
+from .index import load_index, extend_index
+from .sidecars import JOURNAL_SUFFIX, BAD_JOURNAL_SUFFIX
+
+# offset in the logger, length and crc32 of the record that follows
+ENTRY_HEADER = struct.Struct('<QII')
+CHECKPOINT_SIZE = 1024 * 1024
+GROUP_COMMIT_SIZE = 256
+
+
+def journal_path(filename: str) -> str:
+    """
+    returns where the journal of the given logger is kept
+    """
+    return filename + JOURNAL_SUFFIX
+
+
+def read_journal(filename: str) -> List[Tuple[int, bytes]]:
+    """
+    returns (offset, raw bytes) for every complete entry in the logger's journal. A torn entry at the end (whose batch
+    was never acknowledged) and everything after it are ignored.
+    """
+    try:
+        file_handle = open(journal_path(filename), 'rb')
+    except FileNotFoundError:
+        return []
+    journal = file_handle.read()
+    file_handle.close()
+
+    entries = []
+    position = 0
+    while position + ENTRY_HEADER.size <= len(journal):
+        offset, length, checksum = ENTRY_HEADER.unpack_from(journal, position)
+        position += ENTRY_HEADER.size
+        raw = journal[position:position + length]
+        if len(raw) != length or zlib.crc32(raw) != checksum:
+            break
+        entries.append((offset, raw))
+        position += length
+    return entries
+
+
+def recover_log(filename: str) -> int:
+    """
+    finishes any append that was cut short, using the journal, and empties the journal. Returns how many records had
+    to be rewritten. If the logger was changed by hand since, the journal is left as '.journal.bad' instead of being
+    replayed over the changes.
+    """
+    path = journal_path(filename)
+    if not os.path.exists(path):
+        return 0
+
+    replayed = 0
+    entries = read_journal(filename)
+    if entries:
+        file_handle = open(filename, 'r+b')
+        try:
+            for offset, raw in entries:
+                size = file_handle.seek(0, os.SEEK_END)
+                if size < offset:
+                    break
+                file_handle.seek(offset)
+                existing = file_handle.read(len(raw))
+                if existing == raw:
+                    continue
+                written = len(os.path.commonprefix([existing, raw]))
+                if existing[written:].strip(b'\0'):
+                    print("The logger was changed since it was last written to, its journal was kept in",
+                          filename + BAD_JOURNAL_SUFFIX)
+                    file_handle.close()
+                    os.replace(path, filename + BAD_JOURNAL_SUFFIX)
+                    return replayed
+                file_handle.seek(offset + written)
+                file_handle.truncate()
+                file_handle.write(raw[written:])
+                replayed += 1
+            file_handle.flush()
+            os.fsync(file_handle.fileno())
+        finally:
+            file_handle.close()
+    os.remove(path)
+    return replayed
+
+
+def write_journal(filename: str, offset: int, raws: List[bytes]) -> int:
+    """
+    helper function for journal_batch() and rewrite_log() that adds raws to the journal as the records that belong in
+    the logger from offset onwards, with one fsync. Returns the size of the journal.
+    """
+    frames = []
+    for raw in raws:
+        frames.append(ENTRY_HEADER.pack(offset, len(raw), zlib.crc32(raw)))
+        frames.append(raw)
+        offset += len(raw)
+
+    file_handle = open(journal_path(filename), 'ab')
+    file_handle.write(b''.join(frames))
+    file_handle.flush()
+    os.fsync(file_handle.fileno())
+    journal_size = file_handle.tell()
+    file_handle.close()
+    return journal_size
+
+
+def journal_batch(filename: str, texts: List[str]) -> int:
+    """
+    appends texts to the logger through the journal (one fsync for the whole batch) and brings the index and the
+    parse cache up to date. The journal isn't emptied, see checkpoint_log(). Returns the size of the journal.
+    """
+    index = load_index(filename)
+    old_signature = index['signature']
+    tail = index['tail']
+
+    raws = [encode_record(text) for text in texts]
+    journal_size = write_journal(filename, old_signature[1], raws)
+
+    file_handle = open(filename, 'ab')
+    file_handle.write(b''.join(raws))
+    file_handle.close()
+
+    extend_index(filename, index)
+    parse_cache.appended(filename, old_signature, tail)
+    return journal_size
+
+
+def checkpoint_log(filename: str) -> None:
+    """
+    fsyncs the logger, after which the journal isn't needed anymore and is removed
+    """
+    file_handle = open(filename, 'ab')
+    os.fsync(file_handle.fileno())
+    file_handle.close()
+    try:
+        os.remove(journal_path(filename))
+    except FileNotFoundError:
+        pass
+
+
+def commit_batch(filename: str, texts: List[str]) -> None:
+    """
+    helper function for append_to_log() that appends texts to the logger crash-safely and leaves no journal behind
+    """
+    recover_log(filename)
+    journal_batch(filename, texts)
+    checkpoint_log(filename)
+
+
+class GroupCommitWriter:
+    """
+    appends records to one logger from many threads at once. write() blocks until its record is safely in the
+    journal, and whatever queued up while the previous batch was being fsynced goes out as the next batch, so there is
+    one fsync per batch instead of one per record. Nothing else should write to the logger until close().
+    """
+
+    def __init__(self, filename: str, max_batch: int = GROUP_COMMIT_SIZE, checkpoint_size: int = CHECKPOINT_SIZE):
+        self.filename = filename
+        self.max_batch = max_batch
+        self.checkpoint_size = checkpoint_size
+        self.condition = threading.Condition()
+        self.pending = []
+        self.queued = 0
+        self.committed = 0
+        self.batches = 0
+        self.error = None
+        self.closed = False
+        recover_log(filename)
+        self.thread = threading.Thread(target=self.run, name='fitnesslog-group-commit', daemon=True)
+        self.thread.start()
+
+    def write(self, text: str) -> None:
+        with self.condition:
+            if self.closed:
+                raise ValueError("write to a closed GroupCommitWriter")
+            self.pending.append(text)
+            self.queued += 1
+            ticket = self.queued
+            self.condition.notify_all()
+            while self.committed < ticket and self.error is None:
+                self.condition.wait()
+            if self.committed < ticket:
+                raise self.error
+
+    def run(self) -> None:
+        while True:
+            with self.condition:
+                while not self.pending and not self.closed:
+                    self.condition.wait()
+                if not self.pending:
+                    return
+                batch = self.pending[:self.max_batch]
+                del self.pending[:self.max_batch]
+            try:
+                if journal_batch(self.filename, batch) >= self.checkpoint_size:
+                    checkpoint_log(self.filename)
+            except Exception as error:
+                with self.condition:
+                    self.error = error
+                    self.condition.notify_all()
+                return
+            with self.condition:
+                self.committed += len(batch)
+                self.batches += 1
+                self.condition.notify_all()
+
+    def close(self) -> None:
+        """
+        waits for everything written so far to be committed and checkpoints the logger
+        """
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+        self.thread.join()
+        if self.error is None:
+            checkpoint_log(self.filename)
+
+    def __enter__(self) -> 'GroupCommitWriter':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
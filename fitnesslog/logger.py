@@ -0,0 +1,343 @@
+"""
+reading from and writing to the logger, without any prompts
+"""
+
+import csv
+import datetime
+import json
+import os
+import time
+from typing import List, Dict, Optional, Iterator, Tuple
+
+from .records import PROGRAM, REPS_PATTERN, parse_date, decode_record, encode_record, make_record, file_signature, \
+    tail_records
+from .cache import build_parsed_state, parse_cache
+from .index import RECORD_KIND, load_index, truncate_index, read_record
+from .journal import recover_log, commit_batch, write_journal, journal_batch, checkpoint_log
+from .backups import create_backup
+from .segments import load_manifest, carried_records, archived_tail, archived_program
+from .programs import Program, program_sections, parse_program
+from .database import is_database, database_append, database_current_program, database_tail_records, \
+    database_truncate
+from .sidecars import REMOVED_SUFFIX
+
+PROGRAM_LIST = 0
+SESSION_DICT = 1
+EVERYTHING_LIST = 2
+
+CURRENT_PROGRAM = -1
+
+
+def parse_logger(filename: str) -> (List[str],
+                                    Dict[str, List[str]],
+                                    List[str]):
+    """
+    reads the logger specified and parses it into appropriate dictionaries for later use. The result is shared with
+    the parse cache, so it shouldn't be modified.
+    """
+    return parse_cache.get(filename, 'parsed', build_parsed_state)[:3]
+
+
+def last_entries(filename: str, entries: int) -> List[str]:
+    """
+    returns the last few entries in the logger, reading the file backwards so it doesn't matter how long it is. The
+    segments of a rotated logger are only opened if the logger itself has fewer entries than that.
+    """
+    if is_database(filename):
+        return [decode_record(raw) for start, end, raw in database_tail_records(filename, entries)]
+    last = [decode_record(raw) for start, end, raw in tail_records(filename, entries)]
+    manifest = load_manifest(filename) if len(last) < entries else None
+    if manifest is not None:
+        records = load_index(filename)['records'][carried_records(filename, manifest):]
+        last = [read_record(filename, record) for record in records]
+        last = archived_tail(filename, entries - len(last)) + last
+    return last
+
+
+def return_current_program(filename: str) -> str:
+    """
+    returns the current program being followed
+    """
+    current_program = parse_cache.get(filename, 'current_program', find_current_program)
+    if current_program is None:
+        print("Couldn't detect a program.")
+    return current_program
+
+
+def find_current_program(filename: str) -> Optional[str]:
+    """
+    helper function for return_current_program() that seeks to the last program in the logger
+    """
+    if is_database(filename):
+        return database_current_program(filename)
+    for record in reversed(load_index(filename)['records']):
+        if record[RECORD_KIND] == PROGRAM:
+            return read_record(filename, record)
+    # a rotated logger keeps a copy of its program, unless it was deleted since
+    return archived_program(filename)
+
+
+def append_to_log(filename: str, text: str) -> None:
+    """
+    helper function for log() and write_adjusted_program() that appends text to the logger through the journal, so a
+    crash can't leave half a record behind, and brings the index and the parse cache up to date without re-reading
+    what was already there. The text is on disk by the time this returns.
+    """
+    if is_database(filename):
+        database_append(filename, text)
+        return
+    commit_batch(filename, [text])
+
+
+def write_adjusted_program(filename: str, new_program: str) -> bool:
+    """
+    a helper function for adjust_program() that writes the adjusted program to file, unless it has the same sections
+    as the current program. Returns True if it was written.
+    """
+    current_program = find_current_program(filename)
+    if current_program is not None:
+        current = parse_program(current_program)
+        if current.sections and current.to_text() == parse_program(new_program).to_text():
+            return False
+    append_to_log(filename, '\n' + new_program + '---')
+    return True
+
+
+def current_program_model(filename: str) -> Optional[Program]:
+    """
+    returns the current program parsed into its sections, parsed only once for every revision of the program
+    """
+    current_program = return_current_program(filename)
+    if current_program is None:
+        return None
+    return parse_program(current_program)
+
+
+def parse_current_program(filename: str) -> Dict[str, list[str]]:
+    """
+    returns the subsets of every section of the current program by header
+    """
+    return program_sections(return_current_program(filename))
+
+
+def log_feedback(filename: str) -> str:
+    """
+    helper function for log() and adjust_program() that gives feedback on log made
+    """
+    last_3_list = last_entries(filename, 3)
+    last_3_str = "---".join(last_3_list)
+    last_3_str += '---'
+    return last_3_str
+
+
+def create_program_header(filename: str) -> List[str]:
+    """
+    returns the section headers for the current program being followed
+    """
+    return current_program_model(filename).headers()
+
+
+def format_session(header: str, comment: Optional[str], reps_list: List[str]) -> str:
+    """
+    helper function for log() and ingest_sessions() that turns a session into the text appended to the logger
+    """
+    to_be_written = ['', header]
+    if comment is not None:
+        to_be_written.append(comment)
+    for reps in reps_list:
+        to_be_written.append(reps)
+    to_be_written.append('---')
+    return '\n'.join(to_be_written)
+
+
+def read_ingest_rows(path: str) -> Iterator[Tuple[int, dict]]:
+    """
+    helper function for ingest_sessions() that yields (line number, session) for every session in a .csv or .jsonl
+    file. A session is a dict with 'date', 'comment', 'skipped' and 'reps' (one line of reps per section).
+
+    CSV files start with a header row holding 'date', optionally 'comment' and 'skipped', and one column per section
+    of the current program in the same order as the program (quoted, since reps contain commas). JSONL files hold one
+    object per line with the same keys as the dict.
+    """
+    file_handle = open(path, newline='')
+    try:
+        if path.lower().endswith(('.jsonl', '.json')):
+            for line_number, line in enumerate(file_handle, 1):
+                if not line.strip():
+                    continue
+                try:
+                    session = json.loads(line)
+                except ValueError:
+                    session = None
+                if not isinstance(session, dict):
+                    yield line_number, {'error': "not a JSON object"}
+                    continue
+                yield line_number, session
+        else:
+            reader = csv.reader(file_handle)
+            columns = [column.strip().lower() for column in next(reader, [])]
+            section_columns = [number for number, column in enumerate(columns)
+                               if column not in ('date', 'comment', 'skipped')]
+            for row in reader:
+                if not any(row):
+                    continue
+                cells = dict(zip(columns, row))
+                yield reader.line_num, {'date': cells.get('date', ''),
+                                        'comment': cells.get('comment') or None,
+                                        'skipped': cells.get('skipped', '').strip().lower() in ('1', 'true', 'yes'),
+                                        'reps': [row[number] for number in section_columns if number < len(row)]}
+    finally:
+        file_handle.close()
+
+
+def validate_session(session: dict, sections: Dict[str, List[str]]) -> (Optional[str],
+                                                                       Optional[str]):
+    """
+    helper function for ingest_sessions() that checks a session against the sections of the current program and
+    returns (text to append, None), or (None, what is wrong with it)
+    """
+    if 'error' in session:
+        return None, session['error']
+    wanted_date = str(session.get('date', '')).strip()
+    try:
+        if '-' in wanted_date:
+            formatted_date = datetime.date.fromisoformat(wanted_date)
+        else:
+            formatted_date = parse_date(wanted_date)
+    except (ValueError, IndexError):
+        return None, "invalid date {!r}, format must be DD/MM/YYYY or YYYY-MM-DD".format(wanted_date)
+    header = "{} {}".format(formatted_date.strftime('%A'), formatted_date.strftime('%d/%m/%Y'))
+
+    comment = session.get('comment')
+    if comment is not None:
+        comment = str(comment).strip() or None
+    if comment is not None and ('\n' in comment or '---' in comment):
+        return None, "comments can't contain new lines or '---'"
+    if session.get('skipped') or comment == "(SKIPPED)":
+        return format_session(header, "(SKIPPED)", []), None
+
+    reps_list = [str(reps).strip() for reps in session.get('reps') or []]
+    if len(reps_list) != len(sections):
+        return None, "expected {} lines of reps (one per section), got {}".format(len(sections), len(reps_list))
+    for reps, section in zip(reps_list, sections):
+        groups = reps.split(',')
+        if REPS_PATTERN.fullmatch(reps) is None:
+            return None, "invalid reps {!r} for the {}".format(reps, section.lower())
+        if len(groups) != len(sections[section]):
+            return None, "the {} has {} exercises but {!r} has {}".format(section.lower(), len(sections[section]),
+                                                                         reps, len(groups))
+    return format_session(header, comment, reps_list), None
+
+
+def ingest_sessions(filename: str, path: str) -> Optional[int]:
+    """
+    logs every session in a .csv or .jsonl file in one journaled append, after checking all of them against the
+    current program. Nothing is logged if any session is invalid. The sessions go through a single append_to_log(),
+    so commit_batch() fsyncs the journal and the logger once for all of them. Returns how many sessions were logged,
+    or None if nothing could be logged.
+    """
+    current_program = return_current_program(filename)
+    if current_program is None:
+        return
+    sections = program_sections(current_program)
+
+    started = time.perf_counter()
+    buffered = []
+    errors = []
+    for line_number, session in read_ingest_rows(path):
+        text, error = validate_session(session, sections)
+        if error is not None:
+            errors.append("line {}: {}".format(line_number, error))
+        else:
+            buffered.append(text)
+
+    if errors:
+        print("\nNothing was logged, {} session(s) are invalid:\n".format(len(errors)))
+        print('\n'.join(errors))
+        return
+    if buffered:
+        append_to_log(filename, ''.join(buffered))
+
+    elapsed = time.perf_counter() - started
+    rate = len(buffered) / elapsed if elapsed > 0 else float('inf')
+    print("\nLogged {} session(s) in {:.2f} seconds ({:.0f} sessions/s).".format(len(buffered), elapsed, rate))
+    return len(buffered)
+
+
+def removed_path(filename: str) -> str:
+    """
+    returns where the entries last removed from an SQLite logger are kept (right beside it)
+    """
+    return filename + REMOVED_SUFFIX
+
+
+def write_removed(filename: str, removed: bytes) -> None:
+    """
+    helper function for remove_entries() that keeps the entries removed from an SQLite logger, as the .txt version of
+    the logger held them, so appending them to that version puts it back exactly
+    """
+    file_handle = open(removed_path(filename), 'wb')
+    file_handle.write(removed)
+    file_handle.flush()
+    os.fsync(file_handle.fileno())
+    file_handle.close()
+
+
+def select_entries(filename: str, entries: int) -> List[Tuple[int, int, bytes]]:
+    """
+    returns the last few entries in the logger as (start, end, raw bytes), oldest first, ready for remove_entries()
+    """
+    if is_database(filename):
+        return database_tail_records(filename, entries)
+    return tail_records(filename, entries)
+
+
+def remove_entries(filename: str, delete_records: List[Tuple[int, int, bytes]]) -> None:
+    """
+    deletes the entries returned by select_entries() (and everything after them), making a restore point of the logger
+    first (see backups.py). SQLite loggers have no restore points, the deleted entries are kept in removed_path().
+    """
+    if not delete_records:
+        return
+
+    if is_database(filename):
+        removed = database_truncate(filename, delete_records[0][0])
+        write_removed(filename, removed)
+        return
+
+    # everything up to and including the '---' before the first deleted entry stays as it is. The restore point is on
+    # disk before anything is cut, and an unfinished append is finished first so it can't be replayed over the cut.
+    recover_log(filename)
+    create_backup(filename, 'before removing {} entr{}'.format(len(delete_records),
+                                                               'y' if len(delete_records) == 1 else 'ies'))
+    truncate_log(filename, delete_records)
+
+
+def truncate_log(filename: str, delete_records: List[Tuple[int, int, bytes]]) -> None:
+    """
+    helper function for remove_entries(), rewrite_log() and sync_loggers() that cuts a .txt logger right before the
+    first of the given records, which have to be every record from there to the end, and brings the index and the
+    parse cache up to date
+    """
+    cut = delete_records[0][0]
+    old_signature = file_signature(filename)
+    file_handle = open(filename, 'r+b')
+    file_handle.truncate(cut)
+    os.fsync(file_handle.fileno())
+    file_handle.close()
+    truncate_index(filename, old_signature, cut)
+    parse_cache.truncated(filename, old_signature, [make_record(start, end, raw) for start, end, raw in delete_records])
+
+
+def rewrite_log(filename: str, delete_records: List[Tuple[int, int, bytes]], texts: List[str]) -> None:
+    """
+    replaces the records from the first of delete_records to the end of a .txt logger with texts. The texts are in the
+    journal, at the offset of the cut, before anything is cut, so if FitnessLogManager stops halfway through
+    recover_log() writes them there like any other append: only the records that aren't written again can be lost,
+    which is what a restore point is for.
+    """
+    recover_log(filename)
+    write_journal(filename, delete_records[0][0], [encode_record(text) for text in texts])
+    truncate_log(filename, delete_records)
+    journal_batch(filename, texts)
+    checkpoint_log(filename)
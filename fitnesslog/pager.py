@@ -0,0 +1,148 @@
+"""
+paging through the logger a few records at a time
+"""
+
+import bisect
+import datetime
+from typing import List, Optional, Tuple
+
+from .records import SESSION, Record, make_record, read_spans
+from .cache import parse_cache
+from .index import RECORD_START, RECORD_END, load_index
+from .dates import load_date_index
+from .database import is_database, database_entry_positions, database_read_entries, database_first_session_from
+from .segments import load_manifest, carried_records, segment_records
+
+PAGE_SIZE = 10
+
+
+class LogPager:
+    """
+    pages through the logger page_size records at a time, newest first unless told otherwise. Records are numbered
+    from 1 for the oldest one. Pages are read straight from the offsets in the logger's index (or the entry positions
+    of the SQLite logger), so any page costs the same to open however long the logger is. The records of a rotated
+    logger's segments come first, and a segment is only decompressed when a page reaches into it.
+    """
+
+    def __init__(self, filename: str, page_size: int = PAGE_SIZE, newest_first: bool = True):
+        self.filename = filename
+        self.page_size = max(1, page_size)
+        self.newest_first = newest_first
+
+    def locations(self) -> list:
+        """
+        returns where every record is: [start, end, ...] index records for a .txt logger (without the program copy a
+        rotation carried over), entry positions for SQLite
+        """
+        if is_database(self.filename):
+            return parse_cache.get(self.filename, 'entry_positions', database_entry_positions)
+        records = load_index(self.filename)['records']
+        skip = carried_records(self.filename, load_manifest(self.filename))
+        return records[skip:] if skip else records
+
+    def segments(self) -> List[dict]:
+        """
+        returns the segments of a rotated .txt logger, oldest first
+        """
+        if is_database(self.filename):
+            return []
+        manifest = load_manifest(self.filename)
+        return [] if manifest is None else manifest['segments']
+
+    def archived(self) -> int:
+        return sum(segment['records'] for segment in self.segments())
+
+    def __len__(self) -> int:
+        return self.archived() + len(self.locations())
+
+    def pages(self) -> int:
+        return max(1, -(-len(self) // self.page_size))
+
+    def page_numbers(self, page: int) -> range:
+        """
+        returns the record numbers on a page, in the order they are shown
+        """
+        records = len(self)
+        page = min(max(page, 1), self.pages())
+        if self.newest_first:
+            last = records - (page - 1) * self.page_size
+            return range(last, max(last - self.page_size, 0), -1)
+        first = (page - 1) * self.page_size + 1
+        return range(first, min(first + self.page_size, records + 1))
+
+    def page(self, page: int) -> List[Tuple[int, Record]]:
+        """
+        returns (record number, record) for every record on a page, in the order they are shown
+        """
+        numbers = self.page_numbers(page)
+        if not numbers:
+            return []
+        low, high = min(numbers), max(numbers)
+        locations = self.locations()
+        if is_database(self.filename):
+            rows = database_read_entries(self.filename, locations[low - 1], locations[high - 1])
+            records = [make_record(position, position, raw) for position, raw in rows]
+        else:
+            records = []
+            first = 0  # number of records before the segment
+            for segment in self.segments():
+                if first < high and low <= first + segment['records']:
+                    records.extend(segment_records(self.filename, segment)[max(low - 1 - first, 0):high - first])
+                first += segment['records']
+            if high > first:
+                records.extend(read_spans(self.filename, [(record[RECORD_START], record[RECORD_END]) for record
+                                                          in locations[max(low - 1 - first, 0):high - first]]))
+        numbered = list(zip(range(low, high + 1), records))
+        if self.newest_first:
+            numbered.reverse()
+        return numbered
+
+    def page_of_record(self, number: int) -> int:
+        """
+        returns the page the given record number is shown on
+        """
+        number = min(max(number, 1), max(len(self), 1))
+        if self.newest_first:
+            number = len(self) - number + 1
+        return (number - 1) // self.page_size + 1
+
+    def record_of_date(self, date: datetime.date) -> Optional[int]:
+        """
+        returns the number of the earliest session done on or after date, or None if there is none
+        """
+        if is_database(self.filename):
+            position = database_first_session_from(self.filename, date)
+            if position is None:
+                return None
+            return bisect.bisect_left(self.locations(), position) + 1
+
+        first = 0
+        for segment in self.segments():
+            if segment['last_date'] is not None and segment['last_date'] >= date.toordinal():
+                for number, record in enumerate(segment_records(self.filename, segment)):
+                    if record.kind == SESSION and record.date >= date:
+                        return first + number + 1
+            first += segment['records']
+
+        date_index = load_date_index(self.filename)
+        session = bisect.bisect_left(date_index.ordinals, date.toordinal())
+        if session == len(date_index.ordinals):
+            return None
+        start = date_index.spans[session][0]
+        # the index records are in file order, so their starts are sorted
+        records = self.locations()
+        low, high = 0, len(records)
+        while low < high:
+            middle = (low + high) // 2
+            if records[middle][RECORD_START] < start:
+                low = middle + 1
+            else:
+                high = middle
+        return first + low + 1
+
+
+def format_page(numbered: List[Tuple[int, Record]]) -> str:
+    """
+    returns a page the way it is printed: every record under its number, each followed by '---' like in the logger
+    """
+    return ''.join('\n({})\n{}\n---'.format(number, record.text.strip('\n')) for number, record in numbered)
@@ -0,0 +1,324 @@
+"""
+opt-in instrumentation of menu actions and commands: file opens, bytes read and written, parse_logger() calls and the
+time spent in every function, printed after each action and optionally written as a JSONL trace or cProfile output
+
+Nothing is patched until enable_profiling() is called (by 'python FitnessLogManager.py --profile' or with
+FITNESSLOG_PROFILE=1 set), so when it is off the only cost is profile_action() checking a global.
+"""
+
+import builtins
+import functools
+import json
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from typing import List, Dict, Optional
+
+from .cache import parse_cache
+
+PROFILE_ENVIRONMENT = 'FITNESSLOG_PROFILE'
+TRACE_ENVIRONMENT = 'FITNESSLOG_PROFILE_TRACE'
+CPROFILE_ENVIRONMENT = 'FITNESSLOG_PROFILE_CPROFILE'
+PROFILE_OPTIONS = {'--profile': None, '--profile-trace': 'trace_file', '--profile-cprofile': 'cprofile_dir'}
+SUMMARY_FUNCTIONS = 12
+INSTRUMENTED_PREFIXES = ('fitnesslog', 'FitnessLogManager', '__main__')
+
+profiler = None  # the Profiler while profiling is on
+
+
+class CountingFile:
+    """
+    stands in for a file returned by open() while profiling, counting what goes through it (characters rather than
+    bytes for text files)
+    """
+
+    def __init__(self, file, counters: Counter):
+        self.file = file
+        self.counters = counters
+
+    def __getattr__(self, name):
+        return getattr(self.file, name)
+
+    def __enter__(self):
+        self.file.__enter__()
+        return self
+
+    def __exit__(self, *exception):
+        return self.file.__exit__(*exception)
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        line = next(self.file)
+        self.counters['bytes read'] += len(line)
+        return line
+
+    def read(self, *args):
+        data = self.file.read(*args)
+        self.counters['bytes read'] += len(data)
+        return data
+
+    def readline(self, *args):
+        line = self.file.readline(*args)
+        self.counters['bytes read'] += len(line)
+        return line
+
+    def readlines(self, *args):
+        lines = self.file.readlines(*args)
+        self.counters['bytes read'] += sum(len(line) for line in lines)
+        return lines
+
+    def readinto(self, buffer):
+        size = self.file.readinto(buffer)
+        self.counters['bytes read'] += size or 0
+        return size
+
+    def write(self, data):
+        self.counters['bytes written'] += len(data)
+        return self.file.write(data)
+
+    def writelines(self, lines):
+        lines = list(lines)
+        self.counters['bytes written'] += sum(len(line) for line in lines)
+        return self.file.writelines(lines)
+
+
+class Profiler:
+    """
+    collects the counters and function timings of one action at a time. timings maps every instrumented function to
+    [calls, total seconds, seconds spent in the function itself rather than in the instrumented functions it called].
+    """
+
+    def __init__(self, trace_file: Optional[str] = None, cprofile_dir: Optional[str] = None):
+        self.trace_file = trace_file
+        self.cprofile_dir = cprofile_dir
+        self.counters = Counter()
+        self.timings = {}
+        self.local = threading.local()
+        self.actions = 0
+        self.original_open = builtins.open
+        self.original_input = builtins.input
+
+    def stack(self) -> List[float]:
+        """
+        returns this thread's stack of the time spent in the callees of every instrumented call in progress
+        """
+        stack = getattr(self.local, 'stack', None)
+        if stack is None:
+            stack = self.local.stack = []
+        return stack
+
+    def record(self, name: str, calls: int, elapsed: float, children: float) -> None:
+        stack = self.stack()
+        if stack:
+            stack[-1] += elapsed
+        timing = self.timings.get(name)
+        if timing is None:
+            timing = self.timings[name] = [0, 0.0, 0.0]
+        timing[0] += calls
+        timing[1] += elapsed
+        timing[2] += elapsed - children
+
+    def timed(self, name: str, function):
+        """
+        returns function wrapped to count its calls and time them (every step of it, for a generator)
+        """
+        import inspect  # only needed once profiling is on, and slow to import
+
+        perf_counter = time.perf_counter
+        if inspect.isgeneratorfunction(function):
+            @functools.wraps(function)
+            def wrapper(*args, **kwargs):
+                iterator = function(*args, **kwargs)
+                calls = 1
+                while True:
+                    stack = self.stack()
+                    stack.append(0.0)
+                    started = perf_counter()
+                    try:
+                        value = next(iterator)
+                    except StopIteration:
+                        self.record(name, calls, perf_counter() - started, stack.pop())
+                        return
+                    self.record(name, calls, perf_counter() - started, stack.pop())
+                    calls = 0
+                    yield value
+            return wrapper
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            stack = self.stack()
+            stack.append(0.0)
+            started = perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                self.record(name, 1, perf_counter() - started, stack.pop())
+        return wrapper
+
+    def open(self, *args, **kwargs):
+        self.counters['file opens'] += 1
+        return CountingFile(self.original_open(*args, **kwargs), self.counters)
+
+    def install(self) -> None:
+        """
+        replaces open() and input() and every function of FitnessLogManager and fitnesslog (wherever they were
+        imported to) with instrumented versions
+        """
+        import inspect
+
+        builtins.open = self.open
+        builtins.input = self.timed('input()', self.original_input)
+        modules = [module for name, module in list(sys.modules.items())
+                   if module is not None and name.startswith(INSTRUMENTED_PREFIXES) and name != __name__]
+        names = {module.__name__ for module in modules}
+        wrappers = {}
+        for module in modules:
+            for attribute, value in list(vars(module).items()):
+                if not inspect.isfunction(value) or value.__module__ not in names or value.__module__ == __name__ \
+                        or attribute == 'main':
+                    continue
+                if value not in wrappers:
+                    module_name = value.__module__.replace('fitnesslog.', '')
+                    wrappers[value] = self.timed('{}.{}'.format(module_name, value.__name__), value)
+                setattr(module, attribute, wrappers[value])
+
+    def start(self, action: str) -> None:
+        self.action = action
+        self.counters.clear()
+        self.timings = {}
+        self.cache_misses = parse_cache.misses
+        self.cache_hits = parse_cache.hits
+        self.profile = None
+        if self.cprofile_dir is not None:
+            import cProfile  # only needed when cProfile output was asked for
+            self.profile = cProfile.Profile()
+            self.profile.enable()
+        self.started = time.perf_counter()
+
+    def stop(self) -> dict:
+        """
+        finishes the action, writing its cProfile output and trace line if they were asked for, and returns its summary
+        """
+        elapsed = time.perf_counter() - self.started
+        self.actions += 1
+        if self.profile is not None:
+            self.profile.disable()
+            os.makedirs(self.cprofile_dir, exist_ok=True)
+            slug = ''.join(character if character.isalnum() else '_' for character in self.action.lower())
+            self.profile.dump_stats(os.path.join(self.cprofile_dir, '{:03d}-{}.prof'.format(self.actions, slug)))
+        waiting = self.timings.get('input()', [0, 0.0, 0.0])[1]
+        summary = {'action': self.action, 'seconds': elapsed, 'seconds waiting for input': waiting,
+                   'file opens': self.counters['file opens'], 'bytes read': self.counters['bytes read'],
+                   'bytes written': self.counters['bytes written'],
+                   'parse_logger calls': self.timings.get('logger.parse_logger', [0])[0],
+                   'parse cache misses': parse_cache.misses - self.cache_misses,
+                   'parse cache hits': parse_cache.hits - self.cache_hits,
+                   'functions': {name: {'calls': calls, 'seconds': total, 'own seconds': own}
+                                 for name, (calls, total, own) in self.timings.items()}}
+        if self.trace_file is not None:
+            file_handle = self.original_open(self.trace_file, 'a')
+            file_handle.write(json.dumps(summary) + '\n')
+            file_handle.close()
+        return summary
+
+
+class ProfiledAction:
+    """
+    times whatever runs inside it as one action and prints its summary afterwards
+    """
+
+    def __init__(self, action: str):
+        self.action = action
+
+    def __enter__(self):
+        profiler.start(self.action)
+        return self
+
+    def __exit__(self, *exception):
+        print(format_summary(profiler.stop()))
+        return False
+
+
+class NoAction:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exception):
+        return False
+
+
+NO_ACTION = NoAction()
+
+
+def profile_action(action: Optional[str]):
+    """
+    returns a context manager that profiles the given action if profiling is on (and does nothing otherwise)
+    """
+    if profiler is None or action is None:
+        return NO_ACTION
+    return ProfiledAction(action)
+
+
+def enable_profiling(trace_file: Optional[str] = None, cprofile_dir: Optional[str] = None) -> None:
+    """
+    turns profiling on for the rest of the run. Should be called once everything to be profiled has been imported.
+    """
+    global profiler
+    if profiler is not None:
+        return
+    profiler = Profiler(trace_file, cprofile_dir)
+    profiler.install()
+
+
+def profiling_options(arguments: List[str]) -> (List[str], Optional[Dict[str, Optional[str]]]):
+    """
+    takes the profiling options (--profile, --profile-trace FILE, --profile-cprofile FOLDER) out of the command line,
+    falling back on the FITNESSLOG_PROFILE environment variables. Returns the remaining arguments and the options
+    for enable_profiling(), or None if profiling wasn't asked for.
+    """
+    remaining = []
+    options = None
+    position = 0
+    while position < len(arguments):
+        argument = arguments[position]
+        name, equals, value = argument.partition('=')
+        if name in PROFILE_OPTIONS:
+            options = options or {}
+            key = PROFILE_OPTIONS[name]
+            if key is not None:
+                if not equals:
+                    position += 1
+                    value = arguments[position] if position < len(arguments) else None
+                options[key] = value
+        else:
+            remaining.append(argument)
+        position += 1
+
+    if options is None and os.environ.get(PROFILE_ENVIRONMENT, '') not in ('', '0'):
+        options = {}
+    if options is not None:
+        options.setdefault('trace_file', os.environ.get(TRACE_ENVIRONMENT) or None)
+        options.setdefault('cprofile_dir', os.environ.get(CPROFILE_ENVIRONMENT) or None)
+    return remaining, options
+
+
+def format_summary(summary: dict) -> str:
+    """
+    returns the summary of an action as printed after it: the counters, then the functions that took the longest
+    """
+    lines = ['\n[profile] {}: {:.3f}s ({:.3f}s waiting for input), {} file opens, {} bytes read, {} bytes written, '
+             '{} parse_logger calls, parse cache {} hits / {} misses'.format(
+                 summary['action'], summary['seconds'], summary['seconds waiting for input'], summary['file opens'],
+                 summary['bytes read'], summary['bytes written'], summary['parse_logger calls'],
+                 summary['parse cache hits'], summary['parse cache misses'])]
+    functions = sorted(((name, timing) for name, timing in summary['functions'].items() if name != 'input()'),
+                       key=lambda item: -item[1]['own seconds'])
+    width = max([len(name) for name, timing in functions[:SUMMARY_FUNCTIONS]] + [0])
+    for name, timing in functions[:SUMMARY_FUNCTIONS]:
+        lines.append('[profile]   {}  {:>7} calls  {:9.4f}s own  {:9.4f}s total'.format(
+            name.ljust(width), timing['calls'], timing['own seconds'], timing['seconds']))
+    return '\n'.join(lines)
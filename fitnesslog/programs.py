@@ -0,0 +1,167 @@
+"""
+parsing workout programs into their sections
+"""
+
+import functools
+import re
+from typing import List, Dict, Optional
+
+# what max_reps_clipboard() copies for each kind of section
+MAX_REPS = {'pair': '8 8 8, 8 8 8', 'triplet': '12 12 12, 30 30 30, 12 12 12'}
+
+# the kind of a section is named in its title, the part of the header before the ':' ('Core Triplet')
+KIND_PATTERN = re.compile(r'\b({})s?\b'.format('|'.join(MAX_REPS)), re.IGNORECASE)
+# '5-8 reps', '10-30 seconds each side'
+RANGE_PATTERN = re.compile(r'(\d+)\s*-\s*(\d+)\s*([^\W\d]*)')
+PROGRAM_CACHE_SIZE = 64
+
+
+class Exercise:
+    """
+    one subset of a section, e.g. '1- Pull-ups, 5-8 reps': its text, the exercise ('Pull-ups') and its rep range
+    ((5, 8, 'reps'), or None if it doesn't give one)
+    """
+    __slots__ = ('text', 'name', 'rep_range')
+
+    def __init__(self, text: str):
+        self.text = text
+        self.name = exercise_name(text)
+        number, dash, rest = text.partition('-')
+        if not (dash and number.strip().isdigit()):
+            rest = text
+        match = RANGE_PATTERN.search(rest)
+        self.rep_range = None if match is None else (int(match.group(1)), int(match.group(2)), match.group(3))
+
+    def __repr__(self) -> str:
+        return 'Exercise({!r})'.format(self.text)
+
+
+class Section:
+    """
+    a section of a program: its header (without a trailing ':'), its kind ('pair', 'triplet' or None), its exercises
+    and the max reps max_reps_clipboard() copies for it
+    """
+    __slots__ = ('header', 'kind', 'exercises', 'max_reps')
+
+    def __init__(self, header: str, exercises: List[Exercise]):
+        self.header = header
+        self.kind = section_kind(header)
+        self.exercises = exercises
+        self.max_reps = MAX_REPS.get(self.kind)
+
+    def subsets(self) -> List[str]:
+        return [exercise.text for exercise in self.exercises]
+
+    def __repr__(self) -> str:
+        return 'Section({!r}, {!r})'.format(self.header, self.exercises)
+
+
+class Program:
+    """
+    a workout program parsed into its sections, in order. Parsed programs are shared through parse_program(), so
+    they shouldn't be modified: adjusting a program means building a new one from new sections.
+    """
+    __slots__ = ('sections', 'by_header')
+
+    def __init__(self, sections: List[Section]):
+        self.sections = sections
+        self.by_header = {section.header: section for section in sections}
+
+    @classmethod
+    def from_text(cls, text: str) -> 'Program':
+        """
+        parses a program: a section is a one line header naming its kind, followed by its block of subsets
+        """
+        blocks = text.split('\n\n')
+        sections = []
+        for index in range(len(blocks) - 1):
+            header = blocks[index].strip('\n').strip(':')
+            if header and '\n' not in header and section_kind(header) is not None:
+                sections.append(Section(header, [Exercise(subset) for subset in blocks[index + 1].split('\n')
+                                                 if subset]))
+        return cls(sections)
+
+    @classmethod
+    def from_sections(cls, sections: Dict[str, List[str]]) -> 'Program':
+        return cls([Section(header, [Exercise(subset) for subset in subsets]) for header, subsets in sections.items()])
+
+    def headers(self) -> List[str]:
+        return [section.header for section in self.sections]
+
+    def section(self, header: str) -> Optional[Section]:
+        return self.by_header.get(header)
+
+    def to_dict(self) -> Dict[str, List[str]]:
+        """
+        returns the subsets of every section by header, the way program_sections() always has
+        """
+        return {section.header: section.subsets() for section in self.sections}
+
+    def to_text(self) -> str:
+        """
+        returns the program the way it is written to the logger (minus the newline every record starts with), which is
+        the text it was parsed from for any program FitnessLogManager wrote
+        """
+        lines = []
+        for section in self.sections:
+            lines.append(section.header)
+            lines.append('')
+            lines.extend(section.subsets())
+            lines.append('')
+        return '\n'.join(lines)
+
+
+@functools.lru_cache(maxsize=PROGRAM_CACHE_SIZE)
+def parse_program(text: str) -> Program:
+    """
+    returns the program parsed from text, parsing every program revision only once
+    """
+    return Program.from_text(text)
+
+
+def section_kind(header: str) -> Optional[str]:
+    """
+    returns the kind of section a header names ('pair' for 'First Pair: (...)'), or None if it doesn't name one
+    """
+    match = KIND_PATTERN.search(header.split(':')[0])
+    if match is None:
+        return None
+    return match.group(1).lower()
+
+
+def program_sections(current_program: str) -> Dict[str, list[str]]:
+    """
+    helper function for parse_current_program() and the SQLite backend that parses a program into its sections
+    """
+    return parse_program(current_program).to_dict()
+
+
+def parse_adjusted_program(new_program_dict: Dict[str, list[str]]) -> str:
+    """
+    helper function for adjust_program() that turns a dictionary into a str for file writing
+    """
+    return Program.from_sections(new_program_dict).to_text()
+
+
+def program_headers(current_program: str) -> List[str]:
+    """
+    helper function for create_program_header() and program_sections() that returns the section headers of a program
+    """
+    return parse_program(current_program).headers()
+
+
+def max_reps(header: str) -> Optional[str]:
+    """
+    returns the max reps possible as appropriate to the given header
+    """
+    return MAX_REPS.get(section_kind(header))
+
+
+def exercise_name(subset: str) -> str:
+    """
+    returns the exercise of a subset, e.g. 'Pull-ups' for '1- Pull-ups, 5-8 reps'
+    """
+    number, dash, rest = subset.partition('-')
+    if dash and number.strip().isdigit():
+        subset = rest
+    return subset.split(',')[0].strip()
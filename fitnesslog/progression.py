@@ -0,0 +1,205 @@
+"""
+linking every session to the program it was done under, and keeping per-exercise progress up to date
+"""
+
+from typing import List, Dict, Optional, NamedTuple
+
+from .records import PROGRAM, SESSION, parse_rep_line
+from .cache import parse_cache
+from .programs import parse_program
+from .database import logger_history
+
+TREND_WINDOW = 8
+
+
+class ProgramRevision(NamedTuple):
+    """
+    a program as it was written to the logger: where it starts, its section headers and the exercises of each section
+    """
+    start: int
+    headers: List[str]
+    exercises: List[List[str]]
+
+
+class LinkedSession(NamedTuple):
+    """
+    a session and the program revision (its position in ProgressionEngine.programs) it was done under, None if no
+    program came before it. sets holds (exercise, reps of every set) once for every exercise done, with its sets from
+    every section it is in put together, and unmatched counts the groups of reps the program had no exercise for.
+    """
+    start: int
+    date: int
+    program: Optional[int]
+    skipped: bool
+    sets: List[tuple]
+    unmatched: int
+
+
+class ExerciseProgress:
+    """
+    the running totals for one exercise across every session it was done in, whatever program it was part of
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.total_reps = 0
+        self.total_sets = 0
+        self.dates = []  # the date ordinal of every session the exercise was done in
+        self.volumes = []  # the reps done in each of those sessions
+        self.bests = []  # the best set so far, as of each of those sessions
+
+    @property
+    def sessions(self) -> int:
+        return len(self.volumes)
+
+    @property
+    def best_set(self) -> int:
+        return self.bests[-1] if self.bests else 0
+
+    def add(self, date: int, sets: List[int]) -> None:
+        self.total_reps += sum(sets)
+        self.total_sets += len(sets)
+        self.dates.append(date)
+        self.volumes.append(sum(sets))
+        self.bests.append(max([self.best_set] + sets))
+
+    def remove(self, sets: List[int]) -> None:
+        """
+        undoes the last add()
+        """
+        self.total_reps -= sum(sets)
+        self.total_sets -= len(sets)
+        self.dates.pop()
+        self.volumes.pop()
+        self.bests.pop()
+
+    def trend(self, window: int = TREND_WINDOW) -> float:
+        """
+        returns how many reps per session the exercise went up (or down) by, over its last window sessions, as the
+        slope of a least squares line through them
+        """
+        volumes = self.volumes[-window:]
+        count = len(volumes)
+        if count < 2:
+            return 0.0
+        mean_x = (count - 1) / 2
+        mean_y = sum(volumes) / count
+        numerator = sum((x - mean_x) * (y - mean_y) for x, y in enumerate(volumes))
+        denominator = sum((x - mean_x) ** 2 for x in range(count))
+        return numerator / denominator
+
+
+class ProgressionEngine:
+    """
+    goes through the logger once, in order, linking every session to the program revision in force where it was
+    logged, and matching each line of reps to a section and each comma separated group to an exercise of that
+    program. Per-exercise progress is kept up to date as records are added or removed at the end, so logging a session
+    only costs the sets in it. Lines or groups that the program has no section or exercise for are counted under
+    unmatched.
+    """
+
+    def __init__(self):
+        self.programs = []
+        self.sessions = []
+        self.exercises = {}  # name -> ExerciseProgress
+        self.unmatched = 0
+
+    @classmethod
+    def from_records(cls, records) -> 'ProgressionEngine':
+        engine = cls()
+        engine.extend(records)
+        return engine
+
+    def extend(self, records) -> None:
+        for record in records:
+            if record.kind == PROGRAM:
+                program = parse_program(record.text)
+                self.programs.append(ProgramRevision(record.start, program.headers(),
+                                                     [[exercise.name for exercise in section.exercises]
+                                                      for section in program.sections]))
+            elif record.kind == SESSION:
+                self.add_session(record)
+
+    def add_session(self, record) -> None:
+        program = len(self.programs) - 1 if self.programs else None
+        date = record.date.toordinal()
+        done = {}  # name -> reps of every set, an exercise that shows up in several sections counting once
+        unmatched = 0
+        if not record.skipped:
+            exercises = self.programs[program].exercises if program is not None else []
+            for section, line in enumerate(record.reps):
+                for exercise, reps in enumerate(parse_rep_line(line)):
+                    if section >= len(exercises) or exercise >= len(exercises[section]) or not reps:
+                        unmatched += 1
+                        continue
+                    done.setdefault(exercises[section][exercise], []).extend(reps)
+        sets = list(done.items())
+        for name, reps in sets:
+            if name not in self.exercises:
+                self.exercises[name] = ExerciseProgress(name)
+            self.exercises[name].add(date, reps)
+        self.unmatched += unmatched
+        self.sessions.append(LinkedSession(record.start, date, program, record.skipped, sets, unmatched))
+
+    def truncate(self, removed: list) -> None:
+        """
+        undoes the records deleted from the end of the logger, newest first
+        """
+        offset = removed[0].start
+        while self.sessions or self.programs:
+            session_start = self.sessions[-1].start if self.sessions else -1
+            program_start = self.programs[-1].start if self.programs else -1
+            if max(session_start, program_start) < offset:
+                break
+            if session_start > program_start:
+                session = self.sessions.pop()
+                self.unmatched -= session.unmatched
+                for name, reps in reversed(session.sets):
+                    exercise = self.exercises[name]
+                    exercise.remove(reps)
+                    if not exercise.sessions:
+                        del self.exercises[name]
+            else:
+                self.programs.pop()
+
+    def program_of(self, session: LinkedSession) -> Optional[ProgramRevision]:
+        return None if session.program is None else self.programs[session.program]
+
+    def current_exercises(self) -> List[str]:
+        """
+        returns the exercises of the current program, in program order
+        """
+        if not self.programs:
+            return []
+        return [name for names in self.programs[-1].exercises for name in names]
+
+    def report(self, names: Optional[List[str]] = None) -> Dict[str, dict]:
+        """
+        returns the best set, total reps, sessions and trend of the given exercises (all of them by default)
+        """
+        if names is None:
+            names = list(self.exercises)
+        report = {}
+        for name in names:
+            exercise = self.exercises.get(name)
+            if exercise is None:
+                report[name] = {'best_set': 0, 'total_reps': 0, 'sessions': 0, 'trend': 0.0}
+            else:
+                report[name] = {'best_set': exercise.best_set, 'total_reps': exercise.total_reps,
+                                'sessions': exercise.sessions, 'trend': exercise.trend()}
+        return report
+
+
+def load_progression(filename: str) -> ProgressionEngine:
+    """
+    returns the progression engine of the logger, going through the logger only if it isn't already cached
+    """
+    return parse_cache.get(filename, 'progression', build_progression)
+
+
+def build_progression(filename: str) -> ProgressionEngine:
+    """
+    helper function for load_progression() that builds the engine from the whole history of the .txt (segments
+    included) or SQLite logger
+    """
+    return ProgressionEngine.from_records(logger_history(filename))
@@ -0,0 +1,287 @@
+"""
+reading the logger: splitting it into records on "---" and telling programs and sessions apart
+"""
+
+import datetime
+import locale
+import os
+import re
+from typing import List, Optional, Iterator, Tuple, NamedTuple, Union
+
+LOG_ENCODING = locale.getpreferredencoding(False)
+SEPARATOR = b'---'
+CHUNK_SIZE = 64 * 1024
+
+PROGRAM = 'program'
+SESSION = 'session'
+UNDATED = 'undated'
+OTHER = 'other'
+
+DAYS_OF_WEEK = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+
+# a session starts with the weekday of its header ('Tuesday 29/12/2020'), a program has 'First Pair' within its first 33
+# characters. The date is read separately, so a session with a mistyped date is still a session.
+WEEKDAYS = tuple(DAYS_OF_WEEK)
+PROGRAM_FILTER = 'First Pair'
+HEADER_LENGTH = 33
+DATE_PATTERN = re.compile(r'\s*(?:{})[ \t]+(\d{{1,2}})/(\d{{1,2}})/(\d{{4}})'.format('|'.join(DAYS_OF_WEEK)))
+REPS_PATTERN = re.compile(r'[\d\s,]*\d[\d\s,]*')
+
+
+def read(filename: str) -> str:
+    """
+    reads the file specified and returns it as a str
+    """
+    try:
+        file_handle = open(filename)
+        lines = file_handle.read()
+        file_handle.close()
+        return lines
+    except FileNotFoundError:
+        print("File couldn't be found.")
+
+
+def parse_date(wanted_date: str) -> datetime.date:
+    """
+    helper function for create_header() that takes a user inputted date in the form of dd/mm/yyyy and turns it into a
+    date instance
+    """
+    date_elements = wanted_date.split("/")
+    formatted_date = datetime.date(int(date_elements[2]), int(date_elements[1]), int(date_elements[0]))
+    return formatted_date
+
+
+def decode_record(raw: bytes) -> str:
+    """
+    turns the raw bytes of a record into the same str a text mode read() would have given
+    """
+    return raw.decode(LOG_ENCODING).replace('\r\n', '\n')
+
+
+def encode_record(text: str) -> bytes:
+    """
+    turns text into the bytes a text mode write() would have put in the logger
+    """
+    return text.replace('\n', os.linesep).encode(LOG_ENCODING)
+
+
+def scan_records(filename: str, offset: int = 0) -> Iterator[Tuple[int, int, bytes]]:
+    """
+    reads the logger in chunks starting at offset and yields (start, end, raw bytes) for every '---' separated
+    record. The last record yielded is whatever follows the last '---' and runs to the end of the file.
+    """
+    file_handle = open(filename, 'rb')
+    try:
+        file_handle.seek(offset)
+        buffer = b''
+        buffer_offset = offset
+        chunk = file_handle.read(CHUNK_SIZE)
+        while chunk:
+            buffer += chunk
+            start = 0
+            position = buffer.find(SEPARATOR)
+            while position != -1:
+                yield buffer_offset + start, buffer_offset + position, buffer[start:position]
+                start = position + len(SEPARATOR)
+                position = buffer.find(SEPARATOR, start)
+            # only the unfinished record is carried over to the next chunk
+            buffer = buffer[start:]
+            buffer_offset += start
+            chunk = file_handle.read(CHUNK_SIZE)
+        yield buffer_offset, buffer_offset + len(buffer), buffer
+    finally:
+        file_handle.close()
+
+
+class ProgramRecord(NamedTuple):
+    """
+    a workout program in the logger
+    """
+    start: int
+    end: int
+    text: str
+
+    kind = PROGRAM
+
+
+class SessionRecord(NamedTuple):
+    """
+    a logged session: its header ('Tuesday 29/12/2020'), the date it was done on, the comment (if any) and one line of
+    reps per section of the program
+    """
+    start: int
+    end: int
+    text: str
+    header: str
+    date: datetime.date
+    comment: Optional[str]
+    reps: List[str]
+
+    kind = SESSION
+
+    @property
+    def lines(self) -> List[str]:
+        """
+        every line under the header, the way parse_logger() has always stored sessions
+        """
+        if self.comment is None:
+            return list(self.reps)
+        return [self.comment] + self.reps
+
+    @property
+    def skipped(self) -> bool:
+        return self.comment == "(SKIPPED)"
+
+
+class UndatedRecord(NamedTuple):
+    """
+    a session whose header names a weekday but no date that exists ('Monday 31/02/2024', 'Monday'). It is one of the
+    sessions parse_logger() returns, like it always was, but everything that goes by date leaves it out.
+    """
+    start: int
+    end: int
+    text: str
+    header: str
+    lines: List[str]
+
+    kind = UNDATED
+
+
+class OtherRecord(NamedTuple):
+    """
+    anything in the logger that is neither a program nor a session
+    """
+    start: int
+    end: int
+    text: str
+
+    kind = OTHER
+
+
+Record = Union[ProgramRecord, SessionRecord, UndatedRecord, OtherRecord]
+
+
+def record_kind(text: str) -> str:
+    """
+    helper function for make_record() and parse_logger() that tells a session (dated or not), a program and anything
+    else apart by the start of the record
+    """
+    head = text[:HEADER_LENGTH]
+    if head.lstrip().startswith(WEEKDAYS):
+        return SESSION
+    if PROGRAM_FILTER in head:
+        return PROGRAM
+    return OTHER
+
+
+def make_record(start: int, end: int, raw: bytes) -> Record:
+    """
+    helper function for iter_records() that turns the raw bytes of one record into the appropriate record object
+    """
+    text = raw.decode(LOG_ENCODING)
+    if '\r' in text:
+        text = text.replace('\r\n', '\n')
+    kind = record_kind(text)
+    if kind == OTHER:
+        return OtherRecord(start, end, text)
+    if kind == PROGRAM:
+        return ProgramRecord(start, end, text)
+
+    lines = [line for line in text.split('\n') if line]
+    header = lines[0]
+    body = lines[1:]
+    date = None
+    date_match = DATE_PATTERN.match(text)
+    if date_match is not None:
+        day, month, year = date_match.groups()
+        try:
+            date = datetime.date(int(year), int(month), int(day))
+        except ValueError:
+            pass
+    if date is None:
+        return UndatedRecord(start, end, text, header, body)
+    comment = None
+    if body and REPS_PATTERN.fullmatch(body[0]) is None:
+        comment = body.pop(0)
+    return SessionRecord(start, end, text, header, date, comment, body)
+
+
+def iter_records(filename: str, offset: int = 0) -> Iterator[Record]:
+    """
+    goes through the logger once, a chunk at a time, and yields every (non-empty) record in it as a ProgramRecord,
+    SessionRecord, UndatedRecord or OtherRecord
+    """
+    for start, end, raw in scan_records(filename, offset):
+        if raw:
+            yield make_record(start, end, raw)
+
+
+def file_signature(filename: str) -> List[int]:
+    """
+    returns the inode, size and modification time of the file, which tell us if it was edited behind our back
+    """
+    stat = os.stat(filename)
+    return [stat.st_ino, stat.st_size, stat.st_mtime_ns]
+
+
+def tail_records(filename: str, entries: int) -> List[Tuple[int, int, bytes]]:
+    """
+    reads the logger backwards from the end in blocks until it finds the last few (non-empty) records, and returns
+    them oldest first as (start, end, raw bytes). Only the blocks holding those records are ever read.
+    """
+    records = []
+    if entries <= 0:
+        return records
+
+    file_handle = open(filename, 'rb')
+    try:
+        file_handle.seek(0, os.SEEK_END)
+        position = file_handle.tell()
+        end = position
+        buffer = b''  # always holds the bytes between position and end
+        while len(records) < entries:
+            separator = buffer.rfind(SEPARATOR)
+            if separator == -1:
+                if position == 0:
+                    # reached the first record of the file
+                    if buffer:
+                        records.append((0, end, buffer))
+                    break
+                block_start = max(0, position - CHUNK_SIZE)
+                file_handle.seek(block_start)
+                buffer = file_handle.read(position - block_start) + buffer
+                position = block_start
+                continue
+
+            start = position + separator + len(SEPARATOR)
+            if start < end:
+                records.append((start, end, buffer[separator + len(SEPARATOR):]))
+            buffer = buffer[:separator]
+            end = position + separator
+    finally:
+        file_handle.close()
+
+    records.reverse()
+    return records
+
+
+def parse_rep_line(line: str) -> List[List[int]]:
+    """
+    splits a line of reps such as '12 12 12, 30 30 30, 12 12 12' into its exercises and sets
+    """
+    return [[int(token) for token in group.split() if token.isdigit()] for group in line.split(',')]
+
+
+def read_spans(filename: str, spans: List[Tuple[int, int]]) -> List[Record]:
+    """
+    seeks to each (start, end) span of the logger and returns the records there, without reading anything else
+    """
+    records = []
+    file_handle = open(filename, 'rb')
+    try:
+        for start, end in spans:
+            file_handle.seek(start)
+            records.append(make_record(start, end, file_handle.read(end - start)))
+    finally:
+        file_handle.close()
+    return records
@@ -0,0 +1,276 @@
+"""
+the history of the program: every revision of it, with the sections revisions have in common stored only once
+
+Every program in the logger (rotated segments included) is a revision, numbered from 1 the way exports number them.
+Sections are kept in a table by the hash of their text, so a section that went unchanged through many adjustments is
+held (and parsed) once, and a revision is just the tuple of the hashes of its sections: any revision is one lookup
+away, and comparing two revisions only looks inside the sections whose hashes differ. Sections are matched up by
+header and by which section with that header they are, so a program with two sections of the same name keeps both.
+delta() is what a revision changed from the one before it.
+
+The logger itself still holds every revision in full, so it reads the same as ever. The table for the revisions in
+segments is stored beside the logger ('my_fitness_logs.txt.programs'), so the history only has to decompress the
+segments again after a rotation, and otherwise reads just the programs of the hot file.
+"""
+
+import json
+import os
+from typing import List, Dict, Optional, Tuple, NamedTuple
+
+from .records import PROGRAM, read_spans
+from .cache import parse_cache
+from .programs import Program, Section, Exercise, parse_program
+from .index import RECORD_START, RECORD_END, RECORD_KIND, load_index
+from .segments import load_manifest, carried_records, segment_records
+from .database import is_database, database_programs
+from .rollups import segment_files
+from .sidecars import PROGRAMS_SUFFIX
+
+DIGEST_SIZE = 8
+PROGRAMS_VERSION = 1
+
+ADDED = 'added'
+REMOVED = 'removed'
+CHANGED = 'changed'
+
+
+class SectionChange(NamedTuple):
+    """
+    how a section differs between two revisions: added, removed or changed, with the subsets taken out and put in
+    (both empty if the subsets were only reordered)
+    """
+    header: str
+    change: str
+    removed: List[str]
+    added: List[str]
+
+
+def section_digest(section: Section) -> str:
+    """
+    returns the hash of a section's header and subsets, the same for any two sections that read the same
+    """
+    import hashlib  # only needed once revisions are compared, and slow to import
+
+    text = '\n'.join([section.header] + section.subsets())
+    return hashlib.blake2b(text.encode('utf-8'), digest_size=DIGEST_SIZE).hexdigest()
+
+
+def keyed_sections(sections: List[Tuple[str, Section]]) -> Dict[Tuple[str, int], Tuple[str, Section]]:
+    """
+    helper function for diff_programs() and ProgramHistory.sections_of() that keys (digest, section) pairs by
+    (header, how many sections with that header came before), so sections sharing a header are told apart
+    """
+    keyed = {}
+    for digest, section in sections:
+        ordinal = 0
+        while (section.header, ordinal) in keyed:
+            ordinal += 1
+        keyed[section.header, ordinal] = (digest, section)
+    return keyed
+
+
+def diff_sections(old: Dict[Tuple[str, int], Tuple[str, Section]],
+                  new: Dict[Tuple[str, int], Tuple[str, Section]]) -> List[SectionChange]:
+    """
+    helper function for diff_programs() and ProgramHistory.diff() that compares two programs given as
+    (header, ordinal) -> (digest, section), only looking at the subsets of sections whose digests differ
+    """
+    changes = []
+    for key, (digest, section) in old.items():
+        if key not in new:
+            changes.append(SectionChange(section.header, REMOVED, section.subsets(), []))
+    for key, (digest, section) in new.items():
+        if key not in old:
+            changes.append(SectionChange(section.header, ADDED, [], section.subsets()))
+        elif digest != old[key][0]:
+            old_subsets = old[key][1].subsets()
+            new_subsets = section.subsets()
+            removed = [subset for subset in old_subsets if subset not in new_subsets]
+            added = [subset for subset in new_subsets if subset not in old_subsets]
+            changes.append(SectionChange(section.header, CHANGED, removed, added))
+    return changes
+
+
+def diff_programs(old: Optional[Program], new: Program) -> List[SectionChange]:
+    """
+    returns how the sections of new differ from those of old (every section of new is added if old is None)
+    """
+    sections = {}
+    for name, program in ('old', old), ('new', new):
+        sections[name] = {} if program is None else keyed_sections([(section_digest(section), section)
+                                                                    for section in program.sections])
+    return diff_sections(sections['old'], sections['new'])
+
+
+def format_changes(changes: List[SectionChange]) -> str:
+    """
+    returns the changes as printed by 'programs --diff', one line per section with its subsets under it
+    """
+    if not changes:
+        return "No changes."
+    marks = {ADDED: '+', REMOVED: '-', CHANGED: '~'}
+    lines = []
+    for change in changes:
+        lines.append('{} {}'.format(marks[change.change], change.header))
+        lines.extend('    - {}'.format(subset) for subset in change.removed)
+        lines.extend('    + {}'.format(subset) for subset in change.added)
+        if change.change == CHANGED and not change.removed and not change.added:
+            lines.append('    (subsets reordered)')
+    return '\n'.join(lines)
+
+
+class ProgramHistory:
+    """
+    every revision of the program, oldest first. sections maps the digest of every section ever used to the section,
+    revisions holds the digests of the sections of each revision and starts where each revision is in the logger.
+    The first archived revisions come from segments and are never truncated.
+    """
+
+    def __init__(self):
+        self.sections = {}
+        self.revisions = []
+        self.starts = []
+        self.archived = 0
+
+    @classmethod
+    def from_records(cls, records) -> 'ProgramHistory':
+        history = cls()
+        history.extend(records)
+        return history
+
+    def extend(self, records) -> None:
+        for record in records:
+            if record.kind != PROGRAM:
+                continue
+            digests = []
+            for section in parse_program(record.text).sections:
+                digest = section_digest(section)
+                # an unchanged section is shared with the revisions before, whichever one it was parsed from
+                self.sections.setdefault(digest, section)
+                digests.append(digest)
+            self.revisions.append(tuple(digests))
+            self.starts.append(record.start)
+
+    def truncate(self, removed: list) -> None:
+        """
+        drops the revisions among the given records, which were deleted from the end of the logger. Their sections
+        stay in the table, where they are shared again if the same program is written back.
+        """
+        offset = removed[0].start
+        while len(self.revisions) > self.archived and self.starts[-1] >= offset:
+            self.revisions.pop()
+            self.starts.pop()
+
+    def __len__(self) -> int:
+        return len(self.revisions)
+
+    def position(self, number: int) -> int:
+        """
+        returns where revision number (1 for the first, or -1 for the latest) is in revisions
+        """
+        if number > 0 and number <= len(self.revisions):
+            return number - 1
+        if number < 0 and -number <= len(self.revisions):
+            return len(self.revisions) + number
+        raise IndexError("There is no revision {}, there are {} revisions of the program.".format(
+            number, len(self.revisions)))
+
+    def revision(self, number: int) -> Program:
+        """
+        returns revision number (1 for the first, or -1 for the latest) of the program
+        """
+        return Program([self.sections[digest] for digest in self.revisions[self.position(number)]])
+
+    def sections_of(self, number: int) -> Dict[Tuple[str, int], Tuple[str, Section]]:
+        return keyed_sections([(digest, self.sections[digest]) for digest in self.revisions[self.position(number)]])
+
+    def diff(self, old: int, new: int) -> List[SectionChange]:
+        """
+        returns how revision new differs from revision old
+        """
+        if self.revisions[self.position(old)] == self.revisions[self.position(new)]:
+            return []
+        return diff_sections(self.sections_of(old), self.sections_of(new))
+
+    def delta(self, number: int) -> List[SectionChange]:
+        """
+        returns what revision number changed from the one before it (all of it, for the first revision)
+        """
+        position = self.position(number)
+        if position == 0:
+            return diff_sections({}, self.sections_of(number))
+        return self.diff(position, position + 1)
+
+
+def programs_path(filename: str) -> str:
+    return filename + PROGRAMS_SUFFIX
+
+
+def read_archived_programs(filename: str, history: ProgramHistory) -> bool:
+    """
+    helper function for build_program_history() that fills history with the revisions in segments as they were stored
+    beside the logger. Returns False, leaving history as it was, if none were stored for the segments there are now.
+    """
+    try:
+        file_handle = open(programs_path(filename))
+        try:
+            stored = json.load(file_handle)
+        finally:
+            file_handle.close()
+    except (OSError, ValueError):
+        return False
+    if not isinstance(stored, dict) or stored.get('version') != PROGRAMS_VERSION or \
+            stored['segments'] != segment_files(filename):
+        return False
+    for digest, (header, subsets) in stored['sections'].items():
+        history.sections[digest] = Section(header, [Exercise(subset) for subset in subsets])
+    history.revisions = [tuple(digests) for digests in stored['revisions']]
+    history.starts = stored['starts']
+    history.archived = len(history.revisions)
+    return True
+
+
+def write_archived_programs(filename: str, history: ProgramHistory) -> None:
+    """
+    helper function for build_program_history() that stores the revisions in segments (and only their sections)
+    beside the logger, replacing what was stored in one go
+    """
+    revisions = history.revisions[:history.archived]
+    digests = {digest for revision in revisions for digest in revision}
+    stored = {'version': PROGRAMS_VERSION, 'segments': segment_files(filename),
+              'sections': {digest: [section.header, section.subsets()]
+                           for digest, section in history.sections.items() if digest in digests},
+              'revisions': revisions, 'starts': history.starts[:history.archived]}
+    temp_path = programs_path(filename) + '.tmp'
+    file_handle = open(temp_path, 'w')
+    file_handle.write(json.dumps(stored, separators=(',', ':')))
+    file_handle.close()
+    os.replace(temp_path, programs_path(filename))
+
+
+def build_program_history(filename: str) -> ProgramHistory:
+    """
+    helper function for load_program_history() that reads every program in the logger, and nothing else: the ones
+    in segments (from the table stored beside the logger, unless the segments changed since), then the ones the
+    index points to
+    """
+    if is_database(filename):
+        return ProgramHistory.from_records(database_programs(filename))
+    history = ProgramHistory()
+    manifest = load_manifest(filename)
+    if manifest is not None and not read_archived_programs(filename, history):
+        for segment in manifest['segments']:
+            history.extend(segment_records(filename, segment))
+        history.archived = len(history)
+        write_archived_programs(filename, history)
+    records = load_index(filename)['records'][carried_records(filename, manifest):]
+    history.extend(read_spans(filename, [(record[RECORD_START], record[RECORD_END]) for record in records
+                                         if record[RECORD_KIND] == PROGRAM]))
+    return history
+
+
+def load_program_history(filename: str) -> ProgramHistory:
+    """
+    returns every revision of the logger's program, reading them only if they aren't already cached
+    """
+    return parse_cache.get(filename, 'program_history', build_program_history)
@@ -0,0 +1,442 @@
+"""
+weekly and monthly rollups of the logger, kept beside it so charts over years of sessions never read a session
+
+Every ISO week ('2020-W53') and every month ('2020-12') with sessions in it has a Rollup: how many sessions were done
+and how many skipped, the total reps under every section header (the headers of the program the session was logged
+under, as create_program_header() gives them) and the best set. They are stored beside the logger as '.rollups' and
+kept up to date in the parse cache like everything else: an append only adds its own sessions, and deleting entries
+only recomputes the weeks and months the deleted sessions were in, from the sessions the date index finds for them.
+The sessions in segments are rolled up on their own, once, since nothing ever changes them.
+"""
+
+import bisect
+import datetime
+import json
+import mmap
+import os
+from typing import List, Dict, Optional, Tuple
+
+from .records import PROGRAM, SESSION, iter_records, read_spans, file_signature
+from .cache import parse_cache
+from .programs import parse_program
+from .index import RECORD_START, load_index, prefix_check
+from .dates import load_date_index
+from .segments import load_manifest, segment_records
+from .database import is_database, database_records
+from .sidecars import ROLLUP_SUFFIX
+
+ROLLUP_VERSION = 1
+
+WEEK = 'week'
+MONTH = 'month'
+PERIODS = (WEEK, MONTH)
+
+CHART_METRICS = ('reps', 'sessions', 'skipped', 'best')
+CHART_WIDTH = 50
+
+
+def rollup_path(filename: str) -> str:
+    return filename + ROLLUP_SUFFIX
+
+
+def period_key(date: datetime.date, period: str) -> str:
+    """
+    returns the ISO week ('2020-W53') or the month ('2020-12') the date is in
+    """
+    if period == WEEK:
+        year, week, weekday = date.isocalendar()
+        return '{}-W{:02d}'.format(year, week)
+    return '{}-{:02d}'.format(date.year, date.month)
+
+
+def period_range(key: str, period: str) -> Tuple[datetime.date, datetime.date]:
+    """
+    returns the first and the last day of a week or month given by its key
+    """
+    if period == WEEK:
+        year, week = key.split('-W')
+        first = datetime.date.fromisocalendar(int(year), int(week), 1)
+        return first, first + datetime.timedelta(days=6)
+    year, month = (int(part) for part in key.split('-'))
+    following = datetime.date(year + month // 12, month % 12 + 1, 1)
+    return datetime.date(year, month, 1), following - datetime.timedelta(days=1)
+
+
+def period_keys(first: str, last: str, period: str) -> List[str]:
+    """
+    returns the keys of every week or month from first to last (both included), with or without sessions
+    """
+    keys = []
+    date = period_range(first, period)[0]
+    while True:
+        key = period_key(date, period)
+        keys.append(key)
+        if key >= last:
+            return keys
+        date = period_range(key, period)[1] + datetime.timedelta(days=1)
+
+
+class Rollup:
+    """
+    what was done in one week or month: the sessions done and skipped, the reps under every section header and the
+    best set. Lines of reps the program has no section for aren't counted.
+    """
+    __slots__ = ('sessions', 'skipped', 'best_set', 'reps')
+
+    def __init__(self, sessions: int = 0, skipped: int = 0, best_set: int = 0, reps: Optional[Dict[str, int]] = None):
+        self.sessions = sessions
+        self.skipped = skipped
+        self.best_set = best_set
+        self.reps = {} if reps is None else reps
+
+    def add(self, skipped: bool, totals: List[Tuple[str, int]], best_set: int) -> None:
+        """
+        adds a session, given as session_totals() returns it
+        """
+        if skipped:
+            self.skipped += 1
+            return
+        self.sessions += 1
+        for header, total in totals:
+            self.reps[header] = self.reps.get(header, 0) + total
+        self.best_set = max(self.best_set, best_set)
+
+    def merged(self, other: 'Rollup') -> 'Rollup':
+        """
+        returns the rollup of the sessions of both (the same week in a segment and in the logger, after a rotation)
+        """
+        reps = dict(self.reps)
+        for header, total in other.reps.items():
+            reps[header] = reps.get(header, 0) + total
+        return Rollup(self.sessions + other.sessions, self.skipped + other.skipped,
+                      max(self.best_set, other.best_set), reps)
+
+    def total_reps(self, section: Optional[str] = None) -> int:
+        """
+        returns the reps of every section, or only of the sections whose headers have section in them
+        """
+        if section is None:
+            return sum(self.reps.values())
+        section = section.lower()
+        return sum(total for header, total in self.reps.items() if section in header.lower())
+
+    def value(self, metric: str, section: Optional[str] = None) -> int:
+        """
+        returns one of CHART_METRICS
+        """
+        if metric == 'reps':
+            return self.total_reps(section)
+        if metric == 'sessions':
+            return self.sessions
+        if metric == 'skipped':
+            return self.skipped
+        return self.best_set
+
+    def to_json(self, numbers: Dict[str, int]) -> list:
+        """
+        returns the rollup as stored, with every header replaced by its number in numbers (adding it if it's new)
+        """
+        return [self.sessions, self.skipped, self.best_set,
+                [[numbers.setdefault(header, len(numbers)), total] for header, total in self.reps.items()]]
+
+    @classmethod
+    def from_json(cls, stored: list, headers: List[str]) -> 'Rollup':
+        sessions, skipped, best_set, reps = stored
+        return cls(sessions, skipped, best_set, {headers[number]: total for number, total in reps})
+
+    def __repr__(self) -> str:
+        return 'Rollup({!r}, {!r}, {!r}, {!r})'.format(self.sessions, self.skipped, self.best_set, self.reps)
+
+
+def session_totals(headers: List[str], record) -> Tuple[List[Tuple[str, int]], int]:
+    """
+    returns the reps of a session done under a program with the given section headers, as (header, reps) for every
+    section it has reps for, and its best set
+    """
+    totals = []
+    best_set = 0
+    if record.skipped:
+        return totals, best_set
+    for header, line in zip(headers, record.reps):
+        # the exercises of a line don't matter here, only its sets
+        sets = [int(token) for token in line.replace(',', ' ').split() if token.isdigit()]
+        if sets:
+            totals.append((header, sum(sets)))
+            best_set = max(best_set, max(sets))
+    return totals, best_set
+
+
+def add_session(rollups: Dict[str, Dict[str, Rollup]], headers: List[str], record,
+                skip: Optional[Dict[str, set]] = None) -> None:
+    """
+    helper function for RollupTables that adds a session to the week and the month it was done in, unless they are in
+    skip
+    """
+    totals, best_set = session_totals(headers, record)
+    for period in PERIODS:
+        key = period_key(record.date, period)
+        if skip is not None and key in skip[period]:
+            continue
+        rollup = rollups[period].get(key)
+        if rollup is None:
+            rollup = rollups[period][key] = Rollup()
+        rollup.add(record.skipped, totals, best_set)
+
+
+class RollupTables:
+    """
+    the weekly and monthly rollups of a logger. live holds period -> key -> Rollup for the sessions in the logger
+    itself and archived the same for the sessions in its segments. starts and programs are where every program of the
+    logger starts and its section headers, to tell which headers the reps of a session count under. The weeks and
+    months that lost sessions to a truncate are in dirty until recompute() rolls them up again.
+    """
+
+    def __init__(self):
+        self.live = {period: {} for period in PERIODS}
+        self.archived = {period: {} for period in PERIODS}
+        self.archived_headers = []  # the headers of the last program in the segments
+        self.starts = []
+        self.programs = []
+        self.dirty = {period: set() for period in PERIODS}
+        self.signature = None  # the signature of the logger when the rollups were last stored beside it
+
+    def headers_at(self, start: int) -> List[str]:
+        """
+        returns the section headers of the program in force at the given offset of the logger
+        """
+        position = bisect.bisect_right(self.starts, start)
+        return self.programs[position - 1] if position else self.archived_headers
+
+    def archive(self, records) -> None:
+        """
+        adds the records of a segment, which are never truncated
+        """
+        for record in records:
+            if record.kind == PROGRAM:
+                self.archived_headers = parse_program(record.text).headers()
+            elif record.kind == SESSION:
+                add_session(self.archived, self.archived_headers, record)
+
+    def extend(self, records) -> None:
+        for record in records:
+            if record.kind == PROGRAM:
+                self.starts.append(record.start)
+                self.programs.append(parse_program(record.text).headers())
+            elif record.kind == SESSION:
+                # a dirty week or month is rolled up again from the logger, this session included
+                add_session(self.live, self.headers_at(record.start), record, self.dirty)
+
+    def truncate(self, removed: list) -> None:
+        """
+        drops the weeks and months of the sessions among the given records, which were deleted from the end of the
+        logger, until recompute() rolls up the sessions they have left
+        """
+        for record in removed:
+            if record.kind == SESSION and record.date is not None:
+                for period in PERIODS:
+                    key = period_key(record.date, period)
+                    self.live[period].pop(key, None)
+                    self.dirty[period].add(key)
+        position = bisect.bisect_left(self.starts, removed[0].start)
+        del self.starts[position:]
+        del self.programs[position:]
+
+    def recompute(self, filename: str) -> None:
+        """
+        rolls up the dirty weeks and months again, reading only the sessions the date index has for them
+        """
+        if not any(self.dirty.values()):
+            return
+        date_index = load_date_index(filename)
+        for period in PERIODS:
+            for key in self.dirty[period]:
+                rollup = Rollup()
+                for record in read_spans(filename, date_index.between(*period_range(key, period))):
+                    rollup.add(record.skipped, *session_totals(self.headers_at(record.start), record))
+                if rollup.sessions or rollup.skipped:
+                    self.live[period][key] = rollup
+            self.dirty[period] = set()
+
+    def rollups(self, period: str) -> Dict[str, Rollup]:
+        """
+        returns the rollup of every week or month with sessions in it, segments included, oldest first
+        """
+        merged = dict(self.archived[period])
+        for key, rollup in self.live[period].items():
+            merged[key] = merged[key].merged(rollup) if key in merged else rollup
+        return dict(sorted(merged.items()))
+
+    def to_json(self) -> dict:
+        """
+        returns the rollups as stored, with the headers (long, and the same in most rollups) kept once in 'headers'
+        and referred to by their number everywhere else
+        """
+        numbers = {}
+        stored = {}
+        for name in 'live', 'archived':
+            tables = getattr(self, name)
+            stored[name] = {period: {key: rollup.to_json(numbers) for key, rollup in tables[period].items()}
+                            for period in PERIODS}
+        stored['archived_headers'] = [numbers.setdefault(header, len(numbers)) for header in self.archived_headers]
+        stored['programs'] = [[numbers.setdefault(header, len(numbers)) for header in headers]
+                              for headers in self.programs]
+        stored['starts'] = self.starts
+        stored['headers'] = list(numbers)
+        return stored
+
+    @classmethod
+    def from_json(cls, stored: dict) -> 'RollupTables':
+        tables = cls()
+        headers = stored['headers']
+        for name in 'live', 'archived':
+            for period in PERIODS:
+                getattr(tables, name)[period] = {key: Rollup.from_json(values, headers)
+                                                 for key, values in stored[name][period].items()}
+        tables.archived_headers = [headers[number] for number in stored['archived_headers']]
+        tables.starts = stored['starts']
+        tables.programs = [[headers[number] for number in numbers] for numbers in stored['programs']]
+        return tables
+
+
+def build_rollups(filename: str) -> RollupTables:
+    """
+    helper function for load_stored_rollups() that rolls up the whole history of the logger, segments included
+    """
+    tables = RollupTables()
+    if is_database(filename):
+        tables.extend(database_records(filename))
+        return tables
+    manifest = load_manifest(filename)
+    if manifest is not None:
+        for segment in manifest['segments']:
+            tables.archive(segment_records(filename, segment))
+    tables.extend(iter_records(filename))
+    return tables
+
+
+def logger_check(filename: str, index: dict, size: int) -> int:
+    """
+    returns the checksum of the first size bytes of the logger, which the index already has if size is its tail
+    """
+    if size == index['tail'] and index['check'] is not None:
+        return index['check']
+    if size == 0:
+        return 0
+    file_handle = open(filename, 'rb')
+    try:
+        view = mmap.mmap(file_handle.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            return prefix_check(view, size)
+        finally:
+            view.close()
+    finally:
+        file_handle.close()
+
+
+def segment_files(filename: str) -> List[str]:
+    manifest = load_manifest(filename)
+    return [] if manifest is None else [segment['file'] for segment in manifest['segments']]
+
+
+def read_rollups(filename: str) -> Optional[dict]:
+    """
+    returns the rollups as they were stored beside the logger, or None if there are none
+    """
+    try:
+        file_handle = open(rollup_path(filename))
+        try:
+            stored = json.load(file_handle)
+        finally:
+            file_handle.close()
+    except (OSError, ValueError):
+        return None
+    if not isinstance(stored, dict) or stored.get('version') != ROLLUP_VERSION:
+        return None
+    return stored
+
+
+def write_rollups(filename: str, tables: RollupTables) -> None:
+    """
+    stores the rollups beside the logger with where they are up to, replacing the old ones in one go. If the logger
+    ends in an unfinished record nothing says where they are up to, and they are rolled up again if it changes.
+    """
+    signature = file_signature(filename)
+    index = load_index(filename)
+    records = index['records']
+    finished = not records or records[-1][RECORD_START] < index['tail']
+    stored = tables.to_json()
+    stored.update({'version': ROLLUP_VERSION, 'signature': signature, 'tail': index['tail'],
+                   'check': logger_check(filename, index, index['tail']) if finished else None,
+                   'segments': segment_files(filename)})
+    temp_path = rollup_path(filename) + '.tmp'
+    file_handle = open(temp_path, 'w')
+    file_handle.write(json.dumps(stored, separators=(',', ':')))
+    file_handle.close()
+    os.replace(temp_path, rollup_path(filename))
+    tables.signature = signature
+
+
+def load_stored_rollups(filename: str) -> RollupTables:
+    """
+    helper function for load_rollups() that reads the stored rollups and adds only what was appended to the logger
+    since, rolling everything up again if the logger (or its segments) changed in any other way
+    """
+    if is_database(filename):
+        return build_rollups(filename)
+    stored = read_rollups(filename)
+    signature = file_signature(filename)
+    if stored is not None and stored['segments'] == segment_files(filename):
+        tables = RollupTables.from_json(stored)
+        if stored['signature'] == signature:
+            tables.signature = signature
+            return tables
+        tail = stored['tail']
+        if stored['check'] is not None and tail <= signature[1] and \
+                logger_check(filename, load_index(filename), tail) == stored['check']:
+            tables.extend(iter_records(filename, tail))
+            return tables
+    return build_rollups(filename)
+
+
+def load_rollups(filename: str) -> RollupTables:
+    """
+    returns the weekly and monthly rollups of the logger, up to date with it, storing them beside a .txt logger
+    whenever they changed since they were last stored
+    """
+    tables = parse_cache.get(filename, 'rollups', load_stored_rollups)
+    if not is_database(filename):
+        tables.recompute(filename)
+        if tables.signature != file_signature(filename):
+            write_rollups(filename, tables)
+    return tables
+
+
+def update_rollups(filename: str) -> None:
+    """
+    brings the rollups stored beside a .txt logger up to date after it was written to. Nothing is stored for SQLite
+    loggers, their rollups are only built when a chart asks for them.
+    """
+    if not is_database(filename):
+        load_rollups(filename)
+
+
+def format_chart(rollups: Dict[str, Rollup], period: str, metric: str = 'reps', section: Optional[str] = None,
+                 last: Optional[int] = None, width: int = CHART_WIDTH) -> str:
+    """
+    returns a bar chart of one of CHART_METRICS for every week or month up to the latest one with sessions (only the
+    last few if given), the ones without sessions included, one line each
+    """
+    if not rollups:
+        return "Nothing logged yet."
+    keys = list(rollups)
+    keys = period_keys(keys[0], keys[-1], period)
+    if last is not None:
+        keys = keys[max(len(keys) - last, 0):]
+    values = [rollups[key].value(metric, section) if key in rollups else 0 for key in keys]
+    highest = max(values)
+    label_width = max(len(key) for key in keys)
+    lines = []
+    for key, value in zip(keys, values):
+        bar = '#' * (round(value * width / highest) if highest else 0)
+        lines.append('{} |{} {}'.format(key.ljust(label_width), bar.ljust(width), value))
+    return '\n'.join(lines)
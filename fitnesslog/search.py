@@ -0,0 +1,341 @@
+"""
+searching the logger: an inverted index of the words in comments and programs, and a regex scan for anything else
+
+The search index maps every word of a session's comment (so '(SKIPPED)' is 'skipped'), and of every program or other
+entry, to the (start, end) spans of the records it is in. It is kept beside the logger as '.search' (a line of JSON
+saying where every word's spans are, then the spans as raw 64 bit integers, so a query only decodes the words it asks
+for) and caught up with whatever was appended since it was written, so only new records are ever parsed. Regex
+searches go through the logger with mmap instead, never decoding more than the records that match.
+"""
+
+import array
+import json
+import mmap
+import os
+import re
+import sys
+import zlib
+from typing import List, Dict, Optional, Iterable, Tuple, NamedTuple
+
+from .records import LOG_ENCODING, SEPARATOR, SESSION, Record, make_record, iter_records, file_signature, \
+    read_spans
+from .cache import parse_cache
+from .segments import load_manifest, carried_records, segment_records, read_segment
+from .sidecars import SEARCH_SUFFIX
+
+SEARCH_VERSION = 1
+SPAN_TYPE = 'q'
+CHECK_SIZE = 4096
+TOKEN_PATTERN = re.compile(r"[^\W_]+(?:['-][^\W_]+)*")
+SEARCH_LIMIT = 20
+
+
+class SearchResult(NamedTuple):
+    """
+    how many records matched, and the latest few of them (all of them if there was no limit), oldest first
+    """
+    total: int
+    records: List[Record]
+
+
+def search_path(filename: str) -> str:
+    return filename + SEARCH_SUFFIX
+
+
+def text_tokens(text: str) -> set:
+    """
+    returns the words in text, lowercased, with 'pull-ups' also giving 'pull' and 'ups'
+    """
+    tokens = set()
+    for token in TOKEN_PATTERN.findall(text.lower()):
+        tokens.add(token)
+        if '-' in token or "'" in token:
+            tokens.update(part for part in re.split(r"['-]", token) if part)
+    return tokens
+
+
+def record_tokens(record: Record) -> set:
+    """
+    returns the words a record is found by: the comment of a session, the whole text of anything else
+    """
+    if record.kind == SESSION:
+        return set() if record.comment is None else text_tokens(record.comment)
+    return text_tokens(record.text)
+
+
+def tail_check(filename: str, size: int) -> int:
+    """
+    returns a checksum of the last few KB of the logger before size, which tells if what was indexed is still there
+    """
+    file_handle = open(filename, 'rb')
+    try:
+        file_handle.seek(max(0, size - CHECK_SIZE))
+        return zlib.crc32(file_handle.read(min(size, CHECK_SIZE)))
+    finally:
+        file_handle.close()
+
+
+class SearchIndex:
+    """
+    the inverted index of a logger: every word maps to an array of [start, end, start, end, ...] of the records it is
+    in, in file order. Words read from the stored index stay undecoded in stored (word -> (position, length) in data)
+    until they are asked for. tail is where the last record started when the index was last caught up.
+    """
+
+    def __init__(self, tail: int = 0, data: bytes = b'', stored: Optional[Dict[str, List[int]]] = None,
+                 swap: bool = False):
+        self.postings = {}
+        self.tail = tail
+        self.data = data
+        self.stored = {} if stored is None else stored
+        self.swap = swap
+
+    def spans_of(self, token: str) -> Optional[array.array]:
+        spans = self.postings.get(token)
+        if spans is None and token in self.stored:
+            position, length = self.stored.pop(token)
+            spans = array.array(SPAN_TYPE)
+            spans.frombytes(self.data[position:position + length * spans.itemsize])
+            if self.swap:
+                spans.byteswap()
+            self.postings[token] = spans
+        return spans
+
+    def decode_all(self) -> None:
+        for token in list(self.stored):
+            self.spans_of(token)
+        self.data = b''
+
+    def extend(self, records: Iterable[Record]) -> None:
+        """
+        adds records appended to the logger
+        """
+        for record in records:
+            for token in record_tokens(record):
+                spans = self.spans_of(token)
+                if spans is None:
+                    spans = self.postings[token] = array.array(SPAN_TYPE)
+                spans.append(record.start)
+                spans.append(record.end)
+
+    def truncate(self, removed: list) -> None:
+        """
+        drops the given records, which were deleted from the end of the logger
+        """
+        self.drop_from(removed[0].start)
+
+    def drop_from(self, offset: int) -> None:
+        self.decode_all()
+        for token in list(self.postings):
+            spans = self.postings[token]
+            keep = len(spans)
+            while keep and spans[keep - 2] >= offset:
+                keep -= 2
+            if keep == 0:
+                del self.postings[token]
+            else:
+                del spans[keep:]
+
+    def spans(self, tokens: Iterable[str]) -> List[Tuple[int, int]]:
+        """
+        returns the (start, end) of every record holding all of the tokens, in file order
+        """
+        postings = [self.spans_of(token) for token in set(tokens)]
+        if not postings or None in postings:
+            return []
+        postings.sort(key=len)
+        matches = dict(zip(postings[0][0::2], postings[0][1::2]))
+        for spans in postings[1:]:
+            if not matches:
+                break
+            starts = set(spans[0::2])
+            matches = {start: end for start, end in matches.items() if start in starts}
+        return sorted(matches.items())
+
+
+def read_search_index(filename: str) -> Optional[Tuple[dict, bytes]]:
+    """
+    returns the header and the spans of the stored search index, or None if there is none
+    """
+    try:
+        file_handle = open(search_path(filename), 'rb')
+        try:
+            header = json.loads(file_handle.readline())
+            data = file_handle.read()
+        finally:
+            file_handle.close()
+    except (OSError, ValueError):
+        return None
+    if not isinstance(header, dict) or header.get('version') != SEARCH_VERSION:
+        return None
+    return header, data
+
+
+def write_search_index(filename: str, search_index: SearchIndex) -> None:
+    """
+    writes the search index beside the logger, replacing the old one in one go
+    """
+    search_index.decode_all()
+    signature = file_signature(filename)
+    words = {}
+    position = 0
+    for token, spans in search_index.postings.items():
+        words[token] = [position, len(spans)]
+        position += len(spans) * spans.itemsize
+    header = {'version': SEARCH_VERSION, 'signature': signature, 'tail': search_index.tail,
+              'check': tail_check(filename, signature[1]), 'byteorder': sys.byteorder, 'words': words}
+    temp_path = search_path(filename) + '.tmp'
+    file_handle = open(temp_path, 'wb')
+    file_handle.write(json.dumps(header, separators=(',', ':')).encode() + b'\n')
+    for spans in search_index.postings.values():
+        file_handle.write(spans.tobytes())
+    file_handle.close()
+    os.replace(temp_path, search_path(filename))
+
+
+def load_stored_search_index(filename: str) -> SearchIndex:
+    """
+    helper function for load_search_index() that reads the stored index and parses only what was appended to the
+    logger since, rebuilding it if the logger was changed in any other way
+    """
+    stored = read_search_index(filename)
+    signature = file_signature(filename)
+    search_index = SearchIndex()
+    if stored is not None:
+        header, data = stored
+        old_signature = header['signature']
+        if old_signature == signature:
+            return SearchIndex(header['tail'], data, header['words'], header['byteorder'] != sys.byteorder)
+        if old_signature[0] == signature[0] and old_signature[1] <= signature[1] and \
+                tail_check(filename, old_signature[1]) == header['check']:
+            # only appended to since: parse from the last record that might not have been finished
+            search_index = SearchIndex(header['tail'], data, header['words'], header['byteorder'] != sys.byteorder)
+            search_index.drop_from(search_index.tail)
+
+    records = list(iter_records(filename, search_index.tail))
+    if records:
+        search_index.tail = records[-1].start
+    search_index.extend(records)
+    write_search_index(filename, search_index)
+    return search_index
+
+
+def load_search_index(filename: str) -> SearchIndex:
+    """
+    returns the search index of the logger, kept up to date in memory as FitnessLogManager writes to the logger
+    """
+    return parse_cache.get(filename, 'search_index', load_stored_search_index)
+
+
+def search_records(filename: str, query: str, kind: Optional[str] = None,
+                   limit: Optional[int] = None) -> SearchResult:
+    """
+    finds every record (segments included) with all of the words in query in its comment (or its text, for
+    programs). A query in double quotes has to appear as it is, e.g. '"pistol squat"'. Only the latest limit records
+    are read unless the kind or a phrase has to be checked.
+    """
+    phrase = None
+    if len(query) > 1 and query.startswith('"') and query.endswith('"'):
+        query = query[1:-1]
+        phrase = ' '.join(query.lower().split())
+    tokens = text_tokens(query)
+    if not tokens:
+        return SearchResult(0, [])
+
+    def wanted(record: Record) -> bool:
+        if kind is not None and record.kind != kind:
+            return False
+        if phrase is None:
+            return True
+        text = record.comment if record.kind == SESSION else record.text
+        return phrase in ' '.join(text.lower().split())
+
+    archived = []
+    manifest = load_manifest(filename)
+    if manifest is not None:
+        # the segments have no index, they are only scanned when searching
+        for segment in manifest['segments']:
+            archived.extend(record for record in segment_records(filename, segment)
+                            if tokens <= record_tokens(record) and wanted(record))
+    spans = load_search_index(filename).spans(tokens)
+    if carried_records(filename, manifest):
+        # the program copy a rotation carried over is already in the segments
+        spans = [span for span in spans if span[0] != 0]
+
+    if kind is None and phrase is None:
+        total = len(archived) + len(spans)
+        if limit is not None:
+            spans = spans[max(len(spans) - limit, 0):]
+        found = archived + read_spans(filename, spans)
+    else:
+        found = archived + [record for record in read_spans(filename, spans) if wanted(record)]
+        total = len(found)
+    return SearchResult(total, latest(found, limit))
+
+
+def regex_records(filename: str, pattern: str, ignore_case: bool = False, kind: Optional[str] = None,
+                  limit: Optional[int] = None) -> SearchResult:
+    """
+    finds every record (segments included) where the regular expression matches, scanning the logger through mmap
+    so only the records that are returned (or checked for their kind) are ever decoded. The pattern is matched
+    against the raw bytes.
+    """
+    expression = re.compile(pattern.encode(LOG_ENCODING), re.IGNORECASE if ignore_case else 0)
+    archived = []
+    manifest = load_manifest(filename)
+    if manifest is not None:
+        for segment in manifest['segments']:
+            data = read_segment(filename, segment)
+            archived.extend(make_record(start, end, data[start:end]) for start, end in matching_spans(data, expression))
+    if kind is not None:
+        archived = [record for record in archived if record.kind == kind]
+
+    found = []
+    total = len(archived)
+    if os.path.getsize(filename):
+        skip_carried = carried_records(filename, manifest)
+        file_handle = open(filename, 'rb')
+        try:
+            view = mmap.mmap(file_handle.fileno(), 0, access=mmap.ACCESS_READ)
+            try:
+                spans = [span for span in matching_spans(view, expression) if not (skip_carried and span[0] == 0)]
+                if kind is None:
+                    total += len(spans)
+                    if limit is not None:
+                        spans = spans[max(len(spans) - limit, 0):]
+                found = [make_record(start, end, view[start:end]) for start, end in spans]
+            finally:
+                view.close()
+        finally:
+            file_handle.close()
+        if kind is not None:
+            found = [record for record in found if record.kind == kind]
+            total += len(found)
+    return SearchResult(total, latest(archived + found, limit))
+
+
+def latest(records: List[Record], limit: Optional[int]) -> List[Record]:
+    if limit is None:
+        return records
+    return records[max(len(records) - limit, 0):]
+
+
+def matching_spans(data, expression) -> List[Tuple[int, int]]:
+    """
+    helper function for regex_records() that returns the (start, end) of every '---' separated record of data (bytes
+    or an mmap) that the expression matches in
+    """
+    spans = []
+    end = -1
+    for match in expression.finditer(data):
+        if match.start() < end:
+            # another match in the record that was just found
+            continue
+        start = data.rfind(SEPARATOR, 0, match.start())
+        start = 0 if start == -1 else start + len(SEPARATOR)
+        end = data.find(SEPARATOR, max(match.start(), start))
+        if end == -1:
+            end = len(data)
+        if start < end:
+            spans.append((start, end))
+    return spans
@@ -0,0 +1,404 @@
+"""
+segmented loggers: older sessions moved out of my_fitness_logs.txt into compressed per-year segments
+
+rotate_segments() moves every record logged before the sessions of the last keep_days days into
+'my_fitness_logs.txt.segments/<year>.txt.gz' (or .txt.zst), beside a manifest.json holding the date range and counts
+of every segment and the latest program that was moved. The logger itself (the hot file) keeps the recent records,
+starting with a copy of the program that was active when they were logged, so everything that only needs the
+current program or the last few entries never has to open a segment. Queries that reach back further open only the
+segments whose dates they cover, and iter_history() streams the whole history, segments first.
+
+A rotation is committed by the manifest: segments are written (and fsynced, along with their folder) first, then the
+new hot file beside the old one, then the manifest (flagged as rotating), and only then does the new hot file replace
+the old one. read_manifest() finishes
+or undoes a rotation that was cut short.
+"""
+
+import datetime
+import json
+import os
+from collections import OrderedDict
+from typing import List, Dict, Optional, Iterator
+
+from .records import SEPARATOR, PROGRAM, SESSION, CHUNK_SIZE, Record, SessionRecord, encode_record, make_record, \
+    scan_records, iter_records
+from .cache import parse_cache
+from .index import RECORD_START, RECORD_END, RECORD_KIND, RECORD_DATE, load_index, read_record
+from .journal import recover_log
+from .sidecars import SEGMENTS_SUFFIX, ROTATING_SUFFIX
+
+MANIFEST_NAME = 'manifest.json'
+MANIFEST_VERSION = 1
+KEEP_DAYS = 365
+COMPRESSIONS = {'gzip': '.txt.gz', 'zstd': '.txt.zst'}
+SEGMENT_CACHE_SIZE = 4
+
+segment_cache = OrderedDict()  # (path, size, mtime) -> records of a decompressed segment
+
+
+def segments_dir(filename: str) -> str:
+    """
+    returns the folder the segments of the logger are kept in
+    """
+    return filename + SEGMENTS_SUFFIX
+
+
+def load_manifest(filename: str) -> Optional[dict]:
+    """
+    returns the manifest of the logger's segments (None if it has none), read only once for every version of the
+    logger since a rotation always replaces the logger too
+    """
+    return parse_cache.get(filename, 'manifest', read_manifest)
+
+
+def sync_file(path: str) -> None:
+    """
+    fsyncs a file that was written and closed by something that doesn't fsync (like gzip.open())
+    """
+    file_handle = open(path, 'ab')
+    try:
+        os.fsync(file_handle.fileno())
+    finally:
+        file_handle.close()
+
+
+def sync_directory(path: str) -> None:
+    """
+    fsyncs a folder, so the files just created, renamed or replaced in it stay that way after a crash. Folders can't
+    be opened on Windows, which doesn't need this.
+    """
+    if os.name != 'posix':
+        return
+    descriptor = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(descriptor)
+    finally:
+        os.close(descriptor)
+
+
+def write_manifest(filename: str, manifest: dict) -> None:
+    """
+    writes the manifest in one go, so a crash leaves either the old one or the new one
+    """
+    path = os.path.join(segments_dir(filename), MANIFEST_NAME)
+    file_handle = open(path + '.tmp', 'w')
+    file_handle.write(json.dumps(manifest, indent=1))
+    file_handle.flush()
+    os.fsync(file_handle.fileno())
+    file_handle.close()
+    os.replace(path + '.tmp', path)
+    sync_directory(segments_dir(filename))
+
+
+def read_manifest(filename: str) -> Optional[dict]:
+    """
+    returns the manifest of the logger's segments, or None if it has none, first finishing a rotation that was cut
+    short after it was committed, or throwing away one that wasn't
+    """
+    rotating = filename + ROTATING_SUFFIX
+    try:
+        file_handle = open(os.path.join(segments_dir(filename), MANIFEST_NAME))
+        try:
+            manifest = json.load(file_handle)
+        finally:
+            file_handle.close()
+    except (OSError, ValueError):
+        manifest = None
+    if manifest is not None and manifest.get('version') != MANIFEST_VERSION:
+        manifest = None
+
+    if manifest is not None and manifest['rotating']:
+        if os.path.exists(rotating):
+            os.replace(rotating, filename)
+        manifest['rotating'] = False
+        write_manifest(filename, manifest)
+    elif os.path.exists(rotating):
+        # the rotation never got as far as the manifest, so its segments still hold copies of what is in the logger
+        os.remove(rotating)
+        kept = {MANIFEST_NAME} | {segment['file'] for segment in (manifest or new_manifest())['segments']}
+        for name in os.listdir(segments_dir(filename)):
+            if name not in kept:
+                os.remove(os.path.join(segments_dir(filename), name))
+    return manifest
+
+
+def open_segment(path: str, mode: str):
+    """
+    opens a gzip or zstd compressed segment. zstd needs the zstandard package.
+    """
+    if path.endswith(COMPRESSIONS['zstd']):
+        try:
+            import zstandard
+        except ImportError:
+            raise ImportError("zstd segments need zstandard, install it with 'pip install zstandard'.")
+        return zstandard.open(path, mode)
+    import gzip
+    return gzip.open(path, mode)
+
+
+def read_segment(filename: str, segment: dict) -> bytes:
+    file_handle = open_segment(os.path.join(segments_dir(filename), segment['file']), 'rb')
+    try:
+        return file_handle.read()
+    finally:
+        file_handle.close()
+
+
+def segment_records(filename: str, segment: dict) -> List[Record]:
+    """
+    returns every record in a segment, decompressing it only if it isn't one of the last few that were used
+    """
+    path = os.path.join(segments_dir(filename), segment['file'])
+    stat = os.stat(path)
+    key = (path, stat.st_size, stat.st_mtime_ns)
+    records = segment_cache.get(key)
+    if records is None:
+        records = []
+        position = 0
+        for raw in read_segment(filename, segment).split(SEPARATOR):
+            if raw:
+                records.append(make_record(position, position + len(raw), raw))
+            position += len(raw) + len(SEPARATOR)
+        segment_cache[key] = records
+        while len(segment_cache) > SEGMENT_CACHE_SIZE:
+            segment_cache.popitem(last=False)
+    segment_cache.move_to_end(key)
+    return records
+
+
+def carried_records(filename: str, manifest: Optional[dict]) -> int:
+    """
+    returns 1 if the hot file still starts with the copy of the program that the last rotation carried over (which is
+    also in the segments), otherwise 0
+    """
+    if manifest is None or not manifest['carried_program']:
+        return 0
+    records = load_index(filename)['records']
+    if not records or records[0][RECORD_KIND] != PROGRAM:
+        return 0
+    return 1 if read_record(filename, records[0]) == manifest['latest_program'] else 0
+
+
+def archived_records(manifest: Optional[dict]) -> int:
+    if manifest is None:
+        return 0
+    return sum(segment['records'] for segment in manifest['segments'])
+
+
+def iter_history(filename: str) -> Iterator[Record]:
+    """
+    streams every record of the logger's whole history, oldest first: the segments one at a time, then the hot file
+    (without the program copy a rotation carried over). Hot file records keep their offsets in the file, and segment
+    records are given negative ones that run on into them, so offsets still grow through the whole history and
+    whatever drops records from the end of the hot file by offset never touches the segments.
+    """
+    manifest = load_manifest(filename)
+    if manifest is not None:
+        offset = -sum(segment['bytes'] for segment in manifest['segments'])
+        for segment in manifest['segments']:
+            for record in segment_records(filename, segment):
+                yield record._replace(start=offset + record.start, end=offset + record.end)
+            offset += segment['bytes']
+    skip = carried_records(filename, manifest)
+    for record in iter_records(filename):
+        if skip:
+            skip -= 1
+            continue
+        yield record
+
+
+def history_raw_records(filename: str) -> Iterator[bytes]:
+    """
+    yields the raw bytes of every '---' separated record of the logger's whole history, segments first, the same way
+    scan_records() would for a logger that was never rotated
+    """
+    manifest = load_manifest(filename)
+    offset = 0
+    if manifest is not None:
+        for segment in manifest['segments']:
+            # every segment ends right after a '---'
+            yield from read_segment(filename, segment).split(SEPARATOR)[:-1]
+        if carried_records(filename, manifest):
+            offset = load_index(filename)['records'][0][RECORD_END] + len(SEPARATOR)
+    for start, end, raw in scan_records(filename, offset):
+        yield raw
+
+
+def archived_tail(filename: str, entries: int) -> List[str]:
+    """
+    returns the text of the last few records in the segments, oldest first, for when the hot file doesn't have enough
+    """
+    manifest = load_manifest(filename)
+    if manifest is None:
+        return []
+    texts = []
+    for segment in reversed(manifest['segments']):
+        if len(texts) >= entries:
+            break
+        records = segment_records(filename, segment)
+        texts[:0] = [record.text for record in records[-(entries - len(texts)):]]
+    return texts
+
+
+def archived_program(filename: str) -> Optional[str]:
+    """
+    returns the latest program that was moved into the segments, for when the hot file has none left
+    """
+    manifest = load_manifest(filename)
+    return None if manifest is None else manifest['latest_program']
+
+
+def archived_sessions_between(filename: str, first: datetime.date, last: datetime.date,
+                              weekday: Optional[int] = None) -> List[SessionRecord]:
+    """
+    returns the sessions in the segments done from first to last, only opening the segments whose dates overlap
+    """
+    manifest = load_manifest(filename)
+    if manifest is None:
+        return []
+    first_ordinal, last_ordinal = first.toordinal(), last.toordinal()
+    sessions = []
+    for segment in manifest['segments']:
+        if segment['first_date'] is None or segment['last_date'] < first_ordinal or \
+                segment['first_date'] > last_ordinal:
+            continue
+        for record in segment_records(filename, segment):
+            if record.kind == SESSION and first <= record.date <= last and \
+                    (weekday is None or record.date.weekday() == weekday):
+                sessions.append(record)
+    return sessions
+
+
+def new_manifest() -> dict:
+    return {'version': MANIFEST_VERSION, 'segments': [], 'latest_program': None, 'carried_program': False,
+            'rotating': False}
+
+
+def segment_name(directory: str, year: Optional[int], compression: str) -> str:
+    """
+    returns a free file name for a new segment of the given year ('2019.txt.gz', then '2019.1.txt.gz', ...)
+    """
+    base = str(year) if year is not None else 'undated'
+    name = base + COMPRESSIONS[compression]
+    number = 0
+    while os.path.exists(os.path.join(directory, name)):
+        number += 1
+        name = '{}.{}{}'.format(base, number, COMPRESSIONS[compression])
+    return name
+
+
+def copy_range(source, destination, start: int, end: int) -> None:
+    source.seek(start)
+    remaining = end - start
+    while remaining > 0:
+        chunk = source.read(min(CHUNK_SIZE, remaining))
+        if not chunk:
+            break
+        destination.write(chunk)
+        remaining -= len(chunk)
+
+
+def rotate_segments(filename: str, keep_days: int = KEEP_DAYS, today: Optional[datetime.date] = None,
+                    compression: str = 'gzip') -> int:
+    """
+    moves every record before the first session of the last keep_days days into per-year compressed segments, and
+    returns how many records were moved. The hot file keeps the rest, starting with a copy of the program that was
+    active at that point. Nothing else should write to the logger while it is being rotated.
+    """
+    if compression not in COMPRESSIONS:
+        raise ValueError("compression must be one of {}".format(', '.join(COMPRESSIONS)))
+    if today is None:
+        today = datetime.date.today()
+    recover_log(filename)
+    directory = segments_dir(filename)
+    manifest = read_manifest(filename)
+    if manifest is None:
+        manifest = new_manifest()
+    skip = carried_records(filename, manifest)
+
+    index = load_index(filename)
+    records = index['records']
+    cutoff = (today - datetime.timedelta(days=keep_days)).toordinal()
+    cut = skip
+    while cut < len(records) and not (records[cut][RECORD_KIND] == SESSION and records[cut][RECORD_DATE] >= cutoff):
+        cut += 1
+    moving = records[skip:cut]
+    if not moving:
+        return 0
+    cut_start = records[cut][RECORD_START] if cut < len(records) else index['tail']
+
+    # contiguous runs of records, a new one every time the sessions move on to a later year
+    runs = []
+    for record in moving:
+        year = None
+        if record[RECORD_KIND] == SESSION:
+            year = datetime.date.fromordinal(record[RECORD_DATE]).year
+        if not runs or (year is not None and runs[-1]['year'] is not None and year > runs[-1]['year']):
+            runs.append({'year': year, 'records': []})
+        elif runs[-1]['year'] is None:
+            runs[-1]['year'] = year
+        runs[-1]['records'].append(record)
+
+    os.makedirs(directory, exist_ok=True)
+    latest_program = manifest['latest_program']
+    file_handle = open(filename, 'rb')
+    try:
+        new_segments = []
+        for number, run in enumerate(runs):
+            start = run['records'][0][RECORD_START]
+            end = runs[number + 1]['records'][0][RECORD_START] if number + 1 < len(runs) else cut_start
+            name = segment_name(directory, run['year'], compression)
+            segment_handle = open_segment(os.path.join(directory, name), 'wb')
+            try:
+                copy_range(file_handle, segment_handle, start, end)
+            finally:
+                segment_handle.close()
+            sync_file(os.path.join(directory, name))
+            dates = [record[RECORD_DATE] for record in run['records'] if record[RECORD_KIND] == SESSION]
+            new_segments.append({'file': name, 'first_date': min(dates) if dates else None,
+                                 'last_date': max(dates) if dates else None, 'records': len(run['records']),
+                                 'sessions': len(dates), 'bytes': end - start})
+        for record in reversed(records[:cut]):
+            if record[RECORD_KIND] == PROGRAM:
+                latest_program = read_record(filename, record)
+                break
+
+        # the new hot file: the active program (unless the kept records start with one), then the kept records
+        carried = latest_program is not None and not (cut < len(records) and records[cut][RECORD_KIND] == PROGRAM)
+        rotating_handle = open(filename + ROTATING_SUFFIX, 'wb')
+        try:
+            if carried:
+                # the program is written back exactly as it was read, the same way a text mode write() would
+                rotating_handle.write(encode_record(latest_program) + SEPARATOR)
+            file_handle.seek(0, os.SEEK_END)
+            copy_range(file_handle, rotating_handle, cut_start, file_handle.tell())
+            rotating_handle.flush()
+            os.fsync(rotating_handle.fileno())
+        finally:
+            rotating_handle.close()
+    finally:
+        file_handle.close()
+
+    # the manifest commits the rotation, so the segments and the new hot file have to be on disk before it is
+    sync_directory(directory)
+    sync_directory(os.path.dirname(os.path.abspath(filename)))
+    manifest['segments'].extend(new_segments)
+    manifest['latest_program'] = latest_program
+    manifest['carried_program'] = carried
+    manifest['rotating'] = True
+    write_manifest(filename, manifest)
+    os.replace(filename + ROTATING_SUFFIX, filename)
+    sync_directory(os.path.dirname(os.path.abspath(filename)))
+    manifest['rotating'] = False
+    write_manifest(filename, manifest)
+    return len(moving)
+
+
+def segment_summary(filename: str) -> Dict[str, object]:
+    """
+    returns the segments of the logger and how many records are in them and in the hot file
+    """
+    manifest = load_manifest(filename)
+    hot = len(load_index(filename)['records']) - carried_records(filename, manifest)
+    return {'segments': [] if manifest is None else manifest['segments'], 'archived': archived_records(manifest),
+            'hot': hot}
@@ -0,0 +1,343 @@
+"""
+a local HTTP/JSON service that serves the loggers of many users at once
+
+Every user gets a folder under the service's root holding their my_fitness_logs.txt (or my_fitness_logs.db) and the
+restore points made before entries are removed (my_fitness_logs.db.removed for SQLite loggers). Requests and responses
+are JSON:
+
+    POST   /users/<name>                  start a logger from the starter program
+    GET    /users/<name>/program          the current program, as text and as sections
+    PUT    /users/<name>/program          adjust the program, {"sections": {"First Pair: (...)": ["1- ...", ...]}}
+    POST   /users/<name>/sessions         log a session, {"date": ..., "comment": ..., "skipped": ..., "reps": [...]}
+    GET    /users/<name>/entries?last=N   the last N entries
+    DELETE /users/<name>/entries?last=N   remove the last N entries
+
+Work on a logger happens in threads, one request per logger at a time (behind a per-logger asyncio lock), so users
+never wait on each other. Writes run in their own threads, so a burst of them can't hold up reads, and the parse
+cache is bounded so only the most recently used loggers are kept in memory.
+"""
+
+import asyncio
+import json
+import os
+import re
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional, Tuple
+from urllib.parse import urlsplit, parse_qs
+
+from .cache import parse_cache
+from .records import decode_record
+from .database import is_database
+from .journal import recover_log
+from .programs import program_sections, parse_adjusted_program
+from .logger import last_entries, return_current_program, append_to_log, write_adjusted_program, \
+    validate_session, select_entries, remove_entries
+
+LOG_FILE_NAMES = ['my_fitness_logs.txt', 'my_fitness_logs.db']
+USER_NAME_PATTERN = re.compile(r'[A-Za-z0-9_.-]{1,64}')
+MAX_BODY_SIZE = 1024 * 1024
+MAX_ENTRIES = 1000
+DEFAULT_MAX_STATES = 64
+DEFAULT_WORKERS = 8
+STATUS_REASONS = {200: 'OK', 201: 'Created', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+                  409: 'Conflict', 413: 'Payload Too Large', 500: 'Internal Server Error'}
+
+
+class ServiceError(Exception):
+    """
+    an error that is sent back to the client with the given status
+    """
+
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+class FileLocks:
+    """
+    one asyncio lock per logger, dropped again once nobody is using or waiting for it
+    """
+
+    def __init__(self):
+        self.locks = {}  # path -> [lock, users]
+
+    def __call__(self, path: str) -> 'FileLock':
+        return FileLock(self, path)
+
+    def __len__(self) -> int:
+        return len(self.locks)
+
+
+class FileLock:
+    def __init__(self, locks: FileLocks, path: str):
+        self.locks = locks
+        self.path = path
+
+    async def __aenter__(self):
+        entry = self.locks.locks.setdefault(self.path, [asyncio.Lock(), 0])
+        entry[1] += 1
+        try:
+            await entry[0].acquire()
+        except BaseException:
+            self.release(entry)
+            raise
+
+    async def __aexit__(self, *exc_info):
+        entry = self.locks.locks[self.path]
+        entry[0].release()
+        self.release(entry)
+
+    def release(self, entry: list) -> None:
+        entry[1] -= 1
+        if entry[1] == 0:
+            del self.locks.locks[self.path]
+
+
+class LogService:
+    """
+    serves the loggers kept under root. starter_file is copied for every new user.
+    """
+
+    def __init__(self, root: str, starter_file: str, max_states: int = DEFAULT_MAX_STATES,
+                 workers: int = DEFAULT_WORKERS):
+        self.root = os.path.abspath(root)
+        self.starter_file = starter_file
+        self.locks = FileLocks()
+        self.recovered = set()  # loggers whose journal was checked since the service started
+        self.readers = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='fitnesslog-read')
+        self.writers = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='fitnesslog-write')
+        parse_cache.resize(max_states)
+
+    def user_dir(self, name: str) -> str:
+        if USER_NAME_PATTERN.fullmatch(name) is None or name.strip('.') == '':
+            raise ServiceError(400, "invalid user name {!r}".format(name))
+        return os.path.join(self.root, name)
+
+    def logger(self, name: str) -> str:
+        """
+        returns the user's logger, preferring the SQLite one if there is one
+        """
+        user_dir = self.user_dir(name)
+        for file_name in reversed(LOG_FILE_NAMES):
+            filename = os.path.join(user_dir, file_name)
+            if os.path.exists(filename):
+                return filename
+        raise ServiceError(404, "no logger for user {!r}".format(name))
+
+    async def run(self, name: str, function, *arguments, write: bool = False):
+        """
+        runs function(logger, *arguments) in a thread while holding the logger's lock
+        """
+        filename = self.logger(name)
+        executor = self.writers if write else self.readers
+        async with self.locks(filename):
+            loop = asyncio.get_running_loop()
+            if filename not in self.recovered and not is_database(filename):
+                await loop.run_in_executor(self.writers, recover_log, filename)
+                self.recovered.add(filename)
+            return await loop.run_in_executor(executor, function, filename, *arguments)
+
+    async def handle(self, method: str, target: str, body: Optional[dict]) -> Tuple[int, dict]:
+        """
+        answers one request, returning (status, JSON response)
+        """
+        url = urlsplit(target)
+        parts = [part for part in url.path.split('/') if part]
+        query = parse_qs(url.query)
+        if len(parts) < 2 or parts[0] != 'users':
+            raise ServiceError(404, "unknown path {!r}".format(url.path))
+        name = parts[1]
+        resource = '/'.join(parts[2:])
+
+        if resource == '' and method == 'POST':
+            return await self.create_user(name)
+        if resource == 'program' and method == 'GET':
+            return 200, await self.run(name, read_program)
+        if resource == 'program' and method == 'PUT':
+            return 200, await self.run(name, adjust_program, body_field(body, 'sections', dict), write=True)
+        if resource == 'sessions' and method == 'POST':
+            return 201, await self.run(name, log_session, body or {}, write=True)
+        if resource == 'entries' and method == 'GET':
+            return 200, await self.run(name, read_entries, entries_wanted(query))
+        if resource == 'entries' and method == 'DELETE':
+            return 200, await self.run(name, delete_entries, entries_wanted(query), write=True)
+        if resource in ('', 'program', 'sessions', 'entries'):
+            raise ServiceError(405, "{} isn't allowed on {!r}".format(method, url.path))
+        raise ServiceError(404, "unknown path {!r}".format(url.path))
+
+    async def create_user(self, name: str) -> Tuple[int, dict]:
+        user_dir = self.user_dir(name)
+        filename = os.path.join(user_dir, LOG_FILE_NAMES[0])
+        async with self.locks(filename):
+            if any(os.path.exists(os.path.join(user_dir, file_name)) for file_name in LOG_FILE_NAMES):
+                raise ServiceError(409, "user {!r} already has a logger".format(name))
+            await asyncio.get_running_loop().run_in_executor(self.writers, create_logger, self.starter_file,
+                                                             filename)
+        return 201, {'user': name}
+
+    async def respond(self, method: str, target: str, raw_body: bytes) -> Tuple[int, dict]:
+        """
+        helper function for serve_connection() that answers one request, turning errors into error responses: a body
+        that isn't a JSON object is the client's fault, and anything but a ServiceError raised while handling the
+        request is the service's
+        """
+        try:
+            body = json.loads(raw_body) if raw_body else None
+        except ValueError as error:  # UnicodeDecodeError is one too
+            return 400, {'error': "invalid JSON: {}".format(error)}
+        if body is not None and not isinstance(body, dict):
+            return 400, {'error': "the request body must be a JSON object"}
+        try:
+            return await self.handle(method, target, body)
+        except ServiceError as error:
+            return error.status, {'error': str(error)}
+        except Exception as error:  # keep serving everyone else
+            return 500, {'error': repr(error)}
+
+    async def serve_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """
+        answers requests on one connection until the client closes it (HTTP/1.1 keep-alive)
+        """
+        try:
+            while True:
+                request = await read_request(reader)
+                if request is None:
+                    break
+                method, target, headers, raw_body = request
+                status, response = await self.respond(method, target, raw_body)
+                keep_alive = headers.get('connection', '').lower() != 'close'
+                writer.write(format_response(status, response, keep_alive))
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except ServiceError as error:  # the request itself was malformed, so the connection can't be reused
+            writer.write(format_response(error.status, {'error': str(error)}, keep_alive=False))
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    def close(self) -> None:
+        self.readers.shutdown()
+        self.writers.shutdown()
+
+
+async def read_request(reader: asyncio.StreamReader) -> Optional[Tuple[str, str, Dict[str, str], bytes]]:
+    """
+    helper function for LogService.serve_connection() that reads one HTTP request, returning None once the client is
+    done
+    """
+    request_line = await reader.readline()
+    if not request_line.strip():
+        return None
+    try:
+        method, target, version = request_line.decode('latin-1').split()
+    except ValueError:
+        raise ServiceError(400, "malformed request line")
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+        key, _, value = line.decode('latin-1').partition(':')
+        headers[key.strip().lower()] = value.strip()
+    length = int(headers.get('content-length', '0') or 0)
+    if length > MAX_BODY_SIZE:
+        raise ServiceError(413, "request body too large")
+    raw_body = await reader.readexactly(length) if length else b''
+    return method.upper(), target, headers, raw_body
+
+
+def format_response(status: int, response: dict, keep_alive: bool = True) -> bytes:
+    body = json.dumps(response).encode('utf-8')
+    head = 'HTTP/1.1 {} {}\r\nContent-Type: application/json\r\nContent-Length: {}\r\nConnection: {}\r\n\r\n'.format(
+        status, STATUS_REASONS.get(status, ''), len(body), 'keep-alive' if keep_alive else 'close')
+    return head.encode('latin-1') + body
+
+
+def body_field(body: Optional[dict], key: str, kind: type):
+    if body is None or not isinstance(body.get(key), kind):
+        raise ServiceError(400, "the request body needs a {!r} {}".format(key, kind.__name__))
+    return body[key]
+
+
+def entries_wanted(query: dict) -> int:
+    try:
+        entries = int(query.get('last', ['1'])[0])
+    except ValueError:
+        raise ServiceError(400, "'last' must be a number")
+    if not 0 < entries <= MAX_ENTRIES:
+        raise ServiceError(400, "'last' must be between 1 and {}".format(MAX_ENTRIES))
+    return entries
+
+
+def create_logger(starter_file: str, filename: str) -> None:
+    os.makedirs(os.path.dirname(filename), exist_ok=True)
+    shutil.copyfile(starter_file, filename)
+
+
+def current_program(filename: str) -> str:
+    program = return_current_program(filename)
+    if program is None:
+        raise ServiceError(409, "couldn't detect a program")
+    return program
+
+
+def read_program(filename: str) -> dict:
+    program = current_program(filename)
+    return {'program': program, 'sections': program_sections(program)}
+
+
+def adjust_program(filename: str, sections: dict) -> dict:
+    """
+    the service's adjust_program(): writes the program made of the given sections
+    """
+    if not sections:
+        raise ServiceError(400, "a program needs at least one section")
+    for header, subsets in sections.items():
+        if not isinstance(subsets, list) or not all(isinstance(subset, str) for subset in subsets):
+            raise ServiceError(400, "the {} must be a list of subsets".format(header))
+        if any('---' in line or '\n' in line for line in [header] + subsets):
+            raise ServiceError(400, "the {} can't contain new lines or '---'".format(header))
+    write_adjusted_program(filename, parse_adjusted_program(sections))
+    return {'program': current_program(filename)}
+
+
+def log_session(filename: str, session: dict) -> dict:
+    """
+    the service's log(): checks the session against the current program and appends it
+    """
+    text, error = validate_session(session, program_sections(current_program(filename)))
+    if error is not None:
+        raise ServiceError(400, error)
+    append_to_log(filename, text)
+    return {'logged': text.strip('\n').rstrip('-').rstrip('\n')}
+
+
+def read_entries(filename: str, entries: int) -> dict:
+    return {'entries': last_entries(filename, entries)}
+
+
+def delete_entries(filename: str, entries: int) -> dict:
+    """
+    the service's delete_entries(): removes the last few entries, making a restore point first
+    """
+    delete_records = select_entries(filename, entries)
+    remove_entries(filename, delete_records)
+    return {'deleted': [decode_record(raw) for start, end, raw in delete_records]}
+
+
+async def serve(root: str, starter_file: str, host: str = '127.0.0.1', port: int = 8080,
+                max_states: int = DEFAULT_MAX_STATES, workers: int = DEFAULT_WORKERS) -> None:
+    """
+    runs the service until it is cancelled
+    """
+    service = LogService(root, starter_file, max_states, workers)
+    server = await asyncio.start_server(service.serve_connection, host, port)
+    print("Serving the loggers in {} on http://{}:{}".format(service.root, host, port))
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        service.close()
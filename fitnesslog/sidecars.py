@@ -0,0 +1,53 @@
+"""
+the files and folders kept beside the logger, all named after it ('my_fitness_logs.txt.idx', ...)
+
+Every feature that keeps something beside the logger takes its suffix from here and adds it to SIDECAR_SUFFIXES, so
+whatever moves the logger moves everything that belongs to it.
+"""
+
+import os
+import shutil
+from typing import List
+
+INDEX_SUFFIX = '.idx'
+JOURNAL_SUFFIX = '.journal'
+BAD_JOURNAL_SUFFIX = JOURNAL_SUFFIX + '.bad'
+SEGMENTS_SUFFIX = '.segments'
+ROTATING_SUFFIX = '.rotating'
+SEARCH_SUFFIX = '.search'
+ROLLUP_SUFFIX = '.rollups'
+BACKUPS_SUFFIX = '.backups'
+REMOVED_SUFFIX = '.removed'
+SYNC_SUFFIX = '.sync'
+DIGESTS_SUFFIX = '.digests'
+CONFLICTS_SUFFIX = '.conflicts'
+PROGRAMS_SUFFIX = '.programs'
+
+SIDECAR_SUFFIXES = [INDEX_SUFFIX, JOURNAL_SUFFIX, BAD_JOURNAL_SUFFIX, SEGMENTS_SUFFIX, ROTATING_SUFFIX, SEARCH_SUFFIX,
+                    ROLLUP_SUFFIX, BACKUPS_SUFFIX, REMOVED_SUFFIX, SYNC_SUFFIX, DIGESTS_SUFFIX, CONFLICTS_SUFFIX,
+                    PROGRAMS_SUFFIX]
+
+
+def sidecar_paths(filename: str) -> List[str]:
+    """
+    returns the files and folders beside the logger that belong to it, the ones that exist
+    """
+    return [filename + suffix for suffix in SIDECAR_SUFFIXES if os.path.exists(filename + suffix)]
+
+
+def move_logger(filename: str, directory: str) -> List[str]:
+    """
+    moves the logger into directory together with everything beside it that belongs to it, and returns the new paths
+    of what was moved (the logger first). Raises FileExistsError, before anything is moved, if directory already has
+    a logger of the same name or any of its files.
+    """
+    paths = [filename] + sidecar_paths(filename)
+    if os.path.realpath(os.path.dirname(os.path.abspath(filename))) == os.path.realpath(directory):
+        return paths
+    targets = [os.path.join(directory, os.path.basename(path)) for path in paths]
+    existing = [target for target in targets if os.path.exists(target)]
+    if existing:
+        raise FileExistsError("{} already exists, nothing was moved.".format(', '.join(existing)))
+    for path, target in zip(paths, targets):
+        shutil.move(path, target)
+    return targets
@@ -0,0 +1,446 @@
+"""
+syncing the logger with a copy of it in another directory (a USB stick, a mounted share, another machine's folder)
+
+Every record of a .txt logger has a digest of what it says (whatever line endings and blank lines are around it),
+and a chain digest of every record up to and including it, kept beside the logger as '.digests' and caught up like
+the index: an append only hashes the new records. Two loggers are the same up to the last record whose chain digests
+match, which a binary search finds reading a few entries of each '.digests', and only the records after that are
+compared, by their digests. Records only one side has are copied to the other, merged with the other side's new
+records in date order (a new program stays right before the session that was logged after it), and nothing before
+the first record that differs is read or written again.
+
+A session both sides logged for the same date, with different reps, is a conflict: the first logger's version is
+kept on both sides and the other one is appended to '.conflicts' beside the second logger. The '.sync' file beside
+each logger remembers where the two stood after their last sync, so a record deleted or edited on one side since then
+isn't copied back from the other: if one side still has everything it had then and the other doesn't, the other one
+changed it on purpose. Without that (the first sync, or both sides changed what they had in common) records are only
+ever added, never deleted.
+"""
+
+import json
+import os
+import struct
+from typing import List, Optional, Tuple, NamedTuple
+
+from .records import decode_record, encode_record, scan_records, file_signature
+from .index import RECORD_START, RECORD_END, RECORD_DATE, RECORD_CHECK, load_index
+from .journal import recover_log, commit_batch
+from .backups import write_durably, create_backup
+from .rollups import logger_check, segment_files
+from .database import is_database
+from .logger import truncate_log, rewrite_log
+from .sidecars import SYNC_SUFFIX, DIGESTS_SUFFIX, CONFLICTS_SUFFIX
+
+SYNC_VERSION = 1
+
+DIGEST_SIZE = 8
+ENTRY = struct.Struct('<qqIi8s8s')  # start, end, checksum (the index's), date, digest, chain digest
+NO_DATE = 0  # programs, and anything else that isn't a session
+BLANK_DATE = -1  # records with nothing but whitespace in them, which aren't synced
+
+FIRST = 0
+SECOND = 1
+
+
+class SyncEntry(NamedTuple):
+    start: int
+    end: int
+    check: int
+    date: int
+    digest: bytes
+    chain: bytes
+
+
+class SyncReport(NamedTuple):
+    """
+    what sync_loggers() did: how many records it copied to the second logger and from it, how many it deleted (from
+    either side, because the other side deleted them), the headers of the sessions that conflicted and how many bytes
+    of records were copied from one logger to the other
+    """
+    sent: int
+    received: int
+    deleted: int
+    conflicts: List[str]
+    copied: int
+
+
+def sync_path(filename: str) -> str:
+    return filename + SYNC_SUFFIX
+
+
+def digests_path(filename: str) -> str:
+    return filename + DIGESTS_SUFFIX
+
+
+def conflicts_path(filename: str) -> str:
+    return filename + CONFLICTS_SUFFIX
+
+
+class Digests:
+    """
+    the stored digests of a logger, read only a few entries at a time so comparing with a logger on a share doesn't
+    read all of them. read counts the bytes read so far.
+    """
+
+    def __init__(self, filename: str, count: int):
+        self.file_handle = open(digests_path(filename), 'rb')
+        self.count = count
+        self.read = 0
+
+    def entries(self, start: int, stop: int) -> List[SyncEntry]:
+        self.file_handle.seek(start * ENTRY.size)
+        data = self.file_handle.read((stop - start) * ENTRY.size)
+        self.read += len(data)
+        return [SyncEntry._make(fields) for fields in ENTRY.iter_unpack(data)]
+
+    def chain(self, count: int) -> bytes:
+        """
+        returns the chain digest of the first count records
+        """
+        return self.entries(count - 1, count)[0].chain if count else bytes(DIGEST_SIZE)
+
+    def close(self) -> None:
+        self.file_handle.close()
+
+
+def read_sync(filename: str) -> Optional[dict]:
+    """
+    returns the sync state stored beside the logger, or None if there is none (or its digests are missing)
+    """
+    try:
+        file_handle = open(sync_path(filename))
+        try:
+            state = json.load(file_handle)
+        finally:
+            file_handle.close()
+        digests_size = os.path.getsize(digests_path(filename))
+    except (OSError, ValueError):
+        return None
+    if not isinstance(state, dict) or state.get('version') != SYNC_VERSION or \
+            digests_size < state['records'] * ENTRY.size:
+        return None
+    return state
+
+
+def write_sync(filename: str, state: dict) -> None:
+    write_durably(sync_path(filename), json.dumps(state, separators=(',', ':')).encode())
+
+
+def extend_digests(filename: str, index: dict, position: int) -> None:
+    """
+    helper function for update_sync_state() and sync_loggers() that keeps the first position entries of the digests
+    and adds one for every record the index has after them, reading only those records
+    """
+    import hashlib  # only needed for syncing, and slow to import
+
+    records = index['records']
+    path = digests_path(filename)
+    file_handle = open(path, 'r+b' if os.path.exists(path) else 'w+b')
+    try:
+        chain = bytes(DIGEST_SIZE)
+        if position:
+            file_handle.seek((position - 1) * ENTRY.size)
+            chain = SyncEntry._make(ENTRY.unpack(file_handle.read(ENTRY.size))).chain
+        file_handle.seek(position * ENTRY.size)
+        file_handle.truncate()
+        offset = records[position][RECORD_START] if position < len(records) else index['tail']
+        raws = (raw for start, end, raw in scan_records(filename, offset) if raw)
+        packed = []
+        for record, raw in zip(records[position:], raws):
+            text = raw.replace(b'\r\n', b'\n').strip()
+            digest = hashlib.blake2b(text, digest_size=DIGEST_SIZE).digest()
+            chain = hashlib.blake2b(chain + digest, digest_size=DIGEST_SIZE).digest()
+            date = (record[RECORD_DATE] or NO_DATE) if text else BLANK_DATE
+            packed.append(ENTRY.pack(record[RECORD_START], record[RECORD_END], record[RECORD_CHECK], date, digest,
+                                     chain))
+        file_handle.write(b''.join(packed))
+        file_handle.flush()
+        os.fsync(file_handle.fileno())
+    finally:
+        file_handle.close()
+
+
+def first_stale_entry(filename: str, index: dict, count: int) -> int:
+    """
+    helper function for update_sync_state() that returns how many of the stored digests are still those of the
+    records the index has, going by where the records are and their checksums
+    """
+    digests = Digests(filename, count)
+    try:
+        entries = digests.entries(0, count)
+    finally:
+        digests.close()
+    for position, (entry, record) in enumerate(zip(entries, index['records'])):
+        if (entry.start, entry.end, entry.check) != (record[RECORD_START], record[RECORD_END], record[RECORD_CHECK]):
+            return position
+    return min(count, len(index['records']))
+
+
+def save_sync_state(filename: str, index: dict, peers: dict) -> dict:
+    state = {'version': SYNC_VERSION, 'signature': index['signature'], 'records': len(index['records']),
+             'tail': index['tail'], 'check': index['check'], 'peers': peers}
+    write_sync(filename, state)
+    return state
+
+
+def update_sync_state(filename: str) -> dict:
+    """
+    returns the sync state of the logger, bringing its digests up to date first: only what was appended since they
+    were stored is hashed, or everything from the first record that changed if the logger was changed any other way
+    """
+    state = read_sync(filename)
+    signature = file_signature(filename)
+    if state is not None and state['signature'] == signature:
+        return state
+    index = load_index(filename)
+    position = 0
+    if state is not None:
+        tail = state['tail']
+        if state['check'] is not None and tail <= signature[1] and \
+                logger_check(filename, index, tail) == state['check']:
+            position = state['records']
+            digests = Digests(filename, position)
+            try:
+                # the unfinished record at the old tail may have been finished since
+                if position and digests.entries(position - 1, position)[0].start >= tail:
+                    position -= 1
+            finally:
+                digests.close()
+        else:
+            position = first_stale_entry(filename, index, state['records'])
+    extend_digests(filename, index, position)
+    return save_sync_state(filename, index, {} if state is None else state['peers'])
+
+
+def common_prefix(first: Digests, second: Digests) -> int:
+    """
+    returns how many records the two loggers start with that are the same, by a binary search over their chain
+    digests (which match up to a record only if every record up to it does)
+    """
+    low, high = 0, min(first.count, second.count)
+    while low < high:
+        middle = (low + high + 1) // 2
+        if first.chain(middle) == second.chain(middle):
+            low = middle
+        else:
+            high = middle - 1
+    return low
+
+
+def matches_base(digests: Digests, base: Optional[list]) -> bool:
+    """
+    tells if the logger still starts with everything it had after its last sync with the other one, base being how
+    many records it had then and the chain digest of them
+    """
+    return base is not None and base[0] <= digests.count and digests.chain(base[0]).hex() == base[1]
+
+
+def record_groups(entries: List[SyncEntry]) -> List[Tuple[float, List[SyncEntry]]]:
+    """
+    helper function for merge_records() that splits records into groups of a session and whatever came between it and
+    the session before (a new program), keyed by the date of the session. Whatever comes after the last session goes
+    last.
+    """
+    groups = []
+    group = []
+    for entry in entries:
+        group.append(entry)
+        if entry.date > NO_DATE:
+            groups.append((entry.date, group))
+            group = []
+    if group:
+        groups.append((float('inf'), group))
+    return groups
+
+
+def merge_records(first: List[SyncEntry], second: List[SyncEntry]) -> Tuple[List[Tuple[int, SyncEntry]],
+                                                                             List[SyncEntry]]:
+    """
+    helper function for sync_loggers() that merges the new records of both loggers in date order, the first logger's
+    first if they are on the same date. A record both have is only kept where the first logger has it, and a session
+    of the second logger on the same date as a different one of the first is left out. Returns the merged records as
+    (FIRST or SECOND, entry), and the sessions left out.
+    """
+    first_digests = {entry.digest for entry in first}
+    second_digests = {entry.digest for entry in second}
+    first_dates = {entry.date for entry in first if entry.date > NO_DATE and entry.digest not in second_digests}
+    conflicts = []
+    second_groups = []
+    for key, group in record_groups(second):
+        kept = []
+        for entry in group:
+            if entry.digest in first_digests:
+                continue
+            if entry.date in first_dates:
+                conflicts.append(entry)
+                continue
+            kept.append(entry)
+        if kept:
+            second_groups.append((key, kept))
+
+    first_groups = record_groups(first)
+    merged = []
+    position = 0
+    for key, group in second_groups:
+        while position < len(first_groups) and first_groups[position][0] <= key:
+            merged.extend((FIRST, entry) for entry in first_groups[position][1])
+            position += 1
+        merged.extend((SECOND, entry) for entry in group)
+    for key, group in first_groups[position:]:
+        merged.extend((FIRST, entry) for entry in group)
+    return merged, conflicts
+
+
+def plan_side(suffix: List[SyncEntry], merged: List[Tuple[int, SyncEntry]], tail: int) -> Tuple[int, int]:
+    """
+    helper function for sync_loggers() that compares what a logger has after the records both loggers start with to
+    the merged records, and returns how many of its records stay as they are and how many of the merged records that
+    already covers. Everything after those is cut and the rest of the merged records written after the cut.
+    """
+    kept = 0
+    done = 0
+    while kept < len(suffix):
+        entry = suffix[kept]
+        if entry.start >= tail:
+            # an unfinished record (no '---' after it yet) is written again even if it reads the same, and whatever
+            # is appended after blank lines at the end of the file becomes part of the same record
+            break
+        if entry.date != BLANK_DATE:
+            if done == len(merged) or entry.digest != merged[done][1].digest:
+                break
+            done += 1
+        kept += 1
+    return kept, done
+
+
+def read_raws(filename: str, entries: List[SyncEntry]) -> List[bytes]:
+    """
+    seeks to each record and returns its raw bytes, without reading anything else
+    """
+    raws = []
+    file_handle = open(filename, 'rb')
+    try:
+        for entry in entries:
+            file_handle.seek(entry.start)
+            raws.append(file_handle.read(entry.end - entry.start))
+    finally:
+        file_handle.close()
+    return raws
+
+
+def sync_loggers(filename: str, other: str) -> SyncReport:
+    """
+    makes two .txt loggers the same, copying only the records one of them doesn't have (see the top of this file).
+    The other logger is created if it doesn't exist yet. A restore point is made of a logger before any of its records
+    is deleted (or replaced by the other logger's version), records that are only moved need none. Nothing else
+    should write to either logger while they are synced. Raises ValueError for SQLite loggers, and for loggers that
+    were rotated into different segments.
+    """
+    paths = [filename, other]
+    if any(is_database(path) for path in paths):
+        raise ValueError("Only .txt loggers can be synced, SQLite loggers can be copied as they are.")
+    if not os.path.exists(other):
+        open(other, 'wb').close()
+    if segment_files(filename) != segment_files(other):
+        raise ValueError("The loggers were rotated into different segments, rotate both the same way (or neither) "
+                         "before syncing them.")
+    for path in paths:
+        recover_log(path)
+
+    states = [update_sync_state(path) for path in paths]
+    peers = [os.path.realpath(other), os.path.realpath(filename)]
+    bases = [states[side]['peers'].get(peers[side]) for side in (FIRST, SECOND)]
+    digests = [Digests(path, state['records']) for path, state in zip(paths, states)]
+    try:
+        same = common_prefix(digests[FIRST], digests[SECOND])
+        for side in (FIRST, SECOND):
+            if same and same == digests[side].count and digests[side].entries(same - 1, same)[0].start >= \
+                    states[side]['tail']:
+                same -= 1
+        suffixes = [digests[side].entries(same, digests[side].count) for side in (FIRST, SECOND)]
+        # what each side has since the last sync, or everything it has after the records both start with if it can't
+        # be told: a side that still matches the last sync while the other one doesn't only adds what it appended
+        starts = [same, same]
+        if bases[FIRST] is not None and bases[SECOND] is not None:
+            matching = [matches_base(digests[side], bases[side]) for side in (FIRST, SECOND)]
+            for side in (FIRST, SECOND):
+                if matching[side] and not matching[1 - side]:
+                    starts[side] = max(bases[side][0], same)
+    finally:
+        for side_digests in digests:
+            side_digests.close()
+
+    new = [[entry for entry in suffixes[side][starts[side] - same:] if entry.date != BLANK_DATE]
+           for side in (FIRST, SECOND)]
+    merged, conflicts = merge_records(new[FIRST], new[SECOND])
+    merged_digests = {entry.digest for side, entry in merged}
+    plans = [plan_side(suffixes[side], merged, states[side]['tail']) for side in (FIRST, SECOND)]
+
+    # every record to be written is read before either logger is touched, from the logger it is written to if that
+    # already has it further on (it is only written again because something before it changed)
+    writes = []
+    copies = []
+    copied = 0
+    for side in (FIRST, SECOND):
+        kept, done = plans[side]
+        own = {entry.digest: entry for entry in suffixes[side][kept:]}
+        sources = [(side, own[entry.digest]) if entry.digest in own else (source, entry)
+                   for source, entry in merged[done:]]
+        texts = [None] * len(sources)
+        for source in (FIRST, SECOND):
+            positions = [position for position in range(len(sources)) if sources[position][0] == source]
+            raws = read_raws(paths[source], [sources[position][1] for position in positions])
+            for position, raw in zip(positions, raws):
+                texts[position] = decode_record(raw) + '---'
+                if source != side:
+                    copied += len(raw)
+        writes.append(texts)
+        copies.append(sum(1 for source, entry in sources if source != side))
+    conflict_raws = read_raws(other, conflicts)
+
+    # the sessions that lost a conflict are saved before either logger is touched
+    if conflicts:
+        file_handle = open(conflicts_path(other), 'ab')
+        file_handle.write(b''.join(encode_record(decode_record(raw) + '---') for raw in conflict_raws))
+        file_handle.flush()
+        os.fsync(file_handle.fileno())
+        file_handle.close()
+
+    deleted = 0
+    accounted = merged_digests | {entry.digest for entry in conflicts}
+    for side in (FIRST, SECOND):
+        kept, done = plans[side]
+        cut = [entry for entry in suffixes[side][kept:] if entry.date != BLANK_DATE]
+        removed = sum(1 for entry in cut if entry.digest not in accounted)
+        if removed:
+            # records that are only moved are safe in the journal (see rewrite_log()), these aren't written again
+            create_backup(paths[side], 'before syncing with {}'.format(paths[1 - side]))
+            deleted += removed
+        if cut:
+            delete_records = [record for record in scan_records(paths[side], suffixes[side][kept].start) if record[2]]
+            if writes[side]:
+                rewrite_log(paths[side], delete_records, writes[side])
+            else:
+                truncate_log(paths[side], delete_records)
+        elif writes[side]:
+            commit_batch(paths[side], writes[side])
+        if cut or writes[side]:
+            # the digests of what was kept still hold, only the records written after it are hashed
+            index = load_index(paths[side])
+            extend_digests(paths[side], index, same + kept)
+            states[side] = save_sync_state(paths[side], index, states[side]['peers'])
+
+    # both loggers are the same now, which is the base of the next sync between them
+    for side in (FIRST, SECOND):
+        side_digests = Digests(paths[side], states[side]['records'])
+        try:
+            chain = side_digests.chain(side_digests.count)
+        finally:
+            side_digests.close()
+        base = [side_digests.count, chain.hex()]
+        if states[side]['peers'].get(peers[side]) != base:
+            states[side]['peers'][peers[side]] = base
+            write_sync(paths[side], states[side])
+
+    headers = [decode_record(raw).strip().split('\n')[0] for raw in conflict_raws]
+    return SyncReport(copies[SECOND], copies[FIRST], deleted, headers, copied)
@@ -0,0 +1,220 @@
+"""
+watching the logger for changes made outside of FitnessLogManager
+
+The logger can be edited by hand or synced from another machine at any time, so whatever is cached about it can go
+stale. refresh_logger() catches the cache up with the file: the index compares the logger with the checksums of the
+records it indexed (one checksum over everything before the tail first, which is all it takes when the logger was
+only appended to) and only the records from the first one that changed are parsed again. A LogWatcher does that in
+a background thread as soon as the logger changes, told by inotify on Linux and checking every second anywhere
+else, so by the time a menu action starts there is usually nothing left to catch up. Actions run inside the watcher
+(with watcher: ...), which catches up whatever it hasn't yet and keeps the cache from changing under the action.
+"""
+
+import datetime
+import os
+import struct
+import sys
+import threading
+from typing import List, Optional, NamedTuple
+
+from .records import SESSION, file_signature
+from .cache import parse_cache
+from .index import RECORD_START, RECORD_END, RECORD_KIND, RECORD_DATE, load_index, catch_up_index
+from .database import is_database
+
+POLL_INTERVAL = 1.0
+SETTLE_TIME = 0.05  # how long to let a burst of writes finish before catching up with them
+
+# from <sys/inotify.h>
+IN_MODIFY = 0x2
+IN_ATTRIB = 0x4
+IN_CLOSE_WRITE = 0x8
+IN_MOVED_TO = 0x80
+IN_CREATE = 0x100
+IN_DELETE = 0x200
+IN_CLOEXEC = 0o2000000
+IN_NONBLOCK = 0o4000
+WATCH_MASK = IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE | IN_DELETE
+EVENT_HEADER = struct.Struct('iIII')  # wd, mask, cookie, len, followed by len bytes of name
+EVENT_BUFFER_SIZE = 64 * 1024
+
+
+class StaleRecord(NamedTuple):
+    """
+    a record of the logger as it was before it was changed, rebuilt from its index entry (and from its text in the
+    parsed lists for the header of a session, if they are cached), which is all the cache needs to take it out again
+    """
+    start: int
+    end: int
+    kind: str
+    date: Optional[datetime.date]
+    header: Optional[str]
+
+
+def stale_records(entries: List[list], texts: Optional[List[str]]) -> List[StaleRecord]:
+    """
+    helper function for refresh_logger() that turns the index entries dropped by catch_up_index() into records
+    """
+    records = []
+    for number, entry in enumerate(entries):
+        date = None if entry[RECORD_DATE] is None else datetime.date.fromordinal(entry[RECORD_DATE])
+        header = None
+        if texts is not None and entry[RECORD_KIND] == SESSION:
+            header = next(line for line in texts[number].split('\n') if line)
+        records.append(StaleRecord(entry[RECORD_START], entry[RECORD_END], entry[RECORD_KIND], date, header))
+    return records
+
+
+def refresh_logger(filename: str) -> bool:
+    """
+    catches whatever is cached about the logger up with the file as it is now, parsing only the records from the
+    first one that changed since it was cached (and loading the index, caught up the same way, if nothing was).
+    Returns True if the logger had changed.
+    """
+    if is_database(filename) or not os.path.exists(filename):
+        return False
+    with parse_cache.lock:
+        entry = parse_cache.cached(filename)
+        if entry is not None and entry[0] == file_signature(filename):
+            return False
+        if entry is None or 'index' not in entry[1]:
+            load_index(filename)
+            return True
+
+        old_signature, state = entry
+        index = state['index']
+        if 'parsed' in state and len(state['parsed'][2]) != len(index['records']):
+            del state['parsed']
+        removed, offset = catch_up_index(filename, index)
+        texts = None
+        if 'parsed' in state:
+            everything_list = state['parsed'][2]
+            texts = everything_list[len(everything_list) - len(removed):]
+        parse_cache.rewritten(filename, old_signature, index['signature'], stale_records(removed, texts), offset)
+    return True
+
+
+def open_inotify(directory: str) -> Optional[int]:
+    """
+    returns a non-blocking inotify file descriptor watching every file in the directory, or None if inotify can't
+    be used (anything but Linux), in which case the logger is checked every POLL_INTERVAL seconds instead
+    """
+    if not sys.platform.startswith('linux'):
+        return None
+    import ctypes  # only needed once something is watched
+
+    try:
+        libc = ctypes.CDLL(None, use_errno=True)
+        inotify_init1 = libc.inotify_init1
+        inotify_add_watch = libc.inotify_add_watch
+    except (OSError, AttributeError):
+        return None
+    inotify_init1.argtypes = [ctypes.c_int]
+    inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+    descriptor = inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+    if descriptor < 0:
+        return None
+    if inotify_add_watch(descriptor, os.fsencode(directory), WATCH_MASK) < 0:
+        os.close(descriptor)
+        return None
+    return descriptor
+
+
+def event_names(data: bytes) -> List[str]:
+    """
+    returns the name of the file every inotify event read from the descriptor is about
+    """
+    names = []
+    position = 0
+    while position + EVENT_HEADER.size <= len(data):
+        length = EVENT_HEADER.unpack_from(data, position)[3]
+        position += EVENT_HEADER.size
+        names.append(os.fsdecode(data[position:position + length].rstrip(b'\0')))
+        position += length
+    return names
+
+
+class LogWatcher:
+    """
+    keeps the cache of one logger current from a background thread, catching it up every time the file changes.
+    Anything that reads the cache should run inside the watcher (with watcher: ...), which catches up whatever it
+    hasn't yet and holds off the background thread until it is done.
+    """
+
+    def __init__(self, filename: str, poll_interval: float = POLL_INTERVAL):
+        self.filename = os.path.abspath(filename)
+        self.poll_interval = poll_interval
+        self.lock = threading.Lock()
+        self.stopping = threading.Event()
+        self.inotify = None
+        self.selector = None
+        self.thread = None
+
+    def __enter__(self):
+        self.lock.acquire()
+        try:
+            refresh_logger(self.filename)
+        except BaseException:
+            self.lock.release()
+            raise
+        return self
+
+    def __exit__(self, *exception):
+        self.lock.release()
+        return False
+
+    def start(self) -> 'LogWatcher':
+        self.inotify = open_inotify(os.path.dirname(self.filename))
+        if self.inotify is not None:
+            import selectors
+
+            self.selector = selectors.DefaultSelector()
+            self.selector.register(self.inotify, selectors.EVENT_READ)
+        self.thread = threading.Thread(target=self.run, name='LogWatcher', daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self) -> None:
+        """
+        stops the background thread (which mustn't be called from inside the watcher, the thread may be waiting on it)
+        """
+        self.stopping.set()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+        if self.inotify is not None:
+            self.selector.close()
+            os.close(self.inotify)
+            self.inotify = None
+
+    def wait(self) -> bool:
+        """
+        waits until the logger might have changed, or for at most poll_interval seconds. Returns False if it didn't.
+        """
+        if self.inotify is None:
+            return not self.stopping.wait(self.poll_interval)
+        if not self.selector.select(self.poll_interval):
+            return False
+        name = os.path.basename(self.filename)
+        changed = False
+        while True:
+            try:
+                data = os.read(self.inotify, EVENT_BUFFER_SIZE)
+            except BlockingIOError:
+                break
+            changed = changed or name in event_names(data)
+        return changed
+
+    def run(self) -> None:
+        while not self.stopping.is_set():
+            if not self.wait():
+                continue
+            # let whoever is writing finish before catching up with it
+            if self.stopping.wait(SETTLE_TIME):
+                break
+            with self.lock:
+                try:
+                    refresh_logger(self.filename)
+                except (OSError, ValueError):
+                    # e.g. the logger was being replaced, the next change (or action) catches up again
+                    pass
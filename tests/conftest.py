@@ -0,0 +1,63 @@
+"""
+fixtures shared by the tests: a small logger made from the starter program, in a folder of its own
+"""
+
+import os
+import shutil
+import sys
+
+import pytest
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+from fitnesslog import parse_cache, append_to_log, format_session  # noqa: E402
+
+STARTER_FILE = os.path.join(REPO_DIR, 'src', 'starter_file.txt')
+SESSIONS = 5
+
+
+def session(day: int, reps: str = '8 8 8, 8 8 8') -> str:
+    """
+    returns the text of a session on the given day of January 2024, with the same reps for every section
+    """
+    return format_session('Monday {:02d}/01/2024'.format(day), None, [reps] * 4)
+
+
+def read_bytes(filename: str) -> bytes:
+    file_handle = open(filename, 'rb')
+    data = file_handle.read()
+    file_handle.close()
+    return data
+
+
+def entries(filename: str) -> list:
+    """
+    returns the records of a logger as they read, without the blank lines around them
+    """
+    return [record.strip() for record in read_bytes(filename).decode('utf-8').split('---') if record.strip()]
+
+
+@pytest.fixture(autouse=True)
+def empty_parse_cache():
+    # the cache is keyed by file name, and every test reuses the same names in its own folder
+    parse_cache.clear()
+    yield
+    parse_cache.clear()
+
+
+def make_logger(directory: str) -> str:
+    os.makedirs(directory, exist_ok=True)
+    filename = os.path.join(directory, 'my_fitness_logs.txt')
+    shutil.copyfile(STARTER_FILE, filename)
+    for day in range(1, SESSIONS + 1):
+        append_to_log(filename, session(day))
+    return filename
+
+
+@pytest.fixture
+def logger(tmp_path) -> str:
+    """
+    a .txt logger holding the starter program and SESSIONS sessions, a day apart
+    """
+    return make_logger(str(tmp_path / 'first'))
@@ -0,0 +1,66 @@
+import numpy
+
+from fitnesslog import append_to_log, format_session, select_entries, remove_entries, load_rep_store
+from fitnesslog.analytics import build_rep_store
+
+from conftest import session, SESSIONS
+
+ROWS = 4 * 2 * 3  # every session has 4 lines of 2 exercises of 3 sets
+VOLUME = ROWS * 8
+
+
+def skipped(day: int) -> str:
+    return format_session('Monday {:02d}/01/2024'.format(day), "(SKIPPED)", [])
+
+
+def assert_same_columns(store, fresh) -> None:
+    columns = store.columns()
+    for name, column in fresh.columns().items():
+        assert numpy.array_equal(columns[name], column)
+
+
+def test_rep_store_has_a_row_per_set(logger):
+    store = load_rep_store(logger)
+    assert len(store) == SESSIONS * ROWS
+    columns = store.columns()
+    assert sorted(set(columns['section'].tolist())) == [0, 1, 2, 3]
+    assert sorted(set(columns['exercise'].tolist())) == [0, 1]
+    assert sorted(set(columns['set'].tolist())) == [0, 1, 2]
+    assert not columns['skipped'].any()
+
+
+def test_rep_store_volume_queries(logger):
+    dates, totals = load_rep_store(logger).session_volume()
+    assert [str(date) for date in dates] == ['2024-01-0{}'.format(day) for day in range(1, SESSIONS + 1)]
+    assert totals.tolist() == [VOLUME] * SESSIONS
+
+    weeks, totals = load_rep_store(logger).weekly_volume()
+    assert [str(week) for week in weeks] == ['2024-01-01']
+    assert totals.tolist() == [VOLUME * SESSIONS]
+
+    sections, exercises, best = load_rep_store(logger).best_sets()
+    assert len(best) == 8
+    assert best.tolist() == [8] * 8
+
+
+def test_skipped_sessions_are_left_out_of_the_queries(logger):
+    append_to_log(logger, skipped(SESSIONS + 1))
+    store = load_rep_store(logger)
+    assert len(store) == SESSIONS * ROWS + 1
+    assert store.columns()['skipped'].sum() == 1
+    assert len(store.done()['reps']) == SESSIONS * ROWS
+    dates, totals = store.session_volume()
+    assert len(dates) == SESSIONS
+
+
+def test_cached_rep_store_follows_appends_and_removals(logger):
+    store = load_rep_store(logger)
+    append_to_log(logger, session(SESSIONS + 1, '9 9 9, 9 9 9'))
+    append_to_log(logger, skipped(SESSIONS + 2))
+    assert load_rep_store(logger) is store
+    assert_same_columns(store, build_rep_store(logger))
+
+    remove_entries(logger, select_entries(logger, 2))
+    assert load_rep_store(logger) is store
+    assert len(store) == SESSIONS * ROWS
+    assert_same_columns(store, build_rep_store(logger))
@@ -0,0 +1,157 @@
+import datetime
+import os
+
+import pytest
+
+from fitnesslog import append_to_log, format_session, select_entries, remove_entries, parse_logger, create_backup, \
+    list_backups, restore_backup, backups_dir, BACKUP_KEEP
+from fitnesslog.backups import read_points, chunk_path, chunk_spans, MIN_CHUNK_SIZE, MAX_CHUNK_SIZE, POINTS_NAME
+
+from conftest import session, read_bytes, entries, SESSIONS
+
+
+def test_restore_backup_puts_the_logger_back(logger):
+    before = read_bytes(logger)
+    point = create_backup(logger, 'before appending')
+    append_to_log(logger, session(SESSIONS + 1))
+    assert read_bytes(logger) != before
+
+    restored = restore_backup(logger, point.number)
+    assert restored.number == point.number
+    assert read_bytes(logger) == before
+
+
+def test_restore_backup_can_be_undone(logger):
+    point = create_backup(logger)
+    append_to_log(logger, session(SESSIONS + 1))
+    after = read_bytes(logger)
+
+    restore_backup(logger, point.number)
+    undo = list_backups(logger)[-1]
+    assert undo.reason == 'before restoring {}'.format(point.number)
+    restore_backup(logger, undo.number)
+    assert read_bytes(logger) == after
+
+
+def test_create_backup_of_an_unchanged_logger_returns_the_last_restore_point(logger):
+    point = create_backup(logger)
+    assert create_backup(logger) == point
+    assert len(list_backups(logger)) == 1
+
+
+def test_create_backup_only_writes_what_was_appended(logger):
+    first = create_backup(logger)
+    append_to_log(logger, session(SESSIONS + 1))
+    second = create_backup(logger)
+    assert second.number == first.number + 1
+    assert second.size == os.path.getsize(logger)
+    assert second.written < second.size
+
+
+def test_create_backup_drops_the_oldest_restore_points(logger):
+    for day in range(SESSIONS + 1, SESSIONS + 5):
+        create_backup(logger, keep=2)
+        append_to_log(logger, session(day))
+    create_backup(logger)
+    points = list_backups(logger)
+    assert len(points) == 2
+    assert [point.number for point in points] == [4, 5]
+    # the kept restore points still restore, whatever chunks went with the dropped ones
+    restore_backup(logger, points[0].number)
+    assert entries(logger)[-1].startswith('Monday {:02d}/01/2024'.format(SESSIONS + 3))
+
+
+def test_restore_backup_of_an_unknown_restore_point(logger):
+    create_backup(logger)
+    with pytest.raises(ValueError):
+        restore_backup(logger, 99)
+
+
+def test_restore_backup_of_a_damaged_restore_point_leaves_the_logger_alone(logger):
+    point = create_backup(logger)
+    append_to_log(logger, session(SESSIONS + 1))
+    after = read_bytes(logger)
+    digest, length = read_points(logger)['points'][-1]['chunks'][0]
+    file_handle = open(chunk_path(logger, digest), 'r+b')
+    file_handle.write(b'X')
+    file_handle.close()
+
+    with pytest.raises(ValueError):
+        restore_backup(logger, point.number)
+    assert read_bytes(logger) == after
+    assert not [name for name in os.listdir(os.path.dirname(logger)) if name.endswith('.restoring')]
+    assert os.path.isdir(backups_dir(logger))
+
+
+def long_logger(filename: str, sessions: int = 3000) -> None:
+    """
+    appends enough sessions to the logger, all different, for its backups to be split into several chunks
+    """
+    first = datetime.date(2016, 1, 4)
+    texts = []
+    for number in range(sessions):
+        date = first + datetime.timedelta(days=number)
+        reps = '{0} {0} {1}, {0} {1} {1}'.format(5 + number % 4, 5 + number % 7)
+        texts.append(format_session(date.strftime('%A %d/%m/%Y'), None, [reps] * 4))
+    file_handle = open(filename, 'ab')
+    file_handle.write(''.join(texts).encode('utf-8'))
+    file_handle.close()
+
+
+def test_backups_are_split_into_chunks_at_record_boundaries(logger):
+    long_logger(logger)
+    data = read_bytes(logger)
+    spans = chunk_spans(data, 0, len(data))
+    assert len(spans) > 3
+    assert spans[0][0] == 0 and spans[-1][1] == len(data)
+    for (start, end), (next_start, next_end) in zip(spans, spans[1:]):
+        assert end == next_start
+        assert data[:end].endswith(b'---')
+        assert MIN_CHUNK_SIZE <= end - start <= MAX_CHUNK_SIZE
+    # chunks end where the records say, so splitting from any chunk boundary gives the same chunks
+    assert chunk_spans(data, spans[2][0], len(data)) == spans[2:]
+
+
+def test_a_backup_after_an_edit_only_writes_the_chunks_it_changed(logger):
+    long_logger(logger)
+    first = create_backup(logger)
+    data = read_bytes(logger)
+    edited = data.replace(b'Friday 08/07/2016\n', b'Friday 08/07/2016\nfelt strong\n')
+    assert edited != data
+    file_handle = open(logger, 'wb')
+    file_handle.write(edited)
+    file_handle.close()
+
+    second = create_backup(logger)
+    assert second.chunks == first.chunks
+    assert 0 < second.written < first.written // 3
+    stored = [name for folder, folders, names in os.walk(backups_dir(logger)) for name in names
+              if name != POINTS_NAME]
+    assert len(stored) == first.chunks + 1
+
+    restore_backup(logger, first.number)
+    assert read_bytes(logger) == data
+    restore_backup(logger, second.number)
+    assert read_bytes(logger) == edited
+
+
+def test_removing_entries_makes_a_restore_point_first(logger):
+    before = read_bytes(logger)
+    remove_entries(logger, select_entries(logger, 2))
+    point = list_backups(logger)[-1]
+    assert point.reason == 'before removing 2 entries'
+    assert point.size == len(before)
+    restore_backup(logger, point.number)
+    assert read_bytes(logger) == before
+    assert 'Monday {:02d}/01/2024'.format(SESSIONS) in parse_logger(logger)[1]
+
+
+def test_create_backup_keeps_backup_keep_restore_points_by_default(logger):
+    for day in range(SESSIONS + 1, SESSIONS + BACKUP_KEEP + 3):
+        create_backup(logger)
+        append_to_log(logger, session(day))
+    assert len(list_backups(logger)) == BACKUP_KEEP
+    create_backup(logger, keep=3)
+    append_to_log(logger, session(SESSIONS + BACKUP_KEEP + 3))
+    create_backup(logger)
+    assert len(list_backups(logger)) == 3
@@ -0,0 +1,67 @@
+import datetime
+import gzip
+import os
+
+from fitnesslog import append_to_log, format_session, parse_many, find_loggers, split_points
+
+from conftest import read_bytes, make_logger, SESSIONS
+
+
+def gzipped(filename: str, archive: str) -> str:
+    file_handle = gzip.open(archive, 'wb')
+    file_handle.write(read_bytes(filename))
+    file_handle.close()
+    return archive
+
+
+def summary(report) -> tuple:
+    return [file_summary[1:] for file_summary in report.files], report.exercises
+
+
+def test_parse_many_summarises_a_logger(logger):
+    report = parse_many([logger], workers=1)
+    file_summary, = report.files
+    assert (file_summary.records, file_summary.programs, file_summary.sessions, file_summary.skipped) == \
+        (SESSIONS + 1, 1, SESSIONS, 0)
+    assert file_summary.first_date == datetime.date(2024, 1, 1).toordinal()
+    assert file_summary.last_date == datetime.date(2024, 1, SESSIONS).toordinal()
+    assert file_summary.reps == SESSIONS * 4 * 6 * 8
+    assert report.exercises['Pull-ups'] == [SESSIONS * 24, SESSIONS * 3, 8, SESSIONS]
+    assert len(report.exercises) == 8
+
+
+def test_split_points_end_right_after_a_separator(logger):
+    parts = split_points(logger, split_size=100)
+    assert len(parts) > 2
+    assert parts[0][0] == 0 and parts[-1][1] is None
+    data = read_bytes(logger)
+    for (start, end), (next_start, next_end) in zip(parts, parts[1:]):
+        assert end == next_start
+        assert data[:end].endswith(b'---')
+
+
+def test_split_loggers_and_workers_give_the_same_report(logger):
+    append_to_log(logger, format_session('Saturday 06/01/2024', "(SKIPPED)", []))
+    whole = summary(parse_many([logger], workers=1))
+    assert whole[0][0][3] == 1
+    assert summary(parse_many([logger], workers=1, split_size=100)) == whole
+    assert summary(parse_many([logger], workers=2, split_size=100)) == whole
+
+
+def test_archived_loggers_are_read_whole(logger, tmp_path):
+    archive = gzipped(logger, str(tmp_path / 'my_fitness_logs_2023.txt.gz'))
+    assert split_points(archive, split_size=100) == [(0, None)]
+    assert summary(parse_many([archive], workers=1)) == summary(parse_many([logger], workers=1))
+
+
+def test_find_loggers_walks_folders(logger, tmp_path):
+    second = make_logger(str(tmp_path / 'first' / 'old'))
+    archive = gzipped(logger, str(tmp_path / 'first' / 'my_fitness_logs_2023.txt.gz'))
+    open(str(tmp_path / 'first' / 'notes.txt'), 'w').close()
+    assert find_loggers([str(tmp_path / 'first')]) == [logger, archive, second]
+    assert find_loggers([logger]) == [logger]
+
+    report = parse_many(find_loggers([str(tmp_path)]), workers=1)
+    assert [os.path.basename(file_summary.filename) for file_summary in report.files] == \
+        ['my_fitness_logs.txt', 'my_fitness_logs_2023.txt.gz', 'my_fitness_logs.txt']
+    assert report.exercises['Pull-ups'][3] == 3 * SESSIONS
@@ -0,0 +1,54 @@
+import os
+
+from fitnesslog import parse_cache, append_to_log, select_entries, remove_entries, parse_logger, ParseCache
+from fitnesslog.cache import build_parsed_state
+
+from conftest import session, make_logger, SESSIONS
+
+
+def test_parse_logger_reads_an_unchanged_logger_once(logger):
+    first = parse_logger(logger)
+    misses = parse_cache.misses
+    assert parse_logger(logger) is not None
+    assert parse_cache.misses == misses
+    assert parse_cache.hits > 0
+    assert parse_logger(logger) == first
+
+
+def test_an_edit_behind_our_back_is_noticed(logger):
+    parse_logger(logger)
+    file_handle = open(logger, 'a')
+    file_handle.write(session(SESSIONS + 1))
+    file_handle.close()
+    assert 'Monday {:02d}/01/2024'.format(SESSIONS + 1) in parse_logger(logger)[1]
+
+
+def test_appending_updates_the_parsed_lists_in_place(logger):
+    parse_logger(logger)
+    misses = parse_cache.misses
+    append_to_log(logger, session(SESSIONS + 1))
+    parsed = parse_logger(logger)
+    assert parse_cache.misses == misses
+    assert parse_cache.state(logger)['parsed'] == build_parsed_state(logger)
+    assert len(parsed[1]) == SESSIONS + 1
+
+
+def test_removing_a_session_uncovers_an_older_one_with_the_same_header(logger):
+    append_to_log(logger, session(1, '1 1 1, 1 1 1'))
+    assert parse_logger(logger)[1]['Monday 01/01/2024'][0] == '1 1 1, 1 1 1'
+    remove_entries(logger, select_entries(logger, 1))
+    assert parse_logger(logger)[1]['Monday 01/01/2024'][0] == '8 8 8, 8 8 8'
+    assert parse_logger(logger) == build_parsed_state(logger)[:3]
+
+
+def test_the_least_recently_used_logger_is_dropped(tmp_path):
+    cache = ParseCache(max_entries=2)
+    loggers = [make_logger(str(tmp_path / name)) for name in ('first', 'second', 'third')]
+    for filename in loggers:
+        cache.get(filename, 'parsed', build_parsed_state)
+    assert cache.cached(loggers[0]) is None
+    assert [cache.cached(filename) is not None for filename in loggers[1:]] == [True, True]
+
+    cache.resize(1)
+    assert cache.cached(loggers[1]) is None
+    assert os.path.abspath(loggers[2]) in cache.entries
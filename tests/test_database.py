@@ -0,0 +1,68 @@
+import os
+
+import pytest
+
+from fitnesslog import append_to_log, select_entries, remove_entries, removed_path, import_text_log, \
+    export_text_log, parse_logger, rotate_segments
+from fitnesslog import database
+
+from conftest import session, read_bytes, SESSIONS
+
+
+@pytest.fixture
+def sqlite_logger(logger) -> str:
+    """
+    the logger imported into an SQLite logger beside it
+    """
+    filename = os.path.join(os.path.dirname(logger), 'my_fitness_logs.db')
+    import_text_log(logger, filename)
+    return filename
+
+
+def exported(database_file: str) -> bytes:
+    filename = database_file + '.txt'
+    export_text_log(database_file, filename)
+    return read_bytes(filename)
+
+
+def test_import_and_export_give_back_the_same_logger(logger, sqlite_logger):
+    assert exported(sqlite_logger) == read_bytes(logger)
+    assert parse_logger(sqlite_logger) == parse_logger(logger)
+
+
+def test_import_reads_the_segments_of_a_rotated_logger(logger, tmp_path):
+    before = read_bytes(logger)
+    rotate_segments(logger, keep_days=0)
+    filename = str(tmp_path / 'my_fitness_logs.db')
+    import_text_log(logger, filename)
+    assert exported(filename) == before
+
+
+def test_appending_writes_the_same_bytes_as_the_text_logger(logger, sqlite_logger, monkeypatch):
+    monkeypatch.setattr(os, 'linesep', '\r\n')
+    append_to_log(logger, session(SESSIONS + 1))
+    append_to_log(sqlite_logger, session(SESSIONS + 1))
+    assert b'\r\n' in read_bytes(logger)
+    assert exported(sqlite_logger) == read_bytes(logger)
+
+
+def test_removed_entries_are_kept_beside_an_sqlite_logger(logger, sqlite_logger):
+    before = exported(sqlite_logger)
+    remove_entries(sqlite_logger, select_entries(sqlite_logger, 2))
+    after = exported(sqlite_logger)
+    assert len(parse_logger(sqlite_logger)[1]) == SESSIONS - 2
+    assert after + read_bytes(removed_path(sqlite_logger)) == before
+
+
+def test_a_failed_import_leaves_the_database_as_it_was(logger, sqlite_logger, monkeypatch):
+    before = exported(sqlite_logger)
+
+    def broken_history(filename):
+        yield b'\nMonday 01/01/2024\n'
+        raise OSError("the logger went away")
+
+    monkeypatch.setattr(database, 'history_raw_records', broken_history)
+    with pytest.raises(OSError):
+        import_text_log(logger, sqlite_logger)
+    assert exported(sqlite_logger) == before
+    assert not os.path.exists(sqlite_logger + '.tmp')
@@ -0,0 +1,58 @@
+import datetime
+
+from fitnesslog import append_to_log, select_entries, remove_entries, load_date_index, sessions_between, \
+    sessions_in_last_days, sessions_on_weekday, import_text_log
+
+from conftest import session, SESSIONS
+
+
+def day(number: int) -> datetime.date:
+    return datetime.date(2024, 1, number)
+
+
+def dates(sessions: list) -> list:
+    return [record.date.day for record in sessions]
+
+
+def test_sessions_between_includes_both_ends(logger):
+    assert dates(sessions_between(logger, day(2), day(4))) == [2, 3, 4]
+    assert dates(sessions_between(logger, day(6), day(9))) == []
+    assert sessions_between(logger, day(1), day(1))[0].text.strip().startswith('Monday 01/01/2024')
+
+
+def test_sessions_in_last_days_counts_today(logger):
+    assert dates(sessions_in_last_days(logger, 3, today=day(SESSIONS))) == [3, 4, 5]
+    assert dates(sessions_in_last_days(logger, 1, today=day(SESSIONS + 1))) == []
+
+
+def test_sessions_on_weekday_by_name_or_number(logger):
+    # the headers all say monday, the weekday comes from the date itself
+    assert dates(sessions_on_weekday(logger, 'wednesday')) == [3]
+    assert dates(sessions_on_weekday(logger, 0)) == [1]
+    assert dates(sessions_between(logger, day(1), day(31), weekday=4)) == [5]
+
+
+def test_sessions_logged_out_of_order_come_back_sorted(logger):
+    append_to_log(logger, session(2, '9 9 9, 9 9 9'))
+    sessions = sessions_between(logger, day(1), day(3))
+    assert dates(sessions) == [1, 2, 2, 3]
+    assert sessions[1].reps[0] == '8 8 8, 8 8 8'
+    assert sessions[2].reps[0] == '9 9 9, 9 9 9'
+
+
+def test_cached_date_index_follows_appends_and_removals(logger):
+    date_index = load_date_index(logger)
+    append_to_log(logger, session(SESSIONS + 1))
+    assert load_date_index(logger) is date_index
+    assert len(date_index) == SESSIONS + 1
+
+    remove_entries(logger, select_entries(logger, 2))
+    assert load_date_index(logger) is date_index
+    assert dates(sessions_between(logger, day(1), day(31))) == list(range(1, SESSIONS))
+
+
+def test_sqlite_loggers_answer_the_same(logger, tmp_path):
+    database = str(tmp_path / 'my_fitness_logs.db')
+    import_text_log(logger, database)
+    assert dates(sessions_between(database, day(2), day(4))) == [2, 3, 4]
+    assert dates(sessions_on_weekday(database, 'Friday')) == [5]
@@ -0,0 +1,87 @@
+import csv
+import datetime
+import json
+import sys
+
+import pytest
+
+from fitnesslog import append_to_log, format_session, export_log, load_export, EXPORT_FORMATS
+
+from conftest import SESSIONS
+
+SETS = 4 * 2 * 3  # every session has 4 lines of 2 exercises of 3 sets
+
+
+@pytest.fixture
+def commented(logger) -> str:
+    """
+    the logger with a session with a comment and a skipped session after the others
+    """
+    append_to_log(logger, format_session('Saturday 06/01/2024', 'felt strong', ['9 9 9, 9 9 9'] * 4))
+    append_to_log(logger, format_session('Sunday 07/01/2024', '(SKIPPED)', []))
+    return logger
+
+
+def test_export_csv(commented, tmp_path):
+    path = str(tmp_path / 'export.csv')
+    assert export_log(commented, path) == (SESSIONS + 1) * SETS + 1
+    file_handle = open(path, newline='', encoding='utf-8')
+    rows = list(csv.DictReader(file_handle))
+    file_handle.close()
+    assert len(rows) == (SESSIONS + 1) * SETS + 1
+    first = rows[0]
+    assert (first['date'], first['weekday'], first['program'], first['exercise'], first['set'], first['reps']) == \
+        ('2024-01-01', 'Monday', '1', 'Pull-ups', '1', '8')
+    assert first['section'].startswith('First Pair')
+    assert {row['comment'] for row in rows[-SETS - 1:-1]} == {'felt strong'}
+    assert (rows[-1]['date'], rows[-1]['reps'], rows[-1]['skipped']) == ('2024-01-07', '', '1')
+
+
+def test_export_jsonl(commented, tmp_path):
+    path = str(tmp_path / 'export.jsonl')
+    assert export_log(commented, path) == 1 + (SESSIONS + 1) * SETS + 1
+    file_handle = open(path, encoding='utf-8')
+    lines = [json.loads(line) for line in file_handle]
+    file_handle.close()
+    program = lines[0]
+    assert (program['type'], program['program']) == ('program', 1)
+    assert program['sections'][0]['exercises'][0]['rep_range'] == [5, 8, 'reps']
+    assert {line['type'] for line in lines[1:]} == {'set'}
+    assert sum(line['reps'] or 0 for line in lines[1:]) == SESSIONS * SETS * 8 + SETS * 9
+    assert lines[-1]['skipped'] is True
+
+
+def assert_binary_export(exported) -> None:
+    sessions, sets = exported.sessions, exported.sets
+    assert len(sessions['date']) == SESSIONS + 2
+    assert [int(date) for date in sessions['date']][:2] == \
+        [datetime.date(2024, 1, day).toordinal() for day in (1, 2)]
+    assert [int(skipped) for skipped in sessions['skipped']] == [0] * (SESSIONS + 1) + [1]
+    assert len(sets['reps']) == (SESSIONS + 1) * SETS
+    assert sum(int(reps) for reps in sets['reps']) == SESSIONS * SETS * 8 + SETS * 9
+    assert int(sets['session'][-1]) == SESSIONS
+    assert exported.comment(SESSIONS) == 'felt strong'
+    assert exported.comment(0) == ''
+    assert exported.programs[0]['sections'][3]['kind'] == 'triplet'
+
+
+def test_export_binary_loads_back(commented, tmp_path):
+    path = str(tmp_path / ('export' + EXPORT_FORMATS['binary']))
+    assert export_log(commented, path) == (SESSIONS + 1) * SETS
+    assert_binary_export(load_export(path))
+
+
+def test_export_binary_loads_back_without_numpy(commented, tmp_path, monkeypatch):
+    path = str(tmp_path / 'export.bin')
+    export_log(commented, path, 'binary')
+    monkeypatch.setitem(sys.modules, 'numpy', None)
+    assert_binary_export(load_export(path))
+
+
+def test_export_log_refuses_unknown_formats(logger, tmp_path):
+    with pytest.raises(ValueError):
+        export_log(logger, str(tmp_path / 'export.xlsx'))
+    with pytest.raises(ValueError):
+        export_log(logger, str(tmp_path / 'export.csv'), 'xlsx')
+    with pytest.raises(ValueError):
+        load_export(logger)
@@ -0,0 +1,136 @@
+import os
+
+from fitnesslog import parse_cache, append_to_log, select_entries, remove_entries, index_path, load_index, \
+    build_index, catch_up_index, return_current_program
+from fitnesslog.index import HEADER, ENTRY, RECORD_START, RECORD_END, RECORD_KIND, read_index
+
+from conftest import session, read_bytes, SESSIONS
+
+
+def stored_index(filename: str) -> dict:
+    """
+    returns the index stored beside the logger, building it first if there is none yet
+    """
+    load_index(filename)
+    return read_index(filename)
+
+
+def rewrite(filename: str, data: bytes) -> None:
+    file_handle = open(filename, 'wb')
+    file_handle.write(data)
+    file_handle.close()
+
+
+def assert_up_to_date(filename: str, index: dict) -> None:
+    fresh = build_index(filename)
+    assert index['records'] == fresh['records']
+    assert index['tail'] == fresh['tail']
+    assert index['signature'] == fresh['signature']
+    assert read_index(filename) == index
+
+
+def test_catch_up_index_after_an_append_only_indexes_the_new_record(logger):
+    index = stored_index(logger)
+    records = len(index['records'])
+    tail = index['tail']
+    rewrite(logger, read_bytes(logger) + session(SESSIONS + 1).encode('utf-8'))
+
+    removed, offset = catch_up_index(logger, index)
+    assert removed == []
+    assert offset == tail
+    assert len(index['records']) == records + 1
+    assert_up_to_date(logger, index)
+
+
+def test_catch_up_index_after_an_edit_reindexes_from_the_edited_record(logger):
+    index = stored_index(logger)
+    records = list(index['records'])
+    data = read_bytes(logger)
+    edited = data.index(b'Monday 03/01/2024')
+    rewrite(logger, data.replace(b'Monday 03/01/2024\n8 8 8', b'Monday 03/01/2024\n9 9 9'))
+
+    removed, offset = catch_up_index(logger, index)
+    position = next(position for position, record in enumerate(records)
+                    if record[RECORD_START] <= edited < record[RECORD_END])
+    assert removed == records[position:]
+    assert offset <= records[position][RECORD_START]
+    assert index['records'][:position] == records[:position]
+    assert_up_to_date(logger, index)
+
+
+def test_catch_up_index_after_deleting_the_last_session(logger):
+    index = stored_index(logger)
+    records = list(index['records'])
+    data = read_bytes(logger)
+    rewrite(logger, data[:data.index('\nMonday {:02d}/01/2024'.format(SESSIONS).encode('utf-8'))])
+
+    removed, offset = catch_up_index(logger, index)
+    assert removed == records[-1:]
+    assert len(index['records']) == len(records) - 1
+    assert_up_to_date(logger, index)
+
+
+def test_catch_up_index_of_an_emptied_logger(logger):
+    index = stored_index(logger)
+    rewrite(logger, b'')
+
+    removed, offset = catch_up_index(logger, index)
+    assert offset == 0
+    assert index['records'] == []
+    assert_up_to_date(logger, index)
+
+
+def test_appending_only_writes_the_new_entries(logger):
+    load_index(logger)
+    size = os.path.getsize(index_path(logger))
+    assert size == HEADER.size + ENTRY.size * len(load_index(logger)['records'])
+
+    file_handle = open(index_path(logger), 'r+b')
+    file_handle.seek(HEADER.size)
+    stored = file_handle.read(ENTRY.size * 2)
+    append_to_log(logger, session(SESSIONS + 1))
+    file_handle.seek(HEADER.size)
+    assert file_handle.read(ENTRY.size * 2) == stored
+    file_handle.close()
+    assert os.path.getsize(index_path(logger)) == size + ENTRY.size
+    assert_up_to_date(logger, read_index(logger))
+
+
+def test_removing_entries_drops_them_from_the_stored_index(logger):
+    load_index(logger)
+    remove_entries(logger, select_entries(logger, 2))
+    append_to_log(logger, session(SESSIONS + 1))
+    parse_cache.clear()
+    assert_up_to_date(logger, read_index(logger))
+    assert read_index(logger)['records'][-1][RECORD_KIND] == 'session'
+
+
+def test_an_index_whose_entries_never_made_it_to_disk_is_rebuilt(logger):
+    load_index(logger)
+    file_handle = open(index_path(logger), 'r+b')
+    file_handle.seek(HEADER.size + ENTRY.size)
+    file_handle.write(bytes(ENTRY.size))
+    file_handle.close()
+    assert read_index(logger) is None
+
+    parse_cache.clear()
+    assert load_index(logger)['records'] == build_index(logger)['records']
+    assert read_index(logger) is not None
+
+
+def test_an_index_in_the_old_json_format_is_rebuilt(logger):
+    file_handle = open(index_path(logger), 'w')
+    file_handle.write('{"version": 2, "records": []}')
+    file_handle.close()
+    assert read_index(logger) is None
+    parse_cache.clear()
+    assert return_current_program(logger).startswith('First Pair')
+    assert_up_to_date(logger, read_index(logger))
+
+
+def test_index_entries_can_be_read_from_the_end(logger):
+    records = load_index(logger)['records']
+    assert list(reversed(records)) == list(records)[::-1]
+    assert records[-1] == list(records)[-1]
+    assert records.first_from(records[2][RECORD_START]) == 2
+    assert records.first_from(records[-1][RECORD_END] + 1) == len(records)
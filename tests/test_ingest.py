@@ -0,0 +1,56 @@
+import json
+
+from fitnesslog import ingest_sessions
+
+from conftest import read_bytes, entries, SESSIONS
+
+PAIR = '8 8 8, 7 7 7'
+TRIPLET = '10 10, 20 20, 9 9'
+
+
+def write_file(path: str, lines: list) -> str:
+    file_handle = open(path, 'w')
+    file_handle.write('\n'.join(lines) + '\n')
+    file_handle.close()
+    return path
+
+
+def jsonl_file(path: str, sessions: list) -> str:
+    return write_file(path, [json.dumps(session) for session in sessions])
+
+
+def test_ingest_sessions_from_csv(logger, tmp_path):
+    path = write_file(str(tmp_path / 'sessions.csv'), [
+        'date,comment,first,second,third,core',
+        '2024-01-08,,"{0}","{0}","{0}","{1}"'.format(PAIR, TRIPLET),
+        '09/01/2024,felt strong,"{0}","{0}","{0}","{1}"'.format(PAIR, TRIPLET),
+    ])
+    assert ingest_sessions(logger, path) == 2
+    assert entries(logger)[-2].split('\n') == ['Monday 08/01/2024', PAIR, PAIR, PAIR, TRIPLET]
+    assert entries(logger)[-1].split('\n')[:2] == ['Tuesday 09/01/2024', 'felt strong']
+
+
+def test_ingest_sessions_from_jsonl(logger, tmp_path):
+    path = jsonl_file(str(tmp_path / 'sessions.jsonl'), [
+        {'date': '2024-01-08', 'reps': [PAIR, PAIR, PAIR, TRIPLET]},
+        {'date': '2024-01-09', 'skipped': True},
+    ])
+    assert ingest_sessions(logger, path) == 2
+    assert entries(logger)[-1] == 'Tuesday 09/01/2024\n(SKIPPED)'
+    assert len(entries(logger)) == SESSIONS + 3
+
+
+def test_nothing_is_logged_if_any_session_is_invalid(logger, tmp_path, capsys):
+    before = read_bytes(logger)
+    path = jsonl_file(str(tmp_path / 'sessions.jsonl'), [
+        {'date': '2024-01-08', 'reps': [PAIR, PAIR, PAIR, TRIPLET]},
+        {'date': '31/02/2024', 'reps': [PAIR, PAIR, PAIR, TRIPLET]},
+        {'date': '2024-01-10', 'reps': [PAIR, PAIR, PAIR]},
+        {'date': '2024-01-11', 'reps': [PAIR, PAIR, PAIR, PAIR]},
+    ])
+    assert ingest_sessions(logger, path) is None
+    assert read_bytes(logger) == before
+    printed = capsys.readouterr().out
+    assert 'line 2: invalid date' in printed
+    assert 'line 3: expected 4 lines of reps' in printed
+    assert "has 3 exercises but '{}' has 2".format(PAIR) in printed
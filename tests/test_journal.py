@@ -0,0 +1,182 @@
+import os
+import threading
+import time
+
+import pytest
+
+from fitnesslog import parse_cache, journal_path, recover_log, encode_record, load_index, build_index, \
+    GroupCommitWriter, parse_logger
+from fitnesslog import journal
+from fitnesslog.journal import write_journal
+from fitnesslog.cache import build_parsed_state
+
+from conftest import session, read_bytes, entries, SESSIONS
+
+
+def cut_off_append(filename: str, text: str, written: int) -> bytes:
+    """
+    journals text the way an append does, then writes only its first written bytes to the logger, as if
+    FitnessLogManager had been killed halfway through. Returns the logger as the append would have left it.
+    """
+    before = read_bytes(filename)
+    raw = encode_record(text)
+    write_journal(filename, len(before), [raw])
+    file_handle = open(filename, 'ab')
+    file_handle.write(raw[:written])
+    file_handle.close()
+    return before + raw
+
+
+def test_recover_log_without_a_journal_does_nothing(logger):
+    before = read_bytes(logger)
+    assert recover_log(logger) == 0
+    assert read_bytes(logger) == before
+
+
+def test_appends_leave_no_journal_behind(logger):
+    assert not os.path.exists(journal_path(logger))
+
+
+def test_recover_log_finishes_a_cut_off_append(logger):
+    expected = cut_off_append(logger, session(SESSIONS + 1), 10)
+    assert recover_log(logger) == 1
+    assert read_bytes(logger) == expected
+    assert not os.path.exists(journal_path(logger))
+    assert entries(logger)[-1].startswith('Monday {:02d}/01/2024'.format(SESSIONS + 1))
+
+
+def test_recover_log_finishes_an_append_that_never_started(logger):
+    expected = cut_off_append(logger, session(SESSIONS + 1), 0)
+    assert recover_log(logger) == 1
+    assert read_bytes(logger) == expected
+
+
+def test_recover_log_skips_an_append_that_was_finished(logger):
+    expected = cut_off_append(logger, session(SESSIONS + 1), len(encode_record(session(SESSIONS + 1))))
+    assert recover_log(logger) == 0
+    assert read_bytes(logger) == expected
+    assert not os.path.exists(journal_path(logger))
+
+
+def test_recover_log_ignores_a_torn_journal_entry(logger):
+    before = read_bytes(logger)
+    write_journal(logger, len(before), [encode_record(session(SESSIONS + 1))])
+    file_handle = open(journal_path(logger), 'r+b')
+    file_handle.truncate(os.path.getsize(journal_path(logger)) - 5)
+    file_handle.close()
+    assert recover_log(logger) == 0
+    assert read_bytes(logger) == before
+    assert not os.path.exists(journal_path(logger))
+
+
+def test_recover_log_keeps_the_journal_if_the_logger_was_edited_since(logger):
+    cut_off_append(logger, session(SESSIONS + 1), 10)
+    file_handle = open(logger, 'ab')
+    file_handle.write(b' edited by hand')
+    file_handle.close()
+    edited = read_bytes(logger)
+    assert recover_log(logger) == 0
+    assert read_bytes(logger) == edited
+    assert not os.path.exists(journal_path(logger))
+    assert os.path.exists(journal_path(logger) + '.bad')
+
+
+def test_group_commit_writes_every_record_from_every_thread(logger):
+    writer = GroupCommitWriter(logger)
+    days = range(SESSIONS + 1, SESSIONS + 21)
+
+    def work(day):
+        writer.write(session(day))
+
+    threads = [threading.Thread(target=work, args=(day,)) for day in days]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    writer.close()
+
+    assert writer.committed == len(days)
+    assert writer.batches <= len(days)
+    assert sorted(entry.split('\n')[0] for entry in entries(logger)[SESSIONS + 1:]) == \
+        ['Monday {:02d}/01/2024'.format(day) for day in days]
+    assert not os.path.exists(journal_path(logger))
+    assert load_index(logger)['records'] == build_index(logger)['records']
+
+
+def test_group_commit_refuses_writes_once_closed(logger):
+    writer = GroupCommitWriter(logger)
+    writer.close()
+    with pytest.raises(ValueError):
+        writer.write(session(SESSIONS + 1))
+
+
+def write_all(writer: GroupCommitWriter, days: range) -> None:
+    threads = [threading.Thread(target=writer.write, args=(session(day),)) for day in days]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+def test_group_commit_batches_whatever_queued_up_behind_an_fsync(logger, monkeypatch):
+    release = threading.Event()
+    batches = []
+    journal_batch = journal.journal_batch
+
+    def slow_journal_batch(filename, texts):
+        batches.append(len(texts))
+        release.wait()
+        return journal_batch(filename, texts)
+
+    monkeypatch.setattr(journal, 'journal_batch', slow_journal_batch)
+    writer = GroupCommitWriter(logger, max_batch=4)
+    days = range(SESSIONS + 1, SESSIONS + 11)
+    first = threading.Thread(target=writer.write, args=(session(days[0]),))
+    first.start()
+    while not batches:
+        time.sleep(0.01)
+    rest = threading.Thread(target=write_all, args=(writer, days[1:]))
+    rest.start()
+    while writer.queued < len(days):
+        time.sleep(0.01)
+    release.set()
+    first.join()
+    rest.join()
+    writer.close()
+
+    assert batches == [1, 4, 4, 1]
+    assert writer.batches == len(batches)
+    assert writer.committed == len(days)
+    assert len(entries(logger)) == SESSIONS + 1 + len(days)
+
+
+def test_group_commit_keeps_the_index_and_the_parse_cache_current(logger):
+    parse_logger(logger)
+    misses = parse_cache.misses
+    with GroupCommitWriter(logger) as writer:
+        write_all(writer, range(SESSIONS + 1, SESSIONS + 6))
+        assert os.path.exists(journal_path(logger))
+    assert not os.path.exists(journal_path(logger))
+    assert parse_cache.misses == misses
+    assert parse_cache.state(logger)['parsed'] == build_parsed_state(logger)
+    assert load_index(logger)['records'] == build_index(logger)['records']
+
+
+def test_group_commit_checkpoints_a_journal_that_grew_too_big(logger):
+    writer = GroupCommitWriter(logger, checkpoint_size=1)
+    writer.write(session(SESSIONS + 1))
+    assert not os.path.exists(journal_path(logger))
+    writer.close()
+
+
+def test_group_commit_hands_a_failed_batch_to_its_writers(logger, monkeypatch):
+    def failing_journal_batch(filename, texts):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(journal, 'journal_batch', failing_journal_batch)
+    before = read_bytes(logger)
+    writer = GroupCommitWriter(logger)
+    with pytest.raises(OSError):
+        writer.write(session(SESSIONS + 1))
+    writer.close()
+    assert read_bytes(logger) == before
@@ -0,0 +1,61 @@
+import datetime
+
+from fitnesslog import append_to_log, LogPager, format_page, import_text_log
+
+from conftest import session, SESSIONS
+
+RECORDS = SESSIONS + 1  # the starter program comes first
+
+
+def headers(numbered: list) -> list:
+    return [(number, record.text.strip().split('\n')[0]) for number, record in numbered]
+
+
+def test_pages_newest_first(logger):
+    pager = LogPager(logger, page_size=4)
+    assert len(pager) == RECORDS
+    assert pager.pages() == 2
+    assert headers(pager.page(1)) == [(day + 1, 'Monday {:02d}/01/2024'.format(day)) for day in range(5, 1, -1)]
+    assert [number for number, record in pager.page(2)] == [2, 1]
+    assert pager.page(2)[-1][1].text.strip().startswith('First Pair')
+    assert pager.page(9) == pager.page(2)
+
+
+def test_pages_oldest_first(logger):
+    pager = LogPager(logger, page_size=4, newest_first=False)
+    assert [number for number, record in pager.page(1)] == [1, 2, 3, 4]
+    assert [number for number, record in pager.page(2)] == [5, 6]
+    assert pager.page_of_record(5) == 2
+    assert LogPager(logger, page_size=4).page_of_record(5) == 1
+
+
+def test_record_of_date_finds_the_first_session_from_then(logger):
+    pager = LogPager(logger, page_size=4)
+    assert pager.record_of_date(datetime.date(2024, 1, 3)) == 4
+    assert pager.record_of_date(datetime.date(2023, 1, 1)) == 2
+    assert pager.record_of_date(datetime.date(2024, 2, 1)) is None
+
+
+def test_pager_follows_appends(logger):
+    pager = LogPager(logger, page_size=4)
+    pager.page(1)
+    append_to_log(logger, session(SESSIONS + 1))
+    assert len(pager) == RECORDS + 1
+    assert headers(pager.page(1))[0] == (RECORDS + 1, 'Monday {:02d}/01/2024'.format(SESSIONS + 1))
+
+
+def test_format_page(logger):
+    text = format_page(LogPager(logger, page_size=1).page(1))
+    assert text == '\n({})\n{}'.format(RECORDS, session(SESSIONS).strip('\n'))
+
+
+def test_sqlite_loggers_page_the_same(logger, tmp_path):
+    database = str(tmp_path / 'my_fitness_logs.db')
+    import_text_log(logger, database)
+    for newest_first in (True, False):
+        text_pager = LogPager(logger, page_size=4, newest_first=newest_first)
+        database_pager = LogPager(database, page_size=4, newest_first=newest_first)
+        assert len(database_pager) == len(text_pager)
+        for page in (1, 2):
+            assert headers(database_pager.page(page)) == headers(text_pager.page(page))
+    assert LogPager(database).record_of_date(datetime.date(2024, 1, 3)) == 4
@@ -0,0 +1,79 @@
+import json
+
+import pytest
+
+from fitnesslog import profiling_options, profile_action, parse_logger
+from fitnesslog import profiling
+from fitnesslog.profiling import Profiler, PROFILE_ENVIRONMENT, TRACE_ENVIRONMENT, CPROFILE_ENVIRONMENT
+
+
+@pytest.fixture(autouse=True)
+def no_profiling_environment(monkeypatch):
+    for name in (PROFILE_ENVIRONMENT, TRACE_ENVIRONMENT, CPROFILE_ENVIRONMENT):
+        monkeypatch.delenv(name, raising=False)
+
+
+def test_profiling_options_are_taken_out_of_the_command_line():
+    assert profiling_options(['log']) == (['log'], None)
+    assert profiling_options(['--profile', 'log']) == (['log'], {'trace_file': None, 'cprofile_dir': None})
+    assert profiling_options(['log', '--profile-trace', 'trace.jsonl', '--profile-cprofile=profiles']) == \
+        (['log'], {'trace_file': 'trace.jsonl', 'cprofile_dir': 'profiles'})
+
+
+def test_profiling_options_fall_back_on_the_environment(monkeypatch):
+    monkeypatch.setenv(PROFILE_ENVIRONMENT, '0')
+    assert profiling_options([]) == ([], None)
+    monkeypatch.setenv(PROFILE_ENVIRONMENT, '1')
+    monkeypatch.setenv(TRACE_ENVIRONMENT, 'trace.jsonl')
+    assert profiling_options([]) == ([], {'trace_file': 'trace.jsonl', 'cprofile_dir': None})
+
+
+def test_profile_action_does_nothing_while_profiling_is_off():
+    assert profiling.profiler is None
+    assert profile_action('log') is profiling.NO_ACTION
+
+
+def test_timed_functions_count_calls_and_own_time():
+    profiler = Profiler()
+    profiler.start('count')
+
+    def inner():
+        return 1
+
+    timed_inner = profiler.timed('inner', inner)
+
+    def outer():
+        return timed_inner() + timed_inner()
+
+    def numbers():
+        yield timed_inner()
+        yield 2
+
+    assert profiler.timed('outer', outer)() == 2
+    assert list(profiler.timed('numbers', numbers)()) == [1, 2]
+    summary = profiler.stop()
+    assert summary['functions']['inner']['calls'] == 3
+    assert summary['functions']['outer']['calls'] == 1
+    assert summary['functions']['numbers']['calls'] == 1
+    outer_timing = summary['functions']['outer']
+    assert outer_timing['own seconds'] <= outer_timing['seconds']
+
+
+def test_profiled_action_counts_file_traffic_and_writes_its_trace(logger, tmp_path, monkeypatch, capsys):
+    trace_file = str(tmp_path / 'trace.jsonl')
+    profiler = Profiler(trace_file=trace_file)
+    monkeypatch.setattr(profiling, 'profiler', profiler)
+    with profile_action('read'):
+        file_handle = profiler.open(logger)
+        data = file_handle.read()
+        file_handle.close()
+        parse_logger(logger)
+    assert '[profile] read:' in capsys.readouterr().out
+
+    file_handle = open(trace_file)
+    summary, = [json.loads(line) for line in file_handle]
+    file_handle.close()
+    assert summary['action'] == 'read'
+    assert summary['file opens'] == 1
+    assert summary['bytes read'] == len(data)
+    assert summary['parse cache misses'] == 1
@@ -0,0 +1,53 @@
+import pytest
+
+from fitnesslog import return_current_program
+from fitnesslog.programs import Program, Exercise, parse_program, program_sections, parse_adjusted_program, \
+    max_reps, MAX_REPS
+
+from conftest import read_bytes, STARTER_FILE
+
+STARTER_PROGRAM = read_bytes(STARTER_FILE).decode('utf-8').split('---')[0]
+
+
+def test_program_from_text_finds_every_section():
+    program = Program.from_text(STARTER_PROGRAM)
+    assert [section.kind for section in program.sections] == ['pair', 'pair', 'pair', 'triplet']
+    assert program.headers()[0] == 'First Pair: (do whole pair, then rest 90 seconds. repeat 3 times)'
+    core = program.section(program.headers()[3])
+    assert [exercise.name for exercise in core.exercises] == \
+        ['Straight Hanging leg raises', 'Copenhagen Plank', 'Arch Body hold']
+    assert core.max_reps == MAX_REPS['triplet']
+    assert program.section('Fourth Pair') is None
+
+
+def test_program_to_text_gives_back_the_text_it_was_parsed_from():
+    assert Program.from_text(STARTER_PROGRAM).to_text() == STARTER_PROGRAM
+    sections = program_sections(STARTER_PROGRAM)
+    assert parse_adjusted_program(sections) == STARTER_PROGRAM
+    assert Program.from_sections(sections).to_dict() == sections
+
+
+def test_exercise_rep_ranges():
+    assert Exercise('1- Pull-ups, 5-8 reps').rep_range == (5, 8, 'reps')
+    assert Exercise('2- Copenhagen Plank, 10-30 seconds each side').rep_range == (10, 30, 'seconds')
+    assert Exercise('3- Arch Body hold').rep_range is None
+    assert Exercise('1- Pull-ups, 5-8 reps').name == 'Pull-ups'
+
+
+def test_parse_program_parses_every_revision_once(logger):
+    current_program = return_current_program(logger)
+    assert parse_program(current_program) is parse_program(current_program)
+    assert parse_program(current_program).to_dict() == program_sections(STARTER_PROGRAM)
+
+
+def test_parsed_programs_have_no_instance_dict():
+    program = parse_program(STARTER_PROGRAM)
+    for value in (program, program.sections[0], program.sections[0].exercises[0]):
+        with pytest.raises(AttributeError):
+            value.extra = None
+
+
+def test_max_reps_by_kind():
+    assert max_reps('Core Triplet: (do set)') == MAX_REPS['triplet']
+    assert max_reps('First Pair: (do whole pair)') == MAX_REPS['pair']
+    assert max_reps('Warm up: (five minutes, pairs of jumps)') is None
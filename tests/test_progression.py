@@ -0,0 +1,36 @@
+import shutil
+
+from fitnesslog import append_to_log, write_adjusted_program, select_entries, remove_entries, load_progression, \
+    Program
+
+from conftest import STARTER_FILE, session, SESSIONS
+
+TWICE = Program.from_sections({'First Pair': ['1- Pull-ups, 5-8 reps', '2- Squats, 5-8 reps'],
+                               'Second Pair': ['1- Pull-ups, 5-8 reps', '2- Lunges, 5-8 reps']}).to_text()
+
+
+def test_every_session_counts_towards_its_exercises(logger):
+    progress = load_progression(logger).report(['Pull-ups'])['Pull-ups']
+    assert progress['sessions'] == SESSIONS
+    assert progress['total_reps'] == SESSIONS * 24
+    assert progress['best_set'] == 8
+
+
+def test_an_exercise_in_two_sections_counts_once_per_session(tmp_path):
+    filename = str(tmp_path / 'my_fitness_logs.txt')
+    shutil.copyfile(STARTER_FILE, filename)
+    write_adjusted_program(filename, TWICE)
+    append_to_log(filename, session(1, '8 8 8, 8 8 8'))
+    append_to_log(filename, session(2, '9 9 9, 8 8 8'))
+
+    engine = load_progression(filename)
+    pull_ups = engine.exercises['Pull-ups']
+    assert pull_ups.sessions == 2
+    assert pull_ups.volumes == [48, 54]
+    assert pull_ups.total_sets == 12
+    assert pull_ups.best_set == 9
+    assert [name for name, reps in engine.sessions[-1].sets] == ['Pull-ups', 'Squats', 'Lunges']
+
+    remove_entries(filename, select_entries(filename, 1))
+    pull_ups = load_progression(filename).exercises['Pull-ups']
+    assert (pull_ups.sessions, pull_ups.volumes, pull_ups.total_sets) == (1, [48], 6)
@@ -0,0 +1,48 @@
+import datetime
+from collections import Counter
+
+import pytest
+
+from fitnesslog import parse_cache, append_to_log, parse_logger, make_record, iter_records, load_index, \
+    sessions_between, PROGRAM, SESSION, UNDATED, OTHER
+from fitnesslog.cache import build_parsed_state, add_to_parsed_state
+from fitnesslog.index import RECORD_KIND
+
+from conftest import SESSIONS
+
+
+@pytest.mark.parametrize('text, kind', [
+    ('\nMonday 01/01/2024\n8 8 8, 8 8 8\n', SESSION),
+    ('\nWednesday 03/01/2024\n8 8 8, 8 8 8\n', SESSION),
+    ('\nMonday 31/02/2024\n8 8 8, 8 8 8\n', UNDATED),
+    ('\nTuesday\n(SKIPPED)\n', UNDATED),
+    ('\nMonday 1/1/24\n8 8 8\n', UNDATED),
+    ('\nFirst Pair: (do whole pair)\n\n1- Pull-ups, 5-8 reps\n', PROGRAM),
+    ('\nnotes about the week\n', OTHER),
+])
+def test_make_record_tells_records_apart_by_their_first_word(text, kind):
+    assert make_record(0, 0, text.encode('utf-8')).kind == kind
+
+
+def test_a_session_with_a_mistyped_date_is_still_a_session(logger):
+    append_to_log(logger, '\nMonday 31/02/2024\nfelt off\n8 8 8, 8 8 8\n---')
+    record = list(iter_records(logger))[-1]
+    assert record.kind == UNDATED
+    assert (record.header, record.lines) == ('Monday 31/02/2024', ['felt off', '8 8 8, 8 8 8'])
+    assert parse_logger(logger)[1]['Monday 31/02/2024'] == ['felt off', '8 8 8, 8 8 8']
+    assert load_index(logger)['records'][-1][RECORD_KIND] == UNDATED
+    sessions = sessions_between(logger, datetime.date(2024, 1, 1), datetime.date(2024, 12, 31))
+    assert len(sessions) == SESSIONS
+
+
+def test_parse_logger_reads_the_same_as_the_records(logger):
+    file_handle = open(logger, 'ab')
+    file_handle.write(b'\r\nTuesday 30/01/2024\r\n\r\n9 9 9\r\n---\n\nMonday\n---\nnotes\n---\nMonday 01/01/2024\n1 1\n---')
+    file_handle.close()
+    parse_cache.clear()
+    parsed = ([], {}, [], Counter())
+    for record in iter_records(logger):
+        add_to_parsed_state(parsed, record)
+    assert build_parsed_state(logger) == parsed
+    assert parse_logger(logger) == parsed[:3]
+    assert parsed[3]['Monday 01/01/2024'] == 2
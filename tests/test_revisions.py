@@ -0,0 +1,87 @@
+import datetime
+import os
+import shutil
+
+import pytest
+
+from fitnesslog import parse_cache, append_to_log, format_session, write_adjusted_program, rotate_segments, \
+    load_program_history, diff_programs, Program
+from fitnesslog import revisions, segments
+from fitnesslog.revisions import CHANGED, programs_path
+
+from conftest import STARTER_FILE
+
+TODAY = datetime.date(2024, 6, 1)
+
+
+def program(first: str, second: str) -> str:
+    return Program.from_sections({'First Pair': [first, '2- Squats, 5-8 reps'],
+                                  'Core Triplet': [second, '2- Copenhagen Plank, 10-30 seconds each side']}).to_text()
+
+
+@pytest.fixture
+def adjusted(tmp_path) -> str:
+    """
+    a logger whose program was adjusted every year from 2021 to 2024, with a session after every adjustment
+    """
+    filename = str(tmp_path / 'my_fitness_logs.txt')
+    shutil.copyfile(STARTER_FILE, filename)
+    for year in range(2021, 2025):
+        write_adjusted_program(filename, program('1- Pull-ups, {}-8 reps'.format(year - 2019),
+                                                 '1- Arch Body hold, 8-12 reps'))
+        date = datetime.date(year, 1, 4)
+        append_to_log(filename, format_session('{} {}'.format(date.strftime('%A'), date.strftime('%d/%m/%Y')),
+                                               None, ['8 8 8, 8 8 8'] * 2))
+    return filename
+
+
+def revision_texts(filename: str) -> list:
+    history = load_program_history(filename)
+    return [history.revision(number).to_text() for number in range(1, len(history) + 1)]
+
+
+def test_sections_sharing_a_header_are_compared_one_to_one():
+    old = Program.from_text('First Pair\n\n1- Pull-ups\n\nFirst Pair\n\n1- Squats\n\n')
+    new = Program.from_text('First Pair\n\n1- Pull-ups\n\nFirst Pair\n\n1- Lunges\n\n')
+    assert len(old.sections) == 2
+    changes = diff_programs(old, new)
+    assert [(change.header, change.change, change.removed, change.added) for change in changes] == \
+        [('First Pair', CHANGED, ['1- Squats'], ['1- Lunges'])]
+
+
+def test_program_history_keeps_sections_sharing_a_header(tmp_path):
+    filename = str(tmp_path / 'my_fitness_logs.txt')
+    shutil.copyfile(STARTER_FILE, filename)
+    write_adjusted_program(filename, 'First Pair\n\n1- Pull-ups\n\nFirst Pair\n\n1- Squats\n\n')
+    write_adjusted_program(filename, 'First Pair\n\n1- Pull-ups\n\nFirst Pair\n\n1- Lunges\n\n')
+    history = load_program_history(filename)
+    assert len(history.sections_of(-1)) == 2
+    assert [change.change for change in history.delta(-1)] == [CHANGED]
+
+
+def test_the_revisions_in_segments_are_read_from_the_stored_table(adjusted, monkeypatch):
+    before = revision_texts(adjusted)
+    rotate_segments(adjusted, keep_days=365, today=TODAY)
+    parse_cache.clear()
+    assert revision_texts(adjusted) == before
+    assert os.path.exists(programs_path(adjusted))
+
+    def no_segments(filename, segment):
+        raise AssertionError("decompressed a segment")
+
+    parse_cache.clear()
+    segments.segment_cache.clear()
+    monkeypatch.setattr(revisions, 'segment_records', no_segments)
+    assert revision_texts(adjusted) == before
+    assert load_program_history(adjusted).archived > 0
+
+
+def test_the_stored_table_is_rebuilt_after_another_rotation(adjusted):
+    before = revision_texts(adjusted)
+    rotate_segments(adjusted, keep_days=2 * 365, today=TODAY)
+    parse_cache.clear()
+    archived = load_program_history(adjusted).archived
+    rotate_segments(adjusted, keep_days=365, today=TODAY)
+    parse_cache.clear()
+    assert revision_texts(adjusted) == before
+    assert load_program_history(adjusted).archived > archived
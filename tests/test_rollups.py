@@ -0,0 +1,100 @@
+import datetime
+import os
+
+import pytest
+
+from fitnesslog import parse_cache, append_to_log, format_session, select_entries, remove_entries, WEEK, MONTH, \
+    period_key, load_rollups, update_rollups, format_chart, import_text_log
+from fitnesslog import rollups
+from fitnesslog.rollups import build_rollups, rollup_path
+
+from conftest import session, read_bytes, SESSIONS
+
+VOLUME = 4 * 6 * 8  # every session has 4 lines of 6 sets of 8
+
+
+def tables(filename: str) -> dict:
+    current = load_rollups(filename)
+    return {period: repr(current.rollups(period)) for period in (WEEK, MONTH)}
+
+
+def fresh_tables(filename: str) -> dict:
+    built = build_rollups(filename)
+    return {period: repr(built.rollups(period)) for period in (WEEK, MONTH)}
+
+
+def no_rebuild(filename: str):
+    raise AssertionError("the rollups were rolled up again from the whole logger")
+
+
+def test_period_keys():
+    assert period_key(datetime.date(2020, 12, 31), WEEK) == '2020-W53'
+    assert period_key(datetime.date(2021, 1, 3), WEEK) == '2020-W53'
+    assert period_key(datetime.date(2021, 1, 3), MONTH) == '2021-01'
+
+
+def test_rollups_of_a_logger(logger):
+    append_to_log(logger, format_session('Saturday 06/01/2024', '(SKIPPED)', []))
+    week, = load_rollups(logger).rollups(WEEK).items()
+    month, = load_rollups(logger).rollups(MONTH).items()
+    assert week[0] == '2024-W01' and month[0] == '2024-01'
+    for key, rollup in (week, month):
+        assert (rollup.sessions, rollup.skipped, rollup.best_set) == (SESSIONS, 1, 8)
+        assert rollup.total_reps() == SESSIONS * VOLUME
+        assert rollup.total_reps('core') == SESSIONS * VOLUME // 4
+        assert len(rollup.reps) == 4
+
+
+def test_rollups_are_stored_and_only_catch_up_with_appends(logger, monkeypatch):
+    before = tables(logger)
+    assert os.path.exists(rollup_path(logger))
+    monkeypatch.setattr(rollups, 'build_rollups', no_rebuild)
+    parse_cache.clear()
+    assert tables(logger) == before
+
+    file_handle = open(logger, 'ab')
+    file_handle.write(session(SESSIONS + 1).encode('utf-8'))
+    file_handle.close()
+    parse_cache.clear()
+    caught_up = tables(logger)
+    monkeypatch.undo()
+    assert caught_up == fresh_tables(logger)
+
+
+def test_rollups_after_an_edit_are_rolled_up_again(logger):
+    tables(logger)
+    data = read_bytes(logger)
+    file_handle = open(logger, 'wb')
+    file_handle.write(data.replace(b'Monday 03/01/2024\n8 8 8', b'Monday 03/01/2024\n9 9 9'))
+    file_handle.close()
+    parse_cache.clear()
+    assert tables(logger) == fresh_tables(logger)
+
+
+def test_removing_entries_rolls_up_only_the_weeks_they_were_in(logger):
+    append_to_log(logger, format_session('Saturday 20/01/2024', None, ['9 9 9, 9 9 9'] * 4))
+    tables(logger)
+    remove_entries(logger, select_entries(logger, 2))
+    update_rollups(logger)
+    assert tables(logger) == fresh_tables(logger)
+    assert list(load_rollups(logger).rollups(WEEK)) == ['2024-W01']
+    parse_cache.clear()
+    assert tables(logger) == fresh_tables(logger)
+
+
+def test_format_chart_shows_the_weeks_without_sessions(logger):
+    append_to_log(logger, format_session('Saturday 20/01/2024', None, ['9 9 9, 9 9 9'] * 4))
+    lines = format_chart(load_rollups(logger).rollups(WEEK), WEEK, width=10).split('\n')
+    assert [line.split()[0] for line in lines] == ['2024-W01', '2024-W02', '2024-W03']
+    assert lines[0] == '2024-W01 |########## {}'.format(SESSIONS * VOLUME)
+    assert lines[1] == '2024-W02 |{} 0'.format(' ' * 10)
+    assert format_chart(load_rollups(logger).rollups(WEEK), WEEK, metric='sessions', last=1).endswith(' 1')
+    assert format_chart({}, WEEK) == "Nothing logged yet."
+
+
+@pytest.mark.parametrize('period', [WEEK, MONTH])
+def test_sqlite_loggers_roll_up_the_same(logger, tmp_path, period):
+    database = str(tmp_path / 'my_fitness_logs.db')
+    import_text_log(logger, database)
+    assert repr(load_rollups(database).rollups(period)) == repr(load_rollups(logger).rollups(period))
+    assert not os.path.exists(rollup_path(database))
@@ -0,0 +1,76 @@
+import os
+
+from fitnesslog import parse_cache, append_to_log, format_session, select_entries, remove_entries, search_records, \
+    regex_records
+from fitnesslog.records import PROGRAM, SESSION
+from fitnesslog.search import search_path
+
+from conftest import SESSIONS
+
+COMMENTS = ['felt strong', 'pistol squat felt easy', 'squat then pistol', '(SKIPPED)']
+
+
+def headers(result) -> list:
+    return [record.text.strip().split('\n')[0] for record in result.records]
+
+
+def commented(day: int, comment: str) -> str:
+    reps = [] if comment == '(SKIPPED)' else ['9 9 9, 9 9 9'] * 4
+    return format_session('Monday {:02d}/01/2024'.format(day), comment, reps)
+
+
+def log_comments(filename: str) -> None:
+    for day, comment in enumerate(COMMENTS, SESSIONS + 1):
+        append_to_log(filename, commented(day, comment))
+
+
+def test_search_records_finds_every_word_of_the_query(logger):
+    log_comments(logger)
+    assert headers(search_records(logger, 'felt')) == ['Monday 06/01/2024', 'Monday 07/01/2024']
+    assert headers(search_records(logger, 'Pistol SQUAT')) == ['Monday 07/01/2024', 'Monday 08/01/2024']
+    assert headers(search_records(logger, 'skipped')) == ['Monday 09/01/2024']
+    assert search_records(logger, 'pistol strong').total == 0
+    assert search_records(logger, '!!').total == 0
+
+
+def test_search_records_phrases_kinds_and_limits(logger):
+    log_comments(logger)
+    assert headers(search_records(logger, '"pistol squat"')) == ['Monday 07/01/2024']
+    program, = search_records(logger, 'pull-ups', kind=PROGRAM).records
+    assert program.text.strip().startswith('First Pair')
+    assert search_records(logger, 'pull-ups', kind=SESSION).total == 0
+    result = search_records(logger, 'felt', limit=1)
+    assert result.total == 2
+    assert headers(result) == ['Monday 07/01/2024']
+
+
+def test_stored_search_index_catches_up_with_an_edit_behind_our_back(logger):
+    search_records(logger, 'felt')
+    assert os.path.exists(search_path(logger))
+    file_handle = open(logger, 'a')
+    file_handle.write(commented(SESSIONS + 1, 'felt tired'))
+    file_handle.close()
+    parse_cache.clear()
+    assert headers(search_records(logger, 'felt tired')) == ['Monday 06/01/2024']
+
+
+def test_search_index_follows_removals(logger):
+    log_comments(logger)
+    search_records(logger, 'felt')
+    remove_entries(logger, select_entries(logger, 3))
+    assert headers(search_records(logger, 'felt')) == ['Monday 06/01/2024']
+    parse_cache.clear()
+    assert headers(search_records(logger, 'felt')) == ['Monday 06/01/2024']
+
+
+def test_regex_records(logger):
+    log_comments(logger)
+    assert headers(regex_records(logger, r'9 9 9')) == ['Monday 06/01/2024', 'Monday 07/01/2024',
+                                                        'Monday 08/01/2024']
+    assert regex_records(logger, r'PISTOL').total == 0
+    assert regex_records(logger, r'PISTOL', ignore_case=True).total == 2
+    assert regex_records(logger, r'Pull-ups').records[0].kind == PROGRAM
+    assert regex_records(logger, r'Monday', kind=SESSION).total == SESSIONS + len(COMMENTS)
+    result = regex_records(logger, r'Monday', limit=2)
+    assert result.total == SESSIONS + len(COMMENTS)
+    assert headers(result) == ['Monday 08/01/2024', 'Monday 09/01/2024']
@@ -0,0 +1,133 @@
+import datetime
+import os
+import shutil
+
+import pytest
+
+from fitnesslog import parse_cache, append_to_log, format_session, iter_history, rotate_segments, segments_dir, \
+    load_manifest, load_progression, load_rep_store, parse_many, select_entries, remove_entries
+from fitnesslog import segments
+
+from conftest import STARTER_FILE, entries
+
+TODAY = datetime.date(2024, 6, 1)
+
+
+def dated_session(date: datetime.date, reps: str = '8 8 8, 8 8 8') -> str:
+    return format_session('{} {}'.format(date.strftime('%A'), date.strftime('%d/%m/%Y')), None, [reps] * 4)
+
+
+@pytest.fixture
+def history(tmp_path) -> str:
+    """
+    a logger with a session every 100 days from 2021 to 2024
+    """
+    filename = str(tmp_path / 'my_fitness_logs.txt')
+    shutil.copyfile(STARTER_FILE, filename)
+    for day in range(0, 1250, 100):
+        append_to_log(filename, dated_session(datetime.date(2021, 1, 4) + datetime.timedelta(days=day)))
+    return filename
+
+
+@pytest.fixture
+def unrotated(history, tmp_path) -> str:
+    """
+    a copy of the history logger that is never rotated, to compare the rotated one with
+    """
+    os.makedirs(str(tmp_path / 'unrotated'))
+    filename = str(tmp_path / 'unrotated' / 'my_fitness_logs.txt')
+    shutil.copyfile(history, filename)
+    return filename
+
+
+def history_texts(filename: str) -> list:
+    return [record.text.strip() for record in iter_history(filename)]
+
+
+def progress(filename: str) -> tuple:
+    engine = load_progression(filename)
+    return engine.report(), [(session.date, session.sets) for session in engine.sessions], len(engine.programs)
+
+
+def test_rotate_segments_keeps_the_whole_history(history):
+    before = history_texts(history)
+    moved = rotate_segments(history, keep_days=365, today=TODAY)
+    assert moved > 0
+    assert history_texts(history) == before
+    assert entries(history)[0].startswith('First Pair')
+    assert len(entries(history)) < len(before)
+    assert sorted(segment['file'] for segment in load_manifest(history)['segments']) == \
+        ['2021.txt.gz', '2022.txt.gz', '2023.txt.gz']
+
+
+def recording(events: list, name: str, original):
+    def record(path, *arguments):
+        events.append((name, os.path.basename(path)))
+        return original(path, *arguments)
+    return record
+
+
+def test_rotate_segments_syncs_the_segments_before_the_manifest(history, monkeypatch):
+    events = []
+    for name in ('sync_file', 'sync_directory', 'write_manifest'):
+        monkeypatch.setattr(segments, name, recording(events, name, getattr(segments, name)))
+
+    rotate_segments(history, keep_days=365, today=TODAY)
+    first_manifest = events.index(('write_manifest', os.path.basename(history)))
+    synced = [path for name, path in events[:first_manifest] if name == 'sync_file']
+    assert sorted(synced) == ['2021.txt.gz', '2022.txt.gz', '2023.txt.gz']
+    directories = [path for name, path in events[:first_manifest] if name == 'sync_directory']
+    assert os.path.basename(segments_dir(history)) in directories
+    assert os.path.basename(os.path.dirname(history)) in directories
+
+
+def test_a_rotation_cut_off_after_its_manifest_is_finished(history, monkeypatch):
+    before = history_texts(history)
+    replace = os.replace
+
+    def crash_before_the_hot_file_is_replaced(source, destination):
+        if source.endswith(segments.ROTATING_SUFFIX):
+            raise OSError("crashed")
+        replace(source, destination)
+
+    monkeypatch.setattr(segments.os, 'replace', crash_before_the_hot_file_is_replaced)
+    with pytest.raises(OSError):
+        rotate_segments(history, keep_days=365, today=TODAY)
+    monkeypatch.undo()
+    assert os.path.exists(history + segments.ROTATING_SUFFIX)
+
+    parse_cache.clear()
+    assert history_texts(history) == before
+    assert not os.path.exists(history + segments.ROTATING_SUFFIX)
+    assert len(entries(history)) < len(before)
+
+
+def test_iter_history_offsets_grow_through_the_segments_into_the_hot_file(history):
+    rotate_segments(history, keep_days=365, today=TODAY)
+    starts = [record.start for record in iter_history(history)]
+    assert starts == sorted(starts)
+    assert len(set(starts)) == len(starts)
+    assert starts[0] < 0 <= starts[-1]
+
+
+def test_history_readers_see_the_segments(history, unrotated):
+    rotate_segments(history, keep_days=365, today=TODAY)
+    assert progress(history) == progress(unrotated)
+    assert len(load_rep_store(history)) == len(load_rep_store(unrotated))
+    rotated, = parse_many([history], workers=1).files
+    whole, = parse_many([unrotated], workers=1).files
+    assert rotated[1:] == whole[1:]
+    assert parse_many([history], workers=1).exercises == parse_many([unrotated], workers=1).exercises
+
+
+def test_cached_history_readers_keep_the_segments_through_writes(history, unrotated):
+    rotate_segments(history, keep_days=365, today=TODAY)
+    for filename in (history, unrotated):
+        load_progression(filename)
+        load_rep_store(filename)
+        remove_entries(filename, select_entries(filename, 1))
+        append_to_log(filename, dated_session(TODAY, '9 9 9, 9 9 9'))
+    assert progress(history) == progress(unrotated)
+    assert len(load_rep_store(history)) == len(load_rep_store(unrotated))
+    parse_cache.clear()
+    assert progress(history) == progress(unrotated)
@@ -0,0 +1,79 @@
+import asyncio
+import json
+
+import pytest
+
+from fitnesslog import service
+from fitnesslog.service import LogService
+
+from conftest import STARTER_FILE
+
+
+@pytest.fixture
+def log_service(tmp_path):
+    log_service = LogService(str(tmp_path / 'users'), STARTER_FILE, workers=2)
+    yield log_service
+    log_service.close()
+
+
+def respond(log_service: LogService, method: str, target: str, body=None) -> tuple:
+    raw_body = body if isinstance(body, bytes) else (b'' if body is None else json.dumps(body).encode('utf-8'))
+    return asyncio.run(log_service.respond(method, target, raw_body))
+
+
+def test_a_user_can_log_a_session_and_read_it_back(log_service):
+    assert respond(log_service, 'POST', '/users/ann') == (201, {'user': 'ann'})
+    status, response = respond(log_service, 'POST', '/users/ann/sessions',
+                               {'date': '01/01/2024', 'reps': ['8 8 8, 8 8 8'] * 3 + ['8 8 8, 8 8 8, 8 8 8']})
+    assert status == 201
+    status, response = respond(log_service, 'GET', '/users/ann/entries?last=1')
+    assert status == 200
+    assert response['entries'][0].strip('\n').startswith('Monday 01/01/2024')
+
+
+def test_a_body_that_isnt_json_is_a_bad_request(log_service):
+    respond(log_service, 'POST', '/users/ann')
+    status, response = respond(log_service, 'POST', '/users/ann/sessions', b'{"date": ')
+    assert status == 400
+    assert response['error'].startswith('invalid JSON')
+    assert respond(log_service, 'POST', '/users/ann/sessions', [1, 2])[0] == 400
+
+
+def test_an_invalid_session_is_a_bad_request(log_service):
+    respond(log_service, 'POST', '/users/ann')
+    status, response = respond(log_service, 'POST', '/users/ann/sessions', {'date': '31/02/2024'})
+    assert status == 400
+    assert 'invalid date' in response['error']
+
+
+def test_a_value_error_while_handling_is_the_services_fault(log_service, monkeypatch):
+    respond(log_service, 'POST', '/users/ann')
+
+    def broken(filename):
+        raise ValueError("the logger is broken")
+
+    monkeypatch.setattr(service, 'read_program', broken)
+    status, response = respond(log_service, 'GET', '/users/ann/program')
+    assert status == 500
+    assert 'the logger is broken' in response['error']
+    assert 'invalid JSON' not in response['error']
+
+
+def test_requests_over_a_connection(log_service):
+    async def exchange() -> bytes:
+        server = await asyncio.start_server(log_service.serve_connection, '127.0.0.1', 0)
+        port = server.sockets[0].getsockname()[1]
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+        writer.write(b'POST /users/ann HTTP/1.1\r\nContent-Length: 0\r\n\r\n'
+                     b'GET /users/ann/program HTTP/1.1\r\nConnection: close\r\n\r\n')
+        await writer.drain()
+        data = await reader.read()
+        writer.close()
+        server.close()
+        await server.wait_closed()
+        return data
+
+    data = asyncio.run(exchange())
+    assert data.startswith(b'HTTP/1.1 201 Created')
+    assert b'HTTP/1.1 200 OK' in data
+    assert b'First Pair' in data
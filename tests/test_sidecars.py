@@ -0,0 +1,58 @@
+import os
+
+import pytest
+
+from fitnesslog import parse_cache, move_logger, sidecar_paths, rotate_segments, create_backup, load_index, \
+    iter_history, SIDECAR_SUFFIXES
+from fitnesslog import sidecars
+
+from conftest import entries
+
+
+def history_texts(filename: str) -> list:
+    return [record.text.strip() for record in iter_history(filename)]
+
+
+def test_every_sidecar_suffix_is_listed():
+    suffixes = [value for name, value in vars(sidecars).items() if name.endswith('_SUFFIX')]
+    assert sorted(suffixes) == sorted(SIDECAR_SUFFIXES)
+
+
+def test_move_logger_takes_everything_beside_it(logger, tmp_path):
+    rotate_segments(logger, keep_days=0)
+    create_backup(logger)
+    load_index(logger)
+    before = history_texts(logger)
+    beside = sidecar_paths(logger)
+    assert len(beside) >= 3
+    target = str(tmp_path / 'second')
+    os.makedirs(target)
+
+    moved = move_logger(logger, target)
+    assert moved[0] == os.path.join(target, os.path.basename(logger))
+    assert not os.path.exists(logger)
+    assert sidecar_paths(logger) == []
+    assert sorted(os.path.basename(path) for path in sidecar_paths(moved[0])) == \
+        sorted(os.path.basename(path) for path in beside)
+    parse_cache.clear()
+    assert history_texts(moved[0]) == before
+
+
+def test_move_logger_refuses_to_overwrite_and_moves_nothing(logger, tmp_path):
+    load_index(logger)
+    target = str(tmp_path / 'second')
+    os.makedirs(target)
+    file_handle = open(os.path.join(target, os.path.basename(logger) + sidecars.INDEX_SUFFIX), 'w')
+    file_handle.close()
+
+    with pytest.raises(FileExistsError):
+        move_logger(logger, target)
+    assert os.path.exists(logger)
+    assert os.path.exists(logger + sidecars.INDEX_SUFFIX)
+    assert not os.path.exists(os.path.join(target, os.path.basename(logger)))
+
+
+def test_move_logger_into_its_own_folder_does_nothing(logger):
+    before = entries(logger)
+    assert move_logger(logger, os.path.dirname(logger))[0] == logger
+    assert entries(logger) == before
@@ -0,0 +1,190 @@
+import datetime
+import os
+
+import pytest
+
+from fitnesslog import append_to_log, format_session, select_entries, remove_entries, sync_loggers, conflicts_path, \
+    import_text_log, return_current_program, program_sections, parse_adjusted_program, write_adjusted_program, \
+    list_backups, rotate_segments
+from fitnesslog import sync
+from fitnesslog.sync import update_sync_state
+
+from conftest import session, read_bytes, entries, make_logger, SESSIONS
+
+
+@pytest.fixture
+def other(tmp_path) -> str:
+    """
+    where the copy of the logger is kept, in a folder of its own the way another machine's copy would be synced in
+    """
+    os.makedirs(str(tmp_path / 'second'))
+    return str(tmp_path / 'second' / 'my_fitness_logs.txt')
+
+
+def headers(filename: str) -> list:
+    return [entry.split('\n')[0] for entry in entries(filename)[1:]]
+
+
+def test_sync_loggers_copies_the_logger_into_a_new_one(logger, other):
+    report = sync_loggers(logger, other)
+    assert report.sent == SESSIONS + 1
+    assert report.received == report.deleted == 0
+    assert entries(other) == entries(logger)
+
+    report = sync_loggers(logger, other)
+    assert (report.sent, report.received, report.deleted, report.copied) == (0, 0, 0, 0)
+
+
+def test_sync_loggers_merges_appends_on_both_sides_by_date(logger, other):
+    sync_loggers(logger, other)
+    append_to_log(logger, session(SESSIONS + 1))
+    append_to_log(other, session(SESSIONS + 2))
+    append_to_log(logger, session(SESSIONS + 3))
+
+    report = sync_loggers(logger, other)
+    assert report.received == 1
+    assert report.conflicts == []
+    assert entries(other) == entries(logger)
+    assert headers(logger) == ['Monday {:02d}/01/2024'.format(day) for day in range(1, SESSIONS + 4)]
+
+
+def test_sync_loggers_only_copies_what_changed(logger, other):
+    sync_loggers(logger, other)
+    append_to_log(other, session(SESSIONS + 1))
+
+    report = sync_loggers(logger, other)
+    assert (report.sent, report.received) == (0, 1)
+    assert 0 < report.copied < os.path.getsize(other) // 2
+    assert read_bytes(logger) == read_bytes(other)
+
+
+def test_sync_loggers_passes_deletions_on(logger, other):
+    sync_loggers(logger, other)
+    remove_entries(other, select_entries(other, 2))
+
+    report = sync_loggers(logger, other)
+    assert report.deleted == 2
+    assert entries(logger) == entries(other)
+    assert len(entries(logger)) == SESSIONS - 1
+
+
+def test_sync_loggers_keeps_the_losing_side_of_a_conflict(logger, other):
+    sync_loggers(logger, other)
+    append_to_log(logger, session(SESSIONS + 1, '9 9 9, 9 9 9'))
+    append_to_log(other, session(SESSIONS + 1, '1 1 1, 1 1 1'))
+
+    report = sync_loggers(logger, other)
+    assert report.conflicts == ['Monday {:02d}/01/2024'.format(SESSIONS + 1)]
+    assert entries(logger) == entries(other)
+    assert '9 9 9' in entries(other)[-1]
+    file_handle = open(conflicts_path(other))
+    assert '1 1 1' in file_handle.read()
+    file_handle.close()
+
+
+def test_sync_loggers_of_loggers_that_were_never_synced(logger, tmp_path):
+    second = make_logger(str(tmp_path / 'second'))
+    append_to_log(second, session(SESSIONS + 1))
+
+    report = sync_loggers(logger, second)
+    assert report.conflicts == []
+    assert entries(logger) == entries(second)
+    assert headers(logger)[-1] == 'Monday {:02d}/01/2024'.format(SESSIONS + 1)
+
+
+def test_sync_loggers_refuses_sqlite_loggers(logger, tmp_path):
+    database = str(tmp_path / 'my_fitness_logs.db')
+    import_text_log(logger, database)
+    with pytest.raises(ValueError):
+        sync_loggers(logger, database)
+
+
+def rewrite(filename: str, data: bytes) -> None:
+    file_handle = open(filename, 'wb')
+    file_handle.write(data)
+    file_handle.close()
+
+
+def test_sync_state_only_hashes_what_changed(logger, monkeypatch):
+    records = update_sync_state(logger)['records']
+    positions = []
+    extend_digests = sync.extend_digests
+
+    def recording_extend_digests(filename, index, position):
+        positions.append(position)
+        extend_digests(filename, index, position)
+
+    monkeypatch.setattr(sync, 'extend_digests', recording_extend_digests)
+    append_to_log(logger, session(SESSIONS + 1))
+    assert update_sync_state(logger)['records'] == records + 1
+    assert update_sync_state(logger)['records'] == records + 1
+    assert positions == [records]
+
+    rewrite(logger, read_bytes(logger).replace(b'Monday 03/01/2024\n8 8 8', b'Monday 03/01/2024\n9 9 9'))
+    update_sync_state(logger)
+    assert positions[-1] == 3
+
+
+def test_sync_loggers_ignores_line_endings(logger, other):
+    rewrite(other, read_bytes(logger).replace(b'\n', b'\r\n'))
+    report = sync_loggers(logger, other)
+    assert (report.sent, report.received, report.deleted, report.copied) == (0, 0, 0, 0)
+    assert report.conflicts == []
+
+
+def test_sync_loggers_keeps_a_new_program_before_the_session_logged_after_it(logger, other):
+    sync_loggers(logger, other)
+    sections = program_sections(return_current_program(other))
+    first_header = list(sections)[0]
+    sections[first_header] = sections[first_header] + ['3- Pistol Squats, 3-5 reps']
+    assert write_adjusted_program(other, parse_adjusted_program(sections))
+    append_to_log(other, session(SESSIONS + 1))
+    append_to_log(logger, session(SESSIONS + 2))
+
+    report = sync_loggers(logger, other)
+    assert (report.sent, report.received) == (1, 2)
+    assert entries(logger) == entries(other)
+    assert entries(logger)[-3].startswith('First Pair')
+    assert 'Pistol Squats' in return_current_program(logger)
+    assert headers(logger)[-2:] == ['Monday {:02d}/01/2024'.format(day) for day in (SESSIONS + 1, SESSIONS + 2)]
+
+
+def test_sync_loggers_passes_an_edit_on_with_a_restore_point(logger, other):
+    sync_loggers(logger, other)
+    rewrite(other, read_bytes(other).replace(b'Monday 03/01/2024\n8 8 8', b'Monday 03/01/2024\n9 9 9'))
+
+    report = sync_loggers(logger, other)
+    assert (report.sent, report.received, report.deleted) == (0, 1, 1)
+    assert read_bytes(logger) == read_bytes(other)
+    assert list_backups(logger)[-1].reason == 'before syncing with {}'.format(other)
+
+
+def test_sync_loggers_compares_a_few_digests(tmp_path, monkeypatch):
+    first = make_logger(str(tmp_path / 'first'))
+    file_handle = open(first, 'ab')
+    file_handle.write(''.join(format_session('Monday 01/01/2024', str(number), ['8 8 8, 8 8 8'] * 4)
+                              for number in range(2000)).encode('utf-8'))
+    file_handle.close()
+    second = str(tmp_path / 'second.txt')
+    sync_loggers(first, second)
+    append_to_log(second, session(SESSIONS + 1))
+
+    read = []
+    entries_of = sync.Digests.entries
+
+    def counting_entries(digests, start, stop):
+        read.append(stop - start)
+        return entries_of(digests, start, stop)
+
+    monkeypatch.setattr(sync.Digests, 'entries', counting_entries)
+    report = sync_loggers(first, second)
+    assert (report.sent, report.received) == (0, 1)
+    assert sum(read) < 100
+    assert read_bytes(first) == read_bytes(second)
+
+
+def test_sync_loggers_refuses_loggers_rotated_differently(logger, other):
+    sync_loggers(logger, other)
+    rotate_segments(logger, keep_days=30, today=datetime.date(2025, 6, 1))
+    with pytest.raises(ValueError):
+        sync_loggers(logger, other)
@@ -0,0 +1,73 @@
+import time
+
+from fitnesslog import parse_cache, parse_logger, load_index, build_index, LogWatcher, refresh_logger
+from fitnesslog.cache import build_parsed_state
+from fitnesslog.records import file_signature
+
+from conftest import session, read_bytes, SESSIONS
+
+
+def rewrite(filename: str, data: bytes) -> None:
+    file_handle = open(filename, 'wb')
+    file_handle.write(data)
+    file_handle.close()
+
+
+def assert_caught_up(filename: str) -> None:
+    assert parse_cache.cached(filename)[0] == file_signature(filename)
+    assert parse_cache.state(filename)['parsed'] == build_parsed_state(filename)
+    assert load_index(filename)['records'] == build_index(filename)['records']
+
+
+def test_refresh_logger_of_an_unchanged_logger_does_nothing(logger):
+    parse_logger(logger)
+    assert refresh_logger(logger) is False
+
+
+def test_refresh_logger_after_an_append_behind_our_back(logger):
+    parse_logger(logger)
+    misses = parse_cache.misses
+    rewrite(logger, read_bytes(logger) + session(SESSIONS + 1).encode('utf-8'))
+    assert refresh_logger(logger) is True
+    assert_caught_up(logger)
+    assert parse_cache.misses == misses
+    assert 'Monday {:02d}/01/2024'.format(SESSIONS + 1) in parse_logger(logger)[1]
+
+
+def test_refresh_logger_after_an_edit_in_the_middle(logger):
+    parse_logger(logger)
+    data = read_bytes(logger)
+    rewrite(logger, data.replace(b'Monday 03/01/2024\n8 8 8', b'Monday 03/01/2024\n9 9 9'))
+    assert refresh_logger(logger) is True
+    assert_caught_up(logger)
+    assert parse_logger(logger)[1]['Monday 03/01/2024'][0] == '9 9 9, 8 8 8'
+
+
+def test_refresh_logger_after_the_last_session_was_deleted(logger):
+    parse_logger(logger)
+    data = read_bytes(logger)
+    rewrite(logger, data[:data.index('\nMonday {:02d}/01/2024'.format(SESSIONS).encode('utf-8'))])
+    assert refresh_logger(logger) is True
+    assert_caught_up(logger)
+    assert 'Monday {:02d}/01/2024'.format(SESSIONS) not in parse_logger(logger)[1]
+
+
+def test_entering_the_watcher_catches_up(logger):
+    parse_logger(logger)
+    rewrite(logger, read_bytes(logger) + session(SESSIONS + 1).encode('utf-8'))
+    with LogWatcher(logger):
+        assert_caught_up(logger)
+
+
+def test_watcher_catches_up_in_the_background(logger):
+    parse_logger(logger)
+    watcher = LogWatcher(logger, poll_interval=0.05).start()
+    try:
+        rewrite(logger, read_bytes(logger) + session(SESSIONS + 1).encode('utf-8'))
+        deadline = time.monotonic() + 5
+        while parse_cache.cached(logger)[0] != file_signature(logger) and time.monotonic() < deadline:
+            time.sleep(0.02)
+    finally:
+        watcher.stop()
+    assert_caught_up(logger)
+    assert watcher.thread is None